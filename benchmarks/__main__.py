@@ -0,0 +1,79 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+"""
+Runs the benchmarks and compares stored results
+
+Usage:
+    python -m benchmarks run [--filter NAME] [--repeat N] [--quick] [--output FILE]
+    python -m benchmarks compare OLD.json NEW.json [--threshold 0.1] [--fail-on-regression]
+"""
+
+import argparse
+import sys
+
+from benchmarks import bench_executors, bench_mapper, bench_models, bench_requester, bench_startup  # noqa: F401 (registration)
+from benchmarks.harness import compare, get_benchmarks, load, print_comparison, print_results, save
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of the Tankerkoenig client")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    run_parser = commands.add_parser("run", help="Runs the benchmarks and stores the results")
+    run_parser.add_argument("--filter", help="Only runs benchmarks whose name contains the text")
+    run_parser.add_argument("--repeat", type=int, default=5, help="Number of samples per benchmark")
+    run_parser.add_argument("--quick", action="store_true", help="Only runs the first parameter of every benchmark")
+    run_parser.add_argument("--output", help="Result file, default is a new file in benchmarks/results")
+    run_parser.add_argument("--no-save", action="store_true", help="Only prints the results")
+    
+    compare_parser = commands.add_parser("compare", help="Compares two stored results")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+    compare_parser.add_argument("--threshold", type=float, default=0.1,
+                                help="Relative change which is reported, default 0.1 (10%%)")
+    compare_parser.add_argument("--fail-on-regression", action="store_true",
+                                help="Exits with 1 if any benchmark regressed")
+    
+    args = parser.parse_args()
+    
+    if args.command == "run":
+        benchmarks = get_benchmarks(args.filter)
+        width = max((len(name) for bench in benchmarks for name in bench.get_names()), default=0)
+        results = []
+        for bench in benchmarks:
+            for result in bench.run(args.repeat, args.quick):
+                if args.filter is None or args.filter in result.name:
+                    print_results([result], width)
+                    results.append(result)
+        if not args.no_save:
+            print(f"Results written to {save(results, args.output)}")
+        return 0
+    
+    regressions = print_comparison(compare(load(args.old), load(args.new)), args.threshold)
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import atexit
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from benchmarks.harness import benchmark
+from tankerkoenig.client import ClientExecutor, HttpxClientExecutor, RequestsClientExecutor
+from tankerkoenig.testing import FakeServerConfig, FakeTankerkoenigServer, StationUniverse, constant_latency
+
+CONCURRENCY = (1, 16, 64)
+
+# Base URL of an HTTP/2 capable server answering like the Tankerkoenig API (TLS with ALPN or
+# h2c with prior knowledge). Without it, the HTTP/1.1 fake server is used and the httpx
+# executor falls back to HTTP/1.1, so only its overhead is compared, not multiplexing
+H2_BASE_URL = os.environ.get("TANKERKOENIG_BENCH_H2_URL")
+H2_PRIOR_KNOWLEDGE = os.environ.get("TANKERKOENIG_BENCH_H2_PRIOR_KNOWLEDGE") == "1"
+
+try:
+    import httpx  # noqa: F401
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@lru_cache(maxsize=1)
+def fake_server() -> FakeTankerkoenigServer:
+    config = FakeServerConfig(latency=constant_latency(0.005))
+    server = FakeTankerkoenigServer(StationUniverse(size=1000, seed=42), config).start()
+    atexit.register(server.stop)
+    return server
+
+
+def base_url() -> str:
+    return H2_BASE_URL or fake_server().get_base_url()
+
+
+def run_concurrently(executor: ClientExecutor, concurrency: int):
+    """Returns a callable which sends a burst of prices requests with the given concurrency"""
+    url = base_url() + "prices.php"
+    ids = fake_server().get_universe().get_station_ids()[:10]
+    parameters = {"apikey": "benchmark", "ids": ",".join(ids)}
+    pool = ThreadPoolExecutor(max_workers=concurrency)
+    atexit.register(pool.shutdown)
+    
+    def burst():
+        futures = [pool.submit(executor.get, url, parameters) for _ in range(concurrency)]
+        for future in futures:
+            future.result()
+    return burst
+
+
+@benchmark("executor.requests.burst", params=CONCURRENCY)
+def requests_burst(concurrency):
+    """A burst of concurrent requests via requests, one pooled connection per request in flight"""
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=concurrency))
+    return run_concurrently(RequestsClientExecutor(session), concurrency)
+
+
+if HTTP2_AVAILABLE:
+    @benchmark("executor.httpx.burst", params=CONCURRENCY)
+    def httpx_burst(concurrency):
+        """A burst of concurrent requests via httpx, multiplexed over one HTTP/2 connection"""
+        executor = HttpxClientExecutor(max_connections=1, http2_prior_knowledge=H2_PRIOR_KNOWLEDGE)
+        atexit.register(executor.close)
+        return run_concurrently(executor, concurrency)
+
+
+@benchmark("executor.requests.list", params=("gzip", "identity"))
+def requests_list(accept_encoding):
+    """A list.php response with a 25 km radius, compressed and uncompressed"""
+    executor = RequestsClientExecutor(accept_encoding=accept_encoding)
+    server = fake_server()
+    universe = server.get_universe()
+    station = universe.get_station(universe.get_station_ids()[0])
+    parameters = {"apikey": "benchmark", "lat": station.lat, "lng": station.lng, "rad": 25, "type": "all"}
+    return lambda: executor.get(server.get_base_url() + "list.php", parameters)
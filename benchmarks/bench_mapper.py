@@ -0,0 +1,65 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+
+from benchmarks import corpus
+from benchmarks.harness import benchmark, measure
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.models.results import PricesResult, StationDetailResult, StationListResult
+
+
+@benchmark("mapper.from_json.list", params=corpus.SIZES)
+def from_json_list(count):
+    """Parsing and mapping of a list.php response"""
+    mapper, body = JsonMapper(), corpus.station_list_body(count)
+    return lambda: mapper.from_json(body, StationListResult)
+
+
+@benchmark("mapper.from_json.prices", params=corpus.SIZES)
+def from_json_prices(count):
+    """Parsing and mapping of a prices.php response"""
+    mapper, body = JsonMapper(), corpus.prices_body(count)
+    return lambda: mapper.from_json(body, PricesResult)
+
+
+@benchmark("mapper.from_json.detail")
+def from_json_detail(_):
+    """Parsing and mapping of a detail.php response"""
+    mapper, body = JsonMapper(), corpus.detail_body()
+    return lambda: mapper.from_json(body, StationDetailResult)
+
+
+@benchmark("mapper.parse.list", params=corpus.SIZES)
+def parse_list(count):
+    """Only the JSON parsing of a list.php response, to separate it from the mapping"""
+    mapper, body = JsonMapper(), corpus.station_list_body(count)
+    return lambda: mapper.parse(body)
+
+
+@benchmark("mapper.map.per_station", params=(15000,), timed=False)
+def map_per_station(count, repeat):
+    """Mapping cost per station, without JSON parsing"""
+    mapper, data = JsonMapper(), json.loads(corpus.station_list_body(count))
+    return [sample / count for sample in measure(lambda: mapper.map(data, StationListResult), repeat)]
@@ -0,0 +1,69 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import gc
+import json
+import tracemalloc
+
+from benchmarks import corpus
+from benchmarks.harness import benchmark
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.models.results import StationListResult
+from tankerkoenig.models.station import Location, Station
+
+
+@benchmark("models.station.construct")
+def construct_station(_):
+    """Construction of a Station with location and prices"""
+    prices = {GasType.E5: 1.789, GasType.E10: 1.729, GasType.DIESEL: 1.659}
+    
+    def construct():
+        return Station(
+            id="51d4b660-a095-1aa0-e100-80009459e03a", name="JET BERLIN", brand="JET", is_open=True,
+            location=Location(lat=52.5262, lng=13.4886, street_name="HERZBERGSTR.", zip_code=10365, city="BERLIN"),
+            gas_prices=GasPrices(prices=dict(prices), status=Status.OPEN)
+        )
+    return construct
+
+
+@benchmark("models.station.memory", params=(1000, 15000), unit="bytes", timed=False)
+def station_memory(count, repeat):
+    """Memory allocated per mapped Station of a list.php response, including its
+    Location and GasPrices"""
+    data = json.loads(corpus.station_list_body(count))
+    mapper = JsonMapper()
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = mapper.map(data, StationListResult)
+            allocated = tracemalloc.get_traced_memory()[0] - before
+        finally:
+            tracemalloc.stop()
+        samples.append(allocated / len(result.get_stations()))
+        del result
+    return samples
@@ -0,0 +1,108 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import atexit
+import time
+from functools import lru_cache
+from urllib.parse import urlencode
+
+from benchmarks import corpus
+from benchmarks.harness import benchmark
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+
+
+class StubClientExecutor(ClientExecutor):
+    """ClientExecutor which answers every request with a fixed body, so only the
+    client itself is measured"""
+    
+    def __init__(self, body: str):
+        self._body = body
+    
+    def get(self, url, query_parameters, timeout=None):
+        return self._body
+    
+    def post(self, url, form_params, timeout=None):
+        return self._body
+
+
+def build_api(body: str) -> Tankerkoenig.Api:
+    return Tankerkoenig.ApiBuilder().with_api_key("benchmark").with_client_executor(StubClientExecutor(body)).build()
+
+
+@lru_cache(maxsize=1)
+def fake_server() -> FakeTankerkoenigServer:
+    server = FakeTankerkoenigServer(StationUniverse(size=1000, seed=42)).start()
+    atexit.register(server.stop)
+    return server
+
+
+@benchmark("requester.execute.prices", params=(1, 10))
+def execute_prices(count):
+    """Request execution including validation, parameters and mapping against a stub"""
+    api = build_api(corpus.prices_body(count))
+    ids = [entry["id"] for entry in corpus.stations(count)]
+    return lambda: api.prices().add_ids(*ids).execute()
+
+
+@benchmark("requester.execute.prices.template", params=(1, 10))
+def execute_prices_template(count):
+    """Repeated execution of a validated, immutable prices template against a stub"""
+    api = build_api(corpus.prices_body(count))
+    template = api.prices_template([entry["id"] for entry in corpus.stations(count)])
+    return template.execute
+
+
+@benchmark("requester.execute.list", params=corpus.SIZES)
+def execute_list(count):
+    """Request execution of a list request against a stub"""
+    api = build_api(corpus.station_list_body(count))
+    return lambda: api.list(52.52, 13.40).set_search_radius(25).execute()
+
+
+@benchmark("requester.execute.http.prices")
+def execute_prices_http(_):
+    """Request execution over HTTP against the local fake server"""
+    server = fake_server()
+    api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("benchmark").build()
+    ids = server.get_universe().get_station_ids()[:10]
+    return lambda: api.prices().add_ids(*ids).execute()
+
+
+@benchmark("requester.parameters.list", params=("rebuilt", "prepared"))
+def list_parameters(mode):
+    """Building the encoded query string of a repeated list request, rebuilt from the
+    request on every call or prepared once with only the timestamp added"""
+    api = build_api(corpus.station_list_body(10))
+    request = api.list(52.52, 13.40).set_search_radius(25)
+    
+    def rebuilt():
+        parameters = dict(request.get_request_parameters(), apikey=request.get_api_key(), ts=int(time.time()))
+        return urlencode({k: str(v) for k, v in parameters.items() if v is not None and str(v)})
+    
+    def prepared():
+        return request.get_prepared_parameters().with_value("ts", int(time.time())).get_query()
+    
+    return rebuilt if mode == "rebuilt" else prepared
@@ -0,0 +1,57 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.harness import benchmark
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(arguments) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable] + arguments, cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - started
+
+
+@benchmark("startup.interpreter", timed=False)
+def interpreter(_, repeat):
+    """Start of a bare interpreter, the baseline of the cold starts below"""
+    return [_run(["-c", "pass"]) for _ in range(repeat)]
+
+
+@benchmark("startup.import", timed=False)
+def import_package(_, repeat):
+    """Cold start of a new interpreter importing the package"""
+    return [_run(["-c", "import tankerkoenig"]) for _ in range(repeat)]
+
+
+@benchmark("startup.cli", timed=False)
+def cli(_, repeat):
+    """Cold start of the CLI up to its help output"""
+    return [_run(["tankerkoenig_cli.py", "--help"]) for _ in range(repeat)]
@@ -0,0 +1,79 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+from functools import lru_cache
+from typing import Dict, List
+
+from tankerkoenig.testing import StationUniverse
+
+# Corpus sizes from a single station up to roughly all stations in Germany
+SIZES = (10, 1000, 15000)
+
+_TIMESTAMP = 1_700_000_000
+
+
+@lru_cache(maxsize=1)
+def universe() -> StationUniverse:
+    """Returns the universe all corpora are generated from"""
+    return StationUniverse(size=max(SIZES), seed=42)
+
+
+def stations(count: int) -> List[Dict]:
+    """Returns the station entries of a list.php response with count stations"""
+    entries = []
+    for station_id in universe().get_station_ids()[:count]:
+        station = universe().get_station(station_id)
+        data = {key: value for key, value in station.to_json().items()
+                if key not in ("openingTimes", "overrides", "wholeDay", "state")}
+        data["dist"] = 1.5
+        data.update(universe().get_prices(station, _TIMESTAMP))
+        entries.append(data)
+    return entries
+
+
+@lru_cache(maxsize=None)
+def station_list_body(count: int) -> str:
+    """Returns a list.php response body with count stations"""
+    return json.dumps({"ok": True, "license": "CC BY 4.0", "data": "MTS-K", "status": "ok",
+                       "stations": stations(count)})
+
+
+@lru_cache(maxsize=None)
+def prices_body(count: int) -> str:
+    """Returns a prices.php response body with count stations"""
+    prices = {}
+    for entry in stations(count):
+        prices[entry["id"]] = {"status": "open" if entry["isOpen"] else "closed",
+                               "e5": entry["e5"], "e10": entry["e10"] or False, "diesel": entry["diesel"]}
+    return json.dumps({"ok": True, "license": "CC BY 4.0", "data": "MTS-K", "prices": prices})
+
+
+@lru_cache(maxsize=1)
+def detail_body() -> str:
+    """Returns a detail.php response body"""
+    station = universe().get_station(universe().get_station_ids()[0])
+    data = station.to_json()
+    data.update(universe().get_prices(station, _TIMESTAMP))
+    return json.dumps({"ok": True, "license": "CC BY 4.0", "data": "MTS-K", "status": "ok", "station": data})
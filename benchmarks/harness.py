@@ -0,0 +1,228 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import timeit
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+@dataclass
+class Result:
+    """The measurement of a benchmark
+    
+    Attributes:
+        name: The name of the benchmark, including its parameter
+        unit: The unit of the values, e.g. "s" or "bytes"
+        value: The median of the samples, which is used for comparisons
+        samples: The measured samples
+    """
+    name: str
+    unit: str
+    value: float
+    samples: List[float] = field(default_factory=list)
+    
+    def get_min(self) -> float:
+        """Returns the lowest sample"""
+        return min(self.samples) if self.samples else self.value
+    
+    def get_stdev(self) -> float:
+        """Returns the standard deviation of the samples"""
+        return statistics.stdev(self.samples) if len(self.samples) > 1 else 0.0
+
+
+@dataclass
+class Benchmark:
+    """A registered benchmark. The function receives the parameter and returns the
+    samples, unless the benchmark is timed, in which case it returns a callable to time"""
+    name: str
+    function: Callable
+    params: Sequence = (None,)
+    unit: str = "s"
+    timed: bool = True
+    
+    def get_names(self) -> List[str]:
+        """Returns the names of the benchmark for every parameter"""
+        return [self._name(param) for param in self.params]
+    
+    def run(self, repeat: int, quick: bool = False) -> List[Result]:
+        """Runs the benchmark for every parameter"""
+        params = self.params[:1] if quick else self.params
+        results = []
+        for param in params:
+            if self.timed:
+                samples = measure(self.function(param), repeat)
+            else:
+                samples = list(self.function(param, repeat))
+            results.append(Result(self._name(param), self.unit, statistics.median(samples), samples))
+        return results
+    
+    def _name(self, param) -> str:
+        return self.name if param is None else f"{self.name}[{param}]"
+
+
+_REGISTRY: List[Benchmark] = []
+
+
+def benchmark(name: str, params: Sequence = (None,), unit: str = "s", timed: bool = True) -> Callable:
+    """Registers a benchmark function
+    
+    Args:
+        name: The name of the benchmark
+        params: The parameters the benchmark is run with, e.g. corpus sizes
+        unit: The unit of the samples
+        timed: If True, the function is a setup which returns the callable to time.
+            Otherwise the function receives the number of repetitions and returns the samples itself
+    """
+    def register(function: Callable) -> Callable:
+        _REGISTRY.append(Benchmark(name, function, tuple(params), unit, timed))
+        return function
+    return register
+
+
+def get_benchmarks(pattern: Optional[str] = None) -> List[Benchmark]:
+    """Returns the registered benchmarks whose name contains the pattern"""
+    return [b for b in _REGISTRY if pattern is None or any(pattern in name for name in b.get_names())]
+
+
+def measure(function: Callable[[], object], repeat: int, min_time: float = 0.2) -> List[float]:
+    """Times the function and returns the seconds per call of every repetition. Each
+    repetition calls the function often enough to take at least min_time"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    return [total / number for total in timer.repeat(repeat=repeat, number=number)]
+
+
+def get_metadata() -> Dict[str, str]:
+    """Returns the environment of a run, which is stored with the results"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit or "unknown",
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+
+
+def save(results: List[Result], path: Optional[str] = None) -> str:
+    """Writes the results with the metadata of the run. Without a path, a new file is
+    created in the results directory, named after the time and commit"""
+    metadata = get_metadata()
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = metadata["timestamp"].replace(":", "").replace("-", "").split("+")[0]
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{metadata['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata, "results": [asdict(result) for result in results]}, f, indent=2)
+    return path
+
+
+def load(path: str) -> Dict[str, Result]:
+    """Loads stored results, keyed by benchmark name"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return {entry["name"]: Result(**entry) for entry in data["results"]}
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """The change of a benchmark between two runs"""
+    name: str
+    unit: str
+    old: Optional[float]
+    new: Optional[float]
+    
+    def get_ratio(self) -> Optional[float]:
+        """Returns new / old, where values above 1 are slower or larger"""
+        if self.old is None or self.new is None or self.old == 0:
+            return None
+        return self.new / self.old
+
+
+def compare(old: Dict[str, Result], new: Dict[str, Result]) -> List[Comparison]:
+    """Compares the benchmarks of two runs"""
+    names = list(old) + [name for name in new if name not in old]
+    return [
+        Comparison(name, (new.get(name) or old.get(name)).unit,
+                   old[name].value if name in old else None,
+                   new[name].value if name in new else None)
+        for name in names
+    ]
+
+
+def format_value(value: Optional[float], unit: str) -> str:
+    """Formats a value with a readable unit"""
+    if value is None:
+        return "-"
+    if unit == "s":
+        for scale, suffix in ((1, "s"), (1e-3, "ms"), (1e-6, "us")):
+            if value >= scale:
+                return f"{value / scale:.3f} {suffix}"
+        return f"{value * 1e9:.1f} ns"
+    if unit == "bytes":
+        return f"{value:.0f} B"
+    return f"{value:.3f} {unit}"
+
+
+def print_results(results: List[Result], width: int = 0, out=sys.stdout) -> None:
+    """Prints the results as a table, with names padded to at least width"""
+    width = max([width] + [len(result.name) for result in results])
+    for result in results:
+        print(f"{result.name:<{width}}  {format_value(result.value, result.unit):>12}  "
+              f"(min {format_value(result.get_min(), result.unit)}, "
+              f"stdev {format_value(result.get_stdev(), result.unit)})", file=out)
+
+
+def print_comparison(comparisons: List[Comparison], threshold: float, out=sys.stdout) -> int:
+    """Prints the comparison as a table and returns the number of regressions, i.e.
+    benchmarks whose value grew by more than the threshold"""
+    width = max((len(comparison.name) for comparison in comparisons), default=10)
+    regressions = 0
+    for comparison in comparisons:
+        ratio = comparison.get_ratio()
+        flag = ""
+        if ratio is not None and ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif ratio is not None and ratio < 1 - threshold:
+            flag = "  improved"
+        print(f"{comparison.name:<{width}}  {format_value(comparison.old, comparison.unit):>12}  "
+              f"{format_value(comparison.new, comparison.unit):>12}  "
+              f"{'x%.2f' % ratio if ratio is not None else '':>6}{flag}", file=out)
+    return regressions
@@ -15,6 +15,10 @@ Umgebungsvariablen:
     INFLUXDB_ORG - InfluxDB Organisation (erforderlich)
     INFLUXDB_BUCKET - InfluxDB Bucket (Standard: gas_prices)
     INFLUXDB_TOKEN - InfluxDB Token (optional)
+    METRICS_PUSHGATEWAY_URL - Prometheus Pushgateway URL für Metriken (optional)
+    METRICS_TEXTFILE - Datei für Metriken im Prometheus-Textformat (optional)
+    TANKERKOENIG_BASE_URL - Basis-URL der API, z.B. eines lokalen Test-Servers
+        (optional, ohne Angabe wird die Produktions-API verwendet)
 """
 
 import os
@@ -26,6 +30,7 @@ from influxdb_client import InfluxDBClient, Point
 from influxdb_client.client.write_api import SYNCHRONOUS
 from tankerkoenig import Tankerkoenig
 from tankerkoenig.models.gas_prices import GasType
+from tankerkoenig.metrics import ClientMetrics, push_to_gateway, write_textfile
 
 # Logging konfigurieren
 logging.basicConfig(
@@ -34,20 +39,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Maximale Dauer eines API-Requests in Sekunden, damit ein hängender Request den CronJob nicht blockiert
+REQUEST_TIMEOUT = 10.0
 
-def get_diesel_price(station_id: str, api_key: str) -> dict:
+
+def get_diesel_price(station_id: str, api_key: str, metrics: ClientMetrics = None, base_url: str = None) -> dict:
     """Ruft Dieselpreis für eine Tankstelle ab
     
     Args:
         station_id: Tankstellen-ID
         api_key: Tankerkoenig API-Key
+        metrics: Optionale Metriken, in denen die Requests erfasst werden
+        base_url: Optionale Basis-URL der API, z.B. eines lokalen Test-Servers
         
     Returns:
         Dictionary mit Preis-Daten oder None bei Fehler
     """
     try:
         # API-Instanz erstellen
-        api = Tankerkoenig.ApiBuilder().with_api_key(api_key).build()
+        builder = Tankerkoenig.ApiBuilder(base_url=base_url).with_api_key(api_key) \
+            .with_default_timeout(REQUEST_TIMEOUT)
+        if metrics is not None:
+            builder.with_observer(metrics)
+        api = builder.build()
         
         # Preise abrufen
         prices_result = api.prices().add_id(station_id).execute()
@@ -94,12 +108,13 @@ def get_diesel_price(station_id: str, api_key: str) -> dict:
         return None
 
 
-def write_to_influxdb(data: dict, influxdb_config: dict) -> bool:
+def write_to_influxdb(data: dict, influxdb_config: dict, metrics: ClientMetrics = None) -> bool:
     """Schreibt Preis-Daten in InfluxDB
     
     Args:
         data: Dictionary mit Preis-Daten
         influxdb_config: InfluxDB Konfiguration
+        metrics: Optionale Metriken, in denen die Dauer des Schreibens erfasst wird
         
     Returns:
         True bei Erfolg, False bei Fehler
@@ -123,11 +138,11 @@ def write_to_influxdb(data: dict, influxdb_config: dict) -> bool:
             .field("status", data["status"])
         
         # In InfluxDB schreiben
-        write_api.write(
-            bucket=influxdb_config["bucket"],
-            org=influxdb_config["org"],
-            record=point
-        )
+        if metrics is not None:
+            with metrics.time_sink_flush("influxdb"):
+                write_api.write(bucket=influxdb_config["bucket"], org=influxdb_config["org"], record=point)
+        else:
+            write_api.write(bucket=influxdb_config["bucket"], org=influxdb_config["org"], record=point)
         
         logger.info(f"Preis erfolgreich in InfluxDB geschrieben: {data['price']:.3f} €/L für Station {data['station_id']}")
         
@@ -150,6 +165,7 @@ def main() -> int:
     # Umgebungsvariablen lesen
     station_id = os.getenv("STATION_ID")
     api_key = os.getenv("TANKERKOENIG_API_KEY")
+    base_url = os.getenv("TANKERKOENIG_BASE_URL")
     
     influxdb_url = os.getenv("INFLUXDB_URL")
     influxdb_token = os.getenv("INFLUXDB_TOKEN", "")
@@ -181,17 +197,30 @@ def main() -> int:
         "bucket": influxdb_bucket
     }
     
+    metrics = ClientMetrics()
+    
     logger.info(f"Starte Dieselpreis-Abfrage für Station: {station_id}")
     
+    exit_code = run(station_id, api_key, influxdb_config, metrics, base_url)
+    export_metrics(metrics)
+    return exit_code
+
+
+def run(station_id: str, api_key: str, influxdb_config: dict, metrics: ClientMetrics, base_url: str = None) -> int:
+    """Ruft den Dieselpreis ab und schreibt ihn in InfluxDB
+    
+    Returns:
+        Exit-Code (0 = Erfolg, >0 = Fehler)
+    """
     # Dieselpreis abrufen
-    price_data = get_diesel_price(station_id, api_key)
+    price_data = get_diesel_price(station_id, api_key, metrics, base_url)
     
     if not price_data:
         logger.error("Konnte Dieselpreis nicht abrufen")
         return 2
     
     # In InfluxDB schreiben
-    success = write_to_influxdb(price_data, influxdb_config)
+    success = write_to_influxdb(price_data, influxdb_config, metrics)
     
     if not success:
         logger.error("Konnte Daten nicht in InfluxDB schreiben")
@@ -201,6 +230,31 @@ def main() -> int:
     return 0
 
 
+def export_metrics(metrics: ClientMetrics) -> None:
+    """Exportiert die Metriken des Laufs, falls konfiguriert. Fehler beim Export
+    werden nur protokolliert und beeinflussen den Exit-Code nicht
+    
+    Args:
+        metrics: Die erfassten Metriken
+    """
+    pushgateway_url = os.getenv("METRICS_PUSHGATEWAY_URL")
+    textfile = os.getenv("METRICS_TEXTFILE")
+    
+    if pushgateway_url:
+        try:
+            push_to_gateway(pushgateway_url, "diesel_price_logger", metrics.get_registry())
+            logger.info(f"Metriken an Pushgateway gesendet: {pushgateway_url}")
+        except Exception as e:
+            logger.warning(f"Konnte Metriken nicht an Pushgateway senden: {e}")
+    
+    if textfile:
+        try:
+            write_textfile(textfile, metrics.get_registry())
+            logger.info(f"Metriken geschrieben: {textfile}")
+        except Exception as e:
+            logger.warning(f"Konnte Metriken nicht schreiben: {e}")
+
+
 if __name__ == "__main__":
     sys.exit(main())
 
@@ -36,5 +36,11 @@ setup(
         "dev": [
             "pytest>=7.0.0",
         ],
+        "opentelemetry": [
+            "opentelemetry-api>=1.0.0",
+        ],
+        "http2": [
+            "httpx[http2]>=0.23.0",
+        ],
     },
 )
@@ -22,14 +22,25 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import Optional
+from typing import Collection, Iterable, Iterator, List, Optional, Tuple
 
+from tankerkoenig.batch import BatchOutcome, ProgressCallback, execute_many
 from tankerkoenig.client import ClientExecutor, ClientExecutorFactory, Requester
+from tankerkoenig.hedging import HedgingClientExecutor, HedgingConfig
+from tankerkoenig.http_cache import HttpCache, ResultMemo
+from tankerkoenig.instrumentation import RequestObserver
+from tankerkoenig.key_pool import ApiKeyPool
 from tankerkoenig.models.mapper import get_instance as get_json_mapper
-from tankerkoenig.requests.station_list import StationListRequest
+from tankerkoenig.models.results import PricesResult, StationDetailResult, StationListResult
+from tankerkoenig.rate_limiter import RateLimiter
+from tankerkoenig.requests.base import BaseRequest, RequestTemplate
+from tankerkoenig.requests.gas_request_type import GasRequestType
+from tankerkoenig.requests.station_list import SortingRequestType, StationListRequest
 from tankerkoenig.requests.station_detail import StationDetailRequest
 from tankerkoenig.requests.prices import PricesRequest
 from tankerkoenig.requests.correction import CorrectionRequest, CorrectionType
+from tankerkoenig.scheduler import RequestScheduler, SchedulerConfig
+from tankerkoenig.singleflight import SingleFlight
 
 
 BASE_URL = "https://creativecommons.tankerkoenig.de/json/"
@@ -53,6 +64,16 @@ class Tankerkoenig:
             self._client_executor_factory = client_executor_factory or ClientExecutorFactory()
             self._api_key: Optional[str] = None
             self._client_executor: Optional[ClientExecutor] = None
+            self._coalesce_requests = False
+            self._observers: List[RequestObserver] = []
+            self._default_timeout: Optional[float] = None
+            self._hedging_config: Optional[HedgingConfig] = None
+            self._api_key_pool: Optional[ApiKeyPool] = None
+            self._scheduler_config: Optional[SchedulerConfig] = None
+            self._scheduler_rate_limiter: Optional[RateLimiter] = None
+            self._http_cache: Optional[HttpCache] = None
+            self._http_cache_endpoints: Tuple[str, ...] = ()
+            self._result_memo: Optional[ResultMemo] = None
         
         def with_demo_api_key(self) -> 'Tankerkoenig.ApiBuilder':
             """Sets the API Key to the default key as defined on the official website"""
@@ -64,6 +85,13 @@ class Tankerkoenig:
             self._api_key = api_key
             return self
         
+        def with_api_key_pool(self, api_key_pool: ApiKeyPool) -> 'Tankerkoenig.ApiBuilder':
+            """Distributes the requests across the keys of the pool, each with its own rate
+            limit. Replaces the personal API key"""
+            self._api_key_pool = api_key_pool
+            self._api_key = api_key_pool.get_api_keys()[0]
+            return self
+        
         def with_default_client_executor(self) -> 'Tankerkoenig.ApiBuilder':
             """Uses the default client executor"""
             self._client_executor = self._client_executor_factory.build_default_client_executor()
@@ -74,6 +102,62 @@ class Tankerkoenig:
             self._client_executor = client_executor
             return self
         
+        def with_request_coalescing(self) -> 'Tankerkoenig.ApiBuilder':
+            """Identical GET requests which are executed concurrently will share a single
+            upstream call and receive the same result or exception"""
+            self._coalesce_requests = True
+            return self
+        
+        def with_observer(self, observer: RequestObserver) -> 'Tankerkoenig.ApiBuilder':
+            """Adds an observer which receives the stage timings of every request execution.
+            May be called multiple times"""
+            self._observers.append(observer)
+            return self
+        
+        def with_default_timeout(self, timeout: float) -> 'Tankerkoenig.ApiBuilder':
+            """Sets the timeout in seconds of every request execution which does not
+            specify its own timeout. Default is no timeout
+            
+            Args:
+                timeout: Must be positive
+            """
+            if timeout <= 0:
+                raise IllegalStateException("The timeout has to be positive")
+            self._default_timeout = timeout
+            return self
+        
+        def with_hedging(self, config: Optional[HedgingConfig] = None) -> 'Tankerkoenig.ApiBuilder':
+            """GET requests which have not answered within the configured latency percentile
+            are sent a second time and the first successful response is used. The number
+            of extra requests is limited by the hedge budget of the configuration"""
+            self._hedging_config = config or HedgingConfig()
+            return self
+        
+        def with_scheduler(self, config: Optional[SchedulerConfig] = None,
+                           rate_limiter: Optional[RateLimiter] = None) -> 'Tankerkoenig.ApiBuilder':
+            """Queues every request execution in a RequestScheduler, which dispatches by the
+            priority and tenant set with scheduling(). If a rate limiter is supplied, higher
+            priorities receive its tokens first"""
+            self._scheduler_config = config or SchedulerConfig()
+            self._scheduler_rate_limiter = rate_limiter
+            return self
+        
+        def with_http_cache(self, cache: HttpCache,
+                            endpoints: Tuple[str, ...] = ("detail.php",)) -> 'Tankerkoenig.ApiBuilder':
+            """Keeps GET responses of the endpoints in the cache and revalidates them with
+            conditional requests. The cache wraps the client executor, which has to implement
+            ClientExecutor.get_conditional() for responses to be cached. The default, HTTP/2
+            and circuit breaker executors do"""
+            self._http_cache = cache
+            self._http_cache_endpoints = tuple(endpoints)
+            return self
+        
+        def with_result_memo(self, memo: Optional[ResultMemo] = None) -> 'Tankerkoenig.ApiBuilder':
+            """Responses identical to an earlier one are not mapped again, the earlier result
+            is returned instead. Defaults to memoizing station details"""
+            self._result_memo = memo or ResultMemo(result_classes=(StationDetailResult,))
+            return self
+        
         def build(self) -> 'Tankerkoenig.Api':
             """Builds the final API instance. If apiKey is None or empty, will raise an IllegalStateException.
             If no client executor is explicitly specified, will build the default client executor."""
@@ -82,8 +166,19 @@ class Tankerkoenig:
             
             if self._client_executor is None:
                 self._client_executor = self._client_executor_factory.build_default_client_executor()
+            client_executor = self._client_executor
+            if self._http_cache is not None:
+                client_executor = self._client_executor_factory.build_caching_client_executor(
+                    self._http_cache, self._http_cache_endpoints, client_executor)
+            
+            if self._hedging_config is not None:
+                client_executor = HedgingClientExecutor(client_executor, self._hedging_config)
             
-            requester = Requester(self._client_executor, get_json_mapper())
+            single_flight = SingleFlight() if self._coalesce_requests else None
+            requester = Requester(client_executor, get_json_mapper(), single_flight, self._observers,
+                                  self._default_timeout, self._api_key_pool, self._result_memo)
+            if self._scheduler_config is not None:
+                requester = RequestScheduler(requester, self._scheduler_config, self._scheduler_rate_limiter)
             return Tankerkoenig.Api(self._api_key, self._base_url, requester)
     
     class Api:
@@ -94,6 +189,10 @@ class Tankerkoenig:
             self._base_url = base_url
             self._requester = requester
         
+        def get_scheduler(self) -> Optional[RequestScheduler]:
+            """Returns the scheduler of the requests, if one was configured"""
+            return self._requester if isinstance(self._requester, RequestScheduler) else None
+        
         def list(self, lat: float, lng: float) -> StationListRequest:
             """Builds a station list request. The supplied coordinates define the search center
             
@@ -115,6 +214,36 @@ class Tankerkoenig:
             """Builds a prices search request"""
             return PricesRequest(self._api_key, self._base_url, self._requester)
         
+        def list_template(self, lat: float, lng: float, radius: float = 5.0,
+                          gas_request_type: GasRequestType = GasRequestType.ALL,
+                          sorting: SortingRequestType = SortingRequestType.DISTANCE) -> RequestTemplate[StationListResult]:
+            """Builds an immutable station list request, which is validated once and can be
+            executed repeatedly and concurrently
+            
+            Raises:
+                RequestParamException: If a parameter is invalid
+            """
+            return self.list(lat, lng).set_search_radius(radius).set_gas_request_type(gas_request_type) \
+                .set_sorting(sorting).freeze()
+        
+        def detail_template(self, station_id: str) -> RequestTemplate[StationDetailResult]:
+            """Builds an immutable station detail request, which is validated once and can be
+            executed repeatedly and concurrently
+            
+            Raises:
+                RequestParamException: If the station ID is empty
+            """
+            return self.detail(station_id).freeze()
+        
+        def prices_template(self, station_ids: Collection[str]) -> RequestTemplate[PricesResult]:
+            """Builds an immutable prices request for 1 to 10 station IDs, which is validated
+            once and can be executed repeatedly and concurrently
+            
+            Raises:
+                RequestParamException: If no or more than 10 IDs are supplied
+            """
+            return self.prices().add_ids_collection(station_ids).freeze()
+        
         def correction(self, station_id: str, correction_type: CorrectionType) -> CorrectionRequest:
             """Builds a station correction request
             
@@ -123,6 +252,22 @@ class Tankerkoenig:
                 correction_type: The correction request type
             """
             return CorrectionRequest(self._api_key, self._base_url, self._requester, correction_type).set_station_id(station_id)
+        
+        def execute_many(self, requests: Iterable[BaseRequest], max_workers: int = 8, ordered: bool = False,
+                         progress: Optional[ProgressCallback] = None,
+                         timeout: Optional[float] = None) -> Iterator[BatchOutcome]:
+            """Executes requests of any type concurrently and yields a BatchOutcome with the
+            result or exception of every request. Failures don't stop the batch
+            
+            Args:
+                requests: The requests built by this API instance
+                max_workers: Number of requests executed at the same time
+                ordered: If True, outcomes are yielded in the order of the requests,
+                    otherwise in the order of completion
+                progress: Called with a BatchProgress after every finished request
+                timeout: The timeout of every single request execution
+            """
+            return execute_many(requests, max_workers, ordered, progress, timeout)
 
 
 class IllegalStateException(Exception):
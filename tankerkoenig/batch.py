@@ -0,0 +1,184 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import contextvars
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Generic, Iterable, Iterator, Optional, Tuple, TypeVar
+
+from tankerkoenig.requests.base import BaseRequest
+
+R = TypeVar('R')
+
+
+@dataclass(frozen=True)
+class BatchOutcome(Generic[R]):
+    """The outcome of a request of a batch
+    
+    Attributes:
+        index: The position of the request in the batch
+        request: The executed request
+        result: The result, or None if the execution failed
+        exception: The exception of a failed execution, or None
+    """
+    index: int
+    request: BaseRequest
+    result: Optional[R] = None
+    exception: Optional[BaseException] = None
+    
+    def is_success(self) -> bool:
+        """Determines if the request was executed without exception. The result may
+        still be an error response of the API"""
+        return self.exception is None
+    
+    def get_result(self) -> R:
+        """Returns the result, or raises the exception of a failed execution"""
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+@dataclass(frozen=True)
+class BatchProgress:
+    """The progress of a batch, reported after every finished request
+    
+    Attributes:
+        completed: Number of finished requests, including failures
+        failed: Number of requests which raised an exception
+        total: Number of requests, or None if the requests were supplied by an iterator
+        elapsed: Seconds since the batch was started
+    """
+    completed: int
+    failed: int
+    total: Optional[int]
+    elapsed: float
+
+
+ProgressCallback = Callable[[BatchProgress], None]
+
+
+def execute_many(requests: Iterable[BaseRequest], max_workers: int = 8, ordered: bool = False,
+                 progress: Optional[ProgressCallback] = None,
+                 timeout: Optional[float] = None) -> Iterator[BatchOutcome]:
+    """Executes requests concurrently and yields their outcomes. Requests are taken from
+    the iterable lazily, at most twice max_workers are pending at a time, so crawls
+    with many requests don't hold all of them in memory. Every request is executed
+    by the Requester of the API which built it, so session, key pool, rate limits and
+    caches are shared with all other executions of that API instance. Closing the iterator early cancels
+    the requests which have not started yet
+    
+    Args:
+        requests: The requests, of any type
+        max_workers: Number of requests executed at the same time
+        ordered: If True, outcomes are yielded in the order of the requests,
+            otherwise in the order of completion
+        progress: Called in the iterating thread after every finished request
+        timeout: The timeout of every single request execution
+    """
+    if max_workers < 1:
+        raise ValueError("max_workers has to be at least 1")
+    total = len(requests) if hasattr(requests, "__len__") else None
+    return _BatchIterator(iter(enumerate(requests)), max_workers, ordered, progress, timeout, total)
+
+
+class _BatchIterator(Iterator[BatchOutcome]):
+    """Generator-like iterator which owns the worker threads of a batch"""
+    
+    def __init__(self, requests: Iterator[Tuple[int, BaseRequest]], max_workers: int, ordered: bool,
+                 progress: Optional[ProgressCallback], timeout: Optional[float], total: Optional[int]):
+        self._requests = requests
+        self._window = max_workers * 2
+        self._ordered = ordered
+        self._progress = progress
+        self._timeout = timeout
+        self._total = total
+        self._executor: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="tankerkoenig-batch")
+        self._pending: "OrderedDict[Future, Tuple[int, BaseRequest]]" = OrderedDict()
+        self._ready: "OrderedDict[Future, Tuple[int, BaseRequest]]" = OrderedDict()
+        self._started = time.monotonic()
+        self._completed = 0
+        self._failed = 0
+        self._exhausted = False
+    
+    def __next__(self) -> BatchOutcome:
+        if self._executor is None:
+            raise StopIteration
+        self._fill()
+        if not self._ready:
+            if not self._pending:
+                self.close()
+                raise StopIteration
+            self._collect()
+        
+        future, (index, request) = self._ready.popitem(last=False)
+        self._fill()
+        exception = future.exception()
+        outcome = BatchOutcome(index, request, None if exception is not None else future.result(), exception)
+        
+        self._completed += 1
+        self._failed += 0 if exception is None else 1
+        if self._progress is not None:
+            self._progress(BatchProgress(self._completed, self._failed, self._total,
+                                         time.monotonic() - self._started))
+        return outcome
+    
+    def close(self) -> None:
+        """Cancels the requests which have not started and releases the worker threads"""
+        if self._executor is None:
+            return
+        for future in self._pending:
+            future.cancel()
+        self._executor.shutdown(wait=False)
+        self._executor = None
+    
+    def __del__(self):
+        self.close()
+    
+    def _fill(self) -> None:
+        while not self._exhausted and len(self._pending) + len(self._ready) < self._window:
+            item = next(self._requests, None)
+            if item is None:
+                self._exhausted = True
+                return
+            index, request = item
+            # Context variables, e.g. the scheduling priority, are passed to the worker threads
+            future = self._executor.submit(contextvars.copy_context().run, self._execute, request)
+            self._pending[future] = item
+    
+    def _collect(self) -> None:
+        if self._ordered:
+            # Only the oldest request may be yielded, later ones wait in the pending queue
+            future = next(iter(self._pending))
+            wait([future])
+            self._ready[future] = self._pending.pop(future)
+            return
+        done, _ = wait(list(self._pending), return_when=FIRST_COMPLETED)
+        for future in sorted(done, key=lambda f: self._pending[f][0]):
+            self._ready[future] = self._pending.pop(future)
+    
+    def _execute(self, request: BaseRequest) -> Any:
+        return request.execute(self._timeout) if self._timeout is not None else request.execute()
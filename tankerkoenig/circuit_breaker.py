@@ -0,0 +1,359 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tankerkoenig.client import ClientExecutor, ConditionalResponse
+from tankerkoenig.exceptions import CircuitOpenException
+
+# Parameters which differ between identical requests and are ignored for stale responses
+_VOLATILE_PARAMETERS = ("ts", "apikey")
+
+
+class CircuitState(Enum):
+    """The state of a circuit breaker"""
+    # Calls pass through, outcomes are recorded
+    CLOSED = "closed"
+    # Calls are rejected until the open duration has passed
+    OPEN = "open"
+    # A limited number of probe calls decide whether to close or reopen the circuit
+    HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class CircuitBreakerConfig:
+    """Configuration of a circuit breaker
+    
+    Attributes:
+        failure_rate_threshold: Failure rate of the window at which the circuit opens
+        window_size: Number of most recent calls the failure rate is computed from
+        minimum_calls: Minimum number of calls in the window before the circuit may open
+        slow_call_duration: Calls taking longer (in seconds) are counted as failures. None disables it
+        open_duration: Seconds the circuit stays open before probe calls are allowed
+        half_open_max_calls: Number of successful probes required to close the circuit again
+    """
+    failure_rate_threshold: float = 0.5
+    window_size: int = 20
+    minimum_calls: int = 5
+    slow_call_duration: Optional[float] = None
+    open_duration: float = 30.0
+    half_open_max_calls: int = 1
+
+
+@dataclass(frozen=True)
+class CircuitBreakerMetrics:
+    """Point-in-time metrics of a circuit breaker"""
+    state: CircuitState
+    failure_rate: float
+    calls: int
+    failures: int
+    slow_calls: int
+    rejected_calls: int
+    stale_responses: int
+    transitions: int
+    mean_latency: Optional[float]
+
+
+StateListener = Callable[[str, CircuitState, CircuitState], None]
+
+
+class CircuitBreaker:
+    """Circuit breaker for a single endpoint, which tracks the error rate and latency
+    of the latest calls in a sliding window. Thread-safe"""
+    
+    def __init__(self, name: str, config: Optional[CircuitBreakerConfig] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self._name = name
+        self._config = config or CircuitBreakerConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._listeners: List[StateListener] = []
+        self._state = CircuitState.CLOSED
+        self._window: deque = deque(maxlen=self._config.window_size)
+        self._window_failures = 0
+        self._opened_at = 0.0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self._calls = 0
+        self._failures = 0
+        self._slow_calls = 0
+        self._rejected_calls = 0
+        self._stale_responses = 0
+        self._transitions = 0
+        self._total_latency = 0.0
+    
+    def add_listener(self, listener: StateListener) -> None:
+        """Adds a listener, which is called with the name, old and new state on every transition"""
+        self._listeners.append(listener)
+    
+    def get_state(self) -> CircuitState:
+        """Returns the current state. An open circuit whose open duration has passed
+        is reported as half-open"""
+        with self._lock:
+            transition = self._check_open_duration()
+        self._notify(transition)
+        return self._state
+    
+    def allow_request(self) -> bool:
+        """Determines if a call may be sent. Every permitted call has to be followed by
+        record_success() or record_failure()"""
+        with self._lock:
+            transition = self._check_open_duration()
+            if self._state == CircuitState.CLOSED:
+                allowed = True
+            elif self._state == CircuitState.HALF_OPEN and self._probes_in_flight < self._config.half_open_max_calls:
+                self._probes_in_flight += 1
+                allowed = True
+            else:
+                self._rejected_calls += 1
+                allowed = False
+        self._notify(transition)
+        return allowed
+    
+    def get_retry_after(self) -> float:
+        """Returns the seconds until probe calls are allowed again"""
+        with self._lock:
+            if self._state != CircuitState.OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._config.open_duration - self._clock())
+    
+    def record_success(self, duration: float) -> None:
+        """Records a successful call with its duration in seconds. Slow calls count as failures"""
+        slow = self._config.slow_call_duration is not None and duration > self._config.slow_call_duration
+        self._record(duration, failed=slow, slow=slow)
+    
+    def record_failure(self, duration: float) -> None:
+        """Records a failed call with its duration in seconds"""
+        self._record(duration, failed=True, slow=False)
+    
+    def record_stale_response(self) -> None:
+        """Records that a rejected call was served from the stale cache"""
+        with self._lock:
+            self._stale_responses += 1
+    
+    def get_metrics(self) -> CircuitBreakerMetrics:
+        """Returns the current metrics"""
+        with self._lock:
+            transition = self._check_open_duration()
+            metrics = CircuitBreakerMetrics(
+                state=self._state,
+                failure_rate=self._failure_rate(),
+                calls=self._calls,
+                failures=self._failures,
+                slow_calls=self._slow_calls,
+                rejected_calls=self._rejected_calls,
+                stale_responses=self._stale_responses,
+                transitions=self._transitions,
+                mean_latency=self._total_latency / self._calls if self._calls else None
+            )
+        self._notify(transition)
+        return metrics
+    
+    def _record(self, duration: float, failed: bool, slow: bool) -> None:
+        with self._lock:
+            self._calls += 1
+            self._total_latency += duration
+            self._failures += 1 if failed else 0
+            self._slow_calls += 1 if slow else 0
+            
+            if self._state == CircuitState.HALF_OPEN:
+                self._probes_in_flight = max(0, self._probes_in_flight - 1)
+                if failed:
+                    transition = self._transition(CircuitState.OPEN)
+                else:
+                    self._probe_successes += 1
+                    transition = None
+                    if self._probe_successes >= self._config.half_open_max_calls:
+                        transition = self._transition(CircuitState.CLOSED)
+            elif self._state == CircuitState.CLOSED:
+                if len(self._window) == self._window.maxlen and self._window[0]:
+                    self._window_failures -= 1
+                self._window.append(failed)
+                self._window_failures += 1 if failed else 0
+                transition = None
+                if len(self._window) >= self._config.minimum_calls and \
+                        self._failure_rate() >= self._config.failure_rate_threshold:
+                    transition = self._transition(CircuitState.OPEN)
+            else:
+                # Outcome of a call which was permitted before the circuit opened
+                transition = None
+        self._notify(transition)
+    
+    def _failure_rate(self) -> float:
+        return self._window_failures / len(self._window) if self._window else 0.0
+    
+    def _check_open_duration(self) -> Optional[Tuple[CircuitState, CircuitState]]:
+        if self._state == CircuitState.OPEN and self._clock() - self._opened_at >= self._config.open_duration:
+            return self._transition(CircuitState.HALF_OPEN)
+        return None
+    
+    def _transition(self, state: CircuitState) -> Tuple[CircuitState, CircuitState]:
+        old_state, self._state = self._state, state
+        self._transitions += 1
+        if state == CircuitState.OPEN:
+            self._opened_at = self._clock()
+        elif state == CircuitState.HALF_OPEN:
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+        elif state == CircuitState.CLOSED:
+            self._window.clear()
+            self._window_failures = 0
+        return old_state, state
+    
+    def _notify(self, transition: Optional[Tuple[CircuitState, CircuitState]]) -> None:
+        # Listeners are called outside of the lock, so they may query the breaker
+        if transition is not None:
+            for listener in list(self._listeners):
+                listener(self._name, transition[0], transition[1])
+
+
+class CircuitBreakerClientExecutor(ClientExecutor):
+    """Client Executor which wraps around any ClientExecutor and guards every endpoint
+    (the request URL) with its own CircuitBreaker. While a circuit is open, calls fail fast
+    with a CircuitOpenException, or are optionally served from the latest successful
+    response of the same GET request"""
+    
+    def __init__(self, delegate: ClientExecutor, config: Optional[CircuitBreakerConfig] = None,
+                 serve_stale: bool = False, stale_cache_size: int = 1024,
+                 clock: Callable[[], float] = time.monotonic):
+        """Creates a new CircuitBreakerClientExecutor
+        
+        Args:
+            delegate: The client executor which actually executes the requests
+            config: The circuit breaker configuration, which applies to every endpoint
+            serve_stale: If True, rejected GET requests are answered with the latest
+                successful response of the same request, if available
+            stale_cache_size: Maximum number of responses kept for serve_stale
+            clock: Monotonic clock in seconds, replaceable for tests
+        """
+        self._delegate = delegate
+        self._config = config or CircuitBreakerConfig()
+        self._serve_stale = serve_stale
+        self._stale_cache_size = stale_cache_size
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._listeners: List[StateListener] = []
+        self._stale: "OrderedDict[Tuple, str]" = OrderedDict()
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a GET request, if the circuit of the URL permits it"""
+        breaker = self.get_circuit_breaker(url)
+        stale_key = self._stale_key(url, query_parameters) if self._serve_stale else None
+        
+        if not breaker.allow_request():
+            stale = self._get_stale(stale_key)
+            if stale is not None:
+                breaker.record_stale_response()
+                return stale
+            raise CircuitOpenException(url, breaker.get_retry_after())
+        
+        response = self._call(breaker, self._delegate.get, url, query_parameters, timeout)
+        if stale_key is not None:
+            self._put_stale(stale_key, response)
+        return response
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a POST request, if the circuit of the URL permits it. POST requests
+        are never served stale"""
+        breaker = self.get_circuit_breaker(url)
+        if not breaker.allow_request():
+            raise CircuitOpenException(url, breaker.get_retry_after())
+        return self._call(breaker, self._delegate.post, url, form_params, timeout)
+    
+    def get_conditional(self, url: str, query_parameters: Dict[str, Any], headers: Dict[str, str],
+                        timeout: Optional[float] = None) -> ConditionalResponse:
+        """Executes a conditional GET request, if the circuit of the URL permits it.
+        Conditional requests are never served stale, the caller holds the cached response"""
+        breaker = self.get_circuit_breaker(url)
+        if not breaker.allow_request():
+            raise CircuitOpenException(url, breaker.get_retry_after())
+        return self._call(breaker, lambda u, p, timeout=None: self._delegate.get_conditional(u, p, headers, timeout),
+                          url, query_parameters, timeout)
+    
+    def add_listener(self, listener: StateListener) -> None:
+        """Adds a listener for state transitions of all current and future endpoints"""
+        with self._lock:
+            self._listeners.append(listener)
+            breakers = list(self._breakers.values())
+        for breaker in breakers:
+            breaker.add_listener(listener)
+    
+    def get_circuit_breaker(self, url: str) -> CircuitBreaker:
+        """Returns the circuit breaker of an endpoint, which is created on first use"""
+        with self._lock:
+            breaker = self._breakers.get(url)
+            if breaker is None:
+                breaker = self._breakers[url] = CircuitBreaker(url, self._config, self._clock)
+                for listener in self._listeners:
+                    breaker.add_listener(listener)
+            return breaker
+    
+    def get_state(self, url: str) -> CircuitState:
+        """Returns the state of the circuit of an endpoint"""
+        return self.get_circuit_breaker(url).get_state()
+    
+    def get_metrics(self) -> Dict[str, CircuitBreakerMetrics]:
+        """Returns the metrics of every endpoint, keyed by URL"""
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {url: breaker.get_metrics() for url, breaker in breakers.items()}
+    
+    def _call(self, breaker: CircuitBreaker, method, url: str, parameters: Dict[str, Any],
+              timeout: Optional[float]) -> Any:
+        started = self._clock()
+        try:
+            # The timeout is only forwarded if set, so delegates without timeout support keep working
+            response = method(url, parameters, timeout=timeout) if timeout is not None else method(url, parameters)
+        except BaseException:
+            # Any exception, not only ClientExecutorException, has to release a half-open
+            # probe, otherwise the circuit would reject every later call
+            breaker.record_failure(self._clock() - started)
+            raise
+        breaker.record_success(self._clock() - started)
+        return response
+    
+    @staticmethod
+    def _stale_key(url: str, parameters: Dict[str, Any]) -> Tuple:
+        return url, tuple(sorted(
+            (k, str(v)) for k, v in parameters.items() if k not in _VOLATILE_PARAMETERS and v is not None
+        ))
+    
+    def _get_stale(self, key: Optional[Tuple]) -> Optional[str]:
+        if key is None:
+            return None
+        with self._lock:
+            return self._stale.get(key)
+    
+    def _put_stale(self, key: Tuple, response: str) -> None:
+        with self._lock:
+            self._stale[key] = response
+            self._stale.move_to_end(key)
+            while len(self._stale) > self._stale_cache_size:
+                self._stale.popitem(last=False)
@@ -22,88 +22,337 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
+import asyncio
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Type, TypeVar, Generic
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from typing import Callable, Dict, Any, Hashable, List, Optional, Tuple, Type, TypeVar
 import requests
-from urllib.parse import urlencode
 
-from tankerkoenig.exceptions import ClientExecutorException, RequesterException, RequestParamException
+from tankerkoenig.compression import TransferCounter, TransferStats, build_accept_encoding, get_supported_encodings
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.http_cache import HttpCache, ResultMemo, cache_key
+from tankerkoenig.exceptions import (
+    ClientExecutorException, ClientExecutorTimeoutException, RequesterException, RequestParamException,
+    RequestTimeoutException
+)
+from tankerkoenig.key_pool import ApiKeyPool, is_auth_error
+from tankerkoenig.instrumentation import RequestObserver, RequestTrace, Stage, notify_observers
 from tankerkoenig.requests.base import BaseRequest, Method
 from tankerkoenig.models.results import BaseResult
 from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.singleflight import SingleFlight
+from tankerkoenig.utils import PreparedParameters
 
 R = TypeVar('R', bound=BaseResult)
 
 
+@dataclass(frozen=True)
+class ConditionalResponse:
+    """Response of a conditional GET request
+    
+    Attributes:
+        body: The response body, or None if the response was 304 Not Modified
+        etag: The ETag header of the response, if any
+        last_modified: The Last-Modified header of the response, if any
+    """
+    body: Optional[str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    
+    def is_not_modified(self) -> bool:
+        """Determines if the server answered 304 Not Modified"""
+        return self.body is None
+
+
 class ClientExecutor(ABC):
     """Interface for executing HTTP requests"""
     
     @abstractmethod
-    def get(self, url: str, query_parameters: Dict[str, Any]) -> str:
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
         """Executes a GET request
         
         Args:
             url: The request URL
             query_parameters: The query parameters
+            timeout: The maximum seconds to wait for the response. Only passed by the
+                Requester if the execution has a deadline
             
         Returns:
             The response body
             
         Raises:
             ClientExecutorException: Should be thrown if any parameter or client-side error occurs
+            ClientExecutorTimeoutException: Should be thrown if the timeout was exceeded
         """
         pass
     
     @abstractmethod
-    def post(self, url: str, form_params: Dict[str, Any]) -> str:
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
         """Executes a POST request. Request Parameters should be sent as forms (not multipart)
         
         Args:
             url: The request URL
             form_params: The form parameters
+            timeout: The maximum seconds to wait for the response. Only passed by the
+                Requester if the execution has a deadline
             
         Returns:
             The response body
             
         Raises:
             ClientExecutorException: Should be thrown if any parameter or client-side error occurs
+            ClientExecutorTimeoutException: Should be thrown if the timeout was exceeded
         """
         pass
+    
+    def get_conditional(self, url: str, query_parameters: Dict[str, Any], headers: Dict[str, str],
+                        timeout: Optional[float] = None) -> ConditionalResponse:
+        """Executes a GET request with conditional request headers (If-None-Match,
+        If-Modified-Since) and returns the validators of the response. Executors which
+        can't send headers or read response headers keep this implementation, which
+        executes a plain GET request whose response carries no validators
+        
+        Args:
+            url: The request URL
+            query_parameters: The query parameters
+            headers: The conditional request headers
+            timeout: The maximum seconds to wait for the response
+            
+        Returns:
+            The response, whose body is None if it was not modified
+            
+        Raises:
+            ClientExecutorException: Should be thrown if any parameter or client-side error occurs
+            ClientExecutorTimeoutException: Should be thrown if the timeout was exceeded
+        """
+        body = self.get(url, query_parameters, timeout=timeout) if timeout is not None else self.get(url, query_parameters)
+        return ConditionalResponse(body)
 
 
 class RequestsClientExecutor(ClientExecutor):
-    """Client Executor which wraps around requests library"""
+    """Client Executor which wraps around requests library. Compressed responses are
+    negotiated explicitly and decompressed chunk-wise while the body is read"""
     
-    def __init__(self, session: requests.Session = None):
+    def __init__(self, session: requests.Session = None, accept_encoding: Optional[str] = None,
+                 chunk_size: int = 64 * 1024):
         """Creates a new RequestsClientExecutor
         
         Args:
             session: Optional requests Session. If None, a new one will be created.
+            accept_encoding: Accept-Encoding header sent with every request. If None, every
+                encoding which can be decoded is offered, preferring zstd over br over gzip
+            chunk_size: Size of the chunks the body is read and decompressed in
         """
         self._session = session or requests.Session()
+        if accept_encoding is None:
+            accept_encoding = build_accept_encoding(get_supported_encodings())
+        self._headers = {"Accept-Encoding": accept_encoding}
+        self._chunk_size = chunk_size
+        self._transfer = TransferCounter()
     
-    def get(self, url: str, query_parameters: Dict[str, Any]) -> str:
-        """Executes a GET request"""
-        try:
-            # Filter out None and empty values
-            params = {k: str(v) for k, v in query_parameters.items() if v is not None and str(v)}
-            
-            response = self._session.get(url, params=params)
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a GET request. The timeout applies to connecting and to every read
+        from the socket, as defined by requests, and additionally bounds the total time
+        until the body is read completely, so a server trickling the body can't stall it"""
+        url, params = self._encode(url, query_parameters)
+        return self._send(url, timeout, lambda: self._session.get(
+            url, params=params, timeout=timeout, headers=self._headers, stream=True))
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a POST request with form data"""
+        # Filter out None and empty values
+        data = {k: str(v) for k, v in form_params.items() if v is not None and str(v)}
+        return self._send(url, timeout, lambda: self._session.post(
+            url, data=data, timeout=timeout, headers=self._headers, stream=True))
+    
+    def get_conditional(self, url: str, query_parameters: Dict[str, Any], headers: Dict[str, str],
+                        timeout: Optional[float] = None) -> ConditionalResponse:
+        """Executes a conditional GET request, a 304 Not Modified is returned without body"""
+        url, params = self._encode(url, query_parameters)
+        
+        def read(response: requests.Response, deadline: Optional[Deadline]) -> ConditionalResponse:
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if response.status_code == 304:
+                return ConditionalResponse(None, etag, last_modified)
             response.raise_for_status()
-            return response.text
+            return ConditionalResponse(self._read_body(response, deadline), etag, last_modified)
+        
+        return self._send(url, timeout, lambda: self._session.get(
+            url, params=params, timeout=timeout, headers=dict(self._headers, **headers), stream=True), read)
+    
+    def get_transfer_stats(self) -> TransferStats:
+        """Returns the bytes received before and after decompression"""
+        return self._transfer.get_stats()
+    
+    @staticmethod
+    def _encode(url: str, query_parameters: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, str]]]:
+        """Returns the URL and the parameters to pass to requests. The query string of
+        prepared parameters is appended to the URL as is instead of encoding it again"""
+        if isinstance(query_parameters, PreparedParameters):
+            query = query_parameters.get_query()
+            return (f"{url}?{query}" if query else url), None
+        # Filter out None and empty values
+        return url, {k: str(v) for k, v in query_parameters.items() if v is not None and str(v)}
+    
+    def _send(self, url: str, timeout: Optional[float], send: Callable[[], requests.Response],
+              read: Optional[Callable[[requests.Response, Optional[Deadline]], Any]] = None) -> Any:
+        """Sends a request and reads the response with read, which defaults to raising for
+        error status codes and returning the body"""
+        deadline = Deadline.of(timeout)
+        try:
+            with send() as response:
+                if read is not None:
+                    return read(response, deadline)
+                response.raise_for_status()
+                return self._read_body(response, deadline)
+        except requests.Timeout as e:
+            raise ClientExecutorTimeoutException(url, f"The request timed out after {timeout}s: {str(e)}", e)
         except requests.RequestException as e:
             raise ClientExecutorException(url, f"An exception was thrown while request execution: {str(e)}", e)
     
-    def post(self, url: str, form_params: Dict[str, Any]) -> str:
+    def _read_body(self, response: requests.Response, deadline: Optional[Deadline] = None) -> str:
+        # Decompresses chunk by chunk as the body arrives instead of buffering the compressed
+        # body first, and decodes as UTF-8 unless stated otherwise, which skips the charset
+        # detection of response.text on large bodies
+        chunks = []
+        for chunk in response.iter_content(self._chunk_size):
+            # The read timeout of requests only bounds every single read, the deadline is
+            # checked between the chunks to bound the whole body
+            if deadline is not None and deadline.expired():
+                raise ClientExecutorTimeoutException(
+                    response.url, f"The response body was not read within {deadline.get_timeout()}s")
+            chunks.append(chunk)
+        body = b"".join(chunks)
+        encoding = response.headers.get("Content-Encoding", "identity").strip().lower() or "identity"
+        self._transfer.add(encoding, response.raw.tell(), len(body))
+        return body.decode(response.encoding or "utf-8", errors="replace")
+
+
+class CachingClientExecutor(ClientExecutor):
+    """Client Executor which keeps GET responses of rarely changing endpoints in a
+    persistent HttpCache. Cached responses are revalidated with If-None-Match and
+    If-Modified-Since, and a 304 Not Modified is answered from the cache without
+    transferring the body again.
+    
+    The conditional requests are sent with get_conditional() of the delegate. Delegates
+    which don't implement it answer without validators, so nothing is cached"""
+    
+    def __init__(self, delegate: ClientExecutor, cache: HttpCache, endpoints: Tuple[str, ...] = ("detail.php",)):
+        """Creates a new CachingClientExecutor
+        
+        Args:
+            delegate: The executor which sends the requests
+            cache: The cache of the responses
+            endpoints: The endpoints whose responses are cached
+        """
+        self._delegate = delegate
+        self._cache = cache
+        self._endpoints = tuple(endpoints)
+    
+    def get_delegate(self) -> ClientExecutor:
+        """Returns the executor which sends the requests"""
+        return self._delegate
+    
+    def get_cache(self) -> HttpCache:
+        """Returns the cache of the responses"""
+        return self._cache
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a GET request, revalidating a cached response of the endpoint"""
+        if not url.endswith(self._endpoints):
+            # The timeout is only forwarded if set, so delegates without timeout support keep working
+            return self._delegate.get(url, query_parameters, timeout=timeout) if timeout is not None \
+                else self._delegate.get(url, query_parameters)
+        
+        key = cache_key(url, query_parameters)
+        entry = self._cache.get(key)
+        headers = entry.get_conditional_headers() if entry is not None else {}
+        response = self._delegate.get_conditional(url, query_parameters, headers, timeout)
+        
+        if entry is not None:
+            self._cache.record_revalidation(key, response.is_not_modified())
+            if response.is_not_modified():
+                return entry.body
+        elif response.is_not_modified():
+            raise ClientExecutorException(url, "Not Modified was answered to an unconditional request")
+        self._cache.put(key, response.body, response.etag, response.last_modified)
+        return response.body
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a POST request, which is never cached"""
+        return self._delegate.post(url, form_params, timeout=timeout) if timeout is not None \
+            else self._delegate.post(url, form_params)
+
+
+class HttpxClientExecutor(ClientExecutor):
+    """Client Executor which wraps around httpx with HTTP/2 enabled. Concurrent requests
+    to the same host are multiplexed as streams over a single connection instead of
+    opening a connection per request. The client is thread-safe.
+    Requires the optional httpx package with HTTP/2 support (httpx[http2])"""
+    
+    def __init__(self, client: Any = None, max_connections: int = 1, http2_prior_knowledge: bool = False):
+        """Creates a new HttpxClientExecutor
+        
+        Args:
+            client: Optional httpx Client. If None, a new HTTP/2 client will be created
+            max_connections: Number of connections per host, each carrying many streams
+            http2_prior_knowledge: If True, plain HTTP connections use HTTP/2 without
+                negotiation (h2c). Otherwise HTTP/2 is negotiated via TLS ALPN and
+                plain HTTP connections use HTTP/1.1
+        """
+        try:
+            import httpx
+            if client is None:
+                limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+                client = httpx.Client(http1=not http2_prior_knowledge, http2=True, limits=limits)
+        except ImportError as e:
+            raise ImportError("HttpxClientExecutor requires the httpx package with HTTP/2 support (httpx[http2])") from e
+        
+        self._httpx = httpx
+        self._client = client
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a GET request. The timeout applies to connecting, every read and
+        waiting for a connection of the pool"""
+        params = {k: str(v) for k, v in query_parameters.items() if v is not None and str(v)}
+        return self._send(url, timeout, lambda: self._client.get(url, params=params, timeout=timeout))
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
         """Executes a POST request with form data"""
+        data = {k: str(v) for k, v in form_params.items() if v is not None and str(v)}
+        return self._send(url, timeout, lambda: self._client.post(url, data=data, timeout=timeout))
+    
+    def get_conditional(self, url: str, query_parameters: Dict[str, Any], headers: Dict[str, str],
+                        timeout: Optional[float] = None) -> ConditionalResponse:
+        """Executes a conditional GET request, a 304 Not Modified is returned without body"""
+        params = {k: str(v) for k, v in query_parameters.items() if v is not None and str(v)}
+        
+        def read(response) -> ConditionalResponse:
+            etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+            if response.status_code == 304:
+                return ConditionalResponse(None, etag, last_modified)
+            response.raise_for_status()
+            return ConditionalResponse(response.text, etag, last_modified)
+        
+        return self._send(url, timeout, lambda: self._client.get(url, params=params, headers=headers, timeout=timeout),
+                          read)
+    
+    def close(self) -> None:
+        """Closes the connections of the client"""
+        self._client.close()
+    
+    def _send(self, url: str, timeout: Optional[float], send, read: Optional[Callable[[Any], Any]] = None) -> Any:
         try:
-            # Filter out None and empty values
-            data = {k: str(v) for k, v in form_params.items() if v is not None and str(v)}
-            
-            response = self._session.post(url, data=data)
+            response = send()
+            if read is not None:
+                return read(response)
             response.raise_for_status()
             return response.text
-        except requests.RequestException as e:
+        except self._httpx.TimeoutException as e:
+            raise ClientExecutorTimeoutException(url, f"The request timed out after {timeout}s: {str(e)}", e)
+        except self._httpx.HTTPError as e:
             raise ClientExecutorException(url, f"An exception was thrown while request execution: {str(e)}", e)
 
 
@@ -114,6 +363,19 @@ class ClientExecutorFactory:
     def build_default_client_executor() -> ClientExecutor:
         """Builds the default ClientExecutor, which currently wraps requests library"""
         return RequestsClientExecutor()
+    
+    @staticmethod
+    def build_caching_client_executor(cache: HttpCache, endpoints: Tuple[str, ...] = ("detail.php",),
+                                      delegate: Optional[ClientExecutor] = None) -> ClientExecutor:
+        """Builds a ClientExecutor which revalidates cached responses of the endpoints. The
+        requests are sent by the delegate, which defaults to the default client executor"""
+        return CachingClientExecutor(delegate or ClientExecutorFactory.build_default_client_executor(), cache, endpoints)
+    
+    @staticmethod
+    def build_http2_client_executor(max_connections: int = 1) -> ClientExecutor:
+        """Builds a ClientExecutor which multiplexes concurrent requests over HTTP/2.
+        Requires the optional httpx package with HTTP/2 support (httpx[http2])"""
+        return HttpxClientExecutor(max_connections=max_connections)
 
 
 class Requester:
@@ -121,57 +383,221 @@ class Requester:
     and mapping the result to the specified result class.
     Recoverable failures will be wrapped by a RequesterException"""
     
-    def __init__(self, client_executor: ClientExecutor, json_mapper: JsonMapper):
+    def __init__(self, client_executor: ClientExecutor, json_mapper: JsonMapper,
+                 single_flight: Optional[SingleFlight] = None,
+                 observers: Optional[List[RequestObserver]] = None,
+                 default_timeout: Optional[float] = None,
+                 api_key_pool: Optional[ApiKeyPool] = None,
+                 result_memo: Optional[ResultMemo] = None):
         """Creates a new Requester
         
         Args:
             client_executor: The client executor to use for HTTP requests
             json_mapper: The JSON mapper to use for deserialization
+            single_flight: If supplied, identical concurrent GET requests share a single call
+            observers: Observers which receive the stage timings of every execution
+            default_timeout: The timeout in seconds of executions which don't specify one.
+                None means no timeout
+            api_key_pool: If supplied, every execution uses a key of the pool instead of
+                the key of the request
+            result_memo: If supplied, responses identical to an earlier one are not mapped
+                again, the earlier result is returned instead
         """
         self._client_executor = client_executor
         self._json_mapper = json_mapper
+        self._single_flight = single_flight
+        self._observers = list(observers or [])
+        self._default_timeout = default_timeout
+        self._api_key_pool = api_key_pool
+        self._result_memo = result_memo
+    
+    def add_observer(self, observer: RequestObserver) -> None:
+        """Adds an observer which receives the stage timings of every execution"""
+        self._observers.append(observer)
+    
+    def get_default_timeout(self) -> Optional[float]:
+        """Returns the timeout in seconds of executions which don't specify one"""
+        return self._default_timeout
     
-    def execute(self, request: BaseRequest[R], result_class: Type[R]) -> R:
+    def execute(self, request: BaseRequest[R], result_class: Type[R], timeout: Optional[float] = None) -> R:
         """Executes a request and returns the result
         
         Args:
             request: The request to execute
             result_class: The expected result class
+            timeout: The maximum seconds the whole execution may take. Defaults to the
+                default timeout of the requester
             
         Returns:
             The mapped result object
             
         Raises:
+            RequestTimeoutException: If the execution exceeded the timeout
+            RequesterException: If the request execution fails
+        """
+        deadline = Deadline.of(timeout if timeout is not None else self._default_timeout)
+        trace = RequestTrace(request.get_endpoint(), request.get_method().value)
+        try:
+            request_url, request_parameters = self._prepare(request, trace)
+            
+            if self._single_flight is not None and request.get_method() == Method.GET:
+                key = self._coalescing_key(request_url, request_parameters, result_class)
+                perform = self._leading(trace, lambda: self._perform(request, request_url, request_parameters,
+                                                                     result_class, trace, deadline))
+                try:
+                    result, trace.coalesced = self._single_flight.do(
+                        key, perform, deadline.remaining() if deadline is not None else None)
+                except FutureTimeoutError as e:
+                    raise RequestTimeoutException("The deadline was exceeded while waiting for an identical request",
+                                                  deadline.get_timeout(), e)
+            else:
+                result = self._perform(request, request_url, request_parameters, result_class, trace, deadline)
+        except BaseException as e:
+            self._finish(trace, error=e)
+            raise
+        
+        self._finish(trace, result)
+        return result
+    
+    async def execute_async(self, request: BaseRequest[R], result_class: Type[R], timeout: Optional[float] = None) -> R:
+        """Executes a request from a coroutine. The blocking execution is run in the
+        default executor of the running event loop
+        
+        Raises:
+            RequestTimeoutException: If the execution exceeded the timeout
             RequesterException: If the request execution fails
         """
+        loop = asyncio.get_running_loop()
+        if self._single_flight is None or request.get_method() != Method.GET:
+            return await loop.run_in_executor(None, self.execute, request, result_class, timeout)
+        
+        deadline = Deadline.of(timeout if timeout is not None else self._default_timeout)
+        trace = RequestTrace(request.get_endpoint(), request.get_method().value)
         try:
-            request.validate()
-        except RequestParamException as e:
-            raise RequesterException("An exception was thrown during request validation", e)
+            request_url, request_parameters = self._prepare(request, trace)
+            key = self._coalescing_key(request_url, request_parameters, result_class)
+            perform = self._leading(trace, lambda: self._perform(request, request_url, request_parameters,
+                                                                 result_class, trace, deadline))
+            try:
+                result, trace.coalesced = await self._single_flight.do_async(
+                    key, perform, deadline.remaining() if deadline is not None else None)
+            except asyncio.TimeoutError as e:
+                raise RequestTimeoutException("The deadline was exceeded while waiting for an identical request",
+                                              deadline.get_timeout(), e)
+        except BaseException as e:
+            self._finish(trace, error=e)
+            raise
+        
+        self._finish(trace, result)
+        return result
+    
+    @staticmethod
+    def _leading(trace: RequestTrace, perform: Callable[[], R]) -> Callable[[], R]:
+        """Wraps the call handed to the SingleFlight. A failed shared call returns no role,
+        so the trace starts as coalesced and only the caller whose call runs leads it"""
+        trace.coalesced = True
         
-        request_parameters = request.get_request_parameters()
-        request_parameters["apikey"] = request.get_api_key()
+        def lead() -> R:
+            trace.coalesced = False
+            return perform()
+        return lead
+    
+    def _prepare(self, request: BaseRequest[R], trace: RequestTrace) -> Tuple[str, PreparedParameters]:
+        """Validates the request and builds its URL and parameters"""
+        with trace.span(Stage.VALIDATE):
+            try:
+                request.validate()
+            except RequestParamException as e:
+                raise RequesterException("An exception was thrown during request validation", e)
+        
+        with trace.span(Stage.BUILD_PARAMETERS):
+            request_parameters = request.get_prepared_parameters()
         
-        # Add timestamp if not present
+        return request.get_base_url() + request.get_endpoint(), request_parameters
+    
+    def _perform(self, request: BaseRequest[R], request_url: str, request_parameters: PreparedParameters,
+                 result_class: Type[R], trace: RequestTrace, deadline: Optional[Deadline] = None) -> R:
+        """Sends the request and maps the response"""
+        # Add timestamp if not present, which only appends it to the prepared query string
         if "ts" not in request_parameters:
-            import time
-            request_parameters["ts"] = int(time.time())
+            request_parameters = request_parameters.with_value("ts", int(time.time()))
         
+        # The key of a pool replaces the key of the request and is held until the response is mapped
+        api_key = self._api_key_pool.acquire(deadline) if self._api_key_pool is not None else None
+        if api_key is not None:
+            request_parameters = request_parameters.with_value("apikey", api_key)
+        auth_error = False
+        
+        # Executors are only passed a timeout if there is one, so executors which
+        # don't support it keep working without deadlines
         try:
-            request_url = request.get_base_url() + request.get_endpoint()
+            kwargs = {"timeout": deadline.check("sending the request")} if deadline is not None else {}
             
-            if request.get_method() == Method.GET:
-                result = self._client_executor.get(request_url, request_parameters)
-            elif request.get_method() == Method.POST:
-                result = self._client_executor.post(request_url, request_parameters)
-            else:
-                raise UnsupportedOperationException(f"The request method {request.get_method()} is not supported")
+            with trace.span(Stage.HTTP):
+                if request.get_method() == Method.GET:
+                    result = self._client_executor.get(request_url, request_parameters, **kwargs)
+                elif request.get_method() == Method.POST:
+                    result = self._client_executor.post(request_url, request_parameters, **kwargs)
+                else:
+                    raise UnsupportedOperationException(f"The request method {request.get_method()} is not supported")
+            trace.response_size = len(result)
             
-            return self._json_mapper.from_json(result, result_class)
+            # Parsing and mapping can't be interrupted, so the deadline is checked before and
+            # after them instead, which never returns a result after the deadline has passed
+            if deadline is not None:
+                deadline.check("mapping the response")
+            mapped = self._map(result, result_class, trace)
+            if deadline is not None:
+                deadline.check("returning the result")
+            auth_error = api_key is not None and is_auth_error(result=mapped)
+            return mapped
+        except RequesterException:
+            raise
+        except ClientExecutorTimeoutException as e:
+            raise RequestTimeoutException("The deadline was exceeded while request execution",
+                                          deadline.get_timeout() if deadline is not None else 0.0, e)
         except ClientExecutorException as e:
+            auth_error = api_key is not None and is_auth_error(exception=e)
             raise RequesterException("An exception was thrown while request execution", e)
         except Exception as e:
             raise RequesterException("An unhandled exception was thrown", e)
+        finally:
+            if api_key is not None:
+                self._api_key_pool.release(api_key, auth_error)
+    
+    def _map(self, body: str, result_class: Type[R], trace: RequestTrace) -> R:
+        """Parses and maps the body, or returns the memoized result of an identical body"""
+        memo_key = None
+        if self._result_memo is not None and self._result_memo.is_memoized(result_class):
+            memo_key = self._result_memo.get_key(body, result_class)
+            mapped = self._result_memo.get(memo_key)
+            if mapped is not None:
+                return mapped
+        
+        with trace.span(Stage.PARSE):
+            data = self._json_mapper.parse(body)
+        with trace.span(Stage.MAP):
+            mapped = self._json_mapper.map(data, result_class)
+        
+        if memo_key is not None:
+            self._result_memo.put(memo_key, mapped)
+        return mapped
+    
+    def _finish(self, trace: RequestTrace, result: Optional[BaseResult] = None,
+                error: Optional[BaseException] = None) -> None:
+        if self._observers:
+            trace.finish(result, error)
+            notify_observers(self._observers, trace)
+    
+    @staticmethod
+    def _coalescing_key(request_url: str, request_parameters: Dict[str, Any], result_class: type) -> Hashable:
+        """Builds a key from the URL and the normalized parameters, ignoring the timestamp
+        and parameters which would not be sent"""
+        parameters = tuple(sorted(
+            (k, str(v)) for k, v in request_parameters.items()
+            if k != "ts" and v is not None and str(v)
+        ))
+        return request_url, parameters, result_class
 
 
 class UnsupportedOperationException(Exception):
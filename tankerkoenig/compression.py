@@ -0,0 +1,97 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+# Content codings in order of preference, zstd and br are only offered if urllib3 can
+# decode them, which requires the optional zstandard and brotli packages
+PREFERRED_ENCODINGS = ("zstd", "br", "gzip", "deflate")
+
+
+def get_supported_encodings() -> Tuple[str, ...]:
+    """Returns the content codings which can be decoded in this environment, in order of preference"""
+    available = {encoding.strip() for encoding in ACCEPT_ENCODING.split(",")}
+    return tuple(encoding for encoding in PREFERRED_ENCODINGS if encoding in available)
+
+
+def build_accept_encoding(encodings: Sequence[str]) -> str:
+    """Builds an Accept-Encoding header value which states the order of preference of
+    the encodings with descending quality values, e.g. 'br, gzip;q=0.9, deflate;q=0.8'"""
+    values = []
+    for position, encoding in enumerate(encodings):
+        quality = max(1, 10 - position) / 10
+        values.append(encoding if position == 0 else f"{encoding};q={quality:g}")
+    return ", ".join(values)
+
+
+@dataclass(frozen=True)
+class TransferStats:
+    """Point-in-time byte counters of the response bodies received by a ClientExecutor
+    
+    Attributes:
+        responses: Number of response bodies read
+        wire_bytes: Bytes of the bodies as transferred, before decompression
+        decoded_bytes: Bytes of the bodies after decompression
+        encodings: Number of responses per Content-Encoding, 'identity' if uncompressed
+    """
+    responses: int
+    wire_bytes: int
+    decoded_bytes: int
+    encodings: Dict[str, int]
+    
+    def get_saved_bytes(self) -> int:
+        """Returns the bytes saved by compression"""
+        return self.decoded_bytes - self.wire_bytes
+    
+    def get_compression_ratio(self) -> float:
+        """Returns the ratio of wire bytes to decoded bytes, 1.0 if nothing was received"""
+        return self.wire_bytes / self.decoded_bytes if self.decoded_bytes else 1.0
+
+
+class TransferCounter:
+    """Thread-safe accumulator of TransferStats"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._responses = 0
+        self._wire_bytes = 0
+        self._decoded_bytes = 0
+        self._encodings: Dict[str, int] = {}
+    
+    def add(self, encoding: str, wire_bytes: int, decoded_bytes: int) -> None:
+        """Counts a response body"""
+        with self._lock:
+            self._responses += 1
+            self._wire_bytes += wire_bytes
+            self._decoded_bytes += decoded_bytes
+            self._encodings[encoding] = self._encodings.get(encoding, 0) + 1
+    
+    def get_stats(self) -> TransferStats:
+        """Returns the current counters"""
+        with self._lock:
+            return TransferStats(self._responses, self._wire_bytes, self._decoded_bytes, dict(self._encodings))
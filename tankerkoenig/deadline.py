@@ -0,0 +1,78 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+from typing import Callable, Optional
+
+from tankerkoenig.exceptions import RequestTimeoutException
+
+
+class Deadline:
+    """A point in time by which a request execution has to be completed. It is created
+    once per execution and passed through every stage which may block, so the total
+    wall time of the execution is bounded by the initial timeout"""
+    
+    __slots__ = ("_timeout", "_expires_at", "_clock")
+    
+    def __init__(self, timeout: float, clock: Callable[[], float] = time.monotonic):
+        """Creates a deadline which expires after the timeout
+        
+        Args:
+            timeout: The timeout in seconds, which has to be positive
+            clock: Monotonic clock in seconds, replaceable for tests
+        """
+        if timeout <= 0:
+            raise ValueError("Timeout has to be positive")
+        self._timeout = timeout
+        self._clock = clock
+        self._expires_at = clock() + timeout
+    
+    @staticmethod
+    def of(timeout: Optional[float]) -> Optional['Deadline']:
+        """Creates a deadline for the timeout, or None if no timeout is supplied"""
+        return Deadline(timeout) if timeout is not None else None
+    
+    def get_timeout(self) -> float:
+        """Returns the initial timeout in seconds"""
+        return self._timeout
+    
+    def remaining(self) -> float:
+        """Returns the remaining seconds, which are never negative"""
+        return max(0.0, self._expires_at - self._clock())
+    
+    def expired(self) -> bool:
+        """Determines if the deadline has passed"""
+        return self._clock() >= self._expires_at
+    
+    def check(self, stage: str) -> float:
+        """Returns the remaining seconds
+        
+        Raises:
+            RequestTimeoutException: If the deadline has already passed
+        """
+        remaining = self._expires_at - self._clock()
+        if remaining <= 0:
+            raise RequestTimeoutException(f"The deadline of {self._timeout}s was exceeded before {stage}",
+                                          self._timeout)
+        return remaining
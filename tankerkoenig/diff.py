@@ -0,0 +1,225 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+from tankerkoenig.history import to_tenth_cents
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.results import PricesResult, StationListResult
+
+Snapshot = Mapping[str, GasPrices]
+# The status followed by the fixed-point price of each gas type
+Fingerprint = Tuple[Optional[Status], ...]
+
+_GAS_TYPES = tuple(GasType)
+
+
+class ChangeType(Enum):
+    """The type of a change between two snapshots"""
+    PRICE_UP = "price_up"
+    PRICE_DOWN = "price_down"
+    # A price became available, e.g. after the station opened
+    PRICE_ADDED = "price_added"
+    # A price became unavailable, e.g. after the station closed
+    PRICE_REMOVED = "price_removed"
+    STATUS_CHANGED = "status_changed"
+    STATION_APPEARED = "station_appeared"
+    STATION_DISAPPEARED = "station_disappeared"
+
+
+@dataclass(frozen=True)
+class ChangeEvent:
+    """A change of a station between two snapshots. For price changes, previous and
+    current are prices and gas_type is set. For status changes, they are the Status.
+    For appearing or disappearing stations, they are the GasPrices"""
+    change_type: ChangeType
+    station_id: str
+    gas_type: Optional[GasType] = None
+    previous: Any = None
+    current: Any = None
+
+
+def snapshot_of(result: Union[PricesResult, StationListResult], gas_type: Optional[GasType] = None) -> Dict[str, GasPrices]:
+    """Converts a result to a snapshot, which maps the station ID to its gas prices
+    
+    Args:
+        result: A PricesResult or StationListResult
+        gas_type: The gas type of Station.price, required if the list was requested
+            for a single gas type instead of ALL
+    
+    Raises:
+        ValueError: If the result is an error response of the API
+    """
+    if not _has_payload(result):
+        raise ValueError(f"Error responses have no snapshot: {result.get_message()}")
+    if isinstance(result, PricesResult):
+        return dict(result.get_gas_prices())
+    
+    snapshot = {}
+    for station in result.get_stations():
+        status = Status.OPEN if station.is_open else Status.CLOSED
+        if station.gas_prices is not None:
+            # Stations of list results carry no status of their own
+            snapshot[station.id] = GasPrices(prices=station.gas_prices.prices, status=status)
+        elif gas_type is not None and station.price is not None:
+            snapshot[station.id] = GasPrices(prices={gas_type: station.price}, status=status)
+        else:
+            snapshot[station.id] = GasPrices(prices={}, status=status)
+    return snapshot
+
+
+def _has_payload(result: Union[PricesResult, StationListResult]) -> bool:
+    """Determines if a result carries prices, which error responses of the API don't"""
+    payload = result.get_gas_prices() if isinstance(result, PricesResult) else result.get_stations()
+    return result.is_ok() is not False and payload is not None
+
+
+def fingerprint(gas_prices: GasPrices) -> Fingerprint:
+    """Returns the status followed by the fixed-point prices of all gas types, which
+    is used to skip unchanged stations with a single tuple comparison. The tuple itself
+    is compared instead of its hash, so colliding hashes cannot hide a change"""
+    return (gas_prices.status,) + tuple(_price_key(gas_prices.prices.get(gas_type)) for gas_type in _GAS_TYPES)
+
+
+def diff_snapshots(previous: Snapshot, current: Snapshot) -> List[ChangeEvent]:
+    """Compares two snapshots and returns the change events, ordered by the
+    stations of the current snapshot followed by the disappeared stations"""
+    previous_fingerprints = {station_id: fingerprint(gas_prices) for station_id, gas_prices in previous.items()}
+    events, _ = _diff(previous, previous_fingerprints, current)
+    return events
+
+
+class SnapshotDiffer:
+    """Compares each new snapshot to the previous one and publishes the changes to
+    the subscribers, so that only changes have to propagate downstream.
+    The fingerprints of the previous snapshot are kept, so every update is a single
+    pass over the current snapshot with a fingerprint comparison per station"""
+    
+    def __init__(self):
+        self._snapshot: Dict[str, GasPrices] = {}
+        self._fingerprints: Dict[str, Fingerprint] = {}
+        self._subscribers: List[tuple] = []
+        self._initialized = False
+    
+    def subscribe(self, callback: Callable[[ChangeEvent], None],
+                  change_types: Optional[Iterable[ChangeType]] = None) -> Callable[[], None]:
+        """Subscribes to change events. Returns a function which cancels the subscription
+        
+        Args:
+            callback: Called once per change event
+            change_types: If supplied, only events of these types are delivered
+        """
+        subscription = (callback, frozenset(change_types) if change_types is not None else None)
+        self._subscribers.append(subscription)
+        
+        def unsubscribe() -> None:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+        
+        return unsubscribe
+    
+    def update(self, result: Union[PricesResult, StationListResult, Snapshot],
+               gas_type: Optional[GasType] = None, emit_initial: bool = False) -> List[ChangeEvent]:
+        """Compares the new result to the previous one, publishes and returns the changes
+        
+        Args:
+            result: A PricesResult, StationListResult or an already converted snapshot
+            gas_type: The gas type of Station.price for single gas type station lists
+            emit_initial: If False, the first update only records the snapshot instead of
+                reporting every station as appeared
+        
+        Error responses of the API are ignored and keep the previous snapshot, so a failed
+        poll doesn't report every station as disappeared
+        """
+        if not isinstance(result, Mapping) and not _has_payload(result):
+            return []
+        current = result if isinstance(result, Mapping) else snapshot_of(result, gas_type)
+        events, fingerprints = _diff(self._snapshot, self._fingerprints, current)
+        
+        if not self._initialized and not emit_initial:
+            events = []
+        self._initialized = True
+        self._snapshot = dict(current)
+        self._fingerprints = fingerprints
+        
+        for event in events:
+            for callback, change_types in list(self._subscribers):
+                if change_types is None or event.change_type in change_types:
+                    callback(event)
+        return events
+    
+    def get_snapshot(self) -> Dict[str, GasPrices]:
+        """Returns the latest snapshot"""
+        return self._snapshot
+
+
+def _diff(previous: Snapshot, previous_fingerprints: Dict[str, Fingerprint], current: Snapshot) -> tuple:
+    remaining = dict(previous_fingerprints)
+    fingerprints = {}
+    events: List[ChangeEvent] = []
+    
+    for station_id, gas_prices in current.items():
+        current_fingerprint = fingerprint(gas_prices)
+        fingerprints[station_id] = current_fingerprint
+        previous_fingerprint = remaining.pop(station_id, None)
+        
+        if previous_fingerprint is None:
+            events.append(ChangeEvent(ChangeType.STATION_APPEARED, station_id, current=gas_prices))
+        elif previous_fingerprint != current_fingerprint:
+            _diff_station(station_id, previous[station_id], gas_prices, events)
+    
+    for station_id in remaining:
+        events.append(ChangeEvent(ChangeType.STATION_DISAPPEARED, station_id, previous=previous[station_id]))
+    
+    return events, fingerprints
+
+
+def _diff_station(station_id: str, previous: GasPrices, current: GasPrices, events: List[ChangeEvent]) -> None:
+    if previous.status != current.status:
+        events.append(ChangeEvent(ChangeType.STATUS_CHANGED, station_id,
+                                  previous=previous.status, current=current.status))
+    
+    for gas_type in _GAS_TYPES:
+        before = _price_key(previous.prices.get(gas_type))
+        after = _price_key(current.prices.get(gas_type))
+        if before == after:
+            continue
+        
+        if before is None:
+            change_type = ChangeType.PRICE_ADDED
+        elif after is None:
+            change_type = ChangeType.PRICE_REMOVED
+        else:
+            change_type = ChangeType.PRICE_UP if after > before else ChangeType.PRICE_DOWN
+        events.append(ChangeEvent(change_type, station_id, gas_type,
+                                  previous.prices.get(gas_type), current.prices.get(gas_type)))
+
+
+def _price_key(price: Optional[float]) -> Optional[int]:
+    """Compares prices as fixed-point values, treating missing and non-positive prices alike"""
+    if price is None or price <= 0:
+        return None
+    return to_tenth_cents(price)
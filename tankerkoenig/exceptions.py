@@ -41,6 +41,21 @@ class ClientExecutorException(TankerkoenigException):
         return self.url
 
 
+class ClientExecutorTimeoutException(ClientExecutorException):
+    """Exception thrown by a ClientExecutor if the request did not complete within
+    the supplied timeout"""
+    pass
+
+
+class CircuitOpenException(ClientExecutorException):
+    """Exception thrown by a CircuitBreakerClientExecutor if the circuit of the
+    endpoint is open and the call was rejected without being sent"""
+    
+    def __init__(self, url: str, retry_after: float):
+        super().__init__(url, f"The circuit for {url} is open, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
 class RequesterException(TankerkoenigException):
     """Exceptions thrown by a Requester when the request execution of the underlying
     ClientExecutor failed"""
@@ -50,6 +65,36 @@ class RequesterException(TankerkoenigException):
         self.cause = cause
 
 
+class RequestTimeoutException(RequesterException):
+    """Exception thrown by a Requester if the request execution exceeded its deadline"""
+    
+    def __init__(self, message: str, timeout: float, cause: Exception = None):
+        super().__init__(message, cause)
+        self.timeout = timeout
+
+
+class NoApiKeyAvailableException(RequesterException):
+    """Exception thrown by a Requester if every key of its ApiKeyPool is taken out of
+    rotation because of authentication errors"""
+    
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+    
+    def get_retry_after(self) -> float:
+        """Returns the seconds until the first key returns into rotation"""
+        return self.retry_after
+
+
+class RequestRejectedException(RequesterException):
+    """Exception thrown by a RequestScheduler if a request was shed because the queue
+    was full, or the scheduler was shut down"""
+    
+    def __init__(self, message: str, priority=None):
+        super().__init__(message)
+        self.priority = priority
+
+
 class RequestParamException(TankerkoenigException):
     """Exceptions thrown if any request parameter fails validation"""
     
@@ -0,0 +1,276 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import ClientExecutorTimeoutException
+
+
+# Called with the endpoint name (e.g. "prices.php") whenever a hedge is sent
+HedgeListener = Callable[[str], None]
+
+
+@dataclass(frozen=True)
+class HedgingConfig:
+    """Configuration of hedged GET requests
+    
+    Attributes:
+        percentile: Latency percentile of the recent successful calls after which a hedge is sent
+        initial_delay: Hedge delay in seconds until min_samples latencies are known
+        min_delay: Lower bound of the hedge delay in seconds
+        max_delay: Upper bound of the hedge delay in seconds. None disables it
+        window_size: Number of most recent latencies the percentile is computed from
+        min_samples: Minimum number of latencies before the percentile is used
+        budget_ratio: Hedges earned per request. 0.05 caps the extra traffic at 5% (plus budget_burst)
+        budget_burst: Maximum number of hedges which can be saved up
+        endpoints: Names of the endpoints to hedge (e.g. "prices.php"). None hedges every GET request
+        max_workers: Number of threads which execute primary and hedged calls
+    """
+    percentile: float = 0.95
+    initial_delay: float = 1.0
+    min_delay: float = 0.05
+    max_delay: Optional[float] = None
+    window_size: int = 200
+    min_samples: int = 20
+    budget_ratio: float = 0.05
+    budget_burst: float = 5.0
+    endpoints: Optional[FrozenSet[str]] = None
+    max_workers: int = 16
+
+
+@dataclass(frozen=True)
+class HedgingMetrics:
+    """Point-in-time metrics of a HedgingClientExecutor"""
+    requests: int
+    hedges: int
+    hedge_wins: int
+    budget_exhausted: int
+
+
+class LatencyTracker:
+    """Keeps the latencies of the most recent successful calls of an endpoint. Thread-safe"""
+    
+    def __init__(self, window_size: int):
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=window_size)
+    
+    def record(self, latency: float) -> None:
+        """Records the latency of a successful call in seconds"""
+        with self._lock:
+            self._latencies.append(latency)
+    
+    def get_count(self) -> int:
+        """Returns the number of latencies in the window"""
+        with self._lock:
+            return len(self._latencies)
+    
+    def get_percentile(self, percentile: float) -> Optional[float]:
+        """Returns the percentile (between 0 and 1) of the latencies, using the nearest-rank
+        method, or None if no latency was recorded"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if not latencies:
+            return None
+        rank = min(len(latencies) - 1, max(0, int(percentile * len(latencies) + 0.5) - 1))
+        return latencies[rank]
+
+
+class HedgeBudget:
+    """Token bucket which limits hedged calls to a fraction of all requests. Every request
+    deposits the ratio, every hedge withdraws one token. Thread-safe"""
+    
+    def __init__(self, ratio: float, burst: float):
+        self._lock = threading.Lock()
+        self._ratio = ratio
+        self._burst = burst
+        self._tokens = burst
+    
+    def deposit(self) -> None:
+        """Deposits the ratio of a request"""
+        with self._lock:
+            self._tokens = min(self._burst, self._tokens + self._ratio)
+    
+    def try_withdraw(self) -> bool:
+        """Withdraws a token for a hedge, if available"""
+        with self._lock:
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class HedgingClientExecutor(ClientExecutor):
+    """Client Executor which wraps around any ClientExecutor and hedges GET requests: if a
+    call has not answered within the configured latency percentile of its endpoint, one
+    duplicate call is sent and the first successful response wins. POST requests, e.g. of
+    the CorrectionRequest, are not idempotent and always sent exactly once.
+    
+    The losing call is cancelled if it has not started yet. A call which is already
+    running can't be interrupted by the delegate, so it completes in the background and
+    its response is discarded."""
+    
+    def __init__(self, delegate: ClientExecutor, config: Optional[HedgingConfig] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Creates a new HedgingClientExecutor
+        
+        Args:
+            delegate: The client executor which actually executes the requests. It has
+                to support concurrent calls
+            config: The hedging configuration
+            clock: Monotonic clock in seconds, replaceable for tests
+        """
+        self._delegate = delegate
+        self._config = config or HedgingConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._budget = HedgeBudget(self._config.budget_ratio, self._config.budget_burst)
+        self._pool = ThreadPoolExecutor(self._config.max_workers, thread_name_prefix="tankerkoenig-hedging")
+        self._requests = 0
+        self._hedges = 0
+        self._hedge_wins = 0
+        self._budget_exhausted = 0
+        self._listeners: List[HedgeListener] = []
+    
+    def add_listener(self, listener: HedgeListener) -> None:
+        """Adds a listener, which is called with the endpoint name whenever a hedge is sent"""
+        self._listeners.append(listener)
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a GET request, which is hedged if it is slower than the hedge delay"""
+        if not self._is_hedged(url):
+            return self._invoke(self._delegate.get, url, query_parameters, timeout)
+        
+        tracker = self.get_latency_tracker(url)
+        self._budget.deposit()
+        with self._lock:
+            self._requests += 1
+        
+        started = self._clock()
+        expires_at = None if timeout is None else started + timeout
+        primary = self._pool.submit(self._timed_get, tracker, url, query_parameters, started, expires_at)
+        delay = self.get_hedge_delay(url)
+        if timeout is not None:
+            delay = min(delay, timeout)
+        
+        done, _ = wait([primary], timeout=delay)
+        # Without remaining time a hedge could only be sent with a zero timeout, which the
+        # delegates reject, so the primary call is awaited instead
+        if done or (expires_at is not None and self._clock() >= expires_at):
+            return primary.result()
+        if not self._budget.try_withdraw():
+            with self._lock:
+                self._budget_exhausted += 1
+            return primary.result()
+        
+        hedge = self._pool.submit(self._timed_get, tracker, url, query_parameters, self._clock(), expires_at)
+        with self._lock:
+            self._hedges += 1
+        for listener in list(self._listeners):
+            listener(self._endpoint(url))
+        return self._first_success(primary, hedge)
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes a POST request, which is never hedged"""
+        return self._invoke(self._delegate.post, url, form_params, timeout)
+    
+    def get_latency_tracker(self, url: str) -> LatencyTracker:
+        """Returns the latency tracker of an endpoint, which is created on first use"""
+        with self._lock:
+            tracker = self._trackers.get(url)
+            if tracker is None:
+                tracker = self._trackers[url] = LatencyTracker(self._config.window_size)
+            return tracker
+    
+    def get_hedge_delay(self, url: str) -> float:
+        """Returns the seconds after which a GET request of the URL is hedged"""
+        tracker = self.get_latency_tracker(url)
+        delay = None
+        if tracker.get_count() >= self._config.min_samples:
+            delay = tracker.get_percentile(self._config.percentile)
+        if delay is None:
+            delay = self._config.initial_delay
+        delay = max(self._config.min_delay, delay)
+        if self._config.max_delay is not None:
+            delay = min(self._config.max_delay, delay)
+        return delay
+    
+    def get_metrics(self) -> HedgingMetrics:
+        """Returns the current metrics"""
+        with self._lock:
+            return HedgingMetrics(self._requests, self._hedges, self._hedge_wins, self._budget_exhausted)
+    
+    def close(self) -> None:
+        """Shuts down the threads without waiting for running calls"""
+        self._pool.shutdown(wait=False)
+    
+    def _is_hedged(self, url: str) -> bool:
+        endpoints = self._config.endpoints
+        return endpoints is None or self._endpoint(url) in endpoints
+    
+    @staticmethod
+    def _endpoint(url: str) -> str:
+        return url.rsplit("/", 1)[-1]
+    
+    def _first_success(self, primary: Future, hedge: Future) -> str:
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    if future is hedge:
+                        with self._lock:
+                            self._hedge_wins += 1
+                    return future.result()
+                # The exception of the primary call is preferred, as it was sent first
+                if error is None or future is primary:
+                    error = future.exception()
+        raise error
+    
+    def _timed_get(self, tracker: LatencyTracker, url: str, query_parameters: Dict[str, Any],
+                   submitted: float, expires_at: Optional[float]) -> str:
+        # Measured from the submission, so time spent waiting for a free thread counts
+        # towards both the latency and the timeout
+        timeout = None
+        if expires_at is not None:
+            timeout = expires_at - self._clock()
+            if timeout <= 0:
+                raise ClientExecutorTimeoutException(url, "The timeout expired before a thread was free to send it")
+        response = self._invoke(self._delegate.get, url, query_parameters, timeout)
+        tracker.record(self._clock() - submitted)
+        return response
+    
+    @staticmethod
+    def _invoke(method, url: str, parameters: Dict[str, Any], timeout: Optional[float]) -> str:
+        # The timeout is only forwarded if set, so delegates without timeout support keep working
+        return method(url, parameters, timeout=timeout) if timeout is not None else method(url, parameters)
@@ -0,0 +1,329 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import time
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterator, Optional
+
+from tankerkoenig.models.gas_prices import GasPrices, GasType
+from tankerkoenig.models.results import PricesResult, StationListResult
+
+# Default number of price changes kept per station and gas type
+DEFAULT_CAPACITY = 512
+
+# Largest price which fits into the unsigned 16 bit storage (65.535 €)
+_MAX_TENTH_CENTS = 0xFFFF
+
+
+def to_tenth_cents(price: float) -> int:
+    """Converts a price in Euro to integer tenth-cents (1.789 -> 1789)"""
+    return int(round(price * 1000))
+
+
+def from_tenth_cents(value: int) -> float:
+    """Converts integer tenth-cents to a price in Euro (1789 -> 1.789)"""
+    return value / 1000
+
+
+@dataclass(frozen=True)
+class PriceChange:
+    """Represents a single change of a gas price"""
+    timestamp: int
+    previous: float
+    current: float
+    
+    def get_delta(self) -> float:
+        """Returns the difference between the current and the previous price"""
+        return round(self.current - self.previous, 3)
+
+
+class PriceSeries:
+    """Ring buffer of price changes for one gas type of a station.
+    
+    Only changes are stored: a sample with the same price as the latest entry just
+    extends it. Timestamps are stored as unsigned 32 bit seconds and prices as
+    unsigned 16 bit tenth-cents. The buffers grow up to the capacity, after which
+    the oldest change is overwritten. Minimum and maximum are kept in monotonic
+    queues of change numbers, so they cost amortized constant time per change,
+    including evictions."""
+    
+    __slots__ = ("_capacity", "_timestamps", "_prices", "_start", "_last_seen", "_count",
+                 "_min_queue", "_max_queue", "_weighted_sum")
+    
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity < 1:
+            raise ValueError("Capacity has to be at least 1")
+        self._capacity = capacity
+        self._timestamps = array("I")
+        self._prices = array("H")
+        self._start = 0
+        self._last_seen = 0
+        # Number of changes stored so far. Change n is stored at index n % capacity
+        self._count = 0
+        # Change numbers with increasing (min) or decreasing (max) prices, the front
+        # holds the extreme value of the stored changes
+        self._min_queue = deque()
+        self._max_queue = deque()
+        # Sum of price * duration of all closed intervals, for the time weighted mean
+        self._weighted_sum = 0
+    
+    def add(self, timestamp: int, price: float) -> bool:
+        """Adds a price sample. Returns True if the price changed and therefore was stored
+        
+        Raises:
+            ValueError: If the timestamp lies before the latest sample or the price is out of range
+        """
+        value = to_tenth_cents(price)
+        if value <= 0 or value > _MAX_TENTH_CENTS:
+            raise ValueError(f"Price {price} is out of range")
+        if len(self._prices) and timestamp < self._last_seen:
+            raise ValueError("Samples have to be added in chronological order")
+        
+        self._last_seen = timestamp
+        size = len(self._prices)
+        if size:
+            last = self._physical(size - 1)
+            if self._prices[last] == value:
+                return False
+            self._weighted_sum += self._prices[last] * (timestamp - self._timestamps[last])
+        
+        if size < self._capacity:
+            self._timestamps.append(timestamp)
+            self._prices.append(value)
+        else:
+            self._evict_oldest()
+            self._timestamps[self._start] = timestamp
+            self._prices[self._start] = value
+            self._start = (self._start + 1) % self._capacity
+        
+        prices = self._prices
+        capacity = self._capacity
+        while self._min_queue and prices[self._min_queue[-1] % capacity] >= value:
+            self._min_queue.pop()
+        self._min_queue.append(self._count)
+        while self._max_queue and prices[self._max_queue[-1] % capacity] <= value:
+            self._max_queue.pop()
+        self._max_queue.append(self._count)
+        self._count += 1
+        return True
+    
+    def __len__(self) -> int:
+        return len(self._prices)
+    
+    def __iter__(self) -> Iterator[tuple]:
+        """Iterates over (timestamp, price) tuples, oldest first"""
+        for i in range(len(self._prices)):
+            index = self._physical(i)
+            yield self._timestamps[index], from_tenth_cents(self._prices[index])
+    
+    def get_last(self) -> Optional[float]:
+        """Returns the latest price"""
+        if not self._prices:
+            return None
+        return from_tenth_cents(self._prices[self._physical(len(self._prices) - 1)])
+    
+    def get_last_seen(self) -> Optional[int]:
+        """Returns the timestamp of the latest sample, even if it did not change the price"""
+        return self._last_seen if self._prices else None
+    
+    def get_min(self) -> Optional[float]:
+        """Returns the lowest stored price"""
+        return from_tenth_cents(self._prices[self._min_queue[0] % self._capacity]) if self._prices else None
+    
+    def get_max(self) -> Optional[float]:
+        """Returns the highest stored price"""
+        return from_tenth_cents(self._prices[self._max_queue[0] % self._capacity]) if self._prices else None
+    
+    def get_mean(self, until: Optional[int] = None) -> Optional[float]:
+        """Returns the time weighted mean price from the oldest stored change until the
+        given timestamp, which defaults to the latest sample"""
+        if not self._prices:
+            return None
+        first = self._timestamps[self._start]
+        last = self._physical(len(self._prices) - 1)
+        until = self._last_seen if until is None else max(until, self._timestamps[last])
+        duration = until - first
+        if duration <= 0:
+            return from_tenth_cents(self._prices[last])
+        weighted = self._weighted_sum + self._prices[last] * (until - self._timestamps[last])
+        return round(from_tenth_cents(weighted / duration), 4)
+    
+    def get_last_change(self) -> Optional[PriceChange]:
+        """Returns the latest price change, which requires at least two stored prices"""
+        size = len(self._prices)
+        if size < 2:
+            return None
+        last = self._physical(size - 1)
+        previous = self._physical(size - 2)
+        return PriceChange(self._timestamps[last], from_tenth_cents(self._prices[previous]),
+                           from_tenth_cents(self._prices[last]))
+    
+    def get_price_at(self, timestamp: int) -> Optional[float]:
+        """Returns the price which was valid at the given timestamp using a binary search.
+        Returns None if the timestamp lies before the oldest stored change"""
+        low, high = 0, len(self._prices)
+        while low < high:
+            middle = (low + high) // 2
+            if self._timestamps[self._physical(middle)] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return None
+        return from_tenth_cents(self._prices[self._physical(low - 1)])
+    
+    def _physical(self, logical: int) -> int:
+        return (self._start + logical) % self._capacity
+    
+    def _evict_oldest(self) -> None:
+        """Removes the oldest change from the weighted sum and the min/max queues"""
+        oldest = self._start
+        if self._capacity == 1:
+            self._weighted_sum = 0
+        else:
+            following = self._physical(1)
+            self._weighted_sum -= self._prices[oldest] * (self._timestamps[following] - self._timestamps[oldest])
+        evicted = self._count - self._capacity
+        if self._min_queue[0] == evicted:
+            self._min_queue.popleft()
+        if self._max_queue[0] == evicted:
+            self._max_queue.popleft()
+
+
+class PriceHistory:
+    """Price history of many stations, keyed by station ID and gas type.
+    Can be fed directly with PricesResult and StationListResult"""
+    
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """Creates a new PriceHistory
+        
+        Args:
+            capacity: The number of price changes kept per station and gas type
+        """
+        self._capacity = capacity
+        self._series: Dict[str, Dict[GasType, PriceSeries]] = {}
+        self._rejected = 0
+    
+    def add(self, station_id: str, gas_prices: GasPrices, timestamp: Optional[int] = None) -> int:
+        """Adds the gas prices of a station. Missing or non-positive prices (e.g. of
+        closed stations) are skipped. Out-of-range prices and samples older than the
+        latest stored one are skipped as well and counted, see get_rejected_count.
+        Returns the number of changed prices"""
+        timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        changed = 0
+        for gas_type, price in gas_prices.prices.items():
+            if price is not None and price > 0:
+                changed += self._add_price(station_id, gas_type, price, timestamp)
+        return changed
+    
+    def add_prices_result(self, result: PricesResult, timestamp: Optional[int] = None) -> int:
+        """Adds all gas prices of a PricesResult. Error responses of the API carry no
+        prices and are skipped. Returns the number of changed prices"""
+        if result.is_ok() is False or result.get_gas_prices() is None:
+            return 0
+        timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        return sum(self.add(station_id, gas_prices, timestamp)
+                   for station_id, gas_prices in result.get_gas_prices().items())
+    
+    def add_station_list_result(self, result: StationListResult, timestamp: Optional[int] = None,
+                                gas_type: Optional[GasType] = None) -> int:
+        """Adds all prices of a StationListResult. Error responses of the API carry no
+        stations and are skipped. Returns the number of changed prices
+        
+        Args:
+            result: The result of a StationListRequest
+            timestamp: The timestamp of the samples, defaults to now
+            gas_type: The gas type of Station.price, required if the list was requested
+                for a single gas type instead of ALL
+        """
+        if result.is_ok() is False or result.get_stations() is None:
+            return 0
+        timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        changed = 0
+        for station in result.get_stations():
+            if station.gas_prices is not None:
+                changed += self.add(station.id, station.gas_prices, timestamp)
+            elif gas_type is not None and station.price is not None and station.price > 0:
+                changed += self._add_price(station.id, gas_type, station.price, timestamp)
+        return changed
+    
+    def get_series(self, station_id: str, gas_type: GasType) -> Optional[PriceSeries]:
+        """Returns the price series of a station and gas type"""
+        return self._series.get(station_id, {}).get(gas_type)
+    
+    def get_min(self, station_id: str, gas_type: GasType) -> Optional[float]:
+        """Returns the lowest stored price of a station and gas type"""
+        series = self.get_series(station_id, gas_type)
+        return series.get_min() if series else None
+    
+    def get_max(self, station_id: str, gas_type: GasType) -> Optional[float]:
+        """Returns the highest stored price of a station and gas type"""
+        series = self.get_series(station_id, gas_type)
+        return series.get_max() if series else None
+    
+    def get_mean(self, station_id: str, gas_type: GasType, until: Optional[int] = None) -> Optional[float]:
+        """Returns the time weighted mean price of a station and gas type"""
+        series = self.get_series(station_id, gas_type)
+        return series.get_mean(until) if series else None
+    
+    def get_last_change(self, station_id: str, gas_type: GasType) -> Optional[PriceChange]:
+        """Returns the latest price change of a station and gas type"""
+        series = self.get_series(station_id, gas_type)
+        return series.get_last_change() if series else None
+    
+    def get_rejected_count(self) -> int:
+        """Returns the number of samples skipped because of an out-of-range price or
+        an out-of-order timestamp"""
+        return self._rejected
+    
+    def get_station_ids(self):
+        """Returns the IDs of all stations with a history"""
+        return self._series.keys()
+    
+    def __contains__(self, station_id: str) -> bool:
+        return station_id in self._series
+    
+    def __len__(self) -> int:
+        return len(self._series)
+    
+    def _add_price(self, station_id: str, gas_type: GasType, price: float, timestamp: int) -> int:
+        station_series = self._series.get(station_id)
+        if station_series is None:
+            station_series = self._series[station_id] = {}
+        series = station_series.get(gas_type)
+        if series is None:
+            series = station_series[gas_type] = PriceSeries(self._capacity)
+        try:
+            return 1 if series.add(timestamp, price) else 0
+        except ValueError:
+            # A single out-of-range price or out-of-order timestamp must not abort
+            # a result halfway through, so the sample is skipped and counted
+            self._rejected += 1
+            if series.get_last_seen() is None:
+                del station_series[gas_type]
+                if not station_series:
+                    del self._series[station_id]
+            return 0
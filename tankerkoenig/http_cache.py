@@ -0,0 +1,273 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+# Called with True for a cache hit and False for a miss
+LookupListener = Callable[[bool], None]
+
+# Parameters which differ between identical requests or must not be written to disk
+_IGNORED_PARAMETERS = ("ts", "apikey")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT,
+    body TEXT NOT NULL,
+    stored_at REAL NOT NULL
+)
+"""
+
+
+def cache_key(url: str, parameters: Dict[str, Any]) -> str:
+    """Returns the cache key of a GET request, which is independent of the API key and timestamp"""
+    normalized = sorted(
+        (k, str(v)) for k, v in parameters.items() if k not in _IGNORED_PARAMETERS and v is not None and str(v)
+    )
+    return json.dumps([url, normalized], separators=(",", ":"))
+
+
+def body_hash(body: str) -> str:
+    """Returns the content hash of a response body"""
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """A cached response and its validators
+    
+    Attributes:
+        body: The response body
+        etag: The ETag header of the response, or None
+        last_modified: The Last-Modified header of the response, or None
+        stored_at: The time the response was stored or last revalidated, in seconds since the epoch
+    """
+    body: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+    
+    def get_conditional_headers(self) -> Dict[str, str]:
+        """Returns the headers which revalidate the entry"""
+        headers = {}
+        if self.etag is not None:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified is not None:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+@dataclass(frozen=True)
+class HttpCacheStats:
+    """Point-in-time statistics of an HttpCache
+    
+    Attributes:
+        entries: Number of stored responses
+        revalidations: Number of conditional requests sent for cached responses
+        not_modified: Number of revalidations answered with 304 Not Modified
+    """
+    entries: int
+    revalidations: int
+    not_modified: int
+
+
+class HttpCache:
+    """Persistent cache of GET responses which carry an ETag or Last-Modified validator,
+    stored in a SQLite database. Thread-safe"""
+    
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        """Opens or creates a cache
+        
+        Args:
+            path: Path of the database file, ':memory:' keeps the cache in memory
+            clock: Wall clock in seconds since the epoch, replaceable for tests
+        """
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(_SCHEMA)
+        self._connection.commit()
+        self._revalidations = 0
+        self._not_modified = 0
+        self._listeners: List[LookupListener] = []
+    
+    def add_listener(self, listener: LookupListener) -> None:
+        """Adds a listener which is called once per lookup: with True if the cached response
+        was served after a Not Modified revalidation, with False otherwise"""
+        self._listeners.append(listener)
+    
+    def __enter__(self) -> 'HttpCache':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Returns the cached response of the key, or None, which counts as a miss"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            _notify(self._listeners, False)
+            return None
+        return CacheEntry(*row)
+    
+    def put(self, key: str, body: str, etag: Optional[str], last_modified: Optional[str]) -> bool:
+        """Stores a response. Responses without validators can't be revalidated, so they
+        are not stored and replace nothing
+        
+        Returns:
+            True if the response was stored
+        """
+        if etag is None and last_modified is None:
+            return False
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, etag, last_modified, body, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (key, etag, last_modified, body, self._clock()))
+            self._connection.commit()
+        return True
+    
+    def record_revalidation(self, key: str, not_modified: bool) -> None:
+        """Counts a conditional request. If the response was not modified, the entry is
+        marked as fresh and the lookup counts as a hit, otherwise as a miss"""
+        with self._lock:
+            self._revalidations += 1
+            if not_modified:
+                self._not_modified += 1
+                self._connection.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (self._clock(), key))
+                self._connection.commit()
+        _notify(self._listeners, not_modified)
+    
+    def remove(self, key: str) -> None:
+        """Removes the cached response of the key"""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._connection.commit()
+    
+    def clear(self) -> None:
+        """Removes every cached response"""
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+    
+    def get_stats(self) -> HttpCacheStats:
+        """Returns the number of entries and the revalidation counters"""
+        with self._lock:
+            entries = self._connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            return HttpCacheStats(entries, self._revalidations, self._not_modified)
+    
+    def close(self) -> None:
+        """Closes the database"""
+        with self._lock:
+            self._connection.close()
+
+
+@dataclass(frozen=True)
+class ResultMemoStats:
+    """Point-in-time statistics of a ResultMemo
+    
+    Attributes:
+        entries: Number of memoized results
+        hits: Number of responses whose mapping was skipped
+        misses: Number of responses which were mapped
+    """
+    entries: int
+    hits: int
+    misses: int
+
+
+class ResultMemo:
+    """Bounded LRU memo of mapped results by the content hash of the response body, so
+    unchanged responses are not parsed and mapped again. Memoized results are shared
+    between executions and must not be modified. Thread-safe"""
+    
+    def __init__(self, max_entries: int = 1024, result_classes: Optional[Tuple[type, ...]] = None):
+        """Creates a new ResultMemo
+        
+        Args:
+            max_entries: Maximum number of memoized results, the least recently used is evicted
+            result_classes: The result classes to memoize. None memoizes every result class
+        """
+        if max_entries < 1:
+            raise ValueError("The memo has to hold at least one entry")
+        self._max_entries = max_entries
+        self._result_classes = result_classes
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._listeners: List[LookupListener] = []
+    
+    def add_listener(self, listener: LookupListener) -> None:
+        """Adds a listener which is called with True for every hit and False for every miss"""
+        self._listeners.append(listener)
+    
+    def is_memoized(self, result_class: type) -> bool:
+        """Returns True if results of the class are memoized"""
+        return self._result_classes is None or issubclass(result_class, self._result_classes)
+    
+    @staticmethod
+    def get_key(body: str, result_class: type) -> Hashable:
+        """Returns the key of a response body mapped to the result class"""
+        return result_class, body_hash(body)
+    
+    def get(self, key: Hashable) -> Any:
+        """Returns the memoized result of the key, or None. Counts a hit or miss"""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self._misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self._hits += 1
+        _notify(self._listeners, result is not None)
+        return result
+    
+    def put(self, key: Hashable, result: Any) -> None:
+        """Memoizes a mapped result"""
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+    
+    def get_stats(self) -> ResultMemoStats:
+        """Returns the number of entries, hits and misses"""
+        with self._lock:
+            return ResultMemoStats(len(self._entries), self._hits, self._misses)
+
+
+def _notify(listeners: List[LookupListener], hit: bool) -> None:
+    # Listeners are called outside of the lock, so they may query the cache
+    for listener in list(listeners):
+        listener(hit)
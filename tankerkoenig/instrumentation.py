@@ -0,0 +1,197 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Optional
+
+from tankerkoenig.models.results import BaseResult, PricesResult, StationDetailResult, StationListResult
+
+logger = logging.getLogger(__name__)
+
+
+class Stage(Enum):
+    """The stages of a request execution"""
+    VALIDATE = "validate"
+    BUILD_PARAMETERS = "build_parameters"
+    HTTP = "http"
+    PARSE = "parse"
+    MAP = "map"
+
+
+class TraceStatus(Enum):
+    """The outcome of a request execution"""
+    # The API answered with ok
+    OK = "ok"
+    # The API answered, but reported an error
+    ERROR = "error"
+    # The execution raised an exception
+    EXCEPTION = "exception"
+
+
+@dataclass(frozen=True)
+class Span:
+    """Timing of a single stage. The start is a Unix timestamp, the duration is
+    measured with a monotonic clock, both in seconds"""
+    stage: Stage
+    start: float
+    duration: float
+    
+    def get_end(self) -> float:
+        """Returns the Unix timestamp at which the stage ended"""
+        return self.start + self.duration
+
+
+@dataclass
+class RequestTrace:
+    """Timings and tags of a single request execution, which are passed to the
+    RequestObservers once the execution finished"""
+    endpoint: str
+    method: str
+    start: float = field(default_factory=time.time)
+    spans: List[Span] = field(default_factory=list)
+    status: Optional[TraceStatus] = None
+    response_size: Optional[int] = None
+    station_count: Optional[int] = None
+    # True if the result was shared with a concurrent identical request, in which
+    # case the HTTP, parse and map stages were recorded by that request only
+    coalesced: bool = False
+    error: Optional[BaseException] = None
+    duration: Optional[float] = None
+    
+    @contextmanager
+    def span(self, stage: Stage) -> Iterator[None]:
+        """Records the duration of the enclosed block as span of the stage"""
+        start = time.time()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(stage, start, time.perf_counter() - started))
+    
+    def get_span(self, stage: Stage) -> Optional[Span]:
+        """Returns the span of a stage, if it was recorded"""
+        for span in self.spans:
+            if span.stage == stage:
+                return span
+        return None
+    
+    def get_tags(self) -> Dict[str, Any]:
+        """Returns the tags of the trace, omitting unknown values"""
+        tags = {
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "status": self.status.value if self.status else None,
+            "response_size": self.response_size,
+            "station_count": self.station_count,
+            "coalesced": self.coalesced,
+        }
+        return {k: v for k, v in tags.items() if v is not None}
+    
+    def finish(self, result: Optional[BaseResult] = None, error: Optional[BaseException] = None) -> None:
+        """Completes the trace with the outcome of the execution"""
+        self.duration = time.time() - self.start
+        self.error = error
+        if error is not None:
+            self.status = TraceStatus.EXCEPTION
+            return
+        self.status = TraceStatus.OK if result is not None and result.is_ok() else TraceStatus.ERROR
+        self.station_count = count_stations(result)
+
+
+class RequestObserver(ABC):
+    """Interface for observers of request executions, e.g. to export timings as metrics"""
+    
+    @abstractmethod
+    def on_request(self, trace: RequestTrace) -> None:
+        """Called once per request execution after it finished, whether it succeeded or not.
+        Called on the thread which executed the request, so it should return quickly"""
+        pass
+
+
+def count_stations(result: Optional[BaseResult]) -> Optional[int]:
+    """Returns the number of stations contained in a result"""
+    # Collections of error responses are None, as they are missing in the response
+    if isinstance(result, StationListResult):
+        return len(result.get_stations() or ())
+    if isinstance(result, PricesResult):
+        return len(result.get_gas_prices() or ())
+    if isinstance(result, StationDetailResult):
+        return 1 if result.get_station() else 0
+    return None
+
+
+def notify_observers(observers: List[RequestObserver], trace: RequestTrace) -> None:
+    """Passes the trace to every observer. Failing observers are logged and never
+    affect the request execution"""
+    for observer in observers:
+        try:
+            observer.on_request(trace)
+        except Exception:
+            logger.exception("Request observer %r failed", observer)
+
+
+class OpenTelemetryObserver(RequestObserver):
+    """Adapter which exports request traces as OpenTelemetry spans: one span per request
+    with a child span per stage, all tagged with the trace tags.
+    Requires the optional opentelemetry-api package"""
+    
+    def __init__(self, tracer: Any = None):
+        """Creates a new OpenTelemetryObserver
+        
+        Args:
+            tracer: The OpenTelemetry tracer to use. Defaults to the tracer "tankerkoenig"
+                of the global tracer provider
+        """
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryObserver requires the opentelemetry-api package") from e
+        
+        self._otel_trace = otel_trace
+        self._tracer = tracer or otel_trace.get_tracer("tankerkoenig")
+    
+    def on_request(self, trace: RequestTrace) -> None:
+        attributes = {f"tankerkoenig.{k}": v for k, v in trace.get_tags().items()}
+        root = self._tracer.start_span(f"tankerkoenig {trace.endpoint}", start_time=_nanos(trace.start),
+                                       attributes=attributes)
+        context = self._otel_trace.set_span_in_context(root)
+        
+        for span in trace.spans:
+            child = self._tracer.start_span(f"tankerkoenig.{span.stage.value}", context=context,
+                                            start_time=_nanos(span.start), attributes=attributes)
+            child.end(end_time=_nanos(span.get_end()))
+        
+        if trace.error is not None:
+            root.record_exception(trace.error)
+            root.set_status(self._otel_trace.Status(self._otel_trace.StatusCode.ERROR, str(trace.error)))
+        root.end(end_time=_nanos(trace.start + (trace.duration or 0.0)))
+
+
+def _nanos(timestamp: float) -> int:
+    return int(timestamp * 1_000_000_000)
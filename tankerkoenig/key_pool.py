@@ -0,0 +1,191 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, List, Optional, Sequence
+
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.exceptions import ClientExecutorException, NoApiKeyAvailableException
+from tankerkoenig.models.results import BaseResult
+from tankerkoenig.rate_limiter import RateLimiter
+
+# HTTP status codes and message fragments of responses rejecting the API key
+_AUTH_ERROR_STATUS_CODES = (401, 403)
+_AUTH_ERROR_MARKERS = ("apikey", "api-key", "api key")
+
+
+class BalancingStrategy(Enum):
+    """Determines which key of an ApiKeyPool is used for the next request"""
+    # The keys take turns, skipping keys which would have to wait for their rate limit
+    ROUND_ROBIN = "round_robin"
+    # The key with the fewest requests in flight, ties are broken by the rate limit
+    LEAST_LOADED = "least_loaded"
+
+
+@dataclass(frozen=True)
+class ApiKeyStats:
+    """Point-in-time statistics of a pooled key. The key itself is masked"""
+    key_id: str
+    requests: int
+    in_flight: int
+    auth_errors: int
+    cooldown_remaining: float
+    
+    def is_available(self) -> bool:
+        """Determines if the key is in rotation"""
+        return self.cooldown_remaining <= 0
+
+
+class _PooledKey:
+    __slots__ = ("api_key", "limiter", "requests", "in_flight", "auth_errors", "disabled_until")
+    
+    def __init__(self, api_key: str, limiter: Optional[RateLimiter]):
+        self.api_key = api_key
+        self.limiter = limiter
+        self.requests = 0
+        self.in_flight = 0
+        self.auth_errors = 0
+        self.disabled_until = 0.0
+    
+    def get_wait_time(self) -> float:
+        return self.limiter.get_wait_time() if self.limiter is not None else 0.0
+
+
+def mask_api_key(api_key: str) -> str:
+    """Masks all but the last four characters of a key, for logs and statistics"""
+    return "*" * max(0, len(api_key) - 4) + api_key[-4:]
+
+
+def is_auth_error(result: Optional[BaseResult] = None, exception: Optional[ClientExecutorException] = None) -> bool:
+    """Determines if an error response or a client failure rejected the API key"""
+    if result is not None and result.is_ok() is False:
+        message = (result.get_message() or "").lower()
+        return any(marker in message for marker in _AUTH_ERROR_MARKERS)
+    if exception is not None:
+        response = getattr(exception.cause, "response", None)
+        return getattr(response, "status_code", None) in _AUTH_ERROR_STATUS_CODES
+    return False
+
+
+class ApiKeyPool:
+    """Distributes requests across several API keys, each limited by its own RateLimiter,
+    so the throughput scales with the number of keys. A key whose requests are rejected
+    with authentication errors is taken out of rotation for the cooldown. Thread-safe"""
+    
+    def __init__(self, api_keys: Sequence[str], strategy: BalancingStrategy = BalancingStrategy.ROUND_ROBIN,
+                 rate_limit: Optional[float] = None, burst: int = 1, auth_error_cooldown: float = 300.0,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        """Creates a new ApiKeyPool
+        
+        Args:
+            api_keys: The keys, at least one. Duplicates are ignored
+            strategy: The strategy which selects the key of a request
+            rate_limit: Requests per second permitted per key. None disables rate limiting
+            burst: Number of requests a key may send at once
+            auth_error_cooldown: Seconds a key is out of rotation after an authentication error
+            clock: Monotonic clock in seconds, replaceable for tests
+            sleep: Sleep function, replaceable for tests
+        """
+        unique_keys = list(dict.fromkeys(key for key in api_keys if key))
+        if not unique_keys:
+            raise ValueError("The pool requires at least one API key")
+        self._strategy = strategy
+        self._auth_error_cooldown = auth_error_cooldown
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._keys = [
+            _PooledKey(key, RateLimiter(rate_limit, burst, clock, sleep) if rate_limit is not None else None)
+            for key in unique_keys
+        ]
+        self._by_key = {pooled.api_key: pooled for pooled in self._keys}
+        self._cursor = 0
+    
+    def get_api_keys(self) -> List[str]:
+        """Returns the pooled keys"""
+        return [pooled.api_key for pooled in self._keys]
+    
+    def acquire(self, deadline: Optional[Deadline] = None) -> str:
+        """Selects the key for a request and waits for its rate limit. Every acquired key
+        has to be released
+        
+        Raises:
+            NoApiKeyAvailableException: If every key is out of rotation
+            RequestTimeoutException: If the rate limit can't be met before the deadline
+        """
+        with self._lock:
+            pooled = self._select()
+            pooled.in_flight += 1
+            pooled.requests += 1
+        
+        if pooled.limiter is not None:
+            try:
+                pooled.limiter.acquire(deadline)
+            except BaseException:
+                with self._lock:
+                    pooled.in_flight -= 1
+                raise
+        return pooled.api_key
+    
+    def release(self, api_key: str, auth_error: bool = False) -> None:
+        """Releases an acquired key. An authentication error takes it out of rotation"""
+        with self._lock:
+            pooled = self._by_key[api_key]
+            pooled.in_flight -= 1
+            if auth_error:
+                pooled.auth_errors += 1
+                pooled.disabled_until = self._clock() + self._auth_error_cooldown
+    
+    def get_stats(self) -> List[ApiKeyStats]:
+        """Returns the statistics of every key"""
+        now = self._clock()
+        with self._lock:
+            return [
+                ApiKeyStats(mask_api_key(pooled.api_key), pooled.requests, pooled.in_flight, pooled.auth_errors,
+                            max(0.0, pooled.disabled_until - now))
+                for pooled in self._keys
+            ]
+    
+    def _select(self) -> _PooledKey:
+        now = self._clock()
+        available = [pooled for pooled in self._keys if pooled.disabled_until <= now]
+        if not available:
+            retry_after = min(pooled.disabled_until for pooled in self._keys) - now
+            raise NoApiKeyAvailableException(
+                f"All {len(self._keys)} API keys are out of rotation because of authentication errors", retry_after)
+        
+        if self._strategy == BalancingStrategy.LEAST_LOADED:
+            return min(available, key=lambda pooled: (pooled.in_flight, pooled.get_wait_time(), pooled.requests))
+        
+        # Round robin, starting after the previously selected key
+        count = len(self._keys)
+        ordered = [self._keys[(self._cursor + offset) % count] for offset in range(count)]
+        candidates = [pooled for pooled in ordered if pooled.disabled_until <= now]
+        selected = next((pooled for pooled in candidates if pooled.get_wait_time() == 0), None)
+        if selected is None:
+            selected = min(candidates, key=lambda pooled: pooled.get_wait_time())
+        self._cursor = (self._keys.index(selected) + 1) % count
+        return selected
@@ -0,0 +1,406 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import bisect
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import requests
+
+from tankerkoenig.instrumentation import RequestObserver, RequestTrace
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Default histogram buckets in seconds
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class Metric:
+    """Base class of all metrics. Every metric has a fixed set of label names and
+    keeps one value per combination of label values"""
+    
+    TYPE = ""
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self._name = name
+        self._documentation = documentation
+        self._label_names = tuple(label_names)
+        self._lock = threading.Lock()
+    
+    def get_name(self) -> str:
+        """Returns the name of the metric"""
+        return self._name
+    
+    def render(self) -> List[str]:
+        """Renders the metric in the Prometheus text exposition format"""
+        lines = [f"# HELP {self._name} {_escape_help(self._documentation)}", f"# TYPE {self._name} {self.TYPE}"]
+        with self._lock:
+            lines.extend(self._render_samples())
+        return lines
+    
+    def _label_values(self, labels: Dict[str, object]) -> LabelValues:
+        if set(labels) != set(self._label_names):
+            raise ValueError(f"{self._name} requires the labels {self._label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self._label_names)
+    
+    def _format_labels(self, values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self._label_names, values))
+        if extra is not None:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pairs) + "}"
+    
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """A monotonically increasing value"""
+    
+    TYPE = "counter"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """Increments the counter of the label values"""
+        if amount < 0:
+            raise ValueError("Counters can only be incremented")
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+    
+    def get(self, **labels) -> float:
+        """Returns the value of the label values"""
+        key = self._label_values(labels)
+        with self._lock:
+            return self._values.get(key, 0.0)
+    
+    def _render_samples(self) -> List[str]:
+        return [f"{self._name}{self._format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Gauge(Metric):
+    """A value which can go up and down"""
+    
+    TYPE = "gauge"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+    
+    def set(self, value: float, **labels) -> None:
+        """Sets the value of the label values"""
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+    
+    def get(self, **labels) -> Optional[float]:
+        """Returns the value of the label values, if set"""
+        key = self._label_values(labels)
+        with self._lock:
+            return self._values.get(key)
+    
+    def _render_samples(self) -> List[str]:
+        return [f"{self._name}{self._format_labels(k)} {_format_value(v)}" for k, v in self._values.items()]
+
+
+class Histogram(Metric):
+    """Counts observations in cumulative buckets and tracks their sum"""
+    
+    TYPE = "histogram"
+    
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self._buckets = tuple(sorted(buckets))
+        # Per label values: counts per bucket (non-cumulative, last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+    
+    def observe(self, value: float, **labels) -> None:
+        """Records an observation"""
+        key = self._label_values(labels)
+        index = _bucket_index(self._buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self._buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+    
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """Observes the duration of the enclosed block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+    
+    def get_count(self, **labels) -> int:
+        """Returns the number of observations of the label values"""
+        key = self._label_values(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return sum(entry[0]) if entry else 0
+    
+    def get_sum(self, **labels) -> float:
+        """Returns the sum of the observations of the label values"""
+        key = self._label_values(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            return entry[1][0] if entry else 0.0
+    
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self._buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format_value(bound)
+                lines.append(f"{self._name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            lines.append(f"{self._name}_sum{self._format_labels(key)} {_format_value(total[0])}")
+            lines.append(f"{self._name}_count{self._format_labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics, which are rendered together"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+    
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        """Returns the counter with the name, which is created if it does not exist yet"""
+        return self._get_or_create(Counter, name, documentation, label_names)
+    
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        """Returns the gauge with the name, which is created if it does not exist yet"""
+        return self._get_or_create(Gauge, name, documentation, label_names)
+    
+    def histogram(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """Returns the histogram with the name, which is created if it does not exist yet"""
+        return self._get_or_create(Histogram, name, documentation, label_names, buckets=buckets)
+    
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+    
+    def _get_or_create(self, metric_class, name: str, documentation: str, label_names: Sequence[str], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, documentation, label_names, **kwargs)
+            elif not isinstance(metric, metric_class):
+                raise ValueError(f"Metric {name} is already registered as {metric.TYPE}")
+            return metric
+
+
+class ClientMetrics(RequestObserver):
+    """The standard metrics of the API client. Register it as observer at the
+    ApiBuilder to record request counts and latencies per endpoint and the duration
+    of every stage, including the mapper. Caches, hedges and circuit breakers are
+    recorded once attached, retries and sinks report through the record methods"""
+    
+    def __init__(self, registry: Optional[MetricsRegistry] = None, prefix: str = "tankerkoenig"):
+        """Creates the metrics in the supplied registry, or in a new one"""
+        self._registry = registry or MetricsRegistry()
+        r = self._registry
+        self.requests = r.counter(f"{prefix}_requests_total", "Executed requests",
+                                  ("endpoint", "status"))
+        self.request_duration = r.histogram(f"{prefix}_request_duration_seconds", "Duration of request executions",
+                                            ("endpoint",))
+        self.stage_duration = r.histogram(f"{prefix}_stage_duration_seconds", "Duration of request execution stages",
+                                          ("endpoint", "stage"))
+        self.response_bytes = r.counter(f"{prefix}_response_bytes_total", "Size of received response bodies",
+                                        ("endpoint",))
+        self.cache_requests = r.counter(f"{prefix}_cache_requests_total", "Cache lookups by result",
+                                        ("cache", "result"))
+        self.cache_hit_ratio = r.gauge(f"{prefix}_cache_hit_ratio", "Ratio of cache lookups which were hits",
+                                       ("cache",))
+        self.retries = r.counter(f"{prefix}_retries_total", "Additional attempts of requests",
+                                 ("endpoint",))
+        self.sink_flush_duration = r.histogram(f"{prefix}_sink_flush_duration_seconds", "Duration of sink flushes",
+                                               ("sink",))
+        self.circuit_state = r.gauge(f"{prefix}_circuit_state",
+                                     "State of the circuit breaker (0 = closed, 1 = half open, 2 = open)",
+                                     ("endpoint",))
+        self.circuit_transitions = r.counter(f"{prefix}_circuit_transitions_total", "Circuit breaker transitions",
+                                             ("endpoint", "state"))
+    
+    def get_registry(self) -> MetricsRegistry:
+        """Returns the registry which holds the metrics"""
+        return self._registry
+    
+    def on_request(self, trace: RequestTrace) -> None:
+        status = trace.status.value if trace.status else "unknown"
+        self.requests.inc(endpoint=trace.endpoint, status=status)
+        if trace.duration is not None:
+            self.request_duration.observe(trace.duration, endpoint=trace.endpoint)
+        for span in trace.spans:
+            self.stage_duration.observe(span.duration, endpoint=trace.endpoint, stage=span.stage.value)
+        if trace.response_size is not None and not trace.coalesced:
+            self.response_bytes.inc(trace.response_size, endpoint=trace.endpoint)
+    
+    def record_cache_lookup(self, hit: bool, cache: str = "default") -> None:
+        """Records a cache lookup and updates the hit ratio of the cache"""
+        self.cache_requests.inc(cache=cache, result="hit" if hit else "miss")
+        hits = self.cache_requests.get(cache=cache, result="hit")
+        misses = self.cache_requests.get(cache=cache, result="miss")
+        self.cache_hit_ratio.set(hits / (hits + misses), cache=cache)
+    
+    def record_retry(self, endpoint: str) -> None:
+        """Records an additional attempt of a request, e.g. a retry or a hedged request"""
+        self.retries.inc(endpoint=endpoint)
+    
+    def time_sink_flush(self, sink: str):
+        """Context manager which observes the duration of a sink flush"""
+        return self.sink_flush_duration.time(sink=sink)
+    
+    def attach_circuit_breaker(self, executor) -> None:
+        """Records the states and transitions of a CircuitBreakerClientExecutor"""
+        executor.add_listener(self._on_circuit_transition)
+    
+    def attach_hedging(self, executor) -> None:
+        """Records every hedge of a HedgingClientExecutor as retry of its endpoint"""
+        executor.add_listener(self.record_retry)
+    
+    def attach_cache(self, cache, name: str = "default") -> None:
+        """Records the lookups of an HttpCache or ResultMemo under the cache name"""
+        cache.add_listener(lambda hit: self.record_cache_lookup(hit, cache=name))
+    
+    def _on_circuit_transition(self, endpoint: str, old_state, new_state) -> None:
+        self.circuit_state.set(_CIRCUIT_STATE_VALUES.get(new_state.value, -1), endpoint=endpoint)
+        self.circuit_transitions.inc(endpoint=endpoint, state=new_state.value)
+
+
+_CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def start_http_server(port: int, registry: MetricsRegistry, address: str = "") -> ThreadingHTTPServer:
+    """Serves the metrics of the registry at /metrics from a daemon thread.
+    Use shutdown() of the returned server to stop it
+    
+    Args:
+        port: The port to listen on, 0 picks a free port
+        registry: The registry to expose
+        address: The address to bind to, defaults to all interfaces
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        
+        def log_message(self, format, *args):
+            pass
+    
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="tankerkoenig-metrics", daemon=True)
+    thread.start()
+    return server
+
+
+def write_textfile(path: str, registry: MetricsRegistry) -> None:
+    """Writes the metrics atomically to a file, e.g. for the textfile collector of
+    the node exporter"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(registry.render())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def push_to_gateway(url: str, job: str, registry: MetricsRegistry, grouping: Optional[Dict[str, str]] = None,
+                    timeout: float = 10.0) -> None:
+    """Pushes the metrics to a Prometheus Pushgateway, replacing the metrics of the job.
+    Meant for short-lived runs such as CronJobs
+    
+    Args:
+        url: The base URL of the Pushgateway
+        job: The job name
+        registry: The registry to push
+        grouping: Additional grouping labels
+        timeout: Timeout of the push in seconds
+    """
+    path = f"/metrics/job/{requests.utils.quote(job, safe='')}"
+    for key, value in (grouping or {}).items():
+        path += f"/{requests.utils.quote(key, safe='')}/{requests.utils.quote(value, safe='')}"
+    response = requests.put(url.rstrip("/") + path, data=registry.render().encode("utf-8"),
+                            headers={"Content-Type": CONTENT_TYPE}, timeout=timeout)
+    response.raise_for_status()
+
+
+def _bucket_index(buckets: Tuple[float, ...], value: float) -> int:
+    # The first bucket whose upper bound is at least the value, len(buckets) is +Inf.
+    # NaN compares false to every bound, so it is counted in +Inf only
+    if math.isnan(value):
+        return len(buckets)
+    return bisect.bisect_left(buckets, value)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n")
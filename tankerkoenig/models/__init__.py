@@ -2,6 +2,7 @@
 
 from tankerkoenig.models.station import Station, Location, OpeningTime, State
 from tankerkoenig.models.gas_prices import GasPrices
+from tankerkoenig.models.opening_schedule import OpeningSchedule, open_mask, filter_open
 from tankerkoenig.models.results import (
     BaseResult,
     StationListResult,
@@ -17,6 +18,9 @@ __all__ = [
     "OpeningTime",
     "State",
     "GasPrices",
+    "OpeningSchedule",
+    "open_mask",
+    "filter_open",
     "BaseResult",
     "StationListResult",
     "StationDetailResult",
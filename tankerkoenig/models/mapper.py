@@ -23,7 +23,8 @@ SOFTWARE.
 """
 
 import json
-from typing import Type, TypeVar, Dict, Any, Optional, List
+from functools import lru_cache
+from typing import Type, TypeVar, Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
 
 from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
@@ -31,6 +32,69 @@ from tankerkoenig.models.station import Station, Location, OpeningTime, State
 
 T = TypeVar('T')
 
+# Maximum number of distinct opening time texts kept in the memo table
+OPENING_TEXT_CACHE_SIZE = 1024
+
+_DAY_MAP: Dict[str, int] = {
+    "Montag": 1, "Mo": 1,
+    "Dienstag": 2, "Di": 2,
+    "Mittwoch": 3, "Mi": 3,
+    "Donnerstag": 4, "Do": 4,
+    "Freitag": 5, "Fr": 5,
+    "Samstag": 6, "Sa": 6,
+    "Sonntag": 7, "So": 7,
+    "Feiertag": 8
+}
+
+_WHOLE_WEEK: Tuple[int, ...] = tuple(range(1, 8))
+_MONDAY_TO_SATURDAY: Tuple[int, ...] = tuple(range(1, 7))
+
+
+def _parse_days(text: str) -> Tuple[int, ...]:
+    """Parses day strings to day numbers (1=Monday, 7=Sunday, 8=Holiday)"""
+    if "-" in text:
+        # Day range
+        parts = text.split("-", 1)
+        from_day = _DAY_MAP.get(parts[0].strip(), -1)
+        to_day = _DAY_MAP.get(parts[1].strip(), -1)
+        if from_day == -1 or to_day == -1:
+            raise ValueError(f"Cannot parse day range: {text}")
+        return tuple(range(from_day, to_day + 1))
+    elif "," in text:
+        # Comma-separated days
+        days = tuple(_DAY_MAP.get(s.strip(), -1) for s in text.split(","))
+        if -1 in days:
+            raise ValueError(f"Cannot parse days: {text}")
+        return days
+    else:
+        # Single day
+        day = _DAY_MAP.get(text.strip(), -1)
+        if day == -1:
+            raise ValueError(f"Cannot parse day: {text}")
+        return (day,)
+
+
+@lru_cache(maxsize=OPENING_TEXT_CACHE_SIZE)
+def _parse_opening_text(text: str) -> Tuple[Optional[Tuple[int, ...]], bool]:
+    """Parses the text of an opening time to its days and whether holidays are included.
+    Results are memoized per text, therefore the returned day tuples are shared"""
+    if text == "täglich ausser Feiertag":
+        return _WHOLE_WEEK, False
+    elif text == "täglich":
+        return _WHOLE_WEEK, True
+    elif text == "täglich ausser Sonn- und Feiertagen":
+        return _MONDAY_TO_SATURDAY, False
+    
+    # Try to parse day ranges or individual days
+    try:
+        days = _parse_days(text)
+    except ValueError:
+        return None, False
+    
+    if 8 in days:  # Holiday
+        return tuple(d for d in days if d != 8), True
+    return days, False
+
 
 class JsonMapper:
     """A JSON Mapper which simply converts a string to an object"""
@@ -45,7 +109,14 @@ class JsonMapper:
         Returns:
             The mapped result object
         """
-        data = json.loads(json_str)
+        return self.map(self.parse(json_str), result_class)
+    
+    def parse(self, json_str: str) -> Any:
+        """Parses the supplied JSON string without mapping it"""
+        return json.loads(json_str)
+    
+    def map(self, data: Any, result_class: Type[T]) -> T:
+        """Maps already parsed JSON data to the result class"""
         return self._deserialize(data, result_class)
     
     def _deserialize(self, data: Any, target_class: Type[T]) -> T:
@@ -145,74 +216,22 @@ class JsonMapper:
             return None
     
     def _deserialize_opening_time(self, data: Dict[str, Any]) -> OpeningTime:
-        """Deserializes OpeningTime from JSON"""
+        """Deserializes OpeningTime from JSON. The parsed days of each distinct
+        text are memoized, so equal texts share the same immutable day tuple"""
         text = data.get("text", "")
-        start = data.get("start")
-        end = data.get("end")
-        
-        days: Optional[List[int]] = None
-        includes_holidays = False
-        
-        if text:
-            if text == "täglich ausser Feiertag":
-                days = list(range(1, 8))
-            elif text == "täglich":
-                days = list(range(1, 8))
-                includes_holidays = True
-            elif text == "täglich ausser Sonn- und Feiertagen":
-                days = list(range(1, 7))  # Monday to Saturday
-            else:
-                # Try to parse day ranges or individual days
-                try:
-                    days = self._parse_days(text)
-                    if days and 8 in days:  # Holiday
-                        includes_holidays = True
-                        days = [d for d in days if d != 8]
-                except Exception:
-                    days = None
+        days, includes_holidays = _parse_opening_text(text) if text else (None, False)
         
         return OpeningTime(
             text=text,
             days=days,
-            start=start,
-            end=end,
+            start=data.get("start"),
+            end=data.get("end"),
             includes_holidays=includes_holidays
         )
     
     def _parse_days(self, text: str) -> List[int]:
         """Parses day strings to day numbers (1=Monday, 7=Sunday, 8=Holiday)"""
-        day_map = {
-            "Montag": 1, "Mo": 1,
-            "Dienstag": 2, "Di": 2,
-            "Mittwoch": 3, "Mi": 3,
-            "Donnerstag": 4, "Do": 4,
-            "Freitag": 5, "Fr": 5,
-            "Samstag": 6, "Sa": 6,
-            "Sonntag": 7, "So": 7,
-            "Feiertag": 8
-        }
-        
-        if "-" in text:
-            # Day range
-            parts = text.split("-", 1)
-            from_day = day_map.get(parts[0].strip(), -1)
-            to_day = day_map.get(parts[1].strip(), -1)
-            if from_day == -1 or to_day == -1:
-                raise ValueError(f"Cannot parse day range: {text}")
-            return list(range(from_day, to_day + 1))
-        elif "," in text:
-            # Comma-separated days
-            day_strs = [s.strip() for s in text.split(",")]
-            days = [day_map.get(d, -1) for d in day_strs]
-            if -1 in days:
-                raise ValueError(f"Cannot parse days: {text}")
-            return days
-        else:
-            # Single day
-            day = day_map.get(text.strip(), -1)
-            if day == -1:
-                raise ValueError(f"Cannot parse day: {text}")
-            return [day]
+        return list(_parse_days(text))
     
     def _deserialize_dataclass(self, data: Dict[str, Any], target_class: Type[T]) -> T:
         """Deserializes a dataclass from a dictionary"""
@@ -0,0 +1,236 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, TYPE_CHECKING
+
+try:
+    from zoneinfo import ZoneInfo
+    _LOCAL_TIMEZONE = ZoneInfo("Europe/Berlin")
+except Exception:  # Python < 3.9 or missing tz database
+    _LOCAL_TIMEZONE = None
+
+if TYPE_CHECKING:
+    from tankerkoenig.models.station import OpeningTime, Station
+
+# Default resolution of the weekly bitmap in minutes
+SLOT_MINUTES = 15
+
+_MINUTES_PER_DAY = 24 * 60
+# Rows of the bitmap: Monday to Sunday, followed by public holidays
+_HOLIDAY_ROW = 7
+_ROWS = 8
+
+
+class OpeningSchedule:
+    """Weekly opening times of a Station, compiled once into a compact bitmap.
+    
+    The week is split into slots of the given resolution for every weekday and an
+    additional row for public holidays. A slot is only marked as open if the station
+    is open for the whole slot, so opening times which are not aligned to the
+    resolution are rounded inwards. Instances are immutable and safe to share."""
+    
+    __slots__ = ("_bitmap", "_resolution", "_slots_per_day")
+    
+    def __init__(self, bitmap: bytes, resolution: int = SLOT_MINUTES):
+        """Creates a schedule from an already compiled bitmap. Use compile() or
+        from_station() to build one from opening times"""
+        _check_resolution(resolution)
+        self._resolution = resolution
+        self._slots_per_day = _MINUTES_PER_DAY // resolution
+        if len(bitmap) != _bitmap_size(self._slots_per_day):
+            raise ValueError("Bitmap size does not match the resolution")
+        self._bitmap = bytes(bitmap)
+    
+    @classmethod
+    def compile(cls, opening_times: Optional[Sequence['OpeningTime']], whole_day: Optional[bool] = None,
+                resolution: int = SLOT_MINUTES) -> 'OpeningSchedule':
+        """Compiles opening times into a schedule
+        
+        Args:
+            opening_times: The opening times as supplied by StationDetailResult
+            whole_day: If True, the station is open around the clock, including holidays
+            resolution: The slot size in minutes, which has to divide a day evenly
+        """
+        _check_resolution(resolution)
+        slots_per_day = _MINUTES_PER_DAY // resolution
+        bitmap = bytearray(_bitmap_size(slots_per_day))
+        
+        if whole_day:
+            for row in range(_ROWS):
+                _set_range(bitmap, slots_per_day, row, 0, slots_per_day)
+            return cls(bitmap, resolution)
+        
+        for opening_time in opening_times or ():
+            start = _parse_minutes(opening_time.start)
+            end = _parse_minutes(opening_time.end)
+            if start is None or end is None:
+                continue
+            
+            rows = [day - 1 for day in (opening_time.days or ()) if 1 <= day <= 7]
+            if opening_time.includes_holidays:
+                rows.append(_HOLIDAY_ROW)
+            
+            start_slot = -(-start // resolution)  # Round up
+            end_slot = end // resolution  # Round down
+            for row in rows:
+                if end > start:
+                    _set_range(bitmap, slots_per_day, row, start_slot, end_slot)
+                elif end == start:
+                    # Identical start and end (e.g. 00:00 - 00:00) means open the whole day
+                    _set_range(bitmap, slots_per_day, row, 0, slots_per_day)
+                else:
+                    # Opening time spans midnight, holidays are not carried over to the next day
+                    _set_range(bitmap, slots_per_day, row, start_slot, slots_per_day)
+                    if row != _HOLIDAY_ROW:
+                        _set_range(bitmap, slots_per_day, (row + 1) % 7, 0, end_slot)
+        
+        return cls(bitmap, resolution)
+    
+    @classmethod
+    def from_station(cls, station: 'Station', resolution: int = SLOT_MINUTES) -> Optional['OpeningSchedule']:
+        """Compiles the opening times of a station. Returns None if the station
+        provides neither opening times nor the whole day flag"""
+        if not station.whole_day and not station.opening_times:
+            return None
+        return cls.compile(station.opening_times, station.whole_day, resolution)
+    
+    def get_resolution(self) -> int:
+        """Returns the slot size in minutes"""
+        return self._resolution
+    
+    def is_open_at(self, moment: datetime, holiday: bool = False) -> bool:
+        """Determines if the station is open at the given time. Naive datetimes are
+        interpreted as German local time, aware ones are converted to it.
+        
+        Args:
+            moment: The point in time to check
+            holiday: Whether the day of the moment is a public holiday
+        """
+        index = _bit_index(_to_local(moment), holiday, self._resolution, self._slots_per_day)
+        return _test_bit(self._bitmap, index)
+    
+    def is_open_whole_week(self) -> bool:
+        """Determines if the station is open around the clock on all weekdays"""
+        week_bits = 7 * self._slots_per_day
+        return all(_test_bit(self._bitmap, i) for i in range(week_bits))
+    
+    def __eq__(self, other):
+        if not isinstance(other, OpeningSchedule):
+            return False
+        return self._resolution == other._resolution and self._bitmap == other._bitmap
+    
+    def __hash__(self):
+        return hash((self._resolution, self._bitmap))
+    
+    def __repr__(self):
+        return f"OpeningSchedule(resolution={self._resolution})"
+
+
+def open_mask(schedules: Iterable[Optional[OpeningSchedule]], moment: datetime, holiday: bool = False,
+              default: bool = False) -> List[bool]:
+    """Determines for many schedules at once if they are open at the given time.
+    The slot lookup is computed once per resolution instead of once per schedule.
+    
+    Args:
+        schedules: The schedules to check, None entries are unknown opening times
+        moment: The point in time to check
+        holiday: Whether the day of the moment is a public holiday
+        default: The value to use for unknown opening times
+    """
+    local_moment = _to_local(moment)
+    positions = {}
+    mask = []
+    for schedule in schedules:
+        if schedule is None:
+            mask.append(default)
+            continue
+        
+        position = positions.get(schedule._resolution)
+        if position is None:
+            index = _bit_index(local_moment, holiday, schedule._resolution, schedule._slots_per_day)
+            position = positions[schedule._resolution] = (index >> 3, 1 << (index & 7))
+        
+        mask.append(bool(schedule._bitmap[position[0]] & position[1]))
+    return mask
+
+
+def filter_open(stations: Iterable['Station'], moment: datetime, holiday: bool = False,
+                default: bool = False) -> List['Station']:
+    """Returns the stations which are open at the given time, using their
+    compiled opening schedules
+    
+    Args:
+        stations: The stations to filter
+        moment: The point in time to check
+        holiday: Whether the day of the moment is a public holiday
+        default: Whether stations without opening time information are considered open
+    """
+    stations = list(stations)
+    mask = open_mask((station.get_opening_schedule() for station in stations), moment, holiday, default)
+    return [station for station, is_open in zip(stations, mask) if is_open]
+
+
+def _check_resolution(resolution: int) -> None:
+    if resolution <= 0 or _MINUTES_PER_DAY % resolution != 0:
+        raise ValueError(f"Resolution has to divide a day evenly, got {resolution} minutes")
+
+
+def _bitmap_size(slots_per_day: int) -> int:
+    return (_ROWS * slots_per_day + 7) // 8
+
+
+def _parse_minutes(value: Optional[str]) -> Optional[int]:
+    """Parses a time in the format HH:MM:ss to minutes after midnight"""
+    if not value:
+        return None
+    parts = value.split(":")
+    try:
+        minutes = int(parts[0]) * 60 + (int(parts[1]) if len(parts) > 1 else 0)
+    except ValueError:
+        return None
+    if minutes < 0 or minutes > _MINUTES_PER_DAY:
+        return None
+    return minutes
+
+
+def _set_range(bitmap: bytearray, slots_per_day: int, row: int, start_slot: int, end_slot: int) -> None:
+    offset = row * slots_per_day
+    for index in range(offset + start_slot, offset + min(end_slot, slots_per_day)):
+        bitmap[index >> 3] |= 1 << (index & 7)
+
+
+def _test_bit(bitmap: bytes, index: int) -> bool:
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+def _to_local(moment: datetime) -> datetime:
+    if moment.tzinfo is not None and _LOCAL_TIMEZONE is not None:
+        return moment.astimezone(_LOCAL_TIMEZONE)
+    return moment
+
+
+def _bit_index(moment: datetime, holiday: bool, resolution: int, slots_per_day: int) -> int:
+    row = _HOLIDAY_ROW if holiday else moment.weekday()
+    return row * slots_per_day + (moment.hour * 60 + moment.minute) // resolution
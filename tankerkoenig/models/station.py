@@ -23,9 +23,12 @@ SOFTWARE.
 """
 
 from dataclasses import dataclass, field
-from typing import Optional, List, TYPE_CHECKING
+from datetime import datetime
+from typing import Optional, List, Sequence, TYPE_CHECKING
 from enum import Enum
 
+from tankerkoenig.models.opening_schedule import OpeningSchedule
+
 if TYPE_CHECKING:
     from tankerkoenig.models.gas_prices import GasPrices
 
@@ -99,12 +102,12 @@ class Location:
 class OpeningTime:
     """Represents the opening times of a Station"""
     text: str
-    days: Optional[List[int]] = None  # List of day numbers (1=Monday, 7=Sunday)
+    days: Optional[Sequence[int]] = None  # Day numbers (1=Monday, 7=Sunday), a shared tuple if mapped
     start: Optional[str] = None  # Format: HH:MM:ss
     end: Optional[str] = None  # Format: HH:MM:ss
     includes_holidays: bool = False
     
-    def get_days(self) -> Optional[List[int]]:
+    def get_days(self) -> Optional[Sequence[int]]:
         """Returns the list of days of the week for that the times are valid"""
         return self.days if self.days else None
 
@@ -122,6 +125,7 @@ class Station:
     opening_times: Optional[List[OpeningTime]] = None
     overriding_opening_times: Optional[List[str]] = None
     whole_day: Optional[bool] = None
+    _opening_schedule: Optional[OpeningSchedule] = field(default=None, init=False, repr=False, compare=False)
     
     def get_name(self) -> Optional[str]:
         """Returns the stations name"""
@@ -156,6 +160,27 @@ class Station:
         Not Present is equivalent to False"""
         return self.whole_day
     
+    def get_opening_schedule(self) -> Optional[OpeningSchedule]:
+        """Returns the opening times compiled into a weekly bitmap. The schedule is compiled
+        on first access and reused afterwards, so it won't reflect later changes of the
+        opening times. Will be None if neither opening times nor the whole day flag are available"""
+        if self._opening_schedule is None:
+            self._opening_schedule = OpeningSchedule.from_station(self)
+        return self._opening_schedule
+    
+    def is_open_at(self, moment: datetime, holiday: bool = False) -> Optional[bool]:
+        """Determines if the station is open at the given time based on its opening times,
+        without any API call. Returns None if no opening time information is available
+        
+        Args:
+            moment: The point in time, naive datetimes are interpreted as German local time
+            holiday: Whether the day of the moment is a public holiday
+        """
+        schedule = self.get_opening_schedule()
+        if schedule is None:
+            return None
+        return schedule.is_open_at(moment, holiday)
+    
     def get_price(self) -> Optional[float]:
         """Returns the gas price for the requested GasRequestType.
         Will only be available with StationListRequest if GasRequestType is set to E5, E10 or DIESEL"""
@@ -0,0 +1,259 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from tankerkoenig.models.gas_prices import GasPrices, Status
+from tankerkoenig.models.results import PricesResult, StationListResult
+from tankerkoenig.models.station import Station
+from tankerkoenig.requests.base import BaseRequest
+from tankerkoenig.utils import distance_km
+
+if TYPE_CHECKING:
+    from tankerkoenig.api import Tankerkoenig
+
+# Kilometers per degree of latitude
+_KM_PER_DEGREE = 111.2
+
+Coordinates = Tuple[float, float]
+
+
+@dataclass(frozen=True)
+class ListTile:
+    """A list.php request which is expected to return the prices of several target stations
+    
+    Attributes:
+        lat: Latitude of the search center, which is the location of a target station
+        lng: Longitude of the search center
+        radius: The search radius in kilometers
+        station_ids: The target stations within the radius
+    """
+    lat: float
+    lng: float
+    radius: float
+    station_ids: FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    """The requests which fetch the prices of a set of stations
+    
+    Attributes:
+        tiles: The list.php requests
+        price_chunks: The station IDs of the prices.php requests, at most 10 per request
+    """
+    tiles: Tuple[ListTile, ...]
+    price_chunks: Tuple[Tuple[str, ...], ...]
+    
+    def get_station_ids(self) -> Set[str]:
+        """Returns the IDs of all planned stations"""
+        ids = {station_id for chunk in self.price_chunks for station_id in chunk}
+        ids.update(station_id for tile in self.tiles for station_id in tile.station_ids)
+        return ids
+    
+    def get_request_count(self) -> int:
+        """Returns the number of requests of the plan"""
+        return len(self.tiles) + len(self.price_chunks)
+    
+    def get_prices_only_request_count(self) -> int:
+        """Returns the number of requests if every station was fetched with prices.php"""
+        return math.ceil(len(self.get_station_ids()) / QueryPlanner.MAX_PRICES_IDS)
+
+
+@dataclass(frozen=True)
+class PlanResult:
+    """The prices fetched by an executed QueryPlan
+    
+    Attributes:
+        prices: The prices of every target station which was found, by station ID
+        request_count: The number of requests sent, including follow-up prices.php requests
+            for stations missing from list.php responses
+        missing_ids: The target stations without prices because a request failed or the
+            API didn't return them
+    """
+    prices: Dict[str, GasPrices]
+    request_count: int
+    missing_ids: FrozenSet[str]
+    
+    def get_prices(self, station_id: str) -> Optional[GasPrices]:
+        """Returns the prices of a station, or None if they are missing"""
+        return self.prices.get(station_id)
+
+
+def get_locations(stations: Iterable[Station]) -> Dict[str, Optional[Coordinates]]:
+    """Returns the coordinates of stations, e.g. of a cached station list, by station ID"""
+    return {
+        station.id: (station.location.lat, station.location.lng) if station.location is not None else None
+        for station in stations
+    }
+
+
+class QueryPlanner:
+    """Plans the cheapest mix of list.php and prices.php requests for the current prices of
+    a set of stations with known locations. A list.php request returns every station
+    within 25 km, so for geographically clustered stations a few list requests replace
+    many prices requests of 10 IDs each.
+    
+    Tiles are chosen greedily by the number of uncovered stations they contain, as long
+    as a tile covers more stations than a single prices request could"""
+    
+    MAX_PRICES_IDS = 10
+    MAX_RADIUS = 25.0
+    
+    def __init__(self, radius: float = MAX_RADIUS, margin: float = 0.5, min_tile_stations: int = MAX_PRICES_IDS + 1):
+        """Creates a new QueryPlanner
+        
+        Args:
+            radius: The search radius of the list.php requests, at most 25 km
+            margin: Kilometers within the radius in which stations are not counted as covered,
+                as the API may compute distances slightly differently
+            min_tile_stations: The minimum number of uncovered stations a list request has
+                to cover to be planned
+        """
+        if not 1 <= radius <= self.MAX_RADIUS:
+            raise ValueError(f"The radius has to be between 1 and {self.MAX_RADIUS} km")
+        if not 0 <= margin < radius:
+            raise ValueError("The margin has to be non-negative and smaller than the radius")
+        self._radius = radius
+        self._margin = margin
+        self._min_tile_stations = min_tile_stations
+    
+    def plan(self, locations: Mapping[str, Optional[Coordinates]]) -> QueryPlan:
+        """Plans the requests for the stations
+        
+        Args:
+            locations: The coordinates of the target stations by station ID. Stations
+                without coordinates are fetched with prices.php
+        """
+        located = {station_id: coordinates for station_id, coordinates in locations.items() if coordinates is not None}
+        coverage = self._compute_coverage(located)
+        
+        # Lazy greedy set cover: the coverage of a candidate only shrinks, so a stale count
+        # on the heap is an upper bound and only the top candidate has to be recounted
+        uncovered = set(located)
+        heap = [(-len(covered), station_id) for station_id, covered in coverage.items()]
+        heapq.heapify(heap)
+        tiles = []
+        while heap and -heap[0][0] >= self._min_tile_stations:
+            _, candidate = heapq.heappop(heap)
+            covered = coverage[candidate] & uncovered
+            if heap and len(covered) < -heap[0][0]:
+                heapq.heappush(heap, (-len(covered), candidate))
+                continue
+            if len(covered) < self._min_tile_stations:
+                break
+            lat, lng = located[candidate]
+            tiles.append(ListTile(lat, lng, self._radius, frozenset(covered)))
+            uncovered -= covered
+        
+        remaining = sorted(uncovered | {station_id for station_id in locations if station_id not in located})
+        return QueryPlan(tuple(tiles), self._chunk(remaining))
+    
+    def execute(self, api: 'Tankerkoenig.Api', plan: QueryPlan, max_workers: int = 8,
+                timeout: Optional[float] = None) -> PlanResult:
+        """Executes the plan concurrently. Stations missing from a list.php response, e.g.
+        because the request failed, are fetched with prices.php afterwards
+        
+        Args:
+            api: The API which builds and executes the requests
+            plan: The plan to execute
+            max_workers: Number of requests executed at the same time
+            timeout: The timeout of every single request execution
+        """
+        targets = plan.get_station_ids()
+        prices: Dict[str, GasPrices] = {}
+        requests: List[BaseRequest] = [api.list(tile.lat, tile.lng).set_search_radius(tile.radius)
+                                       for tile in plan.tiles]
+        requests += [api.prices().add_ids_collection(chunk) for chunk in plan.price_chunks]
+        self._collect(api.execute_many(requests, max_workers, timeout=timeout), targets, prices)
+        request_count = len(requests)
+        
+        tile_ids = {station_id for tile in plan.tiles for station_id in tile.station_ids}
+        follow_up = [api.prices().add_ids_collection(chunk) for chunk in self._chunk(sorted(tile_ids - set(prices)))]
+        if follow_up:
+            self._collect(api.execute_many(follow_up, max_workers, timeout=timeout), targets, prices)
+            request_count += len(follow_up)
+        
+        return PlanResult(prices, request_count, frozenset(targets - set(prices)))
+    
+    def _compute_coverage(self, located: Mapping[str, Coordinates]) -> Dict[str, Set[str]]:
+        """Returns the stations within the radius minus margin of every station, using a grid
+        of cells as large as the radius so only neighboring cells have to be searched"""
+        reach = self._radius - self._margin
+        if not located:
+            return {}
+        # A degree of longitude is shortest at the latitude farthest from the equator, which
+        # makes the cells at least as wide as the reach everywhere
+        widest_lat = math.radians(max(abs(lat) for lat, _ in located.values()))
+        cell_lat = reach / _KM_PER_DEGREE
+        cell_lng = reach / (_KM_PER_DEGREE * max(math.cos(widest_lat), 0.01))
+        
+        grid: Dict[Tuple[int, int], List[str]] = {}
+        cells = {}
+        for station_id, (lat, lng) in located.items():
+            cell = cells[station_id] = (math.floor(lat / cell_lat), math.floor(lng / cell_lng))
+            grid.setdefault(cell, []).append(station_id)
+        
+        coverage = {}
+        for station_id, (lat, lng) in located.items():
+            row, column = cells[station_id]
+            coverage[station_id] = {
+                other for d_row in (-1, 0, 1) for d_column in (-1, 0, 1)
+                for other in grid.get((row + d_row, column + d_column), ())
+                if distance_km(lat, lng, *located[other]) <= reach
+            }
+        return coverage
+    
+    @staticmethod
+    def _collect(outcomes, targets: Set[str], prices: Dict[str, GasPrices]) -> None:
+        """Adds the prices of the target stations of successful outcomes"""
+        for outcome in outcomes:
+            if not outcome.is_success() or not outcome.get_result().is_ok():
+                continue
+            result = outcome.get_result()
+            if isinstance(result, StationListResult):
+                for station in result.get_stations():
+                    if station.id in targets:
+                        prices[station.id] = _to_gas_prices(station)
+            elif isinstance(result, PricesResult):
+                for station_id, gas_prices in result.get_gas_prices().items():
+                    if station_id in targets and gas_prices.get_status() != Status.NOT_FOUND:
+                        prices[station_id] = gas_prices
+    
+    @classmethod
+    def _chunk(cls, station_ids: List[str]) -> Tuple[Tuple[str, ...], ...]:
+        return tuple(tuple(station_ids[i:i + cls.MAX_PRICES_IDS])
+                     for i in range(0, len(station_ids), cls.MAX_PRICES_IDS))
+
+
+def _to_gas_prices(station: Station) -> GasPrices:
+    """Converts the prices of a list.php station, which carry no status, into GasPrices
+    as returned by prices.php, which has no prices for closed stations"""
+    if not station.is_open:
+        return GasPrices({}, Status.CLOSED)
+    prices = dict(station.get_gas_prices().prices) if station.get_gas_prices() is not None else {}
+    return GasPrices(prices, Status.OPEN)
@@ -0,0 +1,429 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import heapq
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tankerkoenig.diff import fingerprint
+from tankerkoenig.history import PriceHistory
+from tankerkoenig.models.gas_prices import GasPrices, GasType
+from tankerkoenig.models.results import PricesResult
+from tankerkoenig.rate_limiter import RateLimiter
+
+if TYPE_CHECKING:
+    from tankerkoenig.api import Tankerkoenig
+
+# Maximum number of station IDs of a prices.php request
+MAX_PRICES_IDS = 10
+
+
+@dataclass(frozen=True)
+class PollingConfig:
+    """Configuration of an AdaptivePoller
+    
+    Attributes:
+        requests_per_hour: The budget of prices.php requests per hour, each polls up to 10 stations
+        min_interval: Shortest seconds between two polls of a station
+        max_interval: Longest seconds between two polls of a station
+        initial_rate: Assumed price changes per hour of stations without observations
+        half_life: Seconds after which an observation counts half for the change rate
+        lookahead: Fraction of its interval by which a station may be polled early to fill a request
+        utilization: Fraction of the budget the intervals are planned for, the rest absorbs
+            partially filled requests
+        reallocation_interval: Seconds between two recomputations of the intervals
+    """
+    requests_per_hour: float = 60.0
+    min_interval: float = 300.0
+    max_interval: float = 6 * 3600.0
+    initial_rate: float = 1.0
+    half_life: float = 7 * 24 * 3600.0
+    lookahead: float = 0.25
+    utilization: float = 0.9
+    reallocation_interval: float = 900.0
+
+
+@dataclass(frozen=True)
+class PollingStats:
+    """Point-in-time statistics of an AdaptivePoller
+    
+    Attributes:
+        stations: Number of polled stations
+        requests: Number of prices requests handed out
+        polls: Number of recorded station observations
+        changes: Number of observations with changed prices
+    """
+    stations: int
+    requests: int
+    polls: int
+    changes: int
+
+
+class ChangeRateEstimator:
+    """Estimates the price change rate of a station from periodic observations, which
+    only reveal whether prices changed since the previous one. With the fraction p of
+    intervals containing a change and the mean interval d, a Poisson process changes
+    -ln(1 - p) / d times per second. Older observations decay with the half-life"""
+    
+    __slots__ = ("_half_life", "_initial_rate", "_observations", "_changes", "_exposure")
+    
+    def __init__(self, initial_rate: float, half_life: float):
+        """Creates a new estimator
+        
+        Args:
+            initial_rate: The changes per second assumed without observations
+            half_life: Seconds after which an observation counts half
+        """
+        self._half_life = half_life
+        self._initial_rate = initial_rate
+        self._observations = 0.0
+        self._changes = 0.0
+        self._exposure = 0.0
+    
+    def observe(self, interval: float, changed: bool) -> None:
+        """Adds an observation after the interval in seconds"""
+        if interval <= 0:
+            return
+        decay = 0.5 ** (interval / self._half_life)
+        self._observations = self._observations * decay + 1
+        self._changes = self._changes * decay + (1 if changed else 0)
+        self._exposure = self._exposure * decay + interval
+    
+    def set_initial_rate(self, rate: float) -> None:
+        """Sets the changes per second assumed until observations are available"""
+        self._initial_rate = rate
+    
+    def get_rate(self) -> float:
+        """Returns the estimated changes per second"""
+        if self._observations < 1:
+            return self._initial_rate
+        # Laplace smoothing keeps the estimate finite and positive
+        fraction = (self._changes + 0.5) / (self._observations + 1)
+        return -math.log(1 - fraction) / (self._exposure / self._observations)
+
+
+class _Station:
+    __slots__ = ("estimator", "interval", "due", "last_poll", "fingerprint", "in_flight")
+    
+    def __init__(self, estimator: ChangeRateEstimator, interval: float, due: float):
+        self.estimator = estimator
+        self.interval = interval
+        self.due = due
+        self.last_poll: Optional[float] = None
+        self.fingerprint: Optional[int] = None
+        # Handed out in a batch and not recorded yet
+        self.in_flight = False
+
+
+def allocate_intervals(rates: Dict[str, float], capacity: float, min_interval: float,
+                       max_interval: float) -> Dict[str, float]:
+    """Distributes a capacity of station polls per second over stations with Poisson
+    change rates. The expected number of detected changes, sum f * (1 - exp(-rate / f)),
+    is maximal if the poll frequency f is proportional to the rate, clamped to the
+    interval bounds, which is solved by bisection on the factor
+    
+    Returns:
+        The seconds between two polls by station ID
+    """
+    low, high = 1 / max_interval, 1 / min_interval
+    if not rates:
+        return {}
+    if len(rates) * low >= capacity:
+        return {station_id: max_interval for station_id in rates}
+    if len(rates) * high <= capacity:
+        return {station_id: min_interval for station_id in rates}
+    
+    def total(factor: float) -> float:
+        return sum(min(high, max(low, factor * rate)) for rate in rates.values())
+    
+    lower, upper = 0.0, 1.0
+    while total(upper) < capacity:
+        upper *= 2
+    for _ in range(60):
+        middle = (lower + upper) / 2
+        if total(middle) < capacity:
+            lower = middle
+        else:
+            upper = middle
+    return {station_id: 1 / min(high, max(low, lower * rate)) for station_id, rate in rates.items()}
+
+
+class AdaptivePoller:
+    """Polls the prices of stations at intervals adapted to how often each station
+    changes its prices, within a budget of prices.php requests. Volatile stations are
+    polled more often than stable ones, and stations due at about the same time share
+    requests of up to 10 IDs. Thread-safe"""
+    
+    def __init__(self, station_ids: Iterable[str], config: Optional[PollingConfig] = None,
+                 clock: Callable[[], float] = time.time):
+        """Creates a new AdaptivePoller. The first polls are spread over the initial interval
+        
+        Args:
+            station_ids: The stations to poll
+            config: The budget and interval bounds
+            clock: Wall clock in seconds, replaceable for tests and simulations
+        """
+        self._config = config or PollingConfig()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._rate_limiter = RateLimiter(self._config.requests_per_hour / 3600,
+                                         max(1, math.ceil(self._config.requests_per_hour / 60)), clock)
+        self._stations: Dict[str, _Station] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._requests = 0
+        self._polls = 0
+        self._changes = 0
+        
+        now = clock()
+        station_ids = list(dict.fromkeys(station_ids))
+        for station_id in station_ids:
+            self._stations[station_id] = _Station(self._new_estimator(), self._config.max_interval, now)
+        self._reallocate(now)
+        for index, station_id in enumerate(station_ids):
+            station = self._stations[station_id]
+            self._schedule(station_id, now + station.interval * index / len(station_ids))
+    
+    def add_station(self, station_id: str) -> None:
+        """Adds a station, which is due immediately"""
+        with self._lock:
+            if station_id not in self._stations:
+                now = self._clock()
+                self._stations[station_id] = _Station(self._new_estimator(), self._config.max_interval, now)
+                self._schedule(station_id, now)
+                self._last_allocation = float("-inf")
+    
+    def remove_station(self, station_id: str) -> None:
+        """Stops polling a station"""
+        with self._lock:
+            self._stations.pop(station_id, None)
+    
+    def learn_from_history(self, history: PriceHistory) -> None:
+        """Uses the price changes stored in a history as the initial change rate of the
+        stations, until they are replaced by own observations"""
+        with self._lock:
+            for station_id, station in self._stations.items():
+                rate = _history_rate(history, station_id)
+                if rate is not None:
+                    station.estimator.set_initial_rate(rate)
+            self._reallocate(self._clock())
+    
+    def get_interval(self, station_id: str) -> Optional[float]:
+        """Returns the current seconds between two polls of a station"""
+        station = self._stations.get(station_id)
+        return station.interval if station is not None else None
+    
+    def get_change_rate(self, station_id: str) -> Optional[float]:
+        """Returns the estimated price changes per hour of a station"""
+        station = self._stations.get(station_id)
+        return station.estimator.get_rate() * 3600 if station is not None else None
+    
+    def get_next_due(self) -> Optional[float]:
+        """Returns the time at which the next station is due, or None without stations"""
+        with self._lock:
+            self._drop_stale()
+            return self._heap[0][0] if self._heap else None
+    
+    def get_stats(self) -> PollingStats:
+        """Returns the number of stations, requests, polls and observed changes"""
+        with self._lock:
+            return PollingStats(len(self._stations), self._requests, self._polls, self._changes)
+    
+    def due_batches(self, now: Optional[float] = None) -> List[Tuple[str, ...]]:
+        """Returns the station IDs to poll now, in batches of up to 10 for one prices
+        request each. Requests which would exceed the budget are deferred, and partially
+        filled batches are topped up with stations which are due soon. The stations of a
+        batch are not returned again until their next due time
+        
+        Args:
+            now: The current time, defaults to the clock
+        """
+        now = self._clock() if now is None else now
+        with self._lock:
+            if now - self._last_allocation >= self._config.reallocation_interval:
+                self._reallocate(now)
+            
+            batches = []
+            while True:
+                self._drop_stale()
+                if not self._heap or self._heap[0][0] > now or not self._rate_limiter.try_acquire():
+                    break
+                batch = self._take_batch(now)
+                for station_id in batch:
+                    # Provisionally due again, until the poll is recorded
+                    self._stations[station_id].in_flight = True
+                    self._schedule(station_id, now + self._stations[station_id].interval)
+                batches.append(tuple(batch))
+            self._requests += len(batches)
+            return batches
+    
+    def record(self, station_id: str, gas_prices: GasPrices, timestamp: Optional[float] = None) -> bool:
+        """Records the polled prices of a station and schedules its next poll
+        
+        Returns:
+            True if the prices changed since the previous poll
+        """
+        timestamp = self._clock() if timestamp is None else timestamp
+        with self._lock:
+            station = self._stations.get(station_id)
+            if station is None:
+                return False
+            current = fingerprint(gas_prices)
+            changed = station.fingerprint is not None and current != station.fingerprint
+            if station.last_poll is not None:
+                station.estimator.observe(timestamp - station.last_poll, changed)
+            station.fingerprint = current
+            station.last_poll = timestamp
+            station.in_flight = False
+            self._polls += 1
+            self._changes += 1 if changed else 0
+            self._schedule(station_id, timestamp + station.interval)
+            return changed
+    
+    def record_result(self, result: PricesResult, timestamp: Optional[float] = None) -> int:
+        """Records all prices of a PricesResult. Error responses of the API carry no prices
+        and are skipped. Returns the number of changed stations"""
+        if result.is_ok() is False or result.get_gas_prices() is None:
+            return 0
+        timestamp = self._clock() if timestamp is None else timestamp
+        return sum(self.record(station_id, gas_prices, timestamp)
+                   for station_id, gas_prices in result.get_gas_prices().items())
+    
+    def poll(self, api: 'Tankerkoenig.Api', max_workers: int = 4,
+             timeout: Optional[float] = None) -> List[PricesResult]:
+        """Executes the due batches and records their prices. Stations of failed requests
+        are retried after the minimum interval
+        
+        Returns:
+            The successful results
+        """
+        now = self._clock()
+        batches = self.due_batches(now)
+        if not batches:
+            return []
+        results = []
+        requests = [api.prices().add_ids_collection(batch) for batch in batches]
+        for outcome in api.execute_many(requests, max_workers, ordered=True, timeout=timeout):
+            if outcome.is_success() and outcome.get_result().is_ok():
+                self.record_result(outcome.get_result(), now)
+                results.append(outcome.get_result())
+            else:
+                with self._lock:
+                    for station_id in batches[outcome.index]:
+                        if station_id in self._stations:
+                            self._stations[station_id].in_flight = False
+                            self._schedule(station_id, now + self._config.min_interval)
+        return results
+    
+    def run(self, api: 'Tankerkoenig.Api', stop: threading.Event,
+            on_result: Optional[Callable[[PricesResult], None]] = None, max_workers: int = 4) -> None:
+        """Polls until the stop event is set, sleeping until the next station is due
+        
+        Args:
+            api: The API which executes the prices requests
+            stop: Event which ends the loop
+            on_result: Called with every successful result
+            max_workers: Number of requests executed at the same time
+        """
+        while not stop.is_set():
+            for result in self.poll(api, max_workers):
+                if on_result is not None:
+                    on_result(result)
+            next_due = self.get_next_due()
+            wait = self._config.min_interval if next_due is None else next_due - self._clock()
+            stop.wait(min(max(wait, self._rate_limiter.get_wait_time(), 1.0), self._config.min_interval))
+    
+    def _new_estimator(self) -> ChangeRateEstimator:
+        return ChangeRateEstimator(self._config.initial_rate / 3600, self._config.half_life)
+    
+    def _schedule(self, station_id: str, due: float) -> None:
+        """Sets the due time of a station. Superseded heap entries are dropped lazily"""
+        self._stations[station_id].due = due
+        heapq.heappush(self._heap, (due, station_id))
+    
+    def _drop_stale(self) -> None:
+        while self._heap:
+            due, station_id = self._heap[0]
+            station = self._stations.get(station_id)
+            if station is not None and station.due == due:
+                return
+            heapq.heappop(self._heap)
+    
+    def _take_batch(self, now: float) -> List[str]:
+        """Pops the most overdue stations, then stations whose due time is within the
+        lookahead fraction of their interval"""
+        batch = []
+        deferred = []
+        horizon = now + self._config.lookahead * self._config.max_interval
+        while self._heap and len(batch) < MAX_PRICES_IDS:
+            due, station_id = self._heap[0]
+            station = self._stations.get(station_id)
+            if station is None or station.due != due:
+                heapq.heappop(self._heap)
+                continue
+            if due > horizon:
+                break
+            heapq.heappop(self._heap)
+            if due <= now or due - now <= self._config.lookahead * station.interval:
+                batch.append(station_id)
+            else:
+                deferred.append((due, station_id))
+        for entry in deferred:
+            heapq.heappush(self._heap, entry)
+        return batch
+    
+    def _reallocate(self, now: float) -> None:
+        """Recomputes the intervals from the current change rates and moves the due times"""
+        capacity = self._config.requests_per_hour * MAX_PRICES_IDS * self._config.utilization / 3600
+        rates = {station_id: station.estimator.get_rate() for station_id, station in self._stations.items()}
+        intervals = allocate_intervals(rates, capacity, self._config.min_interval, self._config.max_interval)
+        for station_id, interval in intervals.items():
+            station = self._stations[station_id]
+            station.interval = interval
+            # Stations which are overdue or being polled keep their due time
+            if station.last_poll is not None and not station.in_flight and station.due > now:
+                due = max(now, station.last_poll + interval)
+                if due != station.due:
+                    self._schedule(station_id, due)
+        self._last_allocation = now
+
+
+def _history_rate(history: PriceHistory, station_id: str) -> Optional[float]:
+    """Returns the price changes per second of a station in a history, counting changes
+    of several gas types at the same time once"""
+    timestamps = set()
+    last_seen = None
+    first = None
+    for series in (history.get_series(station_id, gas_type) for gas_type in GasType):
+        if series is None or not len(series):
+            continue
+        series_timestamps = [timestamp for timestamp, _ in series]
+        first = series_timestamps[0] if first is None else min(first, series_timestamps[0])
+        timestamps.update(series_timestamps[1:])
+        last_seen = series.get_last_seen() if last_seen is None else max(last_seen, series.get_last_seen())
+    if first is None or last_seen is None or last_seen <= first:
+        return None
+    return max(len(timestamps), 0.5) / (last_seen - first)
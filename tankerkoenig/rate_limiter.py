@@ -0,0 +1,98 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+import time
+from typing import Callable, Optional
+
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.exceptions import RequestTimeoutException
+
+
+class RateLimiter:
+    """Token bucket which permits rate requests per second on average and bursts of up
+    to burst requests. Thread-safe"""
+    
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Creates a new RateLimiter, which starts with a full bucket
+        
+        Args:
+            rate: Permitted requests per second, has to be positive
+            burst: Capacity of the bucket, has to be at least 1
+            clock: Monotonic clock in seconds, replaceable for tests
+            sleep: Sleep function, replaceable for tests
+        """
+        if rate <= 0 or burst < 1:
+            raise ValueError("The rate has to be positive and the burst at least 1")
+        self._rate = rate
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = clock()
+    
+    def get_rate(self) -> float:
+        """Returns the permitted requests per second"""
+        return self._rate
+    
+    def get_wait_time(self) -> float:
+        """Returns the seconds until a token is available, 0 if one is available now"""
+        with self._lock:
+            self._refill()
+            return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self._rate
+    
+    def try_acquire(self) -> bool:
+        """Takes a token if one is available now"""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+    
+    def acquire(self, deadline: Optional[Deadline] = None) -> None:
+        """Takes a token, waiting until one is available
+        
+        Raises:
+            RequestTimeoutException: If no token becomes available before the deadline
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self._rate
+            if deadline is not None and wait >= deadline.remaining():
+                raise RequestTimeoutException(
+                    f"The deadline of {deadline.get_timeout()}s would be exceeded waiting for the rate limit",
+                    deadline.get_timeout())
+            self._sleep(wait)
+    
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
@@ -0,0 +1,299 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import ClientExecutorException, ClientExecutorTimeoutException
+
+CASSETTE_VERSION = 1
+
+# Parameters which differ between identical requests or must not be written to disk
+_IGNORED_PARAMETERS = ("ts", "apikey")
+
+# The API key in query strings of error messages, e.g. in the URL of a requests exception
+_API_KEY_PATTERN = re.compile(r"(apikey=)[^&\s'\"]+", re.IGNORECASE)
+_REDACTED = "REDACTED"
+
+
+@dataclass(frozen=True)
+class Interaction:
+    """A recorded request and its response
+    
+    Attributes:
+        method: The HTTP method, GET or POST
+        url: The request URL
+        parameters: The sorted request parameters, without the API key and timestamp
+        body: The response body, or None if the request failed
+        error: The message of the failure, or None if the request succeeded
+        latency: The seconds the request took when it was recorded
+    """
+    method: str
+    url: str
+    parameters: Tuple[Tuple[str, str], ...]
+    body: Optional[str]
+    error: Optional[str]
+    latency: float
+    
+    def get_key(self) -> Tuple:
+        """Returns the key which identifies identical requests"""
+        return self.method, self.url, self.parameters
+
+
+def request_key(method: str, url: str, parameters: Dict[str, Any]) -> Tuple:
+    """Returns the key of a request, which is independent of the API key and timestamp"""
+    return method, url, _normalize(parameters)
+
+
+def _redact(message: str, parameters: Dict[str, Any]) -> str:
+    """Removes the API key of the request from an error message before it is recorded"""
+    api_key = parameters.get("apikey")
+    if api_key is not None and str(api_key):
+        message = message.replace(str(api_key), _REDACTED)
+    return _API_KEY_PATTERN.sub(r"\g<1>" + _REDACTED, message)
+
+
+def _normalize(parameters: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(
+        (k, str(v)) for k, v in parameters.items() if k not in _IGNORED_PARAMETERS and v is not None and str(v)
+    ))
+
+
+class Cassette:
+    """Recorded interactions, stored as gzip compressed JSON lines. Identical requests
+    may be recorded multiple times, in which case the responses are replayed in order"""
+    
+    def __init__(self, interactions: Iterable[Interaction] = ()):
+        self._interactions: List[Interaction] = []
+        self._by_key: Dict[Tuple, List[Interaction]] = {}
+        for interaction in interactions:
+            self.add(interaction)
+    
+    @staticmethod
+    def load(path: str) -> 'Cassette':
+        """Loads a cassette file
+        
+        Raises:
+            ValueError: If the file is not a cassette of a supported version
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("version") != CASSETTE_VERSION:
+                raise ValueError(f"Unsupported cassette version: {header.get('version')}")
+            return Cassette(
+                Interaction(
+                    method=entry["method"],
+                    url=entry["url"],
+                    parameters=tuple((k, v) for k, v in entry["parameters"]),
+                    body=entry.get("body"),
+                    error=entry.get("error"),
+                    latency=entry.get("latency", 0.0)
+                )
+                for entry in map(json.loads, f) if entry
+            )
+    
+    def save(self, path: str) -> None:
+        """Writes the cassette file, replacing an existing file"""
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION}) + "\n")
+            for interaction in self._interactions:
+                f.write(json.dumps({
+                    "method": interaction.method,
+                    "url": interaction.url,
+                    "parameters": interaction.parameters,
+                    "body": interaction.body,
+                    "error": interaction.error,
+                    "latency": round(interaction.latency, 6)
+                }, separators=(",", ":")) + "\n")
+    
+    def add(self, interaction: Interaction) -> None:
+        """Adds an interaction"""
+        self._interactions.append(interaction)
+        self._by_key.setdefault(interaction.get_key(), []).append(interaction)
+    
+    def get_interactions(self) -> List[Interaction]:
+        """Returns all interactions in recording order"""
+        return list(self._interactions)
+    
+    def find(self, key: Tuple) -> List[Interaction]:
+        """Returns the interactions of the request key in recording order"""
+        return self._by_key.get(key, [])
+    
+    def __len__(self) -> int:
+        return len(self._interactions)
+
+
+class RecordingClientExecutor(ClientExecutor):
+    """Client Executor which wraps around any ClientExecutor and records every request
+    with its response into a Cassette. The API key is never recorded"""
+    
+    def __init__(self, delegate: ClientExecutor, path: Optional[str] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """Creates a new RecordingClientExecutor
+        
+        Args:
+            delegate: The client executor which actually executes the requests
+            path: The cassette file written by save() and when leaving the context
+            clock: Monotonic clock in seconds, replaceable for tests
+        """
+        self._delegate = delegate
+        self._path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cassette = Cassette()
+    
+    def __enter__(self) -> 'RecordingClientExecutor':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.save()
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes and records a GET request"""
+        return self._record("GET", self._delegate.get, url, query_parameters, timeout)
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Executes and records a POST request"""
+        return self._record("POST", self._delegate.post, url, form_params, timeout)
+    
+    def get_cassette(self) -> Cassette:
+        """Returns the cassette with the interactions recorded so far"""
+        return self._cassette
+    
+    def save(self, path: Optional[str] = None) -> None:
+        """Writes the recorded interactions to the path, or the path of the executor"""
+        path = path or self._path
+        if path is None:
+            raise ValueError("No cassette path specified")
+        with self._lock:
+            self._cassette.save(path)
+    
+    def _record(self, method_name: str, method, url: str, parameters: Dict[str, Any],
+                timeout: Optional[float]) -> str:
+        started = self._clock()
+        body, error = None, None
+        try:
+            # The timeout is only forwarded if set, so delegates without timeout support keep working
+            body = method(url, parameters, timeout=timeout) if timeout is not None else method(url, parameters)
+            return body
+        except ClientExecutorException as e:
+            # Messages of the HTTP client contain the URL, whose query string holds the API key
+            error = _redact(str(e), parameters)
+            raise
+        finally:
+            if body is not None or error is not None:
+                interaction = Interaction(method_name, url, _normalize(parameters), body, error,
+                                          self._clock() - started)
+                with self._lock:
+                    self._cassette.add(interaction)
+
+
+LatencyModel = Callable[[Interaction], float]
+
+
+def fixed_latency(seconds: float) -> LatencyModel:
+    """Latency model which delays every response by the same time"""
+    return lambda interaction: seconds
+
+
+def recorded_latency(scale: float = 1.0) -> LatencyModel:
+    """Latency model which delays every response by its recorded latency, multiplied by scale"""
+    return lambda interaction: interaction.latency * scale
+
+
+def uniform_latency(low: float, high: float, seed: Optional[int] = None) -> LatencyModel:
+    """Latency model which draws the delays uniformly from [low, high]. A seed makes
+    the delays reproducible"""
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    
+    def latency(interaction: Interaction) -> float:
+        with lock:
+            return rng.uniform(low, high)
+    return latency
+
+
+class ReplayClientExecutor(ClientExecutor):
+    """Client Executor which answers requests from a Cassette without network access.
+    Requests which were recorded multiple times are answered with the recorded responses
+    in order, the last one is repeated afterwards. Recorded failures are raised as
+    ClientExecutorException"""
+    
+    def __init__(self, cassette: Any, latency: Optional[LatencyModel] = None,
+                 sleep: Callable[[float], None] = time.sleep):
+        """Creates a new ReplayClientExecutor
+        
+        Args:
+            cassette: A Cassette or the path of a cassette file
+            latency: Determines the artificial delay of every response. None answers immediately
+            sleep: Sleep function, replaceable for tests
+        """
+        self._cassette = cassette if isinstance(cassette, Cassette) else Cassette.load(cassette)
+        self._latency = latency
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._positions: Dict[Tuple, int] = {}
+    
+    def get(self, url: str, query_parameters: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Answers a GET request with its recorded response"""
+        return self._replay("GET", url, query_parameters, timeout)
+    
+    def post(self, url: str, form_params: Dict[str, Any], timeout: Optional[float] = None) -> str:
+        """Answers a POST request with its recorded response"""
+        return self._replay("POST", url, form_params, timeout)
+    
+    def rewind(self) -> None:
+        """Starts replaying every request from its first recorded response again"""
+        with self._lock:
+            self._positions.clear()
+    
+    def _replay(self, method: str, url: str, parameters: Dict[str, Any], timeout: Optional[float]) -> str:
+        key = request_key(method, url, parameters)
+        interactions = self._cassette.find(key)
+        if not interactions:
+            raise ClientExecutorException(url, f"No recorded response for {method} {url} {dict(key[2])}")
+        
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        interaction = interactions[min(position, len(interactions) - 1)]
+        
+        if self._latency is not None:
+            delay = self._latency(interaction)
+            if timeout is not None and delay > timeout:
+                self._sleep(timeout)
+                raise ClientExecutorTimeoutException(url, f"The replayed response took longer than {timeout}s")
+            if delay > 0:
+                self._sleep(delay)
+        
+        if interaction.error is not None:
+            raise ClientExecutorException(url, interaction.error)
+        return interaction.body
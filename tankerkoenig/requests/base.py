@@ -24,10 +24,11 @@ SOFTWARE.
 
 from abc import ABC, abstractmethod
 from enum import Enum
-from typing import Dict, Any, TypeVar, Generic, Type
+from typing import Dict, Any, Optional, TypeVar, Generic, Type
 
 from tankerkoenig.exceptions import RequesterException
 from tankerkoenig.models.results import BaseResult
+from tankerkoenig.utils import PreparedParameters
 
 R = TypeVar('R', bound=BaseResult)
 
@@ -54,15 +55,30 @@ class BaseRequest(ABC, Generic[R]):
         self._api_key = api_key
         self._base_url = base_url
         self._requester = requester
+        self._prepared: Optional[PreparedParameters] = None
     
-    def execute(self) -> R:
+    def execute(self, timeout: Optional[float] = None) -> R:
         """Executes the request using the underlying Requester,
         which will return the requested result object
         
+        Args:
+            timeout: The maximum seconds the whole execution may take, overriding the
+                default timeout of the API
+        
+        Raises:
+            RequestTimeoutException: If the execution exceeded the timeout
+            RequesterException: Checked exceptions that might be thrown during request execution
+        """
+        return self._requester.execute(self, self.get_result_class(), timeout)
+    
+    async def execute_async(self, timeout: Optional[float] = None) -> R:
+        """Executes the request from a coroutine without blocking the event loop
+        
         Raises:
+            RequestTimeoutException: If the execution exceeded the timeout
             RequesterException: Checked exceptions that might be thrown during request execution
         """
-        return self._requester.execute(self, self.get_result_class())
+        return await self._requester.execute_async(self, self.get_result_class(), timeout)
     
     @abstractmethod
     def get_endpoint(self) -> str:
@@ -90,6 +106,29 @@ class BaseRequest(ABC, Generic[R]):
         """Returns the result class for this request"""
         pass
     
+    def freeze(self) -> 'RequestTemplate[R]':
+        """Validates the request and returns an immutable copy, which can be executed
+        repeatedly and from several threads without validating it again
+        
+        Raises:
+            RequestParamException: If validation fails
+        """
+        return RequestTemplate(self)
+    
+    def get_prepared_parameters(self) -> PreparedParameters:
+        """Returns the request parameters including the API key, prepared for sending.
+        They are built once and reused until a setter changes the request"""
+        prepared = self._prepared
+        if prepared is None:
+            parameters = self.get_request_parameters()
+            parameters["apikey"] = self.get_api_key()
+            prepared = self._prepared = PreparedParameters(parameters)
+        return prepared
+    
+    def _invalidate(self) -> None:
+        """Discards the prepared parameters, has to be called by every setter"""
+        self._prepared = None
+    
     def get_api_key(self) -> str:
         """Returns the API key"""
         return self._api_key
@@ -97,3 +136,54 @@ class BaseRequest(ABC, Generic[R]):
     def get_base_url(self) -> str:
         """Returns the base URL"""
         return self._base_url
+
+
+class RequestTemplate(BaseRequest[R]):
+    """Immutable request which is validated and prepared once at construction. Templates
+    are safe to share between threads and skip validation and parameter building on
+    every execution"""
+    
+    def __init__(self, request: BaseRequest[R]):
+        """Creates a template from a request
+        
+        Raises:
+            RequestParamException: If validation of the request fails
+        """
+        request.validate()
+        super().__init__(request.get_api_key(), request.get_base_url(), request._requester)
+        self._endpoint = request.get_endpoint()
+        self._method = request.get_method()
+        self._result_class = request.get_result_class()
+        self._parameters = request.get_request_parameters()
+        self._prepared = PreparedParameters(dict(self._parameters, apikey=self.get_api_key()))
+        self._prepared.get_query()
+        self._frozen = True
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        if getattr(self, "_frozen", False):
+            raise AttributeError("RequestTemplates are immutable")
+        super().__setattr__(name, value)
+    
+    def freeze(self) -> 'RequestTemplate[R]':
+        return self
+    
+    def get_endpoint(self) -> str:
+        return self._endpoint
+    
+    def get_method(self) -> Method:
+        return self._method
+    
+    def get_result_class(self) -> Type[R]:
+        return self._result_class
+    
+    def validate(self) -> None:
+        """Does nothing, templates are validated at construction"""
+    
+    def get_request_parameters(self) -> Dict[str, Any]:
+        return dict(self._parameters)
+    
+    def get_prepared_parameters(self) -> PreparedParameters:
+        return self._prepared
+    
+    def _invalidate(self) -> None:
+        raise AttributeError("RequestTemplates are immutable")
@@ -98,6 +98,7 @@ class CorrectionRequest(BaseRequest[CorrectionResult]):
             station_id: The unique station ID, which is provided with StationListResult or StationDetailResult
         """
         self._station_id = station_id
+        self._invalidate()
         return self
     
     def set_correction_value(self, correction_value: str) -> 'CorrectionRequest':
@@ -113,6 +114,7 @@ class CorrectionRequest(BaseRequest[CorrectionResult]):
             correction_value: The correction value
         """
         self._correction_value = correction_value
+        self._invalidate()
         return self
     
     def get_endpoint(self) -> str:
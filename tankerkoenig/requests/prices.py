@@ -48,6 +48,7 @@ class PricesRequest(BaseRequest[PricesResult]):
         A maximum of 10 IDs is allowed and IDs are getting added uniquely"""
         if station_id:
             self._station_ids.add(station_id)
+            self._invalidate()
         return self
     
     def add_ids(self, *station_ids: str) -> 'PricesRequest':
@@ -60,6 +61,7 @@ class PricesRequest(BaseRequest[PricesResult]):
         A maximum of 10 IDs is allowed and IDs are getting added uniquely"""
         filtered_ids = {id for id in station_ids if id}
         self._station_ids.update(filtered_ids)
+        self._invalidate()
         return self
     
     def get_endpoint(self) -> str:
@@ -84,12 +84,14 @@ class StationListRequest(BaseRequest[StationListResult]):
         """
         self._lat = lat
         self._lng = lng
+        self._invalidate()
         return self
     
     def set_gas_request_type(self, gas_request_type: GasRequestType) -> 'StationListRequest':
         """Sets which gas prices should be requested, which can either be a specific
         one or ALL. Default is: ALL"""
         self._gas_request_type = gas_request_type
+        self._invalidate()
         return self
     
     def set_search_radius(self, radius: float) -> 'StationListRequest':
@@ -99,11 +101,13 @@ class StationListRequest(BaseRequest[StationListResult]):
             radius: Must be between 1.0 and 25.0 km
         """
         self._search_radius = radius
+        self._invalidate()
         return self
     
     def set_sorting(self, sorting: SortingRequestType) -> 'StationListRequest':
         """Sets the sorting for the results. Default is: DISTANCE"""
         self._sorting = sorting
+        self._invalidate()
         return self
     
     def get_endpoint(self) -> str:
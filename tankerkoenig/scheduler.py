@@ -0,0 +1,341 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Deque, Dict, Iterator, List, Optional, Type, TypeVar
+
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.exceptions import RequestRejectedException, RequestTimeoutException
+from tankerkoenig.rate_limiter import RateLimiter
+from tankerkoenig.requests.base import BaseRequest
+
+R = TypeVar('R')
+
+DEFAULT_TENANT = "default"
+
+# Number of most recent queue wait times per priority the percentiles are computed from
+_WAIT_WINDOW = 1000
+
+
+class Priority(Enum):
+    """Priority classes of scheduled requests. Queued requests of a higher priority
+    are always dispatched first"""
+    # Lookups a user is waiting for
+    INTERACTIVE = 0
+    # Everything without an explicit priority
+    DEFAULT = 1
+    # Crawls and other bulk work, which is shed first
+    BACKGROUND = 2
+
+
+_context: contextvars.ContextVar = contextvars.ContextVar("tankerkoenig_scheduling",
+                                                          default=(Priority.DEFAULT, DEFAULT_TENANT))
+
+
+@contextlib.contextmanager
+def scheduling(priority: Priority, tenant: str = DEFAULT_TENANT) -> Iterator[None]:
+    """Sets the priority and tenant of the requests executed within the context
+    
+        with scheduling(Priority.INTERACTIVE, tenant="user-42"):
+            api.detail(station_id).execute()
+    """
+    token = _context.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@dataclass(frozen=True)
+class SchedulerConfig:
+    """Configuration of a RequestScheduler
+    
+    Attributes:
+        max_concurrency: Number of requests executed at the same time
+        max_queue_depth: Number of queued requests, across all priorities, above which
+            requests are shed
+    """
+    max_concurrency: int = 4
+    max_queue_depth: int = 1000
+
+
+@dataclass(frozen=True)
+class PriorityStats:
+    """Point-in-time statistics of a priority class. Wait times are in seconds"""
+    queued: int
+    dispatched: int
+    shed: int
+    mean_wait: Optional[float]
+    p95_wait: Optional[float]
+    max_wait: Optional[float]
+
+
+class _Item:
+    __slots__ = ("request", "result_class", "priority", "tenant", "deadline", "future", "enqueued")
+    
+    def __init__(self, request: BaseRequest, result_class: type, priority: Priority, tenant: str,
+                 deadline: Optional[Deadline], enqueued: float):
+        self.request = request
+        self.result_class = result_class
+        self.priority = priority
+        self.tenant = tenant
+        self.deadline = deadline
+        self.future: Future = Future()
+        self.enqueued = enqueued
+
+
+class _PriorityQueue:
+    """The queue of a priority class, which takes turns between the tenants"""
+    
+    def __init__(self):
+        self.tenants: "OrderedDict[str, Deque[_Item]]" = OrderedDict()
+        self.size = 0
+        self.dispatched = 0
+        self.shed = 0
+        self.waits: Deque[float] = deque(maxlen=_WAIT_WINDOW)
+        self.max_wait: Optional[float] = None
+    
+    def push(self, item: _Item) -> None:
+        self.tenants.setdefault(item.tenant, deque()).append(item)
+        self.size += 1
+    
+    def pop(self) -> _Item:
+        # The first tenant is served and moves to the end, so every tenant gets a turn
+        tenant, items = next(iter(self.tenants.items()))
+        item = items.popleft()
+        if items:
+            self.tenants.move_to_end(tenant)
+        else:
+            del self.tenants[tenant]
+        self.size -= 1
+        return item
+    
+    def pop_newest_of_largest_tenant(self) -> _Item:
+        tenant = max(self.tenants, key=lambda t: len(self.tenants[t]))
+        items = self.tenants[tenant]
+        item = items.pop()
+        if not items:
+            del self.tenants[tenant]
+        self.size -= 1
+        return item
+    
+    def remove(self, item: _Item) -> bool:
+        items = self.tenants.get(item.tenant)
+        if items is None or item not in items:
+            return False
+        items.remove(item)
+        if not items:
+            del self.tenants[item.tenant]
+        self.size -= 1
+        return True
+
+
+class RequestScheduler:
+    """Scheduler in front of a Requester, which queues request executions and dispatches
+    them by priority. Within a priority, the tenants (e.g. users or crawl jobs) take
+    turns, so a single tenant can't starve the others. If the queue is full, the
+    newest request of the lowest priority is shed. An optional RateLimiter is consulted
+    before every dispatch, so higher priorities always receive the tokens first.
+    
+    The scheduler offers the execute methods of the Requester and is set up with
+    ApiBuilder.with_scheduler(). Priority and tenant are taken from the scheduling() context.
+    """
+    
+    def __init__(self, requester: Any, config: Optional[SchedulerConfig] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """Creates a new RequestScheduler and starts its worker threads
+        
+        Args:
+            requester: The Requester which executes the dispatched requests
+            config: The scheduler configuration
+            rate_limiter: If supplied, every dispatch takes a token of the limiter
+        """
+        self._requester = requester
+        self._config = config or SchedulerConfig()
+        self._rate_limiter = rate_limiter
+        self._condition = threading.Condition()
+        self._queues: Dict[Priority, _PriorityQueue] = {priority: _PriorityQueue() for priority in Priority}
+        self._closed = False
+        self._workers: List[threading.Thread] = [
+            threading.Thread(target=self._work, name=f"tankerkoenig-scheduler-{index}", daemon=True)
+            for index in range(self._config.max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+    
+    def execute(self, request: BaseRequest[R], result_class: Type[R], timeout: Optional[float] = None) -> R:
+        """Queues the request with the priority and tenant of the scheduling() context and
+        waits for its result. The timeout includes the time spent in the queue and
+        defaults to the default timeout of the requester
+        
+        Raises:
+            RequestRejectedException: If the request was shed
+            RequestTimeoutException: If the execution exceeded the timeout
+            RequesterException: If the request execution fails
+        """
+        priority, tenant = _context.get()
+        timeout = self._timeout_or_default(timeout)
+        future = self.submit(request, result_class, priority, tenant, timeout)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError as e:
+            self._cancel(future)
+            raise RequestTimeoutException("The deadline was exceeded while the request was queued", timeout, e)
+    
+    async def execute_async(self, request: BaseRequest[R], result_class: Type[R],
+                            timeout: Optional[float] = None) -> R:
+        """Queues the request from a coroutine and awaits its result"""
+        priority, tenant = _context.get()
+        timeout = self._timeout_or_default(timeout)
+        future = self.submit(request, result_class, priority, tenant, timeout)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError as e:
+            self._cancel(future)
+            raise RequestTimeoutException("The deadline was exceeded while the request was queued", timeout, e)
+    
+    def submit(self, request: BaseRequest[R], result_class: Type[R], priority: Priority = Priority.DEFAULT,
+               tenant: str = DEFAULT_TENANT, timeout: Optional[float] = None) -> "Future[R]":
+        """Queues a request and returns the future of its result. A shed request's
+        future fails with a RequestRejectedException. The timeout defaults to the
+        default timeout of the requester"""
+        deadline = Deadline.of(self._timeout_or_default(timeout))
+        item = _Item(request, result_class, priority, tenant, deadline, time.monotonic())
+        with self._condition:
+            if self._closed:
+                raise RequestRejectedException("The scheduler was shut down", priority)
+            shed = None
+            if self._queued() >= self._config.max_queue_depth:
+                lowest = max((p for p in Priority if self._queues[p].size), key=lambda p: p.value)
+                if lowest.value <= priority.value:
+                    self._queues[priority].shed += 1
+                    raise RequestRejectedException(
+                        f"The request queue is full ({self._config.max_queue_depth} requests)", priority)
+                shed = self._queues[lowest].pop_newest_of_largest_tenant()
+                self._queues[lowest].shed += 1
+            self._queues[priority].push(item)
+            self._condition.notify()
+        
+        if shed is not None:
+            shed.future.set_exception(RequestRejectedException(
+                f"The request was shed in favor of a request of priority {priority.name}", shed.priority))
+        return item.future
+    
+    def get_stats(self) -> Dict[Priority, PriorityStats]:
+        """Returns the statistics of every priority"""
+        with self._condition:
+            stats = {}
+            for priority, queue in self._queues.items():
+                waits = sorted(queue.waits)
+                stats[priority] = PriorityStats(
+                    queued=queue.size,
+                    dispatched=queue.dispatched,
+                    shed=queue.shed,
+                    mean_wait=sum(waits) / len(waits) if waits else None,
+                    p95_wait=waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else None,
+                    max_wait=queue.max_wait
+                )
+            return stats
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the workers. Queued requests are rejected"""
+        with self._condition:
+            self._closed = True
+            rejected = []
+            for queue in self._queues.values():
+                while queue.size:
+                    rejected.append(queue.pop())
+            self._condition.notify_all()
+        for item in rejected:
+            item.future.set_exception(RequestRejectedException("The scheduler was shut down", item.priority))
+        if wait:
+            for worker in self._workers:
+                worker.join()
+    
+    def _timeout_or_default(self, timeout: Optional[float]) -> Optional[float]:
+        # Without it, a request without timeout could wait in the queue forever even
+        # though the requester would have bounded its execution
+        if timeout is not None:
+            return timeout
+        get_default_timeout = getattr(self._requester, "get_default_timeout", None)
+        return get_default_timeout() if get_default_timeout is not None else None
+    
+    def _queued(self) -> int:
+        return sum(queue.size for queue in self._queues.values())
+    
+    def _cancel(self, future: Future) -> None:
+        """Removes the request of a caller which stopped waiting from the queue"""
+        future.cancel()
+        with self._condition:
+            for queue in self._queues.values():
+                for items in queue.tenants.values():
+                    item = next((item for item in items if item.future is future), None)
+                    if item is not None:
+                        queue.remove(item)
+                        return
+    
+    def _next(self) -> Optional[_Item]:
+        """Blocks until a request is queued and may be dispatched, None if the scheduler shuts down"""
+        while True:
+            with self._condition:
+                while not self._closed and not self._queued():
+                    self._condition.wait()
+                if self._closed:
+                    return None
+                if self._rate_limiter is None or self._rate_limiter.try_acquire():
+                    # The highest priority is selected after the token was taken, so a request
+                    # queued while waiting for the token is dispatched first
+                    priority = min((p for p in Priority if self._queues[p].size), key=lambda p: p.value)
+                    queue = self._queues[priority]
+                    item = queue.pop()
+                    wait = time.monotonic() - item.enqueued
+                    queue.dispatched += 1
+                    queue.waits.append(wait)
+                    queue.max_wait = wait if queue.max_wait is None else max(queue.max_wait, wait)
+                    return item
+                delay = self._rate_limiter.get_wait_time()
+                self._condition.wait(delay)
+    
+    def _work(self) -> None:
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            if not item.future.set_running_or_notify_cancel():
+                continue
+            try:
+                timeout = None
+                if item.deadline is not None:
+                    timeout = item.deadline.check("the request was dispatched")
+                item.future.set_result(self._requester.execute(item.request, item.result_class, timeout))
+            except BaseException as e:
+                item.future.set_exception(e)
@@ -0,0 +1,477 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import bisect
+import hashlib
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+
+if TYPE_CHECKING:
+    from tankerkoenig.api import Tankerkoenig
+
+# Maximum number of station IDs of a single prices.php request
+MAX_PRICES_IDS = 10
+
+# Points per worker on the ring. More points spread the keys more evenly
+DEFAULT_VIRTUAL_NODES = 64
+
+_COORDINATOR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+)
+"""
+
+_SINK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    station_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    e5 REAL,
+    e10 REAL,
+    diesel REAL,
+    timestamp REAL NOT NULL
+)
+"""
+
+
+def _hash(value: str) -> int:
+    """Returns a stable 64 bit hash, unlike hash() which is salted per process"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    """Opens a database shared by several processes, waiting for locks instead of failing"""
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    return connection
+
+
+class HashRing:
+    """Consistent hash ring which assigns keys, e.g. station IDs, to workers. If a worker
+    joins or leaves, only the keys of its ring segments move"""
+    
+    def __init__(self, nodes: Iterable[str] = (), virtual_nodes: int = DEFAULT_VIRTUAL_NODES):
+        if virtual_nodes < 1:
+            raise ValueError("At least one virtual node per worker is required")
+        self._virtual_nodes = virtual_nodes
+        self._nodes = set()
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+    
+    def __len__(self) -> int:
+        return len(self._nodes)
+    
+    def __contains__(self, node: str) -> bool:
+        return node in self._nodes
+    
+    def add_node(self, node: str) -> None:
+        """Adds a worker to the ring"""
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for replica in range(self._virtual_nodes):
+            point = _hash(f"{node}#{replica}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+    
+    def remove_node(self, node: str) -> None:
+        """Removes a worker from the ring"""
+        if node not in self._nodes:
+            return
+        self._nodes.remove(node)
+        kept = [(point, owner) for point, owner in zip(self._points, self._owners) if owner != node]
+        self._points = [point for point, _ in kept]
+        self._owners = [owner for _, owner in kept]
+    
+    def get_nodes(self) -> List[str]:
+        """Returns the workers of the ring, sorted"""
+        return sorted(self._nodes)
+    
+    def get_node(self, key: str) -> Optional[str]:
+        """Returns the worker owning the key, or None if the ring is empty"""
+        if not self._points:
+            return None
+        index = bisect.bisect(self._points, _hash(key))
+        return self._owners[index % len(self._owners)]
+    
+    def assign(self, keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Groups keys by their owning worker. Every worker is contained, possibly without keys"""
+        assignment: Dict[str, List[str]] = {node: [] for node in self._nodes}
+        for key in keys:
+            node = self.get_node(key)
+            if node is not None:
+                assignment[node].append(key)
+        return assignment
+
+
+class Coordinator(ABC):
+    """Interface for the membership of the workers of a sharded crawl. Workers which stop
+    sending heartbeats are considered gone and their keys move to the remaining workers"""
+    
+    @abstractmethod
+    def join(self, worker_id: str) -> None:
+        """Registers a worker"""
+        pass
+    
+    @abstractmethod
+    def heartbeat(self, worker_id: str) -> None:
+        """Marks a worker as alive"""
+        pass
+    
+    @abstractmethod
+    def leave(self, worker_id: str) -> None:
+        """Unregisters a worker"""
+        pass
+    
+    @abstractmethod
+    def get_workers(self) -> List[str]:
+        """Returns the IDs of the alive workers, sorted"""
+        pass
+    
+    def close(self) -> None:
+        """Releases the resources of the coordinator"""
+        pass
+
+
+class SqliteCoordinator(Coordinator):
+    """Coordinator storing the heartbeats in a SQLite database file, which is shared by
+    processes on one host or by pods mounting the same volume. Thread-safe.
+    
+    Instances can be pickled and passed to other processes, which open their own connection"""
+    
+    def __init__(self, path: str, ttl: float = 60.0, clock: Callable[[], float] = time.time):
+        """Opens or creates a coordinator database
+        
+        Args:
+            path: Path of the database file
+            ttl: Seconds after the last heartbeat until a worker is considered gone
+            clock: Wall clock in seconds since the epoch, replaceable for tests
+        """
+        if ttl <= 0:
+            raise ValueError("TTL has to be positive")
+        self._path = path
+        self._ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._connection = _connect(path)
+        self._connection.execute(_COORDINATOR_SCHEMA)
+        self._connection.commit()
+    
+    def __reduce__(self):
+        return SqliteCoordinator, (self._path, self._ttl, self._clock)
+    
+    def get_ttl(self) -> float:
+        """Returns the seconds after which a silent worker is considered gone"""
+        return self._ttl
+    
+    def join(self, worker_id: str) -> None:
+        self.heartbeat(worker_id)
+    
+    def heartbeat(self, worker_id: str) -> None:
+        with self._lock:
+            self._connection.execute("INSERT OR REPLACE INTO workers (worker_id, last_seen) VALUES (?, ?)",
+                                     (worker_id, self._clock()))
+            self._connection.commit()
+    
+    def leave(self, worker_id: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM workers WHERE worker_id = ?", (worker_id,))
+            self._connection.commit()
+    
+    def get_workers(self) -> List[str]:
+        with self._lock:
+            rows = self._connection.execute("SELECT worker_id FROM workers WHERE last_seen > ? ORDER BY worker_id",
+                                            (self._clock() - self._ttl,)).fetchall()
+        return [row[0] for row in rows]
+    
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class ResultSink(ABC):
+    """Interface for the destination of the prices collected by all workers"""
+    
+    @abstractmethod
+    def write(self, prices: Mapping[str, GasPrices], timestamp: float) -> None:
+        """Stores the prices of stations fetched at the timestamp. Prices older than the
+        stored ones are ignored, so workers overlapping during a rebalance don't matter"""
+        pass
+    
+    def close(self) -> None:
+        """Releases the resources of the sink"""
+        pass
+
+
+class SqliteResultSink(ResultSink):
+    """Sink keeping the latest prices of every station in a SQLite database file. Thread-safe.
+    
+    Instances can be pickled and passed to other processes, which open their own connection"""
+    
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = _connect(path)
+        self._connection.execute(_SINK_SCHEMA)
+        self._connection.commit()
+    
+    def __reduce__(self):
+        return SqliteResultSink, (self._path,)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+    
+    def write(self, prices: Mapping[str, GasPrices], timestamp: float) -> None:
+        rows = [(station_id, gas_prices.get_status().value, gas_prices.get_price(GasType.E5),
+                 gas_prices.get_price(GasType.E10), gas_prices.get_price(GasType.DIESEL), timestamp)
+                for station_id, gas_prices in prices.items()]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT INTO prices (station_id, status, e5, e10, diesel, timestamp) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (station_id) DO UPDATE SET status = excluded.status, e5 = excluded.e5, "
+                "e10 = excluded.e10, diesel = excluded.diesel, timestamp = excluded.timestamp "
+                "WHERE excluded.timestamp >= prices.timestamp", rows)
+            self._connection.commit()
+    
+    def get(self, station_id: str) -> Optional[GasPrices]:
+        """Returns the latest prices of a station, or None"""
+        with self._lock:
+            row = self._connection.execute("SELECT status, e5, e10, diesel FROM prices WHERE station_id = ?",
+                                           (station_id,)).fetchone()
+        return self._to_gas_prices(row) if row is not None else None
+    
+    def get_all(self) -> Dict[str, GasPrices]:
+        """Returns the latest prices of all stations"""
+        with self._lock:
+            rows = self._connection.execute("SELECT station_id, status, e5, e10, diesel FROM prices").fetchall()
+        return {row[0]: self._to_gas_prices(row[1:]) for row in rows}
+    
+    def get_timestamp(self, station_id: str) -> Optional[float]:
+        """Returns when the stored prices of a station were fetched, or None"""
+        with self._lock:
+            row = self._connection.execute("SELECT timestamp FROM prices WHERE station_id = ?",
+                                           (station_id,)).fetchone()
+        return row[0] if row is not None else None
+    
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+    
+    @staticmethod
+    def _to_gas_prices(row: Tuple) -> GasPrices:
+        status, e5, e10, diesel = row
+        prices = {gas_type: price for gas_type, price in ((GasType.E5, e5), (GasType.E10, e10),
+                                                          (GasType.DIESEL, diesel)) if price is not None}
+        return GasPrices(prices, Status(status))
+
+
+@dataclass(frozen=True)
+class CrawlStats:
+    """Outcome of one crawl pass of a worker"""
+    worker_id: str
+    workers: int
+    assigned: int
+    requests: int
+    failed_requests: int
+    stations: int
+
+
+class ShardedCrawler:
+    """Crawls the prices of the share of stations which the consistent hash ring assigns
+    to this worker and writes them to a shared sink. The ring is rebuilt from the alive
+    workers of the coordinator before every pass, so the stations of workers that join or
+    leave are rebalanced automatically"""
+    
+    def __init__(self, worker_id: str, station_ids: Iterable[str], coordinator: Coordinator,
+                 sink: ResultSink, virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+                 clock: Callable[[], float] = time.time):
+        """
+        Args:
+            worker_id: Unique ID of this worker, e.g. the host name and process ID
+            station_ids: The stations of the whole crawl, the same for all workers
+            coordinator: The membership shared by all workers
+            sink: Destination of the fetched prices
+            virtual_nodes: Points per worker on the hash ring
+            clock: Wall clock used for the sink timestamps
+        """
+        self._worker_id = worker_id
+        self._station_ids = list(dict.fromkeys(station_ids))
+        self._coordinator = coordinator
+        self._sink = sink
+        self._virtual_nodes = virtual_nodes
+        self._clock = clock
+        self._workers: Tuple[str, ...] = ()
+        self._assigned: List[str] = []
+        self._rebalances = 0
+    
+    def __enter__(self) -> 'ShardedCrawler':
+        self.join()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.leave()
+    
+    def get_worker_id(self) -> str:
+        return self._worker_id
+    
+    def get_rebalance_count(self) -> int:
+        """Returns how often the membership changed since the first assignment"""
+        return self._rebalances
+    
+    def join(self) -> None:
+        """Registers the worker at the coordinator"""
+        self._coordinator.join(self._worker_id)
+    
+    def leave(self) -> None:
+        """Unregisters the worker, its stations move to the remaining workers"""
+        self._coordinator.leave(self._worker_id)
+    
+    def get_assigned_ids(self) -> List[str]:
+        """Returns the stations of this worker for the current membership"""
+        workers = tuple(self._coordinator.get_workers())
+        if self._worker_id not in workers:
+            workers = tuple(sorted(workers + (self._worker_id,)))
+        if workers != self._workers:
+            ring = HashRing(workers, self._virtual_nodes)
+            self._assigned = [station_id for station_id in self._station_ids
+                              if ring.get_node(station_id) == self._worker_id]
+            if self._workers:
+                self._rebalances += 1
+            self._workers = workers
+        return list(self._assigned)
+    
+    def crawl(self, api: 'Tankerkoenig.Api', max_workers: int = 4, timeout: Optional[float] = None) -> CrawlStats:
+        """Fetches the prices of the assigned stations once and writes them to the sink
+        
+        Args:
+            api: The API which executes the prices requests
+            max_workers: Number of requests executed at the same time
+            timeout: The timeout of every single request execution
+        """
+        self._coordinator.heartbeat(self._worker_id)
+        assigned = self.get_assigned_ids()
+        requests = [api.prices().add_ids_collection(assigned[i:i + MAX_PRICES_IDS])
+                    for i in range(0, len(assigned), MAX_PRICES_IDS)]
+        prices: Dict[str, GasPrices] = {}
+        failed = 0
+        for outcome in api.execute_many(requests, max_workers, timeout=timeout):
+            if not outcome.is_success() or not outcome.get_result().is_ok():
+                failed += 1
+                continue
+            for station_id, gas_prices in outcome.get_result().get_gas_prices().items():
+                if gas_prices.get_status() != Status.NOT_FOUND:
+                    prices[station_id] = gas_prices
+        if prices:
+            self._sink.write(prices, self._clock())
+        return CrawlStats(self._worker_id, len(self._workers), len(assigned), len(requests), failed, len(prices))
+    
+    def run(self, api: 'Tankerkoenig.Api', stop: threading.Event, interval: float = 300.0,
+            heartbeat_interval: float = 10.0, on_stats: Optional[Callable[[CrawlStats], None]] = None,
+            max_workers: int = 4) -> None:
+        """Crawls every interval until the stop event is set and leaves afterwards. Heartbeats
+        are sent while waiting, so the interval may exceed the TTL of the coordinator
+        
+        Args:
+            api: The API which executes the prices requests
+            stop: Event which ends the loop
+            interval: Seconds between the starts of two crawl passes
+            heartbeat_interval: Seconds between two heartbeats while waiting
+            on_stats: Called with the statistics of every pass
+            max_workers: Number of requests executed at the same time
+        """
+        self.join()
+        try:
+            while not stop.is_set():
+                started = time.monotonic()
+                stats = self.crawl(api, max_workers)
+                if on_stats is not None:
+                    on_stats(stats)
+                remaining = interval - (time.monotonic() - started)
+                while remaining > 0 and not stop.wait(min(heartbeat_interval, remaining)):
+                    self._coordinator.heartbeat(self._worker_id)
+                    remaining = interval - (time.monotonic() - started)
+        finally:
+            self.leave()
+
+
+def _crawl_shard(worker_id: str, api_factory: Callable[[], 'Tankerkoenig.Api'], station_ids: Sequence[str],
+                 coordinator: Coordinator, sink: ResultSink, virtual_nodes: int, max_workers: int,
+                 timeout: Optional[float]) -> CrawlStats:
+    """Executes one crawl pass in a worker process"""
+    try:
+        crawler = ShardedCrawler(worker_id, station_ids, coordinator, sink, virtual_nodes)
+        return crawler.crawl(api_factory(), max_workers, timeout)
+    finally:
+        sink.close()
+        coordinator.close()
+
+
+def crawl_in_processes(api_factory: Callable[[], 'Tankerkoenig.Api'], station_ids: Iterable[str],
+                       coordinator: Coordinator, sink: ResultSink, processes: int = 4,
+                       worker_prefix: str = "process", virtual_nodes: int = DEFAULT_VIRTUAL_NODES,
+                       max_workers: int = 4, timeout: Optional[float] = None) -> List[CrawlStats]:
+    """Crawls the stations once with a pool of processes, so the response mapping of the
+    shards runs on several cores. All workers join before the pool starts, so every station
+    is assigned to exactly one process
+    
+    Args:
+        api_factory: Builds the API in each process, has to be picklable (e.g. a module
+            level function or functools.partial)
+        station_ids: The stations to crawl
+        coordinator: The membership, has to be picklable and shared between processes
+        sink: Destination of the prices, has to be picklable and shared between processes
+        processes: Number of worker processes
+        worker_prefix: Prefix of the worker IDs, unique per host if several hosts crawl
+        virtual_nodes: Points per worker on the hash ring
+        max_workers: Number of requests executed at the same time by each process
+        timeout: The timeout of every single request execution
+        
+    Returns:
+        The statistics of every process
+    """
+    if processes < 1:
+        raise ValueError("At least one process is required")
+    station_ids = list(station_ids)
+    worker_ids = [f"{worker_prefix}-{index}" for index in range(processes)]
+    for worker_id in worker_ids:
+        coordinator.join(worker_id)
+    try:
+        with ProcessPoolExecutor(processes) as pool:
+            futures = [pool.submit(_crawl_shard, worker_id, api_factory, station_ids, coordinator, sink,
+                                   virtual_nodes, max_workers, timeout) for worker_id in worker_ids]
+            return [future.result() for future in futures]
+    finally:
+        for worker_id in worker_ids:
+            coordinator.leave(worker_id)
@@ -0,0 +1,293 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from tankerkoenig.history import from_tenth_cents, to_tenth_cents
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.results import PricesResult
+
+# Default number of stations, enough for all stations in Germany
+DEFAULT_CAPACITY = 20000
+
+# Longest station ID which fits into a slot, the API uses 36 character UUIDs
+MAX_STATION_ID_LENGTH = 36
+
+_MAGIC = b"TKPC"
+_VERSION = 1
+
+# magic, version, capacity, number of used slots
+_HEADER = struct.Struct("<4sIII48x")
+# Per slot: sequence number, followed by status, E5, E10 and diesel in tenth-cents, the
+# timestamp and the station ID
+_SEQUENCE = struct.Struct("<I")
+_DATA = struct.Struct("<B3xiiiI36s4x")
+_SLOT_SIZE = _SEQUENCE.size + _DATA.size
+_COUNT_OFFSET = 12
+
+_GAS_TYPES = (GasType.E5, GasType.E10, GasType.DIESEL)
+_STATUS_CODES = {Status.OPEN: 1, Status.CLOSED: 2, Status.NOT_FOUND: 3}
+_STATUSES = {code: status for status, code in _STATUS_CODES.items()}
+_NO_PRICE = -1
+
+# Seconds a reader waits for a slot which is written at the same time, only exceeded
+# if the writer died while writing
+_MAX_READ_WAIT = 1.0
+
+
+def _slot_offset(slot: int) -> int:
+    return _HEADER.size + slot * _SLOT_SIZE
+
+
+class SharedPriceWriter:
+    """Writes the latest prices of stations into a memory mapped file, which any number
+    of SharedPriceReader instances in other processes read without copying the table.
+    
+    The file has a fixed layout: a header followed by one slot per station. A slot is
+    assigned on the first write of a station and never reused. Every slot carries a
+    sequence number which is odd while the slot is written (seqlock), so readers detect
+    and retry torn reads without any lock. There must only be one writer per file"""
+    
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        """Creates the file, or reopens it if it was created with the same capacity, so
+        the slots and the mappings of running readers stay valid after a restart
+        
+        Args:
+            path: Path of the file, e.g. below /dev/shm to keep it in memory only
+            capacity: Maximum number of stations
+            
+        Raises:
+            ValueError: If the file exists with a different layout
+        """
+        if capacity < 1:
+            raise ValueError("Capacity has to be at least 1")
+        size = _slot_offset(capacity)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            existing = os.fstat(fd).st_size
+            if existing not in (0, size):
+                raise ValueError(f"{path} was created with a different capacity")
+            if existing == 0:
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        magic, version, stored_capacity, count = _HEADER.unpack_from(self._mmap, 0)
+        if existing == 0:
+            _HEADER.pack_into(self._mmap, 0, _MAGIC, _VERSION, capacity, 0)
+            count = 0
+        elif magic != _MAGIC or version != _VERSION or stored_capacity != capacity:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a shared price table with capacity {capacity}")
+        self._capacity = capacity
+        self._slots: Dict[str, int] = {}
+        for slot in range(count):
+            self._slots[_read_station_id(self._mmap, slot)] = slot
+    
+    def __enter__(self) -> 'SharedPriceWriter':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+    
+    def __len__(self) -> int:
+        return len(self._slots)
+    
+    def get_capacity(self) -> int:
+        return self._capacity
+    
+    def put(self, station_id: str, gas_prices: GasPrices, timestamp: Optional[int] = None) -> None:
+        """Stores the prices of a station
+        
+        Args:
+            station_id: The station ID
+            gas_prices: The prices and status of the station
+            timestamp: Unix time of the prices, defaults to now
+            
+        Raises:
+            ValueError: If the table is full or the station ID is too long
+        """
+        encoded_id = station_id.encode("ascii")
+        if len(encoded_id) > MAX_STATION_ID_LENGTH:
+            raise ValueError(f"Station ID {station_id} is longer than {MAX_STATION_ID_LENGTH} characters")
+        slot = self._slots.get(station_id)
+        new_slot = slot is None
+        if new_slot:
+            if len(self._slots) >= self._capacity:
+                raise ValueError(f"The shared price table is full ({self._capacity} stations)")
+            slot = len(self._slots)
+        
+        offset = _slot_offset(slot)
+        # A writer which died while writing leaves the sequence odd, so the write starts
+        # at the next odd number instead of assuming an even one
+        sequence = _SEQUENCE.unpack_from(self._mmap, offset)[0] | 1
+        _SEQUENCE.pack_into(self._mmap, offset, sequence)
+        prices = [to_tenth_cents(price) if price is not None else _NO_PRICE
+                  for price in (gas_prices.get_price(gas_type) for gas_type in _GAS_TYPES)]
+        _DATA.pack_into(self._mmap, offset + _SEQUENCE.size, _STATUS_CODES[gas_prices.get_status()], *prices,
+                        int(time.time()) if timestamp is None else timestamp, encoded_id)
+        _SEQUENCE.pack_into(self._mmap, offset, (sequence + 1) & 0xFFFFFFFF)
+        
+        if new_slot:
+            # Published after the slot is complete, readers only look at used slots
+            self._slots[station_id] = slot
+            struct.pack_into("<I", self._mmap, _COUNT_OFFSET, len(self._slots))
+    
+    def put_prices_result(self, result: PricesResult, timestamp: Optional[int] = None) -> int:
+        """Stores all prices of a result, stations which were not found are skipped. Error
+        responses of the API carry no prices and store nothing
+        
+        Returns:
+            The number of stored stations
+        """
+        if result.is_ok() is False or result.get_gas_prices() is None:
+            return 0
+        stored = 0
+        for station_id, gas_prices in result.get_gas_prices().items():
+            if gas_prices.get_status() != Status.NOT_FOUND:
+                self.put(station_id, gas_prices, timestamp)
+                stored += 1
+        return stored
+    
+    def close(self) -> None:
+        """Unmaps the file. The file itself is kept for the readers"""
+        self._mmap.close()
+
+
+class SharedPriceReader:
+    """Reads the prices written by a SharedPriceWriter in another process. Lookups unpack
+    the slot directly from the shared mapping. Not thread-safe, use one reader per thread"""
+    
+    def __init__(self, path: str):
+        """Maps an existing file read-only
+        
+        Raises:
+            ValueError: If the file is not a shared price table
+        """
+        with open(path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._mmap) < _HEADER.size:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a shared price table")
+        magic, version, capacity, _ = _HEADER.unpack_from(self._mmap, 0)
+        if magic != _MAGIC or version != _VERSION or len(self._mmap) != _slot_offset(capacity):
+            self._mmap.close()
+            raise ValueError(f"{path} is not a shared price table")
+        self._slots: Dict[str, int] = {}
+        self._retries = 0
+    
+    def __enter__(self) -> 'SharedPriceReader':
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+    
+    def __len__(self) -> int:
+        return _read_count(self._mmap)
+    
+    def __contains__(self, station_id: str) -> bool:
+        return self._find_slot(station_id) is not None
+    
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.get_station_ids())
+    
+    def get_station_ids(self) -> List[str]:
+        """Returns the IDs of all stored stations"""
+        self._refresh()
+        return list(self._slots)
+    
+    def get(self, station_id: str) -> Optional[GasPrices]:
+        """Returns the latest prices of a station, or None if it was never written"""
+        entry = self.get_entry(station_id)
+        return entry[0] if entry is not None else None
+    
+    def get_timestamp(self, station_id: str) -> Optional[int]:
+        """Returns the unix time of the latest prices of a station, or None"""
+        entry = self.get_entry(station_id)
+        return entry[1] if entry is not None else None
+    
+    def get_entry(self, station_id: str) -> Optional[Tuple[GasPrices, int]]:
+        """Returns the latest prices of a station with their unix time, or None"""
+        slot = self._find_slot(station_id)
+        if slot is None:
+            return None
+        status, e5, e10, diesel, timestamp = self._read_slot(slot)[:5]
+        prices = {gas_type: from_tenth_cents(price)
+                  for gas_type, price in zip(_GAS_TYPES, (e5, e10, diesel)) if price != _NO_PRICE}
+        return GasPrices(prices, _STATUSES[status]), timestamp
+    
+    def get_all(self) -> Dict[str, GasPrices]:
+        """Returns the latest prices of all stations"""
+        return {station_id: self.get(station_id) for station_id in self.get_station_ids()}
+    
+    def get_retry_count(self) -> int:
+        """Returns how often a read overlapped with a write and was repeated"""
+        return self._retries
+    
+    def close(self) -> None:
+        """Unmaps the file"""
+        self._mmap.close()
+    
+    def _find_slot(self, station_id: str) -> Optional[int]:
+        slot = self._slots.get(station_id)
+        if slot is None:
+            self._refresh()
+            slot = self._slots.get(station_id)
+        return slot
+    
+    def _refresh(self) -> None:
+        """Indexes the slots assigned since the last refresh"""
+        for slot in range(len(self._slots), _read_count(self._mmap)):
+            self._slots[_read_station_id(self._mmap, slot)] = slot
+    
+    def _read_slot(self, slot: int) -> tuple:
+        """Reads a consistent copy of a slot, retrying while it is written"""
+        offset = _slot_offset(slot)
+        deadline = None
+        while True:
+            before = _SEQUENCE.unpack_from(self._mmap, offset)[0]
+            if not before & 1:
+                data = _DATA.unpack_from(self._mmap, offset + _SEQUENCE.size)
+                if _SEQUENCE.unpack_from(self._mmap, offset)[0] == before:
+                    return data
+            self._retries += 1
+            if deadline is None:
+                deadline = time.monotonic() + _MAX_READ_WAIT
+            elif time.monotonic() > deadline:
+                raise RuntimeError(f"Slot {slot} of the shared price table is not written completely")
+            # Lets the writer finish if it was preempted in the middle of the slot
+            time.sleep(0)
+
+
+def _read_count(buffer: mmap.mmap) -> int:
+    return struct.unpack_from("<I", buffer, _COUNT_OFFSET)[0]
+
+
+def _read_station_id(buffer: mmap.mmap, slot: int) -> str:
+    """Reads the station ID of a slot, which never changes once the slot is used"""
+    return _DATA.unpack_from(buffer, _slot_offset(slot) + _SEQUENCE.size)[5].rstrip(b"\0").decode("ascii")
@@ -0,0 +1,106 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls: while a call for a key is in flight, further calls
+    with the same key wait for it and share its result or exception instead of running
+    their own. Thread-based and asyncio callers share the same in-flight table"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+    
+    def do(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Runs fn, unless a call with the same key is already in flight, in which case
+        its outcome is awaited. Exceptions of the shared call are raised to every caller
+        
+        Args:
+            key: The key identifying identical calls
+            fn: The call to run
+            timeout: The maximum seconds a waiting caller waits for the shared call
+        
+        Returns:
+            The result and whether it was shared from the call of another caller, in
+            which case fn was not run
+        
+        Raises:
+            concurrent.futures.TimeoutError: If a waiting caller exceeded the timeout
+        """
+        future, leader = self._join(key)
+        if leader:
+            self._run(key, future, fn)
+        return future.result(timeout), not leader
+    
+    async def do_async(self, key: Hashable, fn: Callable[[], T], timeout: Optional[float] = None) -> Tuple[T, bool]:
+        """Asyncio variant of do(). The blocking fn is run in the default executor of the
+        running loop, waiting callers don't occupy a thread
+        
+        Returns:
+            The result and whether it was shared from the call of another caller
+        
+        Raises:
+            asyncio.TimeoutError: If the caller exceeded the timeout
+        """
+        future, leader = self._join(key)
+        if leader:
+            asyncio.get_running_loop().run_in_executor(None, self._run, key, future, fn)
+        # Shielded, so a timed out caller does not cancel the call shared with others
+        return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), timeout), not leader
+    
+    def in_flight(self) -> int:
+        """Returns the number of calls currently in flight"""
+        with self._lock:
+            return len(self._calls)
+    
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+    
+    def _run(self, key: Hashable, future: Future, fn: Callable[[], Any]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            self._forget(key)
+            future.set_exception(e)
+        else:
+            self._forget(key)
+            future.set_result(result)
+    
+    def _forget(self, key: Hashable) -> None:
+        # Removed before completion, so later callers start a fresh call instead of
+        # receiving an already completed one
+        with self._lock:
+            self._calls.pop(key, None)
@@ -0,0 +1,22 @@
+"""Local stand-in for the Tankerkoenig API, for load tests and benchmarks"""
+
+from tankerkoenig.testing.universe import StationUniverse, SyntheticStation
+from tankerkoenig.testing.server import (
+    FakeTankerkoenigServer,
+    FakeServerConfig,
+    FakeServerStats,
+    constant_latency,
+    uniform_latency,
+    lognormal_latency
+)
+
+__all__ = [
+    "StationUniverse",
+    "SyntheticStation",
+    "FakeTankerkoenigServer",
+    "FakeServerConfig",
+    "FakeServerStats",
+    "constant_latency",
+    "uniform_latency",
+    "lognormal_latency",
+]
@@ -0,0 +1,411 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import gzip
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, FrozenSet, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from tankerkoenig.testing.universe import StationUniverse
+
+LICENSE = "CC BY 4.0 -  https://creativecommons.tankerkoenig.de"
+BASE_PATH = "/json/"
+
+LatencyDistribution = Callable[[], float]
+
+_GAS_TYPES = ("e5", "e10", "diesel")
+_COMPLAINT_TYPES = frozenset((
+    "wrongPetrolStationName", "wrongStatusOpen", "wrongStatusClosed", "wrongPriceE5", "wrongPriceE10",
+    "wrongPriceDiesel", "wrongPetrolStationBrand", "wrongPetrolStationStreet", "wrongPetrolStationHouseNumber",
+    "wrongPetrolStationPostcode", "wrongPetrolStationPlace", "wrongPetrolStationLocation"
+))
+
+
+def constant_latency(seconds: float) -> LatencyDistribution:
+    """Latency distribution which delays every response by the same time"""
+    return lambda: seconds
+
+
+def uniform_latency(low: float, high: float, seed: Optional[int] = None) -> LatencyDistribution:
+    """Latency distribution which draws the delays uniformly from [low, high]"""
+    return _seeded(lambda rng: rng.uniform(low, high), seed)
+
+
+def lognormal_latency(median: float, sigma: float = 0.5, seed: Optional[int] = None) -> LatencyDistribution:
+    """Latency distribution with a long tail, as observed for most web services. Half of
+    the delays are below the median, sigma controls the length of the tail"""
+    mu = math.log(median)
+    return _seeded(lambda rng: rng.lognormvariate(mu, sigma), seed)
+
+
+def _seeded(draw: Callable[[random.Random], float], seed: Optional[int]) -> LatencyDistribution:
+    rng = random.Random(seed)
+    lock = threading.Lock()
+    
+    def latency() -> float:
+        with lock:
+            return draw(rng)
+    return latency
+
+
+@dataclass(frozen=True)
+class FakeServerConfig:
+    """Configuration of the fake server
+    
+    Attributes:
+        latency: Distribution of the artificial delay of every response. None answers immediately
+        error_rate: Fraction of requests which are answered with HTTP 500
+        api_error_rate: Fraction of requests which are answered with an error response of the API
+        rate_limit: Requests per second allowed per API key. None disables the rate limit
+        rate_limit_burst: Number of requests an API key may send at once
+        api_keys: The accepted API keys. None accepts every key
+        seed: Seed of the error injection
+        compression_min_size: Responses of at least this many bytes are gzip compressed if
+            the client accepts gzip. None disables compression
+        etags: If True, successful GET responses carry an ETag of the body and requests with
+            a matching If-None-Match are answered with 304 Not Modified
+    """
+    latency: Optional[LatencyDistribution] = None
+    error_rate: float = 0.0
+    api_error_rate: float = 0.0
+    rate_limit: Optional[float] = None
+    rate_limit_burst: int = 10
+    api_keys: Optional[FrozenSet[str]] = None
+    seed: Optional[int] = None
+    compression_min_size: Optional[int] = 1024
+    etags: bool = True
+
+
+@dataclass(frozen=True)
+class FakeServerStats:
+    """Point-in-time request statistics of the fake server"""
+    requests: Dict[str, int]
+    errors: int
+    api_errors: int
+    rate_limited: int
+    complaints: int
+    not_modified: int = 0
+
+
+class _TokenBucket:
+    def __init__(self, rate: float, burst: int, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = now
+    
+    def try_acquire(self, now: float) -> float:
+        """Takes a token and returns 0, or returns the seconds until a token is available"""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class FakeTankerkoenigServer:
+    """Local stand-in for the Tankerkoenig API, which serves list.php, detail.php,
+    prices.php and complaint.php over a StationUniverse. Responses are delayed,
+    failed and rate limited as configured. Intended for load tests and benchmarks:
+    
+        with FakeTankerkoenigServer() as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("key").build()
+    """
+    
+    def __init__(self, universe: Optional[StationUniverse] = None, config: Optional[FakeServerConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0, clock: Callable[[], float] = time.time):
+        """Creates a new fake server, which is started by start()
+        
+        Args:
+            universe: The served stations. Defaults to a universe of 15000 stations
+            config: The latency, error injection and rate limit configuration
+            host: The address to bind
+            port: The port to bind. 0 binds a free port
+            clock: Clock in Unix seconds, which determines the served prices
+        """
+        self._universe = universe or StationUniverse()
+        self._config = config or FakeServerConfig()
+        self._clock = clock
+        self._rng = random.Random(self._config.seed)
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, _TokenBucket] = {}
+        self._requests: Dict[str, int] = {}
+        self._errors = 0
+        self._api_errors = 0
+        self._rate_limited = 0
+        self._not_modified = 0
+        self._complaints = 0
+        self._server = ThreadingHTTPServer((host, port), self._create_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+    
+    def __enter__(self) -> 'FakeTankerkoenigServer':
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+    
+    def start(self) -> 'FakeTankerkoenigServer':
+        """Starts serving in a daemon thread"""
+        # A short poll interval lets stop() return quickly
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,),
+                                        name="fake-tankerkoenig", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        """Stops serving and closes the socket"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+    
+    def get_base_url(self) -> str:
+        """Returns the base URL to pass to the ApiBuilder"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{BASE_PATH}"
+    
+    def get_universe(self) -> StationUniverse:
+        """Returns the served stations"""
+        return self._universe
+    
+    def get_config(self) -> FakeServerConfig:
+        """Returns the configuration"""
+        return self._config
+    
+    def get_stats(self) -> FakeServerStats:
+        """Returns the request statistics"""
+        with self._lock:
+            return FakeServerStats(dict(self._requests), self._errors, self._api_errors,
+                                   self._rate_limited, self._complaints, self._not_modified)
+    
+    def handle(self, method: str, endpoint: str, parameters: Dict[str, str]) -> Tuple[int, Dict[str, str], Dict]:
+        """Answers a request without HTTP, returning the status code, headers and body"""
+        with self._lock:
+            self._requests[endpoint] = self._requests.get(endpoint, 0) + 1
+            roll = self._rng.random()
+        
+        if self._config.latency is not None:
+            time.sleep(max(0.0, self._config.latency()))
+        
+        if roll < self._config.error_rate:
+            with self._lock:
+                self._errors += 1
+            return 500, {}, {"ok": False, "status": "error", "message": "Internal Server Error"}
+        
+        api_key = parameters.get("apikey", "")
+        if not api_key or (self._config.api_keys is not None and api_key not in self._config.api_keys):
+            return 200, {}, _error("apikey nicht angegeben, falsch, oder im falschen Format")
+        
+        retry_after = self._acquire(api_key)
+        if retry_after > 0:
+            with self._lock:
+                self._rate_limited += 1
+            return 429, {"Retry-After": str(max(1, math.ceil(retry_after)))}, _error("rate limit exceeded")
+        
+        if roll < self._config.error_rate + self._config.api_error_rate:
+            with self._lock:
+                self._api_errors += 1
+            return 200, {}, _error("Datenbankfehler")
+        
+        routes = {
+            ("GET", "list.php"): self._list,
+            ("GET", "detail.php"): self._detail,
+            ("GET", "prices.php"): self._prices,
+            ("POST", "complaint.php"): self._complaint,
+        }
+        route = routes.get((method, endpoint))
+        if route is None:
+            return 404, {}, _error(f"unknown endpoint {method} {endpoint}")
+        return 200, {}, route(parameters)
+    
+    def _acquire(self, api_key: str) -> float:
+        if self._config.rate_limit is None:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(api_key)
+            if bucket is None:
+                bucket = self._buckets[api_key] = _TokenBucket(self._config.rate_limit,
+                                                               self._config.rate_limit_burst, now)
+            return bucket.try_acquire(now)
+    
+    def _list(self, parameters: Dict[str, str]) -> Dict:
+        try:
+            lat, lng, radius = float(parameters["lat"]), float(parameters["lng"]), float(parameters["rad"])
+        except (KeyError, ValueError):
+            return _error("lat, lng oder rad fehlt oder ist fehlerhaft")
+        gas_type = parameters.get("type", "all")
+        if gas_type not in _GAS_TYPES + ("all",) or not 0 < radius <= 25:
+            return _error("parameter error")
+        
+        timestamp = self._clock()
+        stations = []
+        for station, dist in self._universe.search(lat, lng, radius):
+            data = {key: value for key, value in station.to_json().items()
+                    if key not in ("openingTimes", "overrides", "wholeDay", "state")}
+            data["dist"] = dist
+            prices = self._universe.get_prices(station, timestamp)
+            if gas_type == "all":
+                data.update(prices)
+            else:
+                data["price"] = prices[gas_type]
+            stations.append(data)
+        
+        if gas_type != "all" and parameters.get("sort") == "price":
+            stations.sort(key=lambda data: (data["price"] is None, data["price"] or 0.0, data["dist"]))
+        return dict(_ok(), status="ok", stations=stations)
+    
+    def _detail(self, parameters: Dict[str, str]) -> Dict:
+        station = self._universe.get_station(parameters.get("id", ""))
+        if station is None:
+            return _error("Tankstelle nicht gefunden")
+        data = station.to_json()
+        data.update(self._universe.get_prices(station, self._clock()))
+        return dict(_ok(), status="ok", station=data)
+    
+    def _prices(self, parameters: Dict[str, str]) -> Dict:
+        ids = [station_id for station_id in parameters.get("ids", "").split(",") if station_id]
+        if not ids or len(ids) > 10:
+            return _error("parameter error: 1 - 10 ids required")
+        
+        timestamp = self._clock()
+        prices = {}
+        for station_id in ids:
+            station = self._universe.get_station(station_id)
+            if station is None:
+                prices[station_id] = {"status": "not found"}
+            elif not station.is_open:
+                prices[station_id] = {"status": "closed"}
+            else:
+                station_prices = self._universe.get_prices(station, timestamp)
+                prices[station_id] = dict(
+                    {gas_type: price if price is not None else False for gas_type, price in station_prices.items()},
+                    status="open"
+                )
+        return dict(_ok(), prices=prices)
+    
+    def _complaint(self, parameters: Dict[str, str]) -> Dict:
+        if self._universe.get_station(parameters.get("id", "")) is None:
+            return _error("Tankstelle nicht gefunden")
+        if parameters.get("type") not in _COMPLAINT_TYPES:
+            return _error("parameter error: type")
+        with self._lock:
+            self._complaints += 1
+        return _ok()
+    
+    def _record_not_modified(self) -> None:
+        with self._lock:
+            self._not_modified += 1
+    
+    def _create_handler(self) -> type:
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, which stalls keep-alive connections
+            # on delayed ACKs if Nagle's algorithm is enabled
+            disable_nagle_algorithm = True
+            
+            def do_GET(self):
+                split = urlsplit(self.path)
+                self._respond("GET", split.path, split.query)
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode("utf-8")
+                self._respond("POST", urlsplit(self.path).path, body)
+            
+            def _respond(self, method: str, path: str, query: str):
+                parameters = {key: values[0] for key, values in parse_qs(query).items()}
+                endpoint = path[len(BASE_PATH):] if path.startswith(BASE_PATH) else path.lstrip("/")
+                status, headers, body = server.handle(method, endpoint, parameters)
+                
+                payload = json.dumps(body).encode("utf-8")
+                if server.get_config().etags and method == "GET" and status == 200:
+                    etag = '"' + hashlib.blake2b(payload, digest_size=8).hexdigest() + '"'
+                    headers = dict(headers, ETag=etag)
+                    if etag in (self.headers.get("If-None-Match") or "").split(", "):
+                        server._record_not_modified()
+                        self._send_not_modified(etag)
+                        return
+                
+                min_size = server.get_config().compression_min_size
+                compress = min_size is not None and len(payload) >= min_size and self._accepts_gzip()
+                if compress:
+                    payload = gzip.compress(payload, compresslevel=6)
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json; charset=utf-8")
+                    if compress:
+                        self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Vary", "Accept-Encoding")
+                    self.send_header("Content-Length", str(len(payload)))
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except ConnectionError:
+                    # The client gave up waiting, e.g. after a timeout
+                    self.close_connection = True
+            
+            def _send_not_modified(self, etag: str):
+                try:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Vary", "Accept-Encoding")
+                    self.end_headers()
+                except ConnectionError:
+                    self.close_connection = True
+            
+            def _accepts_gzip(self) -> bool:
+                for value in (self.headers.get("Accept-Encoding") or "").split(","):
+                    coding, _, quality = value.strip().partition(";q=")
+                    if coding.strip().lower() == "gzip":
+                        try:
+                            return float(quality or 1) > 0
+                        except ValueError:
+                            return False
+                return False
+            
+            def log_message(self, format, *args):
+                pass
+        
+        return Handler
+
+
+def _ok() -> Dict:
+    return {"ok": True, "license": LICENSE, "data": "MTS-K"}
+
+
+def _error(message: str) -> Dict:
+    return {"ok": False, "status": "error", "message": message}
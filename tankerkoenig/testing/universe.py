@@ -0,0 +1,191 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import hashlib
+import math
+import random
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from tankerkoenig.utils import distance_km
+
+# Bounding box of Germany
+MIN_LAT, MAX_LAT = 47.3, 55.0
+MIN_LNG, MAX_LNG = 5.9, 15.0
+
+# Size of the grid cells in degrees, large enough that a search radius of 25 km only
+# touches the neighboring cells
+_CELL_SIZE = 0.25
+
+_BRANDS = ("ARAL", "Shell", "ESSO", "TotalEnergies", "AVIA", "JET", "STAR", "Agip", "HEM", "OIL!", "bft", "Raiffeisen")
+_STREETS = ("Hauptstr.", "Bahnhofstr.", "Berliner Str.", "Industriestr.", "Dorfstr.", "Am Markt", "Ringstr.")
+_PLACES = ("Berlin", "Hamburg", "München", "Köln", "Frankfurt", "Stuttgart", "Leipzig", "Dresden", "Hannover")
+_STATES = ("deBW", "deBY", "deBE", "deBB", "deHB", "deHH", "deHE", "deMV",
+           "deNI", "deNW", "deRP", "deSL", "deSN", "deST", "deSH", "deTH")
+_BASE_PRICES = {"e5": 1.799, "e10": 1.739, "diesel": 1.659}
+_OPENING_TIMES = (
+    [],
+    [{"text": "Mo-Fr", "start": "06:00:00", "end": "22:00:00"},
+     {"text": "Sa, So, Feiertag", "start": "08:00:00", "end": "20:00:00"}],
+    [{"text": "täglich", "start": "06:00:00", "end": "22:00:00"}],
+)
+
+
+@dataclass
+class SyntheticStation:
+    """A generated gas station. Prices are not stored but derived from the time"""
+    id: str
+    name: str
+    brand: str
+    street: str
+    house_number: str
+    post_code: int
+    place: str
+    state: str
+    lat: float
+    lng: float
+    whole_day: bool
+    opening_times: List[Dict[str, str]]
+    is_open: bool
+    # Offset of the station to the national price level in euros
+    price_offset: float
+    # Gas types which are not sold by the station
+    missing: Tuple[str, ...] = ()
+    
+    def to_json(self) -> Dict:
+        """Returns the station data in the format of detail.php, without prices"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "brand": self.brand,
+            "street": self.street,
+            "houseNumber": self.house_number,
+            "postCode": self.post_code,
+            "place": self.place,
+            "openingTimes": self.opening_times,
+            "overrides": [],
+            "wholeDay": self.whole_day,
+            "isOpen": self.is_open,
+            "lat": self.lat,
+            "lng": self.lng,
+            "state": self.state,
+        }
+
+
+@dataclass
+class StationUniverse:
+    """A reproducible set of synthetic gas stations spread across Germany. Equal sizes
+    and seeds generate equal stations. Prices change every price_interval seconds
+    
+    Attributes:
+        size: Number of stations
+        seed: Seed of the generator
+        closed_ratio: Fraction of stations which are closed
+        price_interval: Seconds between price changes
+    """
+    size: int = 15000
+    seed: int = 0
+    closed_ratio: float = 0.1
+    price_interval: int = 300
+    _stations: Dict[str, SyntheticStation] = field(default_factory=dict, init=False, repr=False)
+    _grid: Dict[Tuple[int, int], List[SyntheticStation]] = field(default_factory=dict, init=False, repr=False)
+    
+    def __post_init__(self):
+        rng = random.Random(self.seed)
+        for index in range(self.size):
+            station = self._generate(rng, index)
+            self._stations[station.id] = station
+            self._grid.setdefault(self._cell(station.lat, station.lng), []).append(station)
+    
+    def get_station(self, station_id: str) -> Optional[SyntheticStation]:
+        """Returns the station with the ID, or None if it does not exist"""
+        return self._stations.get(station_id)
+    
+    def get_station_ids(self) -> List[str]:
+        """Returns the IDs of all stations in generation order"""
+        return list(self._stations)
+    
+    def search(self, lat: float, lng: float, radius: float) -> List[Tuple[SyntheticStation, float]]:
+        """Returns the stations within the radius in kilometers with their distance,
+        sorted by distance"""
+        row, col = self._cell(lat, lng)
+        reach_lat = int(radius / 111.0 / _CELL_SIZE) + 1
+        reach_lng = int(radius / (111.0 * max(0.1, math.cos(math.radians(lat)))) / _CELL_SIZE) + 1
+        
+        found = []
+        for r in range(row - reach_lat, row + reach_lat + 1):
+            for c in range(col - reach_lng, col + reach_lng + 1):
+                for station in self._grid.get((r, c), ()):
+                    dist = distance_km(lat, lng, station.lat, station.lng)
+                    if dist <= radius:
+                        found.append((station, round(dist, 1)))
+        found.sort(key=lambda entry: entry[1])
+        return found
+    
+    def get_prices(self, station: SyntheticStation, timestamp: float) -> Dict[str, Optional[float]]:
+        """Returns the prices of a station at the Unix timestamp. Every price changes
+        by a reproducible amount each price_interval"""
+        bucket = int(timestamp // self.price_interval)
+        digest = hashlib.blake2b(f"{self.seed}:{station.id}:{bucket}".encode(), digest_size=5).digest()
+        # All gas types move together by up to +-5 cents, each type deviates by up to +-1 cent
+        change = (int.from_bytes(digest[:2], "big") % 101 - 50) / 1000
+        prices = {}
+        for index, (gas_type, base) in enumerate(_BASE_PRICES.items()):
+            if gas_type in station.missing:
+                prices[gas_type] = None
+                continue
+            deviation = (digest[2 + index] % 21 - 10) / 1000
+            # German prices end with 9
+            price = base + station.price_offset + change + deviation
+            prices[gas_type] = round(math.floor(price * 100) / 100 + 0.009, 3)
+        return prices
+    
+    def _generate(self, rng: random.Random, index: int) -> SyntheticStation:
+        brand = rng.choice(_BRANDS)
+        place = rng.choice(_PLACES)
+        street = rng.choice(_STREETS)
+        opening_times = rng.choice(_OPENING_TIMES)
+        missing = ("e10",) if rng.random() < 0.05 else ()
+        return SyntheticStation(
+            id=str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+            name=f"{brand} {place.upper()} {street.upper()} {index}",
+            brand=brand,
+            street=street,
+            house_number=str(rng.randint(1, 200)),
+            post_code=rng.randint(10000, 99999),
+            place=place,
+            state=rng.choice(_STATES),
+            lat=round(rng.uniform(MIN_LAT, MAX_LAT), 6),
+            lng=round(rng.uniform(MIN_LNG, MAX_LNG), 6),
+            whole_day=not opening_times,
+            opening_times=opening_times,
+            is_open=rng.random() >= self.closed_ratio,
+            price_offset=round(rng.uniform(-0.05, 0.08), 3),
+            missing=missing
+        )
+    
+    @staticmethod
+    def _cell(lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / _CELL_SIZE)), int(math.floor(lng / _CELL_SIZE))
@@ -22,7 +22,11 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-from typing import Collection, Dict, Any
+import math
+from typing import Any, Collection, Dict, Mapping, Optional
+from urllib.parse import quote_plus, urlencode
+
+_EARTH_RADIUS_KM = 6371.0
 
 
 def join(values: Collection[str], separator: str) -> str:
@@ -34,6 +38,15 @@ def join(values: Collection[str], separator: str) -> str:
     return separator.join(filtered)
 
 
+def distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Returns the great-circle distance between two coordinates in kilometers"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
 class RequestParamBuilder:
     """Builder for request parameters"""
     
@@ -57,3 +70,55 @@ class RequestParamBuilder:
     def build(self) -> Dict[str, Any]:
         """Builds the final parameter map"""
         return self._map
+
+
+class PreparedParameters(dict):
+    """Read-only request parameters, normalized to non-empty strings like they are sent,
+    together with their URL encoded query string. The query string is encoded once and
+    reused by every execution of a request whose parameters didn't change"""
+    
+    def __init__(self, parameters: Mapping[str, Any] = (), query: Optional[str] = None):
+        """Creates prepared parameters. None and empty values are dropped
+        
+        Args:
+            parameters: The parameters
+            query: The already encoded query string of the parameters, if known
+        """
+        super().__init__((k, str(v)) for k, v in dict(parameters).items() if v is not None and str(v))
+        self._query = query
+    
+    def get_query(self) -> str:
+        """Returns the URL encoded query string"""
+        if self._query is None:
+            self._query = urlencode(self)
+        return self._query
+    
+    def with_value(self, key: str, value: Any) -> 'PreparedParameters':
+        """Returns a copy with the value set. A key which is not present yet is appended to
+        the encoded query string, other changes encode the query string of the copy again"""
+        value = str(value) if value is not None else ""
+        copy = PreparedParameters.__new__(PreparedParameters)
+        dict.update(copy, self)
+        if not value:
+            # Empty values are not sent
+            dict.pop(copy, key, None)
+            copy._query = self._query if key not in self else None
+        elif key not in self:
+            # The query string of self is encoded once and kept for the next copy
+            dict.__setitem__(copy, key, value)
+            query = self.get_query()
+            added = f"{quote_plus(key)}={quote_plus(value)}"
+            copy._query = f"{query}&{added}" if query else added
+        else:
+            dict.__setitem__(copy, key, value)
+            copy._query = None
+        return copy
+    
+    def __reduce__(self):
+        return PreparedParameters, (dict(self), self._query)
+    
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("PreparedParameters are read-only, use with_value()")
+    
+    __setitem__ = __delitem__ = _read_only
+    clear = pop = popitem = setdefault = update = __ior__ = _read_only
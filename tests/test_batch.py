@@ -0,0 +1,147 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+import threading
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import ClientExecutorException, RequesterException
+from tankerkoenig.models.results import PricesResult, StationDetailResult, StationListResult
+
+
+class RoutingClientExecutor(ClientExecutor):
+    """ClientExecutor which answers by endpoint. Requests for station IDs in gates
+    block until the gate is set, the ID "broken" fails"""
+    
+    def __init__(self, gates=None):
+        self.gates = gates or {}
+        self.lock = threading.Lock()
+        self.started = []
+    
+    def get(self, url, query_parameters, timeout=None):
+        station_id = query_parameters.get("ids") or query_parameters.get("id")
+        with self.lock:
+            self.started.append(station_id)
+        if station_id in self.gates:
+            assert self.gates[station_id].wait(5)
+        if station_id == "broken":
+            raise ClientExecutorException(url, "Service unavailable")
+        if url.endswith("list.php"):
+            return json.dumps({"ok": True, "status": "ok", "stations": []})
+        if url.endswith("detail.php"):
+            return json.dumps({"ok": True, "status": "ok", "station": {"id": station_id}})
+        return json.dumps({"ok": True, "prices": {station_id: {"status": "open", "e5": 1.789}}})
+    
+    def post(self, url, form_params, timeout=None):
+        return json.dumps({"ok": True})
+
+
+def build_api(executor):
+    return Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(executor).build()
+
+
+class TestExecuteMany:
+    """Tests for concurrent batch execution"""
+    
+    def test_heterogeneous_requests_in_order(self):
+        """Test that requests of different types are yielded in submission order"""
+        api = build_api(RoutingClientExecutor())
+        requests = [api.detail("a"), api.list(52.52, 13.40), api.prices().add_id("b")]
+        
+        outcomes = list(api.execute_many(requests, max_workers=3, ordered=True))
+        
+        assert [outcome.index for outcome in outcomes] == [0, 1, 2]
+        assert [type(outcome.result) for outcome in outcomes] == [StationDetailResult, StationListResult, PricesResult]
+        assert all(outcome.request is request for outcome, request in zip(outcomes, requests))
+    
+    def test_completion_order(self):
+        """Test that unordered outcomes are yielded as soon as they complete"""
+        gate = threading.Event()
+        api = build_api(RoutingClientExecutor({"slow": gate}))
+        iterator = api.execute_many([api.prices().add_id("slow"), api.prices().add_id("fast")], max_workers=2)
+        
+        first = next(iterator)
+        gate.set()
+        second = next(iterator)
+        
+        assert (first.index, second.index) == (1, 0)
+        assert list(iterator) == []
+    
+    def test_ordered_waits_for_earlier_requests(self):
+        """Test that ordered outcomes are held back until earlier requests completed"""
+        gate = threading.Event()
+        api = build_api(RoutingClientExecutor({"slow": gate}))
+        threading.Timer(0.05, gate.set).start()
+        
+        outcomes = list(api.execute_many([api.prices().add_id("slow"), api.prices().add_id("fast")],
+                                         max_workers=2, ordered=True))
+        
+        assert [outcome.index for outcome in outcomes] == [0, 1]
+    
+    def test_failures_are_returned_per_request(self):
+        """Test that a failing request doesn't stop the batch"""
+        api = build_api(RoutingClientExecutor())
+        requests = [api.prices().add_id("a"), api.prices().add_id("broken"), api.prices()]
+        
+        outcomes = list(api.execute_many(requests, ordered=True))
+        
+        assert [outcome.is_success() for outcome in outcomes] == [True, False, False]
+        assert isinstance(outcomes[1].exception, RequesterException)
+        with pytest.raises(RequesterException):
+            outcomes[2].get_result()
+        assert outcomes[0].get_result().is_ok()
+    
+    def test_progress(self):
+        """Test that progress is reported after every request"""
+        api = build_api(RoutingClientExecutor())
+        reports = []
+        requests = [api.prices().add_id(station_id) for station_id in ("a", "broken", "c")]
+        
+        list(api.execute_many(requests, progress=reports.append))
+        
+        assert [(report.completed, report.total) for report in reports] == [(1, 3), (2, 3), (3, 3)]
+        assert reports[-1].failed == 1
+        assert reports[-1].elapsed >= 0
+    
+    def test_requests_are_consumed_lazily(self):
+        """Test that at most twice max_workers requests are pending"""
+        executor = RoutingClientExecutor()
+        api = build_api(executor)
+        consumed = []
+        
+        def requests():
+            for index in range(100):
+                consumed.append(index)
+                yield api.prices().add_id(str(index))
+        
+        iterator = api.execute_many(requests(), max_workers=2)
+        assert next(iterator).result.is_ok()
+        assert len(consumed) <= 5
+        assert next(iterator).request is not None
+        iterator.close()
+        
+        assert list(iterator) == []
+        assert len(executor.started) < 100
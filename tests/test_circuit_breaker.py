@@ -0,0 +1,228 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from tankerkoenig.circuit_breaker import (
+    CircuitBreaker, CircuitBreakerClientExecutor, CircuitBreakerConfig, CircuitState
+)
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import CircuitOpenException, ClientExecutorException
+
+URL = "http://localhost/prices.php"
+
+
+class FakeClock:
+    """Manually advanced monotonic clock"""
+    
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FlakyClientExecutor(ClientExecutor):
+    """ClientExecutor which fails while failing is True"""
+    
+    def __init__(self):
+        self.failing = False
+        self.error = None
+        self.calls = 0
+    
+    def get(self, url, query_parameters):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if self.failing:
+            raise ClientExecutorException(url, "Service unavailable")
+        return '{"ok": true, "ids": "%s"}' % query_parameters.get("ids")
+    
+    def post(self, url, form_params):
+        return self.get(url, form_params)
+
+
+CONFIG = CircuitBreakerConfig(failure_rate_threshold=0.5, window_size=4, minimum_calls=4, open_duration=10.0)
+
+
+class TestCircuitBreaker:
+    """Tests for the CircuitBreaker state machine"""
+    
+    def test_opens_at_failure_rate(self):
+        """Test that the circuit opens once the failure rate reaches the threshold"""
+        breaker = CircuitBreaker("test", CONFIG, FakeClock())
+        
+        for failed in (False, True, False):
+            assert breaker.allow_request()
+            breaker.record_failure(0.1) if failed else breaker.record_success(0.1)
+        assert breaker.get_state() == CircuitState.CLOSED
+        
+        breaker.record_failure(0.1)
+        assert breaker.get_state() == CircuitState.OPEN
+        assert breaker.allow_request() is False
+    
+    def test_half_open_probe_closes(self):
+        """Test that a successful probe after the open duration closes the circuit"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", CONFIG, clock)
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        
+        clock.now = 9.0
+        assert breaker.allow_request() is False
+        assert breaker.get_retry_after() == pytest.approx(1.0)
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        assert breaker.get_state() == CircuitState.HALF_OPEN
+        # Only one probe at a time
+        assert breaker.allow_request() is False
+        
+        breaker.record_success(0.1)
+        assert breaker.get_state() == CircuitState.CLOSED
+    
+    def test_half_open_probe_failure_reopens(self):
+        """Test that a failed probe reopens the circuit"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", CONFIG, clock)
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        
+        clock.now = 10.0
+        assert breaker.allow_request() is True
+        breaker.record_failure(0.1)
+        
+        assert breaker.get_state() == CircuitState.OPEN
+        assert breaker.get_retry_after() == pytest.approx(10.0)
+    
+    def test_slow_calls_count_as_failures(self):
+        """Test that calls above the slow call duration count as failures"""
+        config = CircuitBreakerConfig(window_size=2, minimum_calls=2, slow_call_duration=1.0)
+        breaker = CircuitBreaker("test", config, FakeClock())
+        
+        breaker.record_success(2.0)
+        breaker.record_success(0.5)
+        
+        metrics = breaker.get_metrics()
+        assert metrics.state == CircuitState.OPEN
+        assert metrics.slow_calls == 1
+        assert metrics.mean_latency == pytest.approx(1.25)
+    
+    def test_listeners(self):
+        """Test that transitions are reported to listeners"""
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", CONFIG, clock)
+        transitions = []
+        breaker.add_listener(lambda name, old, new: transitions.append((name, old, new)))
+        
+        for _ in range(4):
+            breaker.record_failure(0.1)
+        clock.now = 10.0
+        breaker.get_state()
+        
+        assert transitions == [
+            ("test", CircuitState.CLOSED, CircuitState.OPEN),
+            ("test", CircuitState.OPEN, CircuitState.HALF_OPEN),
+        ]
+        assert breaker.get_metrics().transitions == 2
+
+
+class TestCircuitBreakerClientExecutor:
+    """Tests for the CircuitBreakerClientExecutor"""
+    
+    def _open_circuit(self, executor, delegate):
+        delegate.failing = True
+        while executor.get_state(URL) != CircuitState.OPEN:
+            with pytest.raises(ClientExecutorException):
+                executor.get(URL, {"ids": "a", "ts": 1})
+    
+    def test_fails_fast_while_open(self):
+        """Test that open circuits reject calls without calling the delegate"""
+        delegate = FlakyClientExecutor()
+        executor = CircuitBreakerClientExecutor(delegate, CONFIG, clock=FakeClock())
+        self._open_circuit(executor, delegate)
+        
+        with pytest.raises(CircuitOpenException) as exc_info:
+            executor.get(URL, {"ids": "a"})
+        
+        assert delegate.calls == 4
+        assert exc_info.value.get_url() == URL
+        assert executor.get_state(URL) == CircuitState.OPEN
+        assert executor.get_metrics()[URL].rejected_calls == 1
+    
+    def test_endpoints_are_independent(self):
+        """Test that every URL has its own circuit"""
+        delegate = FlakyClientExecutor()
+        executor = CircuitBreakerClientExecutor(delegate, CONFIG, clock=FakeClock())
+        self._open_circuit(executor, delegate)
+        delegate.failing = False
+        
+        assert executor.get("http://localhost/list.php", {}) is not None
+        assert executor.get_state("http://localhost/list.php") == CircuitState.CLOSED
+    
+    def test_serve_stale(self):
+        """Test serving the latest successful response while the circuit is open"""
+        delegate = FlakyClientExecutor()
+        executor = CircuitBreakerClientExecutor(delegate, CONFIG, serve_stale=True, clock=FakeClock())
+        fresh = executor.get(URL, {"ids": "a", "ts": 1, "apikey": "key"})
+        self._open_circuit(executor, delegate)
+        
+        assert executor.get(URL, {"ids": "a", "ts": 2, "apikey": "other"}) == fresh
+        with pytest.raises(CircuitOpenException):
+            executor.get(URL, {"ids": "b"})
+        assert executor.get_metrics()[URL].stale_responses == 1
+    
+    def test_recovers_after_open_duration(self):
+        """Test that the circuit closes again after a successful probe"""
+        clock = FakeClock()
+        delegate = FlakyClientExecutor()
+        executor = CircuitBreakerClientExecutor(delegate, CONFIG, clock=clock)
+        transitions = []
+        executor.add_listener(lambda url, old, new: transitions.append(new))
+        self._open_circuit(executor, delegate)
+        
+        delegate.failing = False
+        clock.now = 10.0
+        executor.get(URL, {"ids": "a"})
+        
+        assert executor.get_state(URL) == CircuitState.CLOSED
+        assert transitions == [CircuitState.OPEN, CircuitState.HALF_OPEN, CircuitState.CLOSED]
+    
+    def test_half_open_probe_with_other_exception(self):
+        """Test that a probe failing with a non-executor exception releases the half-open circuit"""
+        clock = FakeClock()
+        delegate = FlakyClientExecutor()
+        executor = CircuitBreakerClientExecutor(delegate, CONFIG, clock=clock)
+        self._open_circuit(executor, delegate)
+        
+        clock.now = 10.0
+        delegate.error = ValueError("unexpected")
+        with pytest.raises(ValueError):
+            executor.get(URL, {"ids": "a"})
+        assert executor.get_state(URL) == CircuitState.OPEN
+        
+        delegate.error = None
+        delegate.failing = False
+        clock.now = 20.0
+        executor.get(URL, {"ids": "a"})
+        assert executor.get_state(URL) == CircuitState.CLOSED
@@ -0,0 +1,242 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from tankerkoenig.compression import build_accept_encoding, get_supported_encodings
+from tankerkoenig.client import ClientExecutorFactory, HttpxClientExecutor, RequestsClientExecutor
+from tankerkoenig.exceptions import ClientExecutorException, ClientExecutorTimeoutException
+from tankerkoenig.testing import FakeServerConfig, FakeTankerkoenigServer, StationUniverse, constant_latency
+
+
+@pytest.fixture(scope="module")
+def universe():
+    return StationUniverse(size=100, seed=3)
+
+
+@pytest.fixture
+def server(universe):
+    with FakeTankerkoenigServer(universe) as server:
+        yield server
+
+
+@pytest.fixture
+def slow_server(universe):
+    with FakeTankerkoenigServer(universe, FakeServerConfig(latency=constant_latency(0.5))) as server:
+        yield server
+
+
+@pytest.fixture
+def compressing_server(universe):
+    with FakeTankerkoenigServer(universe, FakeServerConfig(compression_min_size=0)) as server:
+        yield server
+
+
+class TricklingHandler(BaseHTTPRequestHandler):
+    """Answers with a body which arrives in small pieces, each well within a read timeout"""
+    
+    def do_GET(self):
+        body = b'{"ok": true, "padding": "' + b"x" * 2000 + b'"}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            for i in range(0, len(body), 32):
+                self.wfile.write(body[i:i + 32])
+                self.wfile.flush()
+                time.sleep(0.02)
+        except ConnectionError:
+            pass
+    
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def trickling_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TricklingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/prices.php"
+    server.shutdown()
+    server.server_close()
+
+
+def prices_parameters(server):
+    return {"apikey": "api-key", "ids": ",".join(server.get_universe().get_station_ids()[:3])}
+
+
+class TestRequestsClientExecutor:
+    """Tests for the requests based ClientExecutor against the fake server"""
+    
+    def test_get(self, server):
+        """Test that the response body is returned"""
+        body = RequestsClientExecutor().get(server.get_base_url() + "prices.php", prices_parameters(server))
+        assert '"ok":true' in body.replace(" ", "")
+    
+    def test_timeout(self, slow_server):
+        """Test that exceeding the timeout raises a ClientExecutorTimeoutException"""
+        with pytest.raises(ClientExecutorTimeoutException):
+            RequestsClientExecutor().get(slow_server.get_base_url() + "prices.php", prices_parameters(slow_server), timeout=0.05)
+    
+    def test_http_error(self, server):
+        """Test that an unknown path raises a ClientExecutorException"""
+        with pytest.raises(ClientExecutorException):
+            RequestsClientExecutor().get(server.get_base_url() + "unknown.php", {"apikey": "api-key"})
+    
+    def test_get_conditional(self, server):
+        """Test that a revalidated unchanged response is returned without body"""
+        executor = RequestsClientExecutor()
+        url = server.get_base_url() + "detail.php"
+        parameters = {"apikey": "api-key", "id": server.get_universe().get_station_ids()[0]}
+        first = executor.get_conditional(url, parameters, {})
+        second = executor.get_conditional(url, parameters, {"If-None-Match": first.etag})
+        
+        assert first.body is not None and first.etag is not None
+        assert second.is_not_modified() and second.etag == first.etag
+    
+    def test_timeout_bounds_trickling_body(self, trickling_url):
+        """Test that the timeout bounds the whole body, not only every single read"""
+        started = time.monotonic()
+        with pytest.raises(ClientExecutorTimeoutException):
+            RequestsClientExecutor(chunk_size=32).get(trickling_url, {}, timeout=0.2)
+        assert time.monotonic() - started < 1.0
+        
+        assert '"ok": true' in RequestsClientExecutor(chunk_size=32).get(trickling_url, {}, timeout=5)
+
+
+class TestCompression:
+    """Tests for the negotiation and decompression of compressed responses"""
+    
+    def test_build_accept_encoding(self):
+        """Test that the order of preference is expressed with quality values"""
+        assert build_accept_encoding(("br", "gzip", "deflate")) == "br, gzip;q=0.9, deflate;q=0.8"
+        assert build_accept_encoding(("gzip",)) == "gzip"
+    
+    def test_supported_encodings(self):
+        """Test that gzip and deflate are always supported and preferred in order"""
+        encodings = get_supported_encodings()
+        assert encodings[-2:] == ("gzip", "deflate")
+    
+    def test_compressed_response(self, compressing_server):
+        """Test that compressed bodies are decompressed and both sizes are counted"""
+        executor = RequestsClientExecutor()
+        body = executor.get(compressing_server.get_base_url() + "prices.php", prices_parameters(compressing_server))
+        
+        stats = executor.get_transfer_stats()
+        assert '"ok":true' in body.replace(" ", "")
+        assert stats.responses == 1
+        assert stats.encodings == {"gzip": 1}
+        assert stats.decoded_bytes == len(body.encode("utf-8"))
+        assert 0 < stats.wire_bytes < stats.decoded_bytes
+        assert stats.get_saved_bytes() == stats.decoded_bytes - stats.wire_bytes
+        assert stats.get_compression_ratio() < 1
+    
+    def test_identity(self, compressing_server):
+        """Test that uncompressed bodies are counted with equal sizes"""
+        executor = RequestsClientExecutor(accept_encoding="identity")
+        executor.get(compressing_server.get_base_url() + "prices.php", prices_parameters(compressing_server))
+        executor.get(compressing_server.get_base_url() + "prices.php", prices_parameters(compressing_server))
+        
+        stats = executor.get_transfer_stats()
+        assert stats.responses == 2
+        assert stats.encodings == {"identity": 2}
+        assert stats.wire_bytes == stats.decoded_bytes
+        assert stats.get_compression_ratio() == 1
+
+
+class TestHttpxClientExecutor:
+    """Tests for the HTTP/2 capable httpx ClientExecutor"""
+    
+    def test_missing_dependency(self, monkeypatch):
+        """Test that a helpful ImportError is raised if httpx is not installed"""
+        monkeypatch.setitem(sys.modules, "httpx", None)
+        with pytest.raises(ImportError, match="httpx"):
+            ClientExecutorFactory.build_http2_client_executor()
+    
+    def test_get(self, server):
+        """Test that requests fall back to HTTP/1.1 against a plain HTTP server"""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        executor = ClientExecutorFactory.build_http2_client_executor()
+        try:
+            body = executor.get(server.get_base_url() + "prices.php", prices_parameters(server))
+        finally:
+            executor.close()
+        assert '"ok":true' in body.replace(" ", "")
+    
+    def test_post(self, server):
+        """Test that form data is posted"""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        executor = HttpxClientExecutor()
+        station_id = server.get_universe().get_station_ids()[0]
+        try:
+            body = executor.post(server.get_base_url() + "complaint.php",
+                                 {"apikey": "api-key", "id": station_id, "type": "wrongStatusOpen"})
+        finally:
+            executor.close()
+        assert '"ok":true' in body.replace(" ", "")
+    
+    def test_get_conditional(self, server):
+        """Test that a revalidated unchanged response is returned without body"""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        executor = HttpxClientExecutor()
+        url = server.get_base_url() + "detail.php"
+        parameters = {"apikey": "api-key", "id": server.get_universe().get_station_ids()[0]}
+        try:
+            first = executor.get_conditional(url, parameters, {})
+            second = executor.get_conditional(url, parameters, {"If-None-Match": first.etag})
+        finally:
+            executor.close()
+        assert first.body is not None and first.etag is not None
+        assert second.is_not_modified()
+    
+    def test_timeout(self, slow_server):
+        """Test that exceeding the timeout raises a ClientExecutorTimeoutException"""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        executor = HttpxClientExecutor()
+        try:
+            with pytest.raises(ClientExecutorTimeoutException):
+                executor.get(slow_server.get_base_url() + "prices.php", prices_parameters(slow_server), timeout=0.05)
+        finally:
+            executor.close()
+    
+    def test_http_error(self, server):
+        """Test that error status codes raise a ClientExecutorException"""
+        pytest.importorskip("httpx")
+        pytest.importorskip("h2")
+        executor = HttpxClientExecutor()
+        try:
+            with pytest.raises(ClientExecutorException):
+                executor.get(server.get_base_url() + "unknown.php", {"apikey": "api-key"})
+        finally:
+            executor.close()
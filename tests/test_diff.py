@@ -0,0 +1,158 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+
+import pytest
+from tankerkoenig.diff import ChangeEvent, ChangeType, SnapshotDiffer, diff_snapshots, snapshot_of, fingerprint
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.models.results import PricesResult, StationListResult
+from tankerkoenig.models.station import Station
+
+
+def prices(status=Status.OPEN, **values):
+    """Builds GasPrices from keyword arguments like e5=1.789"""
+    return GasPrices(prices={GasType(key): value for key, value in values.items()}, status=status)
+
+
+def load_error_result(result_class):
+    """Maps the error response resource to the result class"""
+    with open(os.path.join(os.path.dirname(__file__), "resources", "error.json"), "r") as f:
+        return JsonMapper().from_json(f.read(), result_class)
+
+
+class TestDiffSnapshots:
+    """Tests for the stateless snapshot diff"""
+    
+    def test_unchanged(self):
+        """Test that equal snapshots produce no events"""
+        snapshot = {"a": prices(e5=1.789, diesel=1.659)}
+        
+        assert diff_snapshots(snapshot, {"a": prices(e5=1.789, diesel=1.659)}) == []
+        assert fingerprint(snapshot["a"]) == fingerprint(prices(e5=1.789, diesel=1.659))
+        assert fingerprint(snapshot["a"]) == (Status.OPEN, 1659, 1789, None)
+    
+    def test_price_changes(self):
+        """Test price up, down, added and removed events"""
+        previous = {"a": prices(e5=1.789, e10=1.729, diesel=1.659)}
+        current = {"a": prices(e5=1.799, e10=1.719)}
+        
+        events = diff_snapshots(previous, current)
+        
+        assert ChangeEvent(ChangeType.PRICE_UP, "a", GasType.E5, 1.789, 1.799) in events
+        assert ChangeEvent(ChangeType.PRICE_DOWN, "a", GasType.E10, 1.729, 1.719) in events
+        assert ChangeEvent(ChangeType.PRICE_REMOVED, "a", GasType.DIESEL, 1.659, None) in events
+        assert len(events) == 3
+        
+        events = diff_snapshots(current, previous)
+        assert ChangeEvent(ChangeType.PRICE_ADDED, "a", GasType.DIESEL, None, 1.659) in events
+    
+    def test_status_change(self):
+        """Test status transitions"""
+        events = diff_snapshots({"a": prices(e5=1.789)}, {"a": prices(status=Status.CLOSED, e5=1.789)})
+        
+        assert events == [ChangeEvent(ChangeType.STATUS_CHANGED, "a", previous=Status.OPEN, current=Status.CLOSED)]
+    
+    def test_appearing_and_disappearing_stations(self):
+        """Test stations which appear or disappear between snapshots"""
+        events = diff_snapshots({"a": prices(e5=1.789)}, {"b": prices(e5=1.799)})
+        
+        assert [(e.change_type, e.station_id) for e in events] == [
+            (ChangeType.STATION_APPEARED, "b"),
+            (ChangeType.STATION_DISAPPEARED, "a"),
+        ]
+
+
+class TestSnapshotOf:
+    """Tests for the conversion of results to snapshots"""
+    
+    def test_prices_result(self):
+        """Test converting a PricesResult"""
+        result = PricesResult(prices={"a": prices(e5=1.789)})
+        assert snapshot_of(result) == {"a": prices(e5=1.789)}
+    
+    def test_station_list_result(self):
+        """Test converting a StationListResult with all or a single gas type"""
+        result = StationListResult(stations=[
+            Station(id="a", is_open=True, gas_prices=prices(status=Status.NOT_FOUND, e5=1.789)),
+            Station(id="b", is_open=False, price=1.659),
+        ])
+        
+        snapshot = snapshot_of(result, GasType.DIESEL)
+        assert snapshot["a"] == prices(e5=1.789)
+        assert snapshot["b"] == prices(status=Status.CLOSED, diesel=1.659)
+        assert snapshot_of(result)["b"] == prices(status=Status.CLOSED)
+    
+    @pytest.mark.parametrize("result_class", [PricesResult, StationListResult])
+    def test_error_result(self, result_class):
+        """Test that error responses of the API are rejected"""
+        with pytest.raises(ValueError):
+            snapshot_of(load_error_result(result_class))
+
+
+class TestSnapshotDiffer:
+    """Tests for the stateful SnapshotDiffer"""
+    
+    def test_first_update_only_records(self):
+        """Test that the first update does not report every station by default"""
+        differ = SnapshotDiffer()
+        
+        assert differ.update(PricesResult(prices={"a": prices(e5=1.789)})) == []
+        assert differ.get_snapshot() == {"a": prices(e5=1.789)}
+        
+        initial = SnapshotDiffer().update({"a": prices(e5=1.789)}, emit_initial=True)
+        assert [e.change_type for e in initial] == [ChangeType.STATION_APPEARED]
+    
+    def test_subscribers(self):
+        """Test publishing events to subscribers with and without filters"""
+        differ = SnapshotDiffer()
+        received = []
+        price_changes = []
+        unsubscribe = differ.subscribe(received.append)
+        differ.subscribe(price_changes.append, [ChangeType.PRICE_UP, ChangeType.PRICE_DOWN])
+        
+        differ.update(PricesResult(prices={"a": prices(e5=1.789)}))
+        differ.update(PricesResult(prices={"a": prices(status=Status.CLOSED, e5=1.799)}))
+        
+        assert [e.change_type for e in received] == [ChangeType.STATUS_CHANGED, ChangeType.PRICE_UP]
+        assert [e.change_type for e in price_changes] == [ChangeType.PRICE_UP]
+        
+        unsubscribe()
+        differ.update(PricesResult(prices={"a": prices(e5=1.779)}))
+        assert len(received) == 2
+        assert len(price_changes) == 2
+    
+    def test_error_result_keeps_snapshot(self):
+        """Test that a failed poll is ignored instead of reporting disappeared stations"""
+        differ = SnapshotDiffer()
+        received = []
+        differ.subscribe(received.append)
+        differ.update(PricesResult(prices={"a": prices(e5=1.789)}))
+        
+        assert differ.update(load_error_result(PricesResult)) == []
+        assert differ.get_snapshot() == {"a": prices(e5=1.789)}
+        
+        differ.update(PricesResult(prices={"a": prices(e5=1.799)}))
+        assert [e.change_type for e in received] == [ChangeType.PRICE_UP]
@@ -0,0 +1,190 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import statistics
+import time
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.exceptions import RequesterException
+from tankerkoenig.models.gas_prices import GasType, Status
+from tankerkoenig.requests.correction import CorrectionType
+from tankerkoenig.testing import (
+    FakeServerConfig, FakeTankerkoenigServer, StationUniverse, constant_latency, lognormal_latency
+)
+from tankerkoenig.testing.universe import distance_km
+
+BERLIN = (52.52, 13.405)
+
+
+@pytest.fixture(scope="module")
+def universe():
+    return StationUniverse(size=3000, seed=1)
+
+
+@pytest.fixture
+def server(universe):
+    with FakeTankerkoenigServer(universe) as server:
+        yield server
+
+
+def build_api(server, api_key="api-key"):
+    return Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key(api_key).build()
+
+
+class TestStationUniverse:
+    """Tests for the synthetic stations"""
+    
+    def test_reproducible(self, universe):
+        """Test that equal seeds generate equal stations"""
+        assert StationUniverse(size=3000, seed=1).get_station_ids() == universe.get_station_ids()
+        assert StationUniverse(size=3000, seed=2).get_station_ids() != universe.get_station_ids()
+    
+    def test_search(self, universe):
+        """Test that the search finds exactly the stations within the radius, sorted by distance"""
+        found = universe.search(*BERLIN, 25)
+        expected = {station_id for station_id in universe.get_station_ids()
+                    if distance_km(*BERLIN, universe.get_station(station_id).lat,
+                                   universe.get_station(station_id).lng) <= 25}
+        
+        assert {station.id for station, _ in found} == expected
+        assert [dist for _, dist in found] == sorted(dist for _, dist in found)
+    
+    def test_prices_change_per_interval(self, universe):
+        """Test that prices are stable within an interval and change between intervals"""
+        stations = [universe.get_station(station_id) for station_id in universe.get_station_ids()[:20]]
+        
+        assert all(universe.get_prices(s, 600) == universe.get_prices(s, 899) for s in stations)
+        assert any(universe.get_prices(s, 600) != universe.get_prices(s, 900) for s in stations)
+        prices = universe.get_prices(stations[0], 600)
+        assert all(price is None or round(price * 1000) % 10 == 9 for price in prices.values())
+
+
+class TestFakeTankerkoenigServer:
+    """End-to-end tests of the client against the fake server"""
+    
+    def test_list_prices_and_detail(self, server):
+        """Test the GET endpoints through the API client"""
+        api = build_api(server)
+        
+        result = api.list(*BERLIN).set_search_radius(25).execute()
+        assert result.is_ok()
+        stations = result.get_stations()
+        assert len(stations) == len(server.get_universe().search(*BERLIN, 25))
+        
+        ids = [station.id for station in stations[:10]]
+        prices = api.prices().add_ids(*ids).execute()
+        assert prices.is_ok()
+        for station_id in ids:
+            expected = Status.OPEN if server.get_universe().get_station(station_id).is_open else Status.CLOSED
+            assert prices.get_gas_price(station_id).status == expected
+        
+        detail = api.detail(ids[0]).execute()
+        assert detail.is_ok()
+        assert detail.get_station()["id"] == ids[0]
+        assert server.get_stats().requests == {"list.php": 1, "prices.php": 1, "detail.php": 1}
+    
+    def test_prices_match_universe(self, universe):
+        """Test that served prices are derived from the clock of the server"""
+        station = next(universe.get_station(station_id) for station_id in universe.get_station_ids()
+                       if universe.get_station(station_id).is_open and not universe.get_station(station_id).missing)
+        
+        with FakeTankerkoenigServer(universe, clock=lambda: 1200.0) as server:
+            result = build_api(server).prices().add_id(station.id).execute()
+        
+        expected = universe.get_prices(station, 1200.0)
+        assert result.get_gas_price(station.id).get_price(GasType.E5) == expected["e5"]
+    
+    def test_complaint(self, server):
+        """Test the POST endpoint"""
+        api = build_api(server)
+        station_id = server.get_universe().get_station_ids()[0]
+        
+        assert api.correction(station_id, CorrectionType.WRONG_STATUS_OPEN).execute().is_ok()
+        assert not api.correction("unknown", CorrectionType.WRONG_STATUS_OPEN).execute().is_ok()
+        assert server.get_stats().complaints == 1
+    
+    def test_parameter_errors(self, server):
+        """Test that invalid parameters are answered with error responses of the API"""
+        too_many = ",".join(server.get_universe().get_station_ids()[:11])
+        
+        assert server.handle("GET", "prices.php", {"apikey": "key", "ids": too_many})[2]["ok"] is False
+        assert server.handle("GET", "list.php", {"apikey": "key", "lat": "52", "lng": "13", "rad": "30"})[2]["ok"] is False
+        assert server.handle("GET", "prices.php", {"ids": "a"})[2]["ok"] is False
+        assert server.handle("GET", "unknown.php", {"apikey": "key"})[0] == 404
+    
+    def test_api_keys(self, universe):
+        """Test that only the configured API keys are accepted"""
+        with FakeTankerkoenigServer(universe, FakeServerConfig(api_keys=frozenset({"valid"}))) as server:
+            assert build_api(server, "valid").list(*BERLIN).execute().is_ok()
+            assert not build_api(server, "invalid").list(*BERLIN).execute().is_ok()
+    
+    def test_error_injection(self, universe):
+        """Test that injected errors fail the requests"""
+        config = FakeServerConfig(error_rate=0.5, api_error_rate=0.5, seed=3)
+        with FakeTankerkoenigServer(universe, config) as server:
+            api = build_api(server)
+            outcomes = []
+            for _ in range(20):
+                try:
+                    outcomes.append(api.list(*BERLIN).execute().is_ok())
+                except RequesterException:
+                    outcomes.append("http error")
+            stats = server.get_stats()
+        
+        assert True not in outcomes
+        assert outcomes.count("http error") == stats.errors
+        assert outcomes.count(False) == stats.api_errors
+        assert stats.errors > 0 and stats.api_errors > 0
+    
+    def test_rate_limit(self, universe):
+        """Test that requests exceeding the rate limit of an API key are rejected with HTTP 429"""
+        config = FakeServerConfig(rate_limit=0.01, rate_limit_burst=2)
+        with FakeTankerkoenigServer(universe, config) as server:
+            api = build_api(server)
+            api.list(*BERLIN).execute()
+            api.list(*BERLIN).execute()
+            with pytest.raises(RequesterException):
+                api.list(*BERLIN).execute()
+            assert build_api(server, "other-key").list(*BERLIN).execute().is_ok()
+            
+            status, headers, _ = server.handle("GET", "list.php", {"apikey": "api-key"})
+            assert status == 429
+            assert int(headers["Retry-After"]) >= 1
+    
+    def test_latency(self, universe):
+        """Test that responses are delayed by the latency distribution"""
+        with FakeTankerkoenigServer(universe, FakeServerConfig(latency=constant_latency(0.05))) as server:
+            started = time.perf_counter()
+            build_api(server).list(*BERLIN).execute()
+            assert time.perf_counter() - started >= 0.05
+    
+    def test_lognormal_latency(self):
+        """Test that the lognormal distribution is reproducible and centered around the median"""
+        draws = [lognormal_latency(0.1, 0.5, seed=5)() for _ in range(2)]
+        latency = lognormal_latency(0.1, 0.5, seed=5)
+        samples = [latency() for _ in range(2000)]
+        
+        assert draws[0] == draws[1] == samples[0]
+        assert 0.09 < statistics.median(samples) < 0.11
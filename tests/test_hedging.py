@@ -0,0 +1,249 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import threading
+
+import pytest
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import ClientExecutorException, ClientExecutorTimeoutException
+from tankerkoenig.hedging import HedgeBudget, HedgingClientExecutor, HedgingConfig, LatencyTracker
+
+URL = "http://localhost/prices.php"
+
+
+class SlowFirstClientExecutor(ClientExecutor):
+    """ClientExecutor whose first GET call blocks until released, later calls answer at once"""
+    
+    def __init__(self, first_error=None, later_error=None):
+        self.release = threading.Event()
+        self.first_error = first_error
+        self.later_error = later_error
+        self.lock = threading.Lock()
+        self.calls = []
+    
+    def get(self, url, query_parameters, timeout=None):
+        with self.lock:
+            self.calls.append(("GET", url, timeout))
+            call = len(self.calls)
+        if call == 1:
+            self.release.wait(5)
+            if self.first_error is not None:
+                raise self.first_error
+            return "primary"
+        if self.later_error is not None:
+            raise self.later_error
+        return "hedge"
+    
+    def post(self, url, form_params, timeout=None):
+        with self.lock:
+            self.calls.append(("POST", url, timeout))
+        self.release.wait(5)
+        return "posted"
+
+
+CONFIG = HedgingConfig(initial_delay=0.02, min_delay=0.01, budget_ratio=0.0, budget_burst=1.0)
+
+
+@pytest.fixture
+def delegate():
+    delegate = SlowFirstClientExecutor()
+    yield delegate
+    delegate.release.set()
+
+
+class TestLatencyTracker:
+    """Tests for the latency percentile"""
+    
+    def test_percentile(self):
+        """Test the nearest-rank percentile of the window"""
+        tracker = LatencyTracker(100)
+        for latency in range(1, 101):
+            tracker.record(latency / 100)
+        
+        assert tracker.get_percentile(0.5) == 0.5
+        assert tracker.get_percentile(0.95) == 0.95
+        assert tracker.get_percentile(1.0) == 1.0
+    
+    def test_window(self):
+        """Test that only the most recent latencies are kept"""
+        tracker = LatencyTracker(2)
+        assert tracker.get_percentile(0.9) is None
+        for latency in (5.0, 0.1, 0.2):
+            tracker.record(latency)
+        
+        assert tracker.get_count() == 2
+        assert tracker.get_percentile(1.0) == 0.2
+
+
+class TestHedgeBudget:
+    """Tests for the hedge budget"""
+    
+    def test_budget(self):
+        """Test that hedges are earned by requests and capped by the burst"""
+        budget = HedgeBudget(0.5, 1.0)
+        assert budget.try_withdraw()
+        assert not budget.try_withdraw()
+        
+        budget.deposit()
+        assert not budget.try_withdraw()
+        budget.deposit()
+        budget.deposit()
+        assert budget.try_withdraw()
+        assert not budget.try_withdraw()
+
+
+class TestHedgingClientExecutor:
+    """Tests for hedged GET requests"""
+    
+    def test_fast_response_is_not_hedged(self):
+        """Test that a response within the delay sends a single call"""
+        delegate = SlowFirstClientExecutor()
+        delegate.release.set()
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        
+        assert executor.get(URL, {"ids": "a"}) == "primary"
+        assert len(delegate.calls) == 1
+        assert executor.get_metrics().hedges == 0
+    
+    def test_slow_response_is_hedged(self, delegate):
+        """Test that the hedge answers if the primary call is slow"""
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        hedged = []
+        executor.add_listener(hedged.append)
+        
+        assert executor.get(URL, {"ids": "a"}) == "hedge"
+        assert len(delegate.calls) == 2
+        assert hedged == ["prices.php"]
+        metrics = executor.get_metrics()
+        assert (metrics.requests, metrics.hedges, metrics.hedge_wins) == (1, 1, 1)
+    
+    def test_budget_limits_hedges(self, delegate):
+        """Test that no hedge is sent once the budget is exhausted"""
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        executor.get(URL, {"ids": "a"})
+        
+        delegate.calls.clear()
+        delegate.release.clear()
+        threading.Timer(0.1, delegate.release.set).start()
+        
+        assert executor.get(URL, {"ids": "a"}) == "primary"
+        assert len(delegate.calls) == 1
+        assert executor.get_metrics().budget_exhausted == 1
+    
+    def test_failed_hedge_waits_for_primary(self):
+        """Test that a failing hedge does not fail the request"""
+        delegate = SlowFirstClientExecutor(later_error=ClientExecutorException(URL, "connection reset"))
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        threading.Timer(0.1, delegate.release.set).start()
+        
+        assert executor.get(URL, {"ids": "a"}) == "primary"
+        assert executor.get_metrics().hedge_wins == 0
+    
+    def test_both_calls_failing(self):
+        """Test that the exception of the primary call is raised if both calls fail"""
+        first_error = ClientExecutorException(URL, "timeout")
+        delegate = SlowFirstClientExecutor(first_error=first_error,
+                                           later_error=ClientExecutorException(URL, "connection reset"))
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        threading.Timer(0.1, delegate.release.set).start()
+        
+        with pytest.raises(ClientExecutorException) as exc_info:
+            executor.get(URL, {"ids": "a"})
+        assert exc_info.value is first_error
+    
+    def test_post_is_never_hedged(self):
+        """Test that POST requests are sent exactly once"""
+        delegate = SlowFirstClientExecutor()
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        threading.Timer(0.1, delegate.release.set).start()
+        
+        assert executor.post("http://localhost/complaint.php", {"id": "a"}) == "posted"
+        assert len(delegate.calls) == 1
+        assert executor.get_metrics().requests == 0
+    
+    def test_endpoint_filter(self, delegate):
+        """Test that only the configured endpoints are hedged"""
+        config = HedgingConfig(initial_delay=0.02, endpoints=frozenset({"prices.php"}))
+        executor = HedgingClientExecutor(delegate, config)
+        threading.Timer(0.1, delegate.release.set).start()
+        
+        assert executor.get("http://localhost/list.php", {}) == "primary"
+        assert len(delegate.calls) == 1
+    
+    def test_hedge_delay_follows_percentile(self):
+        """Test that the delay is the latency percentile once enough samples exist"""
+        config = HedgingConfig(percentile=0.9, initial_delay=0.3, min_delay=0.01, max_delay=0.5, min_samples=10)
+        executor = HedgingClientExecutor(SlowFirstClientExecutor(), config)
+        tracker = executor.get_latency_tracker(URL)
+        
+        for latency in range(1, 10):
+            tracker.record(latency / 100)
+        assert executor.get_hedge_delay(URL) == 0.3
+        
+        tracker.record(0.10)
+        assert executor.get_hedge_delay(URL) == 0.09
+        
+        tracker.record(2.0)
+        tracker.record(2.0)
+        assert executor.get_hedge_delay(URL) == 0.5
+    
+    def test_timeout_is_forwarded(self, delegate):
+        """Test that the hedge is sent with the remaining time of the timeout"""
+        executor = HedgingClientExecutor(delegate, CONFIG)
+        
+        executor.get(URL, {"ids": "a"}, timeout=2)
+        
+        assert 0 < delegate.calls[0][2] <= 2
+        assert 0 < delegate.calls[1][2] < delegate.calls[0][2]
+    
+    def test_expired_timeout_is_not_sent(self, delegate):
+        """Test that no call, and in particular no hedge with a zero timeout, is sent once
+        the timeout expired while the call waited for a free thread"""
+        now = [0.0]
+        executor = HedgingClientExecutor(delegate, HedgingConfig(initial_delay=0.05, max_workers=1),
+                                          clock=lambda: now[0])
+        blocker = threading.Event()
+        executor._pool.submit(blocker.wait, 5)
+        
+        def expire():
+            now[0] = 10.0
+            blocker.set()
+        threading.Timer(0.01, expire).start()
+        
+        with pytest.raises(ClientExecutorTimeoutException):
+            executor.get(URL, {"ids": "a"}, timeout=1.0)
+        assert delegate.calls == []
+        assert executor.get_metrics().hedges == 0
+    
+    def test_latency_includes_waiting_for_a_thread(self):
+        """Test that the recorded latency is measured from the submission of the call"""
+        delegate = SlowFirstClientExecutor()
+        delegate.release.set()
+        executor = HedgingClientExecutor(delegate, HedgingConfig(budget_burst=0.0, max_workers=1))
+        blocker = threading.Event()
+        executor._pool.submit(blocker.wait, 5)
+        threading.Timer(0.1, blocker.set).start()
+        
+        assert executor.get(URL, {"ids": "a"}) == "primary"
+        assert executor.get_latency_tracker(URL).get_percentile(0.5) >= 0.09
@@ -0,0 +1,210 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import os
+import random
+
+import pytest
+from tankerkoenig.history import PriceHistory, PriceSeries, PriceChange, to_tenth_cents, from_tenth_cents
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.models.results import PricesResult, StationListResult
+from tankerkoenig.models.station import Station
+
+
+def load_error_result(result_class):
+    """Maps the error response resource to the result class"""
+    with open(os.path.join(os.path.dirname(__file__), "resources", "error.json"), "r") as f:
+        return JsonMapper().from_json(f.read(), result_class)
+
+
+class TestTenthCents:
+    """Tests for the fixed-point price conversion"""
+    
+    def test_conversion(self):
+        """Test converting prices to tenth-cents and back"""
+        assert to_tenth_cents(1.789) == 1789
+        assert to_tenth_cents(1.009) == 1009
+        assert from_tenth_cents(1789) == 1.789
+
+
+class TestPriceSeries:
+    """Tests for the PriceSeries ring buffer"""
+    
+    def test_only_changes_are_stored(self):
+        """Test that unchanged prices only extend the latest entry"""
+        series = PriceSeries()
+        
+        assert series.add(100, 1.789) is True
+        assert series.add(400, 1.789) is False
+        assert series.add(700, 1.799) is True
+        
+        assert len(series) == 2
+        assert series.get_last() == 1.799
+        assert series.get_last_seen() == 700
+        assert list(series) == [(100, 1.789), (700, 1.799)]
+    
+    def test_min_max_mean(self):
+        """Test min, max and the time weighted mean"""
+        series = PriceSeries()
+        series.add(0, 1.800)
+        series.add(100, 1.700)
+        series.add(400, 1.900)
+        
+        assert series.get_min() == 1.7
+        assert series.get_max() == 1.9
+        # 100s at 1.8 and 300s at 1.7, then 1.9 from 400s on
+        assert series.get_mean() == pytest.approx(1.725)
+        assert series.get_mean(until=500) == pytest.approx((180 + 510 + 190) / 500)
+    
+    def test_last_change(self):
+        """Test the latest price change"""
+        series = PriceSeries()
+        series.add(0, 1.800)
+        assert series.get_last_change() is None
+        
+        series.add(100, 1.750)
+        change = series.get_last_change()
+        assert change == PriceChange(timestamp=100, previous=1.8, current=1.75)
+        assert change.get_delta() == -0.05
+    
+    def test_price_at(self):
+        """Test looking up the price valid at a timestamp"""
+        series = PriceSeries()
+        series.add(100, 1.800)
+        series.add(200, 1.700)
+        series.add(300, 1.600)
+        
+        assert series.get_price_at(50) is None
+        assert series.get_price_at(100) == 1.8
+        assert series.get_price_at(250) == 1.7
+        assert series.get_price_at(1000) == 1.6
+    
+    def test_ring_buffer_eviction(self):
+        """Test that the oldest changes are overwritten and aggregates stay correct"""
+        series = PriceSeries(capacity=3)
+        for i, price in enumerate([1.500, 1.900, 1.600, 1.700, 1.800]):
+            series.add(i * 100, price)
+        
+        assert list(series) == [(200, 1.6), (300, 1.7), (400, 1.8)]
+        assert series.get_min() == 1.6
+        assert series.get_max() == 1.8
+        assert series.get_mean() == pytest.approx(1.65)
+        assert series.get_price_at(250) == 1.6
+        assert series.get_price_at(150) is None
+    
+    def test_min_max_under_eviction(self):
+        """Test that min and max match the stored prices while changes are evicted"""
+        rng = random.Random(42)
+        for capacity in (1, 2, 5):
+            series = PriceSeries(capacity=capacity)
+            for i in range(300):
+                series.add(i, rng.choice([1.5, 1.6, 1.7, 1.8, 1.9]))
+                prices = [price for _, price in series]
+                assert series.get_min() == min(prices)
+                assert series.get_max() == max(prices)
+    
+    def test_rejects_invalid_samples(self):
+        """Test that out of order samples and invalid prices are rejected"""
+        series = PriceSeries()
+        series.add(100, 1.800)
+        
+        with pytest.raises(ValueError):
+            series.add(50, 1.700)
+        with pytest.raises(ValueError):
+            series.add(200, 0)
+        with pytest.raises(ValueError):
+            PriceSeries(capacity=0)
+
+
+class TestPriceHistory:
+    """Tests for PriceHistory"""
+    
+    def test_add_prices_result(self):
+        """Test feeding the history with PricesResults"""
+        history = PriceHistory()
+        first = PricesResult(prices={
+            "station-a": GasPrices(prices={GasType.E5: 1.789, GasType.DIESEL: 1.659}, status=Status.OPEN),
+            "station-b": GasPrices(prices={}, status=Status.CLOSED),
+        })
+        second = PricesResult(prices={
+            "station-a": GasPrices(prices={GasType.E5: 1.779, GasType.DIESEL: 1.659}, status=Status.OPEN),
+        })
+        
+        assert history.add_prices_result(first, timestamp=1000) == 2
+        assert history.add_prices_result(second, timestamp=1300) == 1
+        
+        assert "station-a" in history
+        assert "station-b" not in history
+        assert history.get_min("station-a", GasType.E5) == 1.779
+        assert history.get_max("station-a", GasType.E5) == 1.789
+        assert history.get_last_change("station-a", GasType.E5).current == 1.779
+        assert history.get_last_change("station-a", GasType.DIESEL) is None
+        assert history.get_mean("station-a", GasType.E10) is None
+    
+    def test_add_station_list_result(self):
+        """Test feeding the history with StationListResults"""
+        history = PriceHistory()
+        all_prices = StationListResult(stations=[
+            Station(id="station-a", gas_prices=GasPrices(prices={GasType.E10: 1.729}, status=Status.OPEN)),
+        ])
+        single_price = StationListResult(stations=[
+            Station(id="station-b", price=1.649),
+            Station(id="station-c"),
+        ])
+        
+        assert history.add_station_list_result(all_prices, timestamp=1000) == 1
+        assert history.add_station_list_result(single_price, timestamp=1000) == 0
+        assert history.add_station_list_result(single_price, timestamp=1000, gas_type=GasType.DIESEL) == 1
+        
+        assert history.get_series("station-a", GasType.E10).get_last() == 1.729
+        assert history.get_series("station-b", GasType.DIESEL).get_last() == 1.649
+        assert set(history.get_station_ids()) == {"station-a", "station-b"}
+        assert len(history) == 2
+    
+    def test_error_results_are_skipped(self):
+        """Test that error responses of the API, which carry no prices, are skipped"""
+        history = PriceHistory()
+        
+        assert history.add_prices_result(load_error_result(PricesResult), timestamp=1000) == 0
+        assert history.add_station_list_result(load_error_result(StationListResult), timestamp=1000) == 0
+        assert len(history) == 0
+    
+    def test_invalid_samples_are_skipped_and_counted(self):
+        """Test that invalid samples do not abort a result halfway through"""
+        history = PriceHistory()
+        history.add_prices_result(PricesResult(prices={
+            "station-a": GasPrices(prices={GasType.E5: 1.789}, status=Status.OPEN),
+        }), timestamp=1000)
+        
+        result = PricesResult(prices={
+            "station-a": GasPrices(prices={GasType.E5: 1.779, GasType.DIESEL: 99.9}, status=Status.OPEN),
+            "station-b": GasPrices(prices={GasType.E10: 1.729}, status=Status.OPEN),
+        })
+        
+        assert history.add_prices_result(result, timestamp=900) == 1
+        assert history.get_rejected_count() == 2
+        assert history.get_series("station-a", GasType.E5).get_last() == 1.789
+        assert history.get_series("station-a", GasType.DIESEL) is None
+        assert history.get_series("station-b", GasType.E10).get_last() == 1.729
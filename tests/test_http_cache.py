@@ -0,0 +1,254 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.circuit_breaker import CircuitBreakerClientExecutor
+from tankerkoenig.client import CachingClientExecutor, ClientExecutor, RequestsClientExecutor
+from tankerkoenig.http_cache import HttpCache, ResultMemo, cache_key
+from tankerkoenig.models.results import PricesResult, StationDetailResult
+from tankerkoenig.testing import FakeServerConfig, FakeTankerkoenigServer, StationUniverse
+
+
+class PlainClientExecutor(ClientExecutor):
+    """ClientExecutor without support for conditional requests"""
+    
+    def __init__(self, delegate):
+        self.delegate = delegate
+    
+    def get(self, url, query_parameters):
+        return self.delegate.get(url, query_parameters)
+    
+    def post(self, url, form_params):
+        return self.delegate.post(url, form_params)
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(scope="module")
+def universe():
+    return StationUniverse(size=100, seed=5)
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def server(universe, clock):
+    with FakeTankerkoenigServer(universe, clock=clock) as server:
+        yield server
+
+
+@pytest.fixture
+def cache():
+    with HttpCache(":memory:") as cache:
+        yield cache
+
+
+def detail_parameters(server, index=0):
+    return {"apikey": "api-key", "id": server.get_universe().get_station_ids()[index]}
+
+
+class TestHttpCache:
+    """Tests for the persistent response cache"""
+    
+    def test_cache_key(self):
+        """Test that the key ignores the API key, timestamp and empty parameters"""
+        assert cache_key("u", {"id": "1", "apikey": "a", "ts": 1, "empty": ""}) == cache_key("u", {"id": "1", "apikey": "b"})
+        assert cache_key("u", {"id": "1"}) != cache_key("u", {"id": "2"})
+    
+    def test_put_and_get(self, cache):
+        """Test that responses with validators are stored"""
+        assert cache.put("key", "body", '"tag"', "Mon, 01 Jan 2024 00:00:00 GMT")
+        entry = cache.get("key")
+        assert entry.body == "body"
+        assert entry.get_conditional_headers() == {
+            "If-None-Match": '"tag"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"
+        }
+        assert cache.get("other") is None
+    
+    def test_without_validators(self, cache):
+        """Test that responses without validators are not stored"""
+        assert not cache.put("key", "body", None, None)
+        assert cache.get("key") is None
+    
+    def test_revalidation(self, clock):
+        """Test that revalidations are counted and refresh the entry"""
+        with HttpCache(":memory:", clock=clock) as cache:
+            cache.put("key", "body", '"tag"', None)
+            clock.now += 60
+            cache.record_revalidation("key", not_modified=True)
+            cache.record_revalidation("key", not_modified=False)
+            
+            assert cache.get("key").stored_at == clock.now
+            stats = cache.get_stats()
+            assert (stats.entries, stats.revalidations, stats.not_modified) == (1, 2, 1)
+    
+    def test_persistent(self, tmp_path):
+        """Test that entries survive reopening the database"""
+        path = str(tmp_path / "cache.sqlite")
+        with HttpCache(path) as cache:
+            cache.put("key", "body", '"tag"', None)
+        with HttpCache(path) as cache:
+            assert cache.get("key").etag == '"tag"'
+    
+    def test_remove_and_clear(self, cache):
+        """Test that entries can be removed"""
+        cache.put("a", "body", '"a"', None)
+        cache.put("b", "body", '"b"', None)
+        cache.remove("a")
+        assert cache.get("a") is None
+        cache.clear()
+        assert cache.get_stats().entries == 0
+
+
+class TestCachingClientExecutor:
+    """Tests for conditional requests against the fake server"""
+    
+    def test_not_modified(self, server, cache):
+        """Test that an unchanged detail response is answered from the cache"""
+        lookups = []
+        cache.add_listener(lookups.append)
+        executor = CachingClientExecutor(RequestsClientExecutor(), cache)
+        url = server.get_base_url() + "detail.php"
+        first = executor.get(url, detail_parameters(server))
+        second = executor.get(url, dict(detail_parameters(server), apikey="other-key"))
+        
+        assert first == second
+        assert lookups == [False, True]
+        assert server.get_stats().not_modified == 1
+        stats = cache.get_stats()
+        assert (stats.entries, stats.revalidations, stats.not_modified) == (1, 1, 1)
+    
+    def test_modified(self, server, cache, clock):
+        """Test that a changed response replaces the cached one"""
+        executor = CachingClientExecutor(RequestsClientExecutor(), cache)
+        url = server.get_base_url() + "detail.php"
+        first = executor.get(url, detail_parameters(server))
+        clock.now += 3600
+        second = executor.get(url, detail_parameters(server))
+        
+        assert first != second
+        assert server.get_stats().not_modified == 0
+        assert cache.get(cache_key(url, detail_parameters(server))).body == second
+    
+    def test_other_endpoints(self, server, cache):
+        """Test that only the configured endpoints are cached"""
+        executor = CachingClientExecutor(RequestsClientExecutor(), cache)
+        executor.get(server.get_base_url() + "prices.php", {"apikey": "api-key", "ids": server.get_universe().get_station_ids()[0]})
+        assert cache.get_stats().entries == 0
+    
+    def test_without_etags(self, universe, cache):
+        """Test that responses without validators are not cached"""
+        with FakeTankerkoenigServer(universe, FakeServerConfig(etags=False)) as server:
+            CachingClientExecutor(RequestsClientExecutor(), cache).get(server.get_base_url() + "detail.php", detail_parameters(server))
+        assert cache.get_stats().entries == 0
+
+
+class TestResultMemo:
+    """Tests for the memo of mapped results"""
+    
+    def test_lru(self):
+        """Test that the least recently used entry is evicted"""
+        memo = ResultMemo(max_entries=2)
+        keys = [ResultMemo.get_key(body, StationDetailResult) for body in ("a", "b", "c")]
+        memo.put(keys[0], "A")
+        memo.put(keys[1], "B")
+        assert memo.get(keys[0]) == "A"
+        memo.put(keys[2], "C")
+        
+        assert memo.get(keys[1]) is None
+        assert memo.get(keys[0]) == "A"
+        stats = memo.get_stats()
+        assert (stats.entries, stats.hits, stats.misses) == (2, 2, 1)
+    
+    def test_result_classes(self):
+        """Test that only the configured result classes are memoized"""
+        memo = ResultMemo(result_classes=(StationDetailResult,))
+        assert memo.is_memoized(StationDetailResult)
+        assert not memo.is_memoized(PricesResult)
+        assert ResultMemo().is_memoized(PricesResult)
+    
+    def test_key(self):
+        """Test that the key depends on the body and the result class"""
+        assert ResultMemo.get_key("a", StationDetailResult) == ResultMemo.get_key("a", StationDetailResult)
+        assert ResultMemo.get_key("a", StationDetailResult) != ResultMemo.get_key("a", PricesResult)
+        assert ResultMemo.get_key("a", StationDetailResult) != ResultMemo.get_key("b", StationDetailResult)
+
+
+class TestApiBuilder:
+    """Tests for the cache options of the ApiBuilder"""
+    
+    def test_memoized_detail(self, server, cache):
+        """Test that an unchanged detail response is neither transferred nor mapped again"""
+        memo = ResultMemo()
+        api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key") \
+            .with_http_cache(cache).with_result_memo(memo).build()
+        station_id = server.get_universe().get_station_ids()[0]
+        
+        first = api.detail(station_id).execute()
+        second = api.detail(station_id).execute()
+        
+        assert first.is_ok()
+        assert second is first
+        assert server.get_stats().not_modified == 1
+        assert memo.get_stats().hits == 1
+    
+    def test_memo_without_cache(self, server):
+        """Test that identical bodies are not mapped again without the HTTP cache"""
+        api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key") \
+            .with_result_memo().build()
+        station_id = server.get_universe().get_station_ids()[0]
+        
+        assert api.detail(station_id).execute() is api.detail(station_id).execute()
+        assert api.prices().add_id(station_id).execute() is not api.prices().add_id(station_id).execute()
+    
+    def test_custom_executor(self, server, cache):
+        """Test that the HTTP cache wraps a custom executor, e.g. a circuit breaker"""
+        executor = CircuitBreakerClientExecutor(RequestsClientExecutor())
+        api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key") \
+            .with_client_executor(executor).with_http_cache(cache).build()
+        station_id = server.get_universe().get_station_ids()[0]
+        
+        assert api.detail(station_id).execute().is_ok()
+        assert api.detail(station_id).execute().is_ok()
+        assert server.get_stats().not_modified == 1
+        assert executor.get_metrics()[server.get_base_url() + "detail.php"].calls == 2
+    
+    def test_executor_without_conditional_requests(self, server, cache):
+        """Test that executors without conditional requests work, without caching"""
+        api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key") \
+            .with_client_executor(PlainClientExecutor(RequestsClientExecutor())).with_http_cache(cache).build()
+        station_id = server.get_universe().get_station_ids()[0]
+        
+        assert api.detail(station_id).execute().is_ok()
+        assert cache.get_stats().entries == 0
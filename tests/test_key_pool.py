@@ -0,0 +1,171 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.exceptions import NoApiKeyAvailableException, RequestTimeoutException
+from tankerkoenig.key_pool import ApiKeyPool, BalancingStrategy, mask_api_key
+from tankerkoenig.rate_limiter import RateLimiter
+from tankerkoenig.testing import FakeServerConfig, FakeTankerkoenigServer, StationUniverse
+
+
+class FakeClock:
+    """Manually advanced monotonic clock, whose sleep advances the time"""
+    
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+    
+    def __call__(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter:
+    """Tests for the token bucket"""
+    
+    def test_burst_and_rate(self):
+        """Test that a full bucket permits the burst, afterwards the rate applies"""
+        clock = FakeClock()
+        limiter = RateLimiter(2.0, burst=2, clock=clock, sleep=clock.sleep)
+        
+        assert limiter.try_acquire() and limiter.try_acquire()
+        assert not limiter.try_acquire()
+        assert limiter.get_wait_time() == 0.5
+        
+        limiter.acquire()
+        assert clock.sleeps == [0.5]
+    
+    def test_deadline(self):
+        """Test that waiting longer than the deadline is refused"""
+        clock = FakeClock()
+        limiter = RateLimiter(0.1, clock=clock, sleep=clock.sleep)
+        limiter.acquire()
+        
+        with pytest.raises(RequestTimeoutException):
+            limiter.acquire(Deadline(5, clock=clock))
+        assert clock.sleeps == []
+
+
+class TestApiKeyPool:
+    """Tests for the selection of pooled keys"""
+    
+    def test_round_robin(self):
+        """Test that the keys take turns"""
+        pool = ApiKeyPool(["key-a", "key-b", "key-c", "key-a"])
+        
+        keys = []
+        for _ in range(6):
+            keys.append(pool.acquire())
+            pool.release(keys[-1])
+        
+        assert keys == ["key-a", "key-b", "key-c"] * 2
+    
+    def test_round_robin_skips_rate_limited_keys(self):
+        """Test that a key which would have to wait is skipped"""
+        clock = FakeClock()
+        pool = ApiKeyPool(["key-a", "key-b"], rate_limit=1.0, clock=clock, sleep=clock.sleep)
+        
+        first = [pool.acquire() for _ in range(2)]
+        clock.now += 0.5
+        third = pool.acquire()
+        
+        assert first == ["key-a", "key-b"]
+        assert third == "key-a"
+        assert clock.sleeps == [0.5]
+    
+    def test_least_loaded(self):
+        """Test that the key with the fewest requests in flight is selected"""
+        pool = ApiKeyPool(["key-a", "key-b"], BalancingStrategy.LEAST_LOADED)
+        
+        first = pool.acquire()
+        second = pool.acquire()
+        pool.release(first)
+        
+        assert {first, second} == {"key-a", "key-b"}
+        assert pool.acquire() == first
+    
+    def test_auth_error_cooldown(self):
+        """Test that a key is out of rotation for the cooldown after an authentication error"""
+        clock = FakeClock()
+        pool = ApiKeyPool(["key-a", "key-b"], auth_error_cooldown=60, clock=clock)
+        
+        pool.release(pool.acquire(), auth_error=True)
+        assert [pool.acquire() for _ in range(3)] == ["key-b"] * 3
+        
+        clock.now += 60
+        assert "key-a" in [pool.acquire() for _ in range(2)]
+    
+    def test_no_key_available(self):
+        """Test that an exception is raised if every key is out of rotation"""
+        clock = FakeClock()
+        pool = ApiKeyPool(["key-a"], auth_error_cooldown=60, clock=clock)
+        pool.release(pool.acquire(), auth_error=True)
+        clock.now += 20
+        
+        with pytest.raises(NoApiKeyAvailableException) as exc_info:
+            pool.acquire()
+        assert exc_info.value.get_retry_after() == 40
+    
+    def test_stats_mask_keys(self):
+        """Test that the statistics don't reveal the keys"""
+        pool = ApiKeyPool(["00000000-0000-0000-0000-000000000002"])
+        pool.acquire()
+        
+        stats = pool.get_stats()[0]
+        assert stats.key_id == mask_api_key("00000000-0000-0000-0000-000000000002")
+        assert stats.key_id.endswith("0002") and "0000-0000" not in stats.key_id
+        assert (stats.requests, stats.in_flight, stats.is_available()) == (1, 1, True)
+
+
+class TestApiKeyPoolRequests:
+    """End-to-end tests of pooled keys against the fake server"""
+    
+    def test_requests_are_distributed(self):
+        """Test that the requests are sent with every key of the pool"""
+        pool = ApiKeyPool(["key-a", "key-b"])
+        with FakeTankerkoenigServer(StationUniverse(size=100)) as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key_pool(pool).build()
+            for _ in range(4):
+                assert api.list(52.52, 13.40).execute().is_ok()
+        
+        assert [stats.requests for stats in pool.get_stats()] == [2, 2]
+        assert all(stats.in_flight == 0 for stats in pool.get_stats())
+    
+    def test_rejected_key_is_taken_out_of_rotation(self):
+        """Test that a key rejected by the API is not used for the following requests"""
+        pool = ApiKeyPool(["revoked", "valid"])
+        config = FakeServerConfig(api_keys=frozenset({"valid"}))
+        with FakeTankerkoenigServer(StationUniverse(size=100), config) as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key_pool(pool).build()
+            outcomes = [api.list(52.52, 13.40).execute().is_ok() for _ in range(4)]
+        
+        assert outcomes == [False, True, True, True]
+        revoked, valid = pool.get_stats()
+        assert (revoked.auth_errors, revoked.is_available()) == (1, False)
+        assert valid.requests == 3
@@ -109,3 +109,61 @@ class TestJsonMapper:
         assert station.overriding_opening_times is not None
         assert len(station.overriding_opening_times) == 2
 
+    
+    def test_deserialize_opening_times_from_detail(self):
+        """Test parsing the opening time texts of the detail JSON response"""
+        with open(get_resource_path("detail.json"), "r") as f:
+            json_data = json.load(f)
+        
+        mapper = JsonMapper()
+        station = mapper._deserialize_station(json_data["station"])
+        
+        assert [ot.days for ot in station.opening_times] == [(1, 2), (3, 4), (5,), (6, 7)]
+        assert [ot.includes_holidays for ot in station.opening_times] == [False, False, False, True]
+        assert station.opening_times[0].start == "05:00:00"
+        assert station.opening_times[0].end == "23:00:00"
+    
+    def test_deserialize_opening_time_daily(self):
+        """Test parsing the fixed daily opening time texts"""
+        mapper = JsonMapper()
+        
+        daily = mapper._deserialize_opening_time({"text": "täglich"})
+        assert daily.days == (1, 2, 3, 4, 5, 6, 7)
+        assert daily.includes_holidays is True
+        
+        except_holidays = mapper._deserialize_opening_time({"text": "täglich ausser Feiertag"})
+        assert except_holidays.days == (1, 2, 3, 4, 5, 6, 7)
+        assert except_holidays.includes_holidays is False
+        
+        except_sundays = mapper._deserialize_opening_time({"text": "täglich ausser Sonn- und Feiertagen"})
+        assert except_sundays.days == (1, 2, 3, 4, 5, 6)
+        assert except_sundays.includes_holidays is False
+    
+    def test_deserialize_opening_time_unparseable(self):
+        """Test that unknown opening time texts result in no days"""
+        mapper = JsonMapper()
+        opening_time = mapper._deserialize_opening_time({"text": "nach Vereinbarung"})
+        
+        assert opening_time.text == "nach Vereinbarung"
+        assert opening_time.days is None
+        assert opening_time.includes_holidays is False
+    
+    def test_deserialize_opening_time_shares_days(self):
+        """Test that equal opening time texts share the same immutable day tuple"""
+        mapper = JsonMapper()
+        first = mapper._deserialize_opening_time({"text": "Mo-Fr", "start": "06:00:00", "end": "22:00:00"})
+        second = mapper._deserialize_opening_time({"text": "Mo-Fr", "start": "07:00:00", "end": "21:00:00"})
+        
+        assert first.days == (1, 2, 3, 4, 5)
+        assert first.days is second.days
+        assert second.start == "07:00:00"
+    
+    def test_parse_days(self):
+        """Test parsing day ranges, lists and single days"""
+        mapper = JsonMapper()
+        
+        assert mapper._parse_days("Mo-Mi") == [1, 2, 3]
+        assert mapper._parse_days("Sa, So") == [6, 7]
+        assert mapper._parse_days("Donnerstag") == [4]
+        with pytest.raises(ValueError):
+            mapper._parse_days("Mo-Irgendwann")
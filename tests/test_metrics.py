@@ -0,0 +1,203 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import urllib.request
+
+import pytest
+from tankerkoenig.circuit_breaker import CircuitState
+from tankerkoenig.http_cache import ResultMemo
+from tankerkoenig.instrumentation import RequestTrace, Span, Stage, TraceStatus
+from tankerkoenig.metrics import (
+    ClientMetrics, Counter, Gauge, Histogram, MetricsRegistry, start_http_server, write_textfile
+)
+from tankerkoenig.models.results import PricesResult
+
+
+class TestMetrics:
+    """Tests for counters, gauges and histograms"""
+    
+    def test_counter(self):
+        """Test incrementing and rendering a counter"""
+        counter = Counter("requests_total", "Requests", ("endpoint",))
+        counter.inc(endpoint="list.php")
+        counter.inc(2, endpoint="list.php")
+        
+        assert counter.get(endpoint="list.php") == 3
+        assert counter.render() == [
+            "# HELP requests_total Requests",
+            "# TYPE requests_total counter",
+            'requests_total{endpoint="list.php"} 3',
+        ]
+        with pytest.raises(ValueError):
+            counter.inc(-1, endpoint="list.php")
+        with pytest.raises(ValueError):
+            counter.inc(other="label")
+    
+    def test_gauge(self):
+        """Test setting a gauge and escaping label values"""
+        gauge = Gauge("state", "State", ("name",))
+        gauge.set(2, name='a "quoted"\nname')
+        
+        assert gauge.render()[-1] == 'state{name="a \\"quoted\\"\\nname"} 2'
+    
+    def test_histogram(self):
+        """Test cumulative buckets, sum and count of a histogram"""
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5.0):
+            histogram.observe(value)
+        
+        assert histogram.get_count() == 4
+        assert histogram.get_sum() == pytest.approx(6.05)
+        assert histogram.render()[2:] == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            "latency_seconds_sum 6.05",
+            "latency_seconds_count 4",
+        ]
+    
+    def test_histogram_bucket_bounds(self):
+        """Test that the upper bounds are inclusive and larger values are counted in +Inf"""
+        histogram = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.1, 1.0, 1.5, float("nan")):
+            histogram.observe(value)
+        
+        assert histogram.render()[2:5] == [
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1"} 2',
+            'latency_seconds_bucket{le="+Inf"} 4',
+        ]
+    
+    def test_registry(self):
+        """Test that the registry returns existing metrics and rejects type conflicts"""
+        registry = MetricsRegistry()
+        counter = registry.counter("calls_total", "Calls")
+        
+        assert registry.counter("calls_total", "Calls") is counter
+        with pytest.raises(ValueError):
+            registry.gauge("calls_total", "Calls")
+        
+        counter.inc()
+        assert registry.render() == "# HELP calls_total Calls\n# TYPE calls_total counter\ncalls_total 1\n"
+
+
+class TestClientMetrics:
+    """Tests for the standard client metrics"""
+    
+    def test_on_request(self):
+        """Test recording request traces"""
+        metrics = ClientMetrics()
+        trace = RequestTrace("prices.php", "GET", start=1000.0, status=TraceStatus.OK, response_size=120,
+                             duration=0.2, spans=[Span(Stage.HTTP, 1000.0, 0.15), Span(Stage.MAP, 1000.15, 0.01)])
+        
+        metrics.on_request(trace)
+        
+        assert metrics.requests.get(endpoint="prices.php", status="ok") == 1
+        assert metrics.request_duration.get_count(endpoint="prices.php") == 1
+        assert metrics.stage_duration.get_sum(endpoint="prices.php", stage="map") == pytest.approx(0.01)
+        assert metrics.response_bytes.get(endpoint="prices.php") == 120
+    
+    def test_cache_retry_and_sink_metrics(self):
+        """Test the record methods for caches, retries and sinks"""
+        metrics = ClientMetrics()
+        
+        metrics.record_cache_lookup(True, cache="detail")
+        metrics.record_cache_lookup(False, cache="detail")
+        metrics.record_cache_lookup(True, cache="detail")
+        metrics.record_retry("prices.php")
+        with metrics.time_sink_flush("influxdb"):
+            pass
+        
+        assert metrics.cache_hit_ratio.get(cache="detail") == pytest.approx(2 / 3)
+        assert metrics.retries.get(endpoint="prices.php") == 1
+        assert metrics.sink_flush_duration.get_count(sink="influxdb") == 1
+    
+    def test_circuit_breaker_transitions(self):
+        """Test recording circuit breaker transitions"""
+        metrics = ClientMetrics()
+        listeners = []
+        
+        class Executor:
+            def add_listener(self, listener):
+                listeners.append(listener)
+        
+        metrics.attach_circuit_breaker(Executor())
+        listeners[0]("prices.php", CircuitState.CLOSED, CircuitState.OPEN)
+        
+        assert metrics.circuit_state.get(endpoint="prices.php") == 2
+        assert metrics.circuit_transitions.get(endpoint="prices.php", state="open") == 1
+
+
+    def test_attached_hedging_and_caches(self):
+        """Test recording hedges as retries and the lookups of attached caches"""
+        metrics = ClientMetrics()
+        listeners = []
+        
+        class Executor:
+            def add_listener(self, listener):
+                listeners.append(listener)
+        
+        memo = ResultMemo()
+        key = ResultMemo.get_key("body", PricesResult)
+        metrics.attach_hedging(Executor())
+        metrics.attach_cache(memo, "memo")
+        listeners[0]("prices.php")
+        memo.get(key)
+        memo.put(key, "result")
+        memo.get(key)
+        
+        assert metrics.retries.get(endpoint="prices.php") == 1
+        assert metrics.cache_requests.get(cache="memo", result="hit") == 1
+        assert metrics.cache_hit_ratio.get(cache="memo") == pytest.approx(0.5)
+
+
+class TestExposition:
+    """Tests for exposing the metrics"""
+    
+    def test_http_server(self):
+        """Test serving the metrics over HTTP"""
+        registry = MetricsRegistry()
+        registry.counter("calls_total", "Calls").inc()
+        server = start_http_server(0, registry, address="127.0.0.1")
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url, timeout=5) as response:
+                body = response.read().decode("utf-8")
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+        
+        assert "calls_total 1" in body
+        assert content_type.startswith("text/plain")
+    
+    def test_write_textfile(self, tmp_path):
+        """Test writing the metrics to a file"""
+        registry = MetricsRegistry()
+        registry.gauge("up", "Up").set(1)
+        path = tmp_path / "tankerkoenig.prom"
+        
+        write_textfile(str(path), registry)
+        
+        assert path.read_text(encoding="utf-8").endswith("up 1\n")
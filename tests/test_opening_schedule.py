@@ -0,0 +1,156 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from tankerkoenig.models.opening_schedule import OpeningSchedule, open_mask, filter_open
+from tankerkoenig.models.station import Station, OpeningTime
+
+# 2026-10-19 is a Monday
+MONDAY = datetime(2026, 10, 19)
+
+
+def at(day_offset, hour, minute=0):
+    """Returns a naive datetime relative to MONDAY"""
+    return MONDAY.replace(day=MONDAY.day + day_offset, hour=hour, minute=minute)
+
+
+class TestOpeningSchedule:
+    """Tests for OpeningSchedule bitmap compilation and queries"""
+    
+    def test_weekday_range(self):
+        """Test opening times on a range of weekdays"""
+        schedule = OpeningSchedule.compile([
+            OpeningTime(text="Mo-Fr", days=(1, 2, 3, 4, 5), start="06:00:00", end="22:00:00")
+        ])
+        
+        assert schedule.is_open_at(at(0, 6)) is True
+        assert schedule.is_open_at(at(0, 21, 59)) is True
+        assert schedule.is_open_at(at(0, 5, 59)) is False
+        assert schedule.is_open_at(at(0, 22)) is False
+        assert schedule.is_open_at(at(4, 12)) is True
+        assert schedule.is_open_at(at(5, 12)) is False
+    
+    def test_holidays(self):
+        """Test that holidays only use opening times which include holidays"""
+        schedule = OpeningSchedule.compile([
+            OpeningTime(text="Mo-Fr", days=(1, 2, 3, 4, 5), start="06:00:00", end="22:00:00"),
+            OpeningTime(text="Samstag, Sonntag, Feiertag", days=(6, 7), start="08:00:00", end="20:00:00",
+                        includes_holidays=True)
+        ])
+        
+        assert schedule.is_open_at(at(0, 7)) is True
+        assert schedule.is_open_at(at(0, 7), holiday=True) is False
+        assert schedule.is_open_at(at(0, 9), holiday=True) is True
+        assert schedule.is_open_at(at(6, 9)) is True
+    
+    def test_whole_day(self):
+        """Test that whole day stations are always open"""
+        schedule = OpeningSchedule.compile(None, whole_day=True)
+        
+        assert schedule.is_open_whole_week() is True
+        assert schedule.is_open_at(at(2, 3, 17)) is True
+        assert schedule.is_open_at(at(2, 3, 17), holiday=True) is True
+    
+    def test_over_midnight(self):
+        """Test opening times which span midnight"""
+        schedule = OpeningSchedule.compile([
+            OpeningTime(text="So", days=(7,), start="20:00:00", end="02:00:00")
+        ])
+        
+        assert schedule.is_open_at(at(6, 23)) is True
+        assert schedule.is_open_at(at(7, 1)) is True
+        assert schedule.is_open_at(at(7, 2)) is False
+    
+    def test_unaligned_times_round_inwards(self):
+        """Test that partially open slots are not marked as open"""
+        schedule = OpeningSchedule.compile([
+            OpeningTime(text="Mo", days=(1,), start="06:10:00", end="21:50:00")
+        ])
+        
+        assert schedule.is_open_at(at(0, 6, 10)) is False
+        assert schedule.is_open_at(at(0, 6, 15)) is True
+        assert schedule.is_open_at(at(0, 21, 40)) is True
+        assert schedule.is_open_at(at(0, 21, 45)) is False
+        
+        fine = OpeningSchedule.compile([
+            OpeningTime(text="Mo", days=(1,), start="06:10:00", end="21:50:00")
+        ], resolution=5)
+        assert fine.is_open_at(at(0, 6, 10)) is True
+    
+    def test_timezone_aware_moment(self):
+        """Test that aware datetimes are converted to German local time"""
+        schedule = OpeningSchedule.compile([
+            OpeningTime(text="Mo", days=(1,), start="06:00:00", end="07:00:00")
+        ])
+        
+        # 04:30 UTC is 06:30 CEST
+        assert schedule.is_open_at(datetime(2026, 8, 17, 4, 30, tzinfo=timezone.utc)) is True
+    
+    def test_invalid_resolution(self):
+        """Test that resolutions which do not divide a day are rejected"""
+        with pytest.raises(ValueError):
+            OpeningSchedule.compile([], resolution=7)
+    
+    def test_equality(self):
+        """Test that schedules with the same bitmap are equal"""
+        times = [OpeningTime(text="Mo-Fr", days=(1, 2, 3, 4, 5), start="06:00:00", end="22:00:00")]
+        
+        assert OpeningSchedule.compile(times) == OpeningSchedule.compile(list(times))
+        assert OpeningSchedule.compile(times) != OpeningSchedule.compile(None, whole_day=True)
+
+
+class TestStationOpeningSchedule:
+    """Tests for opening time queries on stations"""
+    
+    def test_station_is_open_at(self):
+        """Test querying a station and caching of the compiled schedule"""
+        station = Station(id="test-id", opening_times=[
+            OpeningTime(text="Mo-Fr", days=(1, 2, 3, 4, 5), start="06:00:00", end="22:00:00")
+        ])
+        
+        assert station.is_open_at(at(0, 12)) is True
+        assert station.is_open_at(at(6, 12)) is False
+        assert station.get_opening_schedule() is station.get_opening_schedule()
+    
+    def test_station_without_opening_times(self):
+        """Test that stations without opening times are unknown"""
+        station = Station(id="test-id")
+        
+        assert station.get_opening_schedule() is None
+        assert station.is_open_at(at(0, 12)) is None
+    
+    def test_open_mask_and_filter(self):
+        """Test the bulk variants over many stations"""
+        weekdays = Station(id="weekdays", opening_times=[
+            OpeningTime(text="Mo-Fr", days=(1, 2, 3, 4, 5), start="06:00:00", end="22:00:00")
+        ])
+        always = Station(id="always", whole_day=True)
+        unknown = Station(id="unknown")
+        stations = [weekdays, always, unknown]
+        
+        assert open_mask([s.get_opening_schedule() for s in stations], at(5, 12)) == [False, True, False]
+        assert open_mask([s.get_opening_schedule() for s in stations], at(5, 12), default=True) == [False, True, True]
+        assert filter_open(stations, at(0, 12)) == [weekdays, always]
@@ -0,0 +1,145 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.models.gas_prices import Status
+from tankerkoenig.planner import ListTile, QueryPlan, QueryPlanner, get_locations
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+from tankerkoenig.utils import distance_km
+
+BERLIN = (52.52, 13.405)
+
+
+@pytest.fixture(scope="module")
+def universe():
+    return StationUniverse(size=15000, seed=1)
+
+
+@pytest.fixture(scope="module")
+def targets(universe):
+    return {station.id: (station.lat, station.lng) for station, _ in universe.search(*BERLIN, 50)}
+
+
+@pytest.fixture
+def server(universe):
+    with FakeTankerkoenigServer(universe, clock=lambda: 1_700_000_000.0) as server:
+        yield server
+
+
+def build_api(server):
+    return Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key").build()
+
+
+class TestQueryPlanner:
+    """Tests for planning list.php and prices.php requests"""
+    
+    def test_dense_stations(self, targets):
+        """Test that clustered stations are mostly covered by list requests"""
+        plan = QueryPlanner().plan(targets)
+        
+        assert plan.get_station_ids() == set(targets)
+        assert plan.tiles
+        assert plan.get_request_count() * 2 < plan.get_prices_only_request_count()
+    
+    def test_tiles_within_radius(self, targets):
+        """Test that every station of a tile is within the radius minus the margin"""
+        plan = QueryPlanner(radius=20, margin=1).plan(targets)
+        for tile in plan.tiles:
+            assert tile.radius == 20
+            assert len(tile.station_ids) >= 11
+            for station_id in tile.station_ids:
+                assert distance_km(tile.lat, tile.lng, *targets[station_id]) <= 19
+    
+    def test_disjoint(self, targets):
+        """Test that every station is planned exactly once"""
+        plan = QueryPlanner().plan(targets)
+        planned = [station_id for tile in plan.tiles for station_id in tile.station_ids]
+        planned += [station_id for chunk in plan.price_chunks for station_id in chunk]
+        assert sorted(planned) == sorted(targets)
+        assert all(len(chunk) <= 10 for chunk in plan.price_chunks)
+    
+    def test_sparse_stations(self):
+        """Test that scattered stations are fetched with prices requests only"""
+        locations = {f"station-{i}": (48.0 + i, 10.0) for i in range(5)}
+        locations["unknown"] = None
+        plan = QueryPlanner().plan(locations)
+        
+        assert plan.tiles == ()
+        assert plan.price_chunks == (("station-0", "station-1", "station-2", "station-3", "station-4", "unknown"),)
+    
+    def test_invalid_radius(self):
+        """Test that radii beyond the limit of list.php are rejected"""
+        with pytest.raises(ValueError):
+            QueryPlanner(radius=30)
+        with pytest.raises(ValueError):
+            QueryPlanner(radius=5, margin=5)
+    
+    def test_get_locations(self, server):
+        """Test that the locations are taken from stations of a list result"""
+        result = build_api(server).list(*BERLIN).set_search_radius(5).execute()
+        locations = get_locations(result.get_stations())
+        assert set(locations) == {station.id for station in result.get_stations()}
+        assert all(location is not None for location in locations.values())
+
+
+class TestPlanExecution:
+    """Tests for executing plans against the fake server"""
+    
+    def test_execute(self, server, targets):
+        """Test that the plan returns the same prices as prices requests would"""
+        api = build_api(server)
+        planner = QueryPlanner()
+        plan = planner.plan(targets)
+        result = planner.execute(api, plan)
+        
+        assert result.missing_ids == frozenset()
+        assert result.request_count == plan.get_request_count()
+        assert set(result.prices) == set(targets)
+        
+        sample = sorted(targets)[:10]
+        expected = api.prices().add_ids_collection(sample).execute()
+        for station_id in sample:
+            assert result.get_prices(station_id) == expected.get_gas_price(station_id)
+        assert server.get_stats().requests["list.php"] == len(plan.tiles)
+    
+    def test_follow_up(self, server, universe):
+        """Test that stations missing from a list response are fetched with prices.php"""
+        station_ids = universe.get_station_ids()
+        far_away = next(station_id for station_id in station_ids
+                        if distance_km(*BERLIN, universe.get_station(station_id).lat,
+                                       universe.get_station(station_id).lng) > 100)
+        plan = QueryPlan((ListTile(*BERLIN, 5.0, frozenset([far_away])),), ())
+        result = QueryPlanner().execute(build_api(server), plan)
+        
+        assert result.request_count == 2
+        assert result.get_prices(far_away) is not None
+        assert result.get_prices(far_away).get_status() in (Status.OPEN, Status.CLOSED)
+    
+    def test_missing(self, server):
+        """Test that unknown stations are reported as missing"""
+        plan = QueryPlan((), (("unknown",),))
+        result = QueryPlanner().execute(build_api(server), plan)
+        assert result.missing_ids == frozenset(["unknown"])
+        assert result.get_prices("unknown") is None
@@ -0,0 +1,257 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import bisect
+import math
+import random
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.history import PriceHistory
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.results import PricesResult
+from tankerkoenig.polling import AdaptivePoller, ChangeRateEstimator, PollingConfig, allocate_intervals
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+
+HOUR = 3600.0
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def prices(value: float) -> GasPrices:
+    return GasPrices({GasType.E5: round(value, 3)}, Status.OPEN)
+
+
+class SimulatedStations:
+    """Stations whose prices change as Poisson processes with individual rates"""
+    
+    def __init__(self, rates_per_hour, duration, start, seed=1):
+        rng = random.Random(seed)
+        self.changes = {}
+        for station_id, rate in rates_per_hour.items():
+            times, t = [], start
+            while True:
+                t += rng.expovariate(rate / HOUR)
+                if t > start + duration:
+                    break
+                times.append(t)
+            self.changes[station_id] = times
+    
+    def get_prices(self, station_id, timestamp) -> GasPrices:
+        return prices(1.5 + bisect.bisect_right(self.changes[station_id], timestamp) / 1000)
+
+
+class TestAllocation:
+    """Tests for the distribution of the poll budget"""
+    
+    def test_proportional(self):
+        """Test that frequencies are proportional to the rates within the bounds"""
+        intervals = allocate_intervals({"a": 1.0, "b": 2.0, "c": 4.0}, 0.7, 0.1, 100)
+        assert intervals["a"] == pytest.approx(10, rel=1e-6)
+        assert intervals["b"] == pytest.approx(5, rel=1e-6)
+        assert intervals["c"] == pytest.approx(2.5, rel=1e-6)
+    
+    def test_clamped(self):
+        """Test that the bounds are kept and the remaining capacity is redistributed"""
+        intervals = allocate_intervals({"a": 0.001, "b": 1.0, "c": 100.0}, 1.5, 1, 100)
+        assert intervals["a"] == pytest.approx(100)
+        assert intervals["c"] == pytest.approx(1)
+        assert sum(1 / interval for interval in intervals.values()) == pytest.approx(1.5)
+    
+    def test_capacity_bounds(self):
+        """Test that too little or too much capacity yields the interval bounds"""
+        assert allocate_intervals({"a": 1.0, "b": 2.0}, 0.001, 1, 100) == {"a": 100, "b": 100}
+        assert allocate_intervals({"a": 1.0, "b": 2.0}, 10, 1, 100) == {"a": 1, "b": 1}
+        assert allocate_intervals({}, 1, 1, 100) == {}
+
+
+class TestChangeRateEstimator:
+    """Tests for the change rate estimation"""
+    
+    def test_initial_rate(self):
+        """Test that the initial rate is used without observations"""
+        assert ChangeRateEstimator(0.5, HOUR).get_rate() == 0.5
+    
+    @pytest.mark.parametrize("rate_per_hour", [0.5, 2.0, 6.0])
+    def test_poisson(self, rate_per_hour):
+        """Test that the rate of a Poisson process is recovered from censored observations"""
+        rng = random.Random(3)
+        estimator = ChangeRateEstimator(1.0, 365 * 24 * HOUR)
+        interval = 900.0
+        for _ in range(5000):
+            estimator.observe(interval, rng.random() < 1 - math.exp(-rate_per_hour / HOUR * interval))
+        assert estimator.get_rate() * HOUR == pytest.approx(rate_per_hour, rel=0.1)
+    
+    def test_decay(self):
+        """Test that recent observations outweigh old ones"""
+        estimator = ChangeRateEstimator(1.0, HOUR)
+        for _ in range(50):
+            estimator.observe(600, True)
+        volatile = estimator.get_rate()
+        for _ in range(50):
+            estimator.observe(600, False)
+        assert estimator.get_rate() < volatile / 10
+
+
+class TestAdaptivePoller:
+    """Tests for the adaptive polling schedule"""
+    
+    def test_initial_spread(self):
+        """Test that the first polls are spread instead of all being due at once"""
+        clock = Clock()
+        poller = AdaptivePoller([f"s{i}" for i in range(100)], PollingConfig(requests_per_hour=60), clock)
+        assert len(poller.due_batches()) == 1
+        assert poller.get_next_due() > clock.now
+    
+    def test_batches(self):
+        """Test that batches hold at most 10 stations and respect the budget"""
+        clock = Clock()
+        config = PollingConfig(requests_per_hour=120, lookahead=0.0)
+        poller = AdaptivePoller([f"s{i}" for i in range(500)], config, clock)
+        clock.now += config.max_interval
+        
+        batches = poller.due_batches()
+        assert len(batches) == 2  # burst of one minute of budget
+        assert all(len(batch) == 10 for batch in batches)
+        assert len({station_id for batch in batches for station_id in batch}) == 20
+        assert poller.get_stats().requests == 2
+    
+    def test_lookahead(self):
+        """Test that a partial batch is topped up with stations due soon"""
+        clock = Clock()
+        poller = AdaptivePoller([], PollingConfig(lookahead=0.5), clock)
+        for station_id in ("a", "b"):
+            poller.add_station(station_id)
+            poller.record(station_id, prices(1.5))
+        clock.now += poller.get_interval("a") * 0.7
+        poller.add_station("c")
+        
+        batches = poller.due_batches()
+        assert len(batches) == 1
+        assert sorted(batches[0]) == ["a", "b", "c"]
+    
+    def test_record(self):
+        """Test that changes are detected and the next poll is scheduled"""
+        clock = Clock()
+        poller = AdaptivePoller(["a"], clock=clock)
+        assert not poller.record("a", prices(1.5))
+        assert not poller.record("a", prices(1.5))
+        assert poller.record("a", prices(1.6))
+        assert not poller.record("unknown", prices(1.6))
+        assert poller.get_next_due() == clock.now + poller.get_interval("a")
+        assert poller.get_stats().changes == 1
+    
+    def test_record_error_result(self):
+        """Test that error responses of the API are skipped"""
+        poller = AdaptivePoller(["a"], clock=Clock())
+        assert poller.record_result(PricesResult(ok=False, prices=None)) == 0
+        assert poller.get_stats().polls == 0
+    
+    def test_learn_from_history(self):
+        """Test that stored price changes determine the initial rates"""
+        clock = Clock()
+        history = PriceHistory()
+        start = int(clock.now - 24 * HOUR)
+        for hour in range(25):
+            history.add("volatile", prices(1.5 + hour / 100), start + hour * HOUR)
+            history.add("stable", prices(1.5), start + hour * HOUR)
+        poller = AdaptivePoller(["volatile", "stable"], PollingConfig(requests_per_hour=1), clock)
+        poller.learn_from_history(history)
+        
+        assert poller.get_change_rate("volatile") == pytest.approx(1.0)
+        assert poller.get_change_rate("stable") < 0.1
+        assert poller.get_interval("volatile") < poller.get_interval("stable")
+    
+    def test_volatile_polled_more_often(self):
+        """Test that the learned rates shorten the intervals of volatile stations"""
+        clock = Clock()
+        config = PollingConfig(requests_per_hour=20, reallocation_interval=0)
+        rates = {f"v{i}": 6.0 for i in range(10)}
+        rates.update({f"s{i}": 0.1 for i in range(90)})
+        stations = SimulatedStations(rates, 48 * HOUR, clock.now)
+        poller = AdaptivePoller(rates, config, clock)
+        
+        for _ in range(int(48 * HOUR / 60)):
+            for batch in poller.due_batches():
+                for station_id in batch:
+                    poller.record(station_id, stations.get_prices(station_id, clock.now))
+            clock.now += 60
+        
+        assert poller.get_interval("v0") * 5 < poller.get_interval("s0")
+        assert poller.get_change_rate("v0") == pytest.approx(6.0, rel=0.5)
+    
+    def test_captures_more_changes_than_fixed_interval(self):
+        """Test that the same budget detects more changes than a fixed interval"""
+        clock = Clock()
+        duration = 72 * HOUR
+        requests_per_hour = 20
+        rng = random.Random(7)
+        rates = {f"station-{i}": (rng.uniform(3, 8) if i < 30 else rng.uniform(0.02, 0.3)) for i in range(200)}
+        stations = SimulatedStations(rates, duration, clock.now, seed=11)
+        start = clock.now
+        
+        # Every station polled at the same interval with the full budget
+        fixed_interval = len(rates) / (requests_per_hour * 10) * HOUR
+        fixed_captured = 0
+        for station_id in rates:
+            last = stations.get_prices(station_id, start)
+            t = start + fixed_interval
+            while t <= start + duration:
+                current = stations.get_prices(station_id, t)
+                fixed_captured += current != last
+                last = current
+                t += fixed_interval
+        
+        poller = AdaptivePoller(rates, PollingConfig(requests_per_hour=requests_per_hour), clock)
+        for _ in range(int(duration / 60)):
+            for batch in poller.due_batches():
+                for station_id in batch:
+                    poller.record(station_id, stations.get_prices(station_id, clock.now))
+            clock.now += 60
+        
+        stats = poller.get_stats()
+        assert stats.requests <= requests_per_hour * duration / HOUR + 1
+        assert stats.changes > fixed_captured * 1.2
+    
+    def test_poll(self):
+        """Test that due stations are polled against the fake server"""
+        clock = Clock()
+        universe = StationUniverse(size=100, seed=4)
+        with FakeTankerkoenigServer(universe, clock=clock) as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key").build()
+            station_ids = universe.get_station_ids()[:25]
+            poller = AdaptivePoller(station_ids, PollingConfig(requests_per_hour=600, lookahead=0.0), clock)
+            clock.now += PollingConfig().max_interval
+            
+            results = poller.poll(api)
+        
+        assert len(results) == 3
+        assert poller.get_stats().polls == 25
+        assert server.get_stats().requests["prices.php"] == 3
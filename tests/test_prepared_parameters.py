@@ -0,0 +1,148 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import copy
+import pickle
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.client import ClientExecutor, RequestsClientExecutor
+from tankerkoenig.requests.gas_request_type import GasRequestType
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+from tankerkoenig.utils import PreparedParameters
+
+
+class RecordingClientExecutor(ClientExecutor):
+    """ClientExecutor which records the passed parameters"""
+    
+    def __init__(self):
+        self.parameters = []
+    
+    def get(self, url, query_parameters, timeout=None):
+        self.parameters.append(query_parameters)
+        return '{"ok": true, "prices": {}}'
+    
+    def post(self, url, form_params, timeout=None):
+        self.parameters.append(form_params)
+        return '{"ok": true}'
+
+
+class TestPreparedParameters:
+    """Tests for the prepared, pre-encoded parameters"""
+    
+    def test_normalized(self):
+        """Test that values are converted to strings and empty values are dropped"""
+        parameters = PreparedParameters({"lat": 52.5, "type": "all", "empty": "", "none": None})
+        assert parameters == {"lat": "52.5", "type": "all"}
+        assert parameters.get_query() == "lat=52.5&type=all"
+    
+    def test_with_value_appends(self):
+        """Test that a new value is appended to the encoded query string"""
+        parameters = PreparedParameters({"ids": "a,b"})
+        parameters.get_query()
+        with_ts = parameters.with_value("ts", 1700000000)
+        
+        assert with_ts.get_query() == "ids=a%2Cb&ts=1700000000"
+        assert with_ts["ts"] == "1700000000"
+        assert "ts" not in parameters
+    
+    def test_with_value_replaces(self):
+        """Test that replacing a value encodes the query string again"""
+        parameters = PreparedParameters({"apikey": "a", "id": "1"})
+        parameters.get_query()
+        assert parameters.with_value("apikey", "b").get_query() == "apikey=b&id=1"
+        assert parameters.with_value("empty", "").get_query() == "apikey=a&id=1"
+    
+    def test_read_only(self):
+        """Test that the parameters can't be modified in place"""
+        parameters = PreparedParameters({"id": "1"})
+        with pytest.raises(TypeError):
+            parameters["id"] = "2"
+        with pytest.raises(TypeError):
+            parameters.update(id="2")
+        with pytest.raises(TypeError):
+            del parameters["id"]
+    
+    def test_copy_and_pickle(self):
+        """Test that copies keep the values and the query string"""
+        parameters = PreparedParameters({"id": "1"})
+        assert copy.copy(parameters).get_query() == "id=1"
+        assert pickle.loads(pickle.dumps(parameters)).get_query() == "id=1"
+        assert dict(parameters, ts=1) == {"id": "1", "ts": 1}
+
+
+class TestRequestPreparation:
+    """Tests for the caching of prepared parameters by the requests"""
+    
+    @pytest.fixture
+    def api(self):
+        return Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(RecordingClientExecutor()).build()
+    
+    def test_reused(self, api):
+        """Test that the parameters are prepared once for an unchanged request"""
+        request = api.list(52.52, 13.40)
+        prepared = request.get_prepared_parameters()
+        
+        assert request.get_prepared_parameters() is prepared
+        assert prepared["apikey"] == "api-key"
+        assert prepared["lat"] == "52.52"
+    
+    def test_invalidated_by_setters(self, api):
+        """Test that setters discard the prepared parameters"""
+        request = api.list(52.52, 13.40)
+        prepared = request.get_prepared_parameters()
+        request.set_search_radius(10)
+        assert request.get_prepared_parameters()["rad"] == "10"
+        request.set_gas_request_type(GasRequestType.DIESEL)
+        assert request.get_prepared_parameters()["type"] == "diesel"
+        assert request.get_prepared_parameters() is not prepared
+        
+        prices = api.prices().add_id("a")
+        assert prices.get_prepared_parameters()["ids"] == "a"
+        prices.add_id("b")
+        assert sorted(prices.get_prepared_parameters()["ids"].split(",")) == ["a", "b"]
+    
+    def test_timestamp_patched(self):
+        """Test that every execution only adds its timestamp to the prepared parameters"""
+        executor = RecordingClientExecutor()
+        api = Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(executor).build()
+        request = api.prices().add_ids("a")
+        request.execute()
+        request.execute()
+        
+        first, second = executor.parameters
+        assert isinstance(first, PreparedParameters)
+        assert first.get_query().startswith(request.get_prepared_parameters().get_query() + "&ts=")
+        assert dict(first, ts=None) == dict(second, ts=None)
+    
+    def test_sent_query(self):
+        """Test that the prepared query string is sent by the RequestsClientExecutor"""
+        with FakeTankerkoenigServer(StationUniverse(size=50, seed=2)) as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key") \
+                .with_client_executor(RequestsClientExecutor()).build()
+            station_id = server.get_universe().get_station_ids()[0]
+            result = api.prices().add_id(station_id).execute()
+        
+        assert result.is_ok()
+        assert result.get_gas_price(station_id) is not None
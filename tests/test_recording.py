@@ -0,0 +1,154 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import gzip
+import json
+
+import pytest
+from tankerkoenig.client import ClientExecutor, Requester, RequestsClientExecutor
+from tankerkoenig.exceptions import ClientExecutorException, ClientExecutorTimeoutException, RequesterException
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.recording import (
+    Cassette, RecordingClientExecutor, ReplayClientExecutor, fixed_latency, recorded_latency, uniform_latency
+)
+from tankerkoenig.requests.prices import PricesRequest
+from tankerkoenig.utils import PreparedParameters
+
+URL = "http://localhost/prices.php"
+
+
+class SequenceClientExecutor(ClientExecutor):
+    """ClientExecutor which answers with a new price on every call"""
+    
+    def __init__(self):
+        self.calls = 0
+    
+    def get(self, url, query_parameters):
+        self.calls += 1
+        if query_parameters.get("ids") == "broken":
+            raise ClientExecutorException(url, "Service unavailable")
+        return json.dumps({
+            "ok": True,
+            "prices": {query_parameters["ids"]: {"status": "open", "e5": 1.7 + self.calls / 100}}
+        })
+    
+    def post(self, url, form_params):
+        return json.dumps({"ok": True})
+
+
+def record(tmp_path):
+    """Records three requests, one of them failing, and returns the cassette path"""
+    path = str(tmp_path / "prices.jsonl.gz")
+    with RecordingClientExecutor(SequenceClientExecutor(), path) as recorder:
+        recorder.get(URL, {"ids": "station-a", "apikey": "secret", "ts": 1})
+        recorder.get(URL, {"ids": "station-a", "apikey": "secret", "ts": 2})
+        with pytest.raises(ClientExecutorException):
+            recorder.get(URL, {"ids": "broken", "apikey": "secret"})
+    return path
+
+
+class TestRecording:
+    """Tests for recording and replaying cassettes"""
+    
+    def test_cassette_round_trip(self, tmp_path):
+        """Test that recorded interactions are written without the API key"""
+        path = record(tmp_path)
+        
+        cassette = Cassette.load(path)
+        
+        assert len(cassette) == 3
+        first = cassette.get_interactions()[0]
+        assert (first.method, first.url, first.parameters) == ("GET", URL, (("ids", "station-a"),))
+        assert first.latency >= 0
+        assert cassette.get_interactions()[2].error == "Service unavailable"
+        with open(path, "rb") as f:
+            assert b"secret" not in f.read()
+    
+    def test_api_key_redacted_from_errors(self, tmp_path):
+        """Test that the API key in the URL of a connection error is not recorded"""
+        path = str(tmp_path / "errors.jsonl.gz")
+        parameters = PreparedParameters({"ids": "station-a", "apikey": "secret-key"})
+        with RecordingClientExecutor(RequestsClientExecutor(), path) as recorder:
+            with pytest.raises(ClientExecutorException) as exc_info:
+                recorder.get("http://127.0.0.1:1/prices.php", parameters, timeout=1)
+        assert "secret-key" in str(exc_info.value)
+        
+        error = Cassette.load(path).get_interactions()[0].error
+        assert "apikey=REDACTED" in error
+        with gzip.open(path, "rb") as f:
+            assert b"secret-key" not in f.read()
+    
+    def test_replay_in_recording_order(self, tmp_path):
+        """Test that repeated requests are answered in recording order, repeating the last response"""
+        replay = ReplayClientExecutor(record(tmp_path))
+        
+        bodies = [replay.get(URL, {"ids": "station-a", "apikey": "other", "ts": 9}) for _ in range(3)]
+        
+        assert bodies[0] != bodies[1]
+        assert bodies[1] == bodies[2]
+        replay.rewind()
+        assert replay.get(URL, {"ids": "station-a"}) == bodies[0]
+    
+    def test_replay_failures(self, tmp_path):
+        """Test that recorded failures and unknown requests raise ClientExecutorException"""
+        replay = ReplayClientExecutor(record(tmp_path))
+        
+        with pytest.raises(ClientExecutorException, match="Service unavailable"):
+            replay.get(URL, {"ids": "broken"})
+        with pytest.raises(ClientExecutorException, match="No recorded response"):
+            replay.get(URL, {"ids": "station-b"})
+    
+    def test_replay_through_requester(self, tmp_path):
+        """Test that replayed responses are mapped like real responses"""
+        requester = Requester(ReplayClientExecutor(record(tmp_path)), JsonMapper())
+        
+        result = PricesRequest("key", "http://localhost/", requester).add_id("station-a").execute()
+        
+        assert result.get_gas_price("station-a").status.value == "open"
+        with pytest.raises(RequesterException):
+            PricesRequest("key", "http://localhost/", requester).add_id("broken").execute()
+    
+    def test_latency_models(self, tmp_path):
+        """Test that the latency model delays the responses"""
+        cassette = Cassette.load(record(tmp_path))
+        interaction = cassette.get_interactions()[0]
+        delays = []
+        
+        replay = ReplayClientExecutor(cassette, fixed_latency(0.25), sleep=delays.append)
+        replay.get(URL, {"ids": "station-a"})
+        
+        assert delays == [0.25]
+        assert recorded_latency(2.0)(interaction) == interaction.latency * 2
+        draws = [uniform_latency(0.1, 0.2, seed=7)(interaction) for _ in range(2)]
+        assert draws[0] == draws[1]
+        assert 0.1 <= draws[0] <= 0.2
+    
+    def test_latency_exceeding_timeout(self, tmp_path):
+        """Test that a delay longer than the timeout raises a timeout"""
+        delays = []
+        replay = ReplayClientExecutor(record(tmp_path), fixed_latency(5), sleep=delays.append)
+        
+        with pytest.raises(ClientExecutorTimeoutException):
+            replay.get(URL, {"ids": "station-a"}, timeout=1)
+        assert delays == [1]
@@ -0,0 +1,142 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import RequestParamException
+from tankerkoenig.models.results import PricesResult, StationListResult
+from tankerkoenig.requests.base import Method, RequestTemplate
+from tankerkoenig.requests.gas_request_type import GasRequestType
+from tankerkoenig.requests.station_list import SortingRequestType
+from tankerkoenig.requests.validator import RequestParamValidator
+
+
+class EchoClientExecutor(ClientExecutor):
+    """ClientExecutor which answers prices requests with the requested IDs"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def get(self, url, query_parameters, timeout=None):
+        self.calls.append(query_parameters)
+        ids = query_parameters.get("ids", "").split(",")
+        return json.dumps({"ok": True, "stations": [],
+                           "prices": {station_id: {"status": "open", "e5": 1.789} for station_id in ids if station_id}})
+    
+    def post(self, url, form_params, timeout=None):
+        return json.dumps({"ok": True})
+
+
+@pytest.fixture
+def executor():
+    return EchoClientExecutor()
+
+
+@pytest.fixture
+def api(executor):
+    return Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(executor).build()
+
+
+class TestRequestTemplate:
+    """Tests for immutable request templates"""
+    
+    def test_prices_template(self, api):
+        """Test that a prices template can be executed repeatedly"""
+        template = api.prices_template(["a", "b"])
+        
+        assert isinstance(template, RequestTemplate)
+        assert template.get_result_class() is PricesResult
+        for _ in range(3):
+            result = template.execute()
+            assert result.is_ok()
+            assert set(result.get_gas_prices()) == {"a", "b"}
+    
+    def test_list_template(self, api, executor):
+        """Test that the list parameters are taken over"""
+        template = api.list_template(52.52, 13.40, radius=10, gas_request_type=GasRequestType.DIESEL,
+                                     sorting=SortingRequestType.PRICE)
+        
+        assert template.get_result_class() is StationListResult
+        assert template.get_method() == Method.GET
+        assert template.get_endpoint() == "list.php"
+        assert template.execute().is_ok()
+        assert {k: executor.calls[0][k] for k in ("lat", "lng", "rad", "type", "sort")} == {
+            "lat": "52.52", "lng": "13.4", "rad": "10", "type": "diesel", "sort": "price"
+        }
+    
+    def test_validated_at_construction(self, api):
+        """Test that invalid templates are rejected when they are built"""
+        with pytest.raises(RequestParamException):
+            api.prices_template([])
+        with pytest.raises(RequestParamException):
+            api.prices_template([str(i) for i in range(11)])
+        with pytest.raises(RequestParamException):
+            api.list_template(91, 13.40)
+        with pytest.raises(RequestParamException):
+            api.detail_template("")
+    
+    def test_not_validated_on_execution(self, api, monkeypatch):
+        """Test that executions skip the validation"""
+        template = api.prices_template(["a"])
+        calls = []
+        original = RequestParamValidator.not_empty_collection
+        monkeypatch.setattr(RequestParamValidator, "not_empty_collection",
+                            staticmethod(lambda *args: calls.append(args) or original(*args)))
+        
+        template.execute()
+        api.prices().add_id("a").execute()
+        assert len(calls) == 1
+    
+    def test_immutable(self, api):
+        """Test that templates can't be changed"""
+        template = api.detail_template("station")
+        with pytest.raises(AttributeError):
+            template._api_key = "other"
+        assert template.freeze() is template
+    
+    def test_independent_of_source(self, api, executor):
+        """Test that changing the source request doesn't change the template"""
+        request = api.prices().add_id("a")
+        template = request.freeze()
+        request.add_id("b")
+        
+        template.execute()
+        assert executor.calls[0]["ids"] == "a"
+    
+    def test_concurrent(self, api):
+        """Test that a template can be executed from several threads"""
+        template = api.prices_template(["a"])
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: template.execute(), range(32)))
+        assert all(result.get_gas_price("a") is not None for result in results)
+    
+    def test_execute_many(self, api):
+        """Test that templates can be executed in batches"""
+        templates = [api.prices_template([station_id]) for station_id in ("a", "b", "c")]
+        outcomes = list(api.execute_many(templates, ordered=True))
+        assert [next(iter(outcome.get_result().get_gas_prices())) for outcome in outcomes] == ["a", "b", "c"]
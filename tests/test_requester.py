@@ -0,0 +1,469 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+from tankerkoenig.client import ClientExecutor, Requester
+from tankerkoenig.deadline import Deadline
+from tankerkoenig.exceptions import (
+    ClientExecutorException, ClientExecutorTimeoutException, RequesterException, RequestTimeoutException
+)
+from tankerkoenig.instrumentation import RequestObserver, Stage, TraceStatus
+from tankerkoenig.models.mapper import JsonMapper
+from tankerkoenig.models.results import PricesResult, CorrectionResult
+from tankerkoenig.requests.correction import CorrectionRequest, CorrectionType
+from tankerkoenig.requests.prices import PricesRequest
+from tankerkoenig.singleflight import SingleFlight
+
+PRICES_BODY = json.dumps({
+    "ok": True,
+    "prices": {"station-a": {"status": "open", "e5": 1.789, "e10": 1.729, "diesel": 1.659}}
+})
+
+
+class StubClientExecutor(ClientExecutor):
+    """ClientExecutor which records calls and returns a fixed body. If a gate is
+    supplied, GET calls block until it is set"""
+    
+    def __init__(self, body=PRICES_BODY, error=None, gate=None, delay=0.0):
+        self.body = body
+        self.error = error
+        self.gate = gate
+        self.delay = delay
+        self.calls = []
+        self.timeouts = []
+    
+    def get(self, url, query_parameters, timeout=None):
+        self.calls.append(("GET", url, dict(query_parameters)))
+        self.timeouts.append(timeout)
+        if self.gate is not None:
+            self.gate.wait(5)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return self.body
+    
+    def post(self, url, form_params, timeout=None):
+        self.calls.append(("POST", url, dict(form_params)))
+        self.timeouts.append(timeout)
+        return json.dumps({"ok": True})
+
+
+class CountingSingleFlight(SingleFlight):
+    """SingleFlight which signals every caller joining the in-flight table"""
+    
+    def __init__(self):
+        super().__init__()
+        self.callers = 0
+        self.joined = threading.Semaphore(0)
+    
+    def _join(self, key):
+        joined = super()._join(key)
+        self.callers += 1
+        self.joined.release()
+        return joined
+    
+    def wait_for_callers(self, count):
+        for _ in range(count):
+            assert self.joined.acquire(timeout=5)
+
+
+class RecordingObserver(RequestObserver):
+    """Observer which keeps every trace"""
+    
+    def __init__(self):
+        self.traces = []
+    
+    def on_request(self, trace):
+        self.traces.append(trace)
+
+
+def prices_request(requester, *ids):
+    """Builds a PricesRequest for the supplied station IDs"""
+    return PricesRequest("api-key", "http://localhost/", requester).add_ids(*ids)
+
+
+class TestRequester:
+    """Tests for Requester request execution"""
+    
+    def test_execute_get(self):
+        """Test executing a GET request and mapping the result"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper())
+        
+        result = prices_request(requester, "station-a").execute()
+        
+        assert isinstance(result, PricesResult)
+        assert result.get_gas_price("station-a").status.value == "open"
+        method, url, params = executor.calls[0]
+        assert (method, url) == ("GET", "http://localhost/prices.php")
+        assert params["ids"] == "station-a"
+        assert params["apikey"] == "api-key"
+        assert "ts" in params
+    
+    def test_execute_post(self):
+        """Test executing a POST request"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper())
+        
+        request = CorrectionRequest("api-key", "http://localhost/", requester, CorrectionType.WRONG_STATUS_OPEN)
+        result = request.set_station_id("station-a").execute()
+        
+        assert isinstance(result, CorrectionResult)
+        assert executor.calls[0][0] == "POST"
+    
+    def test_validation_failure(self):
+        """Test that validation failures are wrapped and nothing is sent"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper())
+        
+        with pytest.raises(RequesterException):
+            prices_request(requester).execute()
+        assert executor.calls == []
+    
+    def test_client_executor_failure(self):
+        """Test that client executor failures are wrapped"""
+        error = ClientExecutorException("http://localhost/prices.php", "connection refused")
+        requester = Requester(StubClientExecutor(error=error), JsonMapper())
+        
+        with pytest.raises(RequesterException) as exc_info:
+            prices_request(requester, "station-a").execute()
+        assert exc_info.value.cause is error
+    
+    def test_execute_async(self):
+        """Test executing a request from a coroutine"""
+        requester = Requester(StubClientExecutor(), JsonMapper())
+        
+        result = asyncio.run(prices_request(requester, "station-a").execute_async())
+        
+        assert result.get_gas_price("station-a") is not None
+
+
+class TestRequesterTimeouts:
+    """Tests for the deadline of request executions"""
+    
+    def test_no_timeout_by_default(self):
+        """Test that executors are not passed a timeout without deadline"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper())
+        
+        prices_request(requester, "station-a").execute()
+        
+        assert executor.timeouts == [None]
+    
+    def test_remaining_time_is_passed_to_executor(self):
+        """Test that the executor receives the remaining time of the deadline"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper())
+        
+        prices_request(requester, "station-a").execute(timeout=5)
+        
+        assert 0 < executor.timeouts[0] <= 5
+    
+    def test_default_timeout(self):
+        """Test that the default timeout applies if none is supplied"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper(), default_timeout=2)
+        
+        prices_request(requester, "station-a").execute()
+        prices_request(requester, "station-a").execute(timeout=10)
+        
+        assert 0 < executor.timeouts[0] <= 2
+        assert 2 < executor.timeouts[1] <= 10
+    
+    def test_executor_timeout(self):
+        """Test that executor timeouts are raised as RequestTimeoutException"""
+        error = ClientExecutorTimeoutException("http://localhost/prices.php", "read timed out")
+        requester = Requester(StubClientExecutor(error=error), JsonMapper())
+        
+        with pytest.raises(RequestTimeoutException) as exc_info:
+            prices_request(requester, "station-a").execute(timeout=1)
+        assert exc_info.value.cause is error
+        assert exc_info.value.timeout == 1
+    
+    def test_deadline_checked_after_http(self):
+        """Test that a response arriving after the deadline is not mapped and returned"""
+        requester = Requester(StubClientExecutor(delay=0.2), JsonMapper())
+        
+        with pytest.raises(RequestTimeoutException) as exc_info:
+            prices_request(requester, "station-a").execute(timeout=0.1)
+        assert "mapping the response" in str(exc_info.value)
+    
+    def test_waiting_for_coalesced_request_is_bounded(self):
+        """Test that a caller waiting for an identical request gives up at its deadline"""
+        gate = threading.Event()
+        executor = StubClientExecutor(gate=gate)
+        single_flight = CountingSingleFlight()
+        requester = Requester(executor, JsonMapper(), single_flight)
+        
+        leader = threading.Thread(target=prices_request(requester, "station-a").execute)
+        leader.start()
+        single_flight.wait_for_callers(1)
+        try:
+            with pytest.raises(RequestTimeoutException):
+                prices_request(requester, "station-a").execute(timeout=0.05)
+        finally:
+            gate.set()
+            leader.join(5)
+        
+        assert len(executor.calls) == 1
+    
+    def test_async_waiting_for_coalesced_request_is_bounded(self):
+        """Test that a timed out coroutine does not cancel the shared request"""
+        gate = threading.Event()
+        executor = StubClientExecutor(gate=gate)
+        single_flight = CountingSingleFlight()
+        requester = Requester(executor, JsonMapper(), single_flight)
+        
+        async def run():
+            leader = asyncio.ensure_future(prices_request(requester, "station-a").execute_async())
+            while single_flight.callers < 1:
+                await asyncio.sleep(0.01)
+            with pytest.raises(RequestTimeoutException):
+                await prices_request(requester, "station-a").execute_async(timeout=0.05)
+            gate.set()
+            return await leader
+        
+        assert asyncio.run(run()).is_ok()
+    
+    def test_expired_deadline(self):
+        """Test that an expired deadline is raised with the stage it expired before"""
+        now = [0.0]
+        deadline = Deadline(1, clock=lambda: now[0])
+        
+        assert deadline.check("sending the request") == 1
+        now[0] = 1.5
+        assert deadline.expired()
+        assert deadline.remaining() == 0
+        with pytest.raises(RequestTimeoutException) as exc_info:
+            deadline.check("sending the request")
+        assert "before sending the request" in str(exc_info.value)
+
+
+class TestRequestCoalescing:
+    """Tests for single-flight request coalescing in the Requester"""
+    
+    def _run_concurrently(self, requester, count, ids=("station-a",)):
+        results = [None] * count
+        
+        def run(index):
+            try:
+                results[index] = prices_request(requester, *ids).execute()
+            except RequesterException as e:
+                results[index] = e
+        
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+    
+    def test_concurrent_identical_requests_share_one_call(self):
+        """Test that identical concurrent GET requests send a single HTTP request"""
+        gate = threading.Event()
+        executor = StubClientExecutor(gate=gate)
+        single_flight = CountingSingleFlight()
+        requester = Requester(executor, JsonMapper(), single_flight)
+        
+        threads, results = self._run_concurrently(requester, 5)
+        single_flight.wait_for_callers(5)
+        assert single_flight.in_flight() == 1
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+        
+        assert len(executor.calls) == 1
+        assert all(result is results[0] for result in results)
+        assert single_flight.in_flight() == 0
+    
+    def test_exception_is_propagated_to_all_waiters(self):
+        """Test that every waiter receives the exception of the shared call"""
+        gate = threading.Event()
+        error = ClientExecutorException("http://localhost/prices.php", "timeout")
+        executor = StubClientExecutor(error=error, gate=gate)
+        single_flight = CountingSingleFlight()
+        requester = Requester(executor, JsonMapper(), single_flight)
+        
+        threads, results = self._run_concurrently(requester, 3)
+        single_flight.wait_for_callers(3)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+        
+        assert all(isinstance(result, RequesterException) for result in results)
+        assert all(result.cause is error for result in results)
+    
+    def test_sequential_requests_are_not_coalesced(self):
+        """Test that only in-flight calls are shared"""
+        executor = StubClientExecutor()
+        requester = Requester(executor, JsonMapper(), SingleFlight())
+        
+        prices_request(requester, "station-a").execute()
+        prices_request(requester, "station-a").execute()
+        
+        assert len(executor.calls) == 2
+    
+    def test_different_parameters_are_not_coalesced(self):
+        """Test that the coalescing key depends on the parameters"""
+        key_a = Requester._coalescing_key("url", {"ids": "a", "ts": 1}, PricesResult)
+        key_b = Requester._coalescing_key("url", {"ids": "b", "ts": 1}, PricesResult)
+        key_a_later = Requester._coalescing_key("url", {"ids": "a", "ts": 2, "empty": ""}, PricesResult)
+        
+        assert key_a != key_b
+        assert key_a == key_a_later
+    
+    def test_async_callers_share_one_call(self):
+        """Test coalescing of asyncio callers"""
+        gate = threading.Event()
+        executor = StubClientExecutor(gate=gate)
+        single_flight = CountingSingleFlight()
+        requester = Requester(executor, JsonMapper(), single_flight)
+        
+        async def run():
+            tasks = [asyncio.ensure_future(prices_request(requester, "station-a").execute_async()) for _ in range(4)]
+            while single_flight.callers < 4:
+                await asyncio.sleep(0.01)
+            gate.set()
+            return await asyncio.gather(*tasks)
+        
+        results = asyncio.run(run())
+        
+        assert len(executor.calls) == 1
+        assert all(result is results[0] for result in results)
+
+
+class TestRequesterInstrumentation:
+    """Tests for the stage timings reported to RequestObservers"""
+    
+    def test_successful_execution(self):
+        """Test that every stage is recorded and the trace is tagged"""
+        observer = RecordingObserver()
+        requester = Requester(StubClientExecutor(), JsonMapper(), observers=[observer])
+        
+        prices_request(requester, "station-a").execute()
+        
+        trace = observer.traces[0]
+        assert [span.stage for span in trace.spans] == [
+            Stage.VALIDATE, Stage.BUILD_PARAMETERS, Stage.HTTP, Stage.PARSE, Stage.MAP
+        ]
+        assert all(span.duration >= 0 for span in trace.spans)
+        assert trace.get_tags() == {
+            "endpoint": "prices.php",
+            "method": "GET",
+            "status": "ok",
+            "response_size": len(PRICES_BODY),
+            "station_count": 1,
+            "coalesced": False,
+        }
+        assert trace.duration >= 0
+    
+    def test_failed_execution(self):
+        """Test that failures are reported with the exception"""
+        observer = RecordingObserver()
+        error = ClientExecutorException("http://localhost/prices.php", "connection refused")
+        requester = Requester(StubClientExecutor(error=error), JsonMapper())
+        requester.add_observer(observer)
+        
+        with pytest.raises(RequesterException):
+            prices_request(requester, "station-a").execute()
+        
+        trace = observer.traces[0]
+        assert trace.status == TraceStatus.EXCEPTION
+        assert trace.error.cause is error
+        assert trace.get_span(Stage.HTTP) is not None
+        assert trace.get_span(Stage.MAP) is None
+    
+    def test_api_error_status(self):
+        """Test that error responses of the API are tagged as error"""
+        observer = RecordingObserver()
+        body = json.dumps({"ok": False, "status": "error", "message": "parameter error"})
+        requester = Requester(StubClientExecutor(body=body), JsonMapper(), observers=[observer])
+        
+        prices_request(requester, "station-a").execute()
+        
+        assert observer.traces[0].status == TraceStatus.ERROR
+        assert observer.traces[0].station_count == 0
+    
+    def test_failing_observer_does_not_affect_execution(self):
+        """Test that exceptions of observers are not propagated"""
+        class FailingObserver(RequestObserver):
+            def on_request(self, trace):
+                raise RuntimeError("broken observer")
+        
+        requester = Requester(StubClientExecutor(), JsonMapper(), observers=[FailingObserver()])
+        
+        assert prices_request(requester, "station-a").execute().is_ok()
+    
+    def test_coalesced_executions(self):
+        """Test that only the leading request of coalesced requests records the HTTP stage"""
+        gate = threading.Event()
+        observer = RecordingObserver()
+        single_flight = CountingSingleFlight()
+        requester = Requester(StubClientExecutor(gate=gate), JsonMapper(), single_flight, [observer])
+        
+        threads = [threading.Thread(target=prices_request(requester, "station-a").execute) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        single_flight.wait_for_callers(3)
+        gate.set()
+        for thread in threads:
+            thread.join(5)
+        
+        assert sorted(trace.coalesced for trace in observer.traces) == [False, True, True]
+        assert all(trace.status == TraceStatus.OK for trace in observer.traces)
+    
+    def test_failing_leader_is_not_coalesced(self):
+        """Test that a leading request failing before the HTTP stage is not reported as coalesced"""
+        observer = RecordingObserver()
+        requester = Requester(StubClientExecutor(), JsonMapper(), SingleFlight(), [observer])
+        
+        with pytest.raises(RequestTimeoutException):
+            requester.execute(prices_request(requester, "station-a"), PricesResult, timeout=1e-9)
+        
+        assert observer.traces[0].status == TraceStatus.EXCEPTION
+        assert observer.traces[0].coalesced is False
+    
+    def test_open_telemetry_observer(self):
+        """Test exporting traces as OpenTelemetry spans"""
+        pytest.importorskip("opentelemetry.sdk")
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+        from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+        from tankerkoenig.instrumentation import OpenTelemetryObserver
+        
+        exporter = InMemorySpanExporter()
+        provider = TracerProvider()
+        provider.add_span_processor(SimpleSpanProcessor(exporter))
+        requester = Requester(StubClientExecutor(), JsonMapper(),
+                              observers=[OpenTelemetryObserver(provider.get_tracer("test"))])
+        
+        prices_request(requester, "station-a").execute()
+        
+        names = [span.name for span in exporter.get_finished_spans()]
+        assert "tankerkoenig prices.php" in names
+        assert "tankerkoenig.http" in names
+        assert len(names) == 6
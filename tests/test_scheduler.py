@@ -0,0 +1,215 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import asyncio
+import json
+import threading
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.client import ClientExecutor
+from tankerkoenig.exceptions import RequestRejectedException, RequestTimeoutException
+from tankerkoenig.rate_limiter import RateLimiter
+from tankerkoenig.scheduler import Priority, RequestScheduler, SchedulerConfig, scheduling
+
+
+class RecordingRequester:
+    """Requester which records the executed requests. The request "block" waits for the gate"""
+    
+    def __init__(self):
+        self.gate = threading.Event()
+        self.blocked = threading.Event()
+        self.executed = []
+        self.default_timeout = None
+    
+    def get_default_timeout(self):
+        return self.default_timeout
+    
+    def execute(self, request, result_class, timeout=None):
+        if request == "block":
+            self.blocked.set()
+            assert self.gate.wait(5)
+        self.executed.append(request)
+        return request
+
+
+@pytest.fixture
+def requester():
+    requester = RecordingRequester()
+    yield requester
+    requester.gate.set()
+
+
+def blocked_scheduler(requester, **config):
+    """Creates a scheduler with a single worker, which is blocked until the gate of the requester is set"""
+    scheduler = RequestScheduler(requester, SchedulerConfig(max_concurrency=1, **config))
+    scheduler.submit("block", str)
+    assert requester.blocked.wait(5)
+    return scheduler
+
+
+class TestRequestScheduler:
+    """Tests for priority and fair scheduling"""
+    
+    def test_priority_and_tenant_order(self, requester):
+        """Test that higher priorities are dispatched first and tenants take turns"""
+        scheduler = blocked_scheduler(requester)
+        futures = [
+            scheduler.submit("crawl-a1", str, Priority.BACKGROUND, "crawl-a"),
+            scheduler.submit("crawl-a2", str, Priority.BACKGROUND, "crawl-a"),
+            scheduler.submit("crawl-a3", str, Priority.BACKGROUND, "crawl-a"),
+            scheduler.submit("crawl-b1", str, Priority.BACKGROUND, "crawl-b"),
+            scheduler.submit("default", str),
+            scheduler.submit("user", str, Priority.INTERACTIVE, "user-1"),
+        ]
+        
+        requester.gate.set()
+        assert [future.result(5) for future in futures][-1] == "user"
+        
+        assert requester.executed == ["block", "user", "default", "crawl-a1", "crawl-b1", "crawl-a2", "crawl-a3"]
+        scheduler.shutdown()
+    
+    def test_rate_limiter_tokens_go_to_higher_priority(self, requester):
+        """Test that rate limited dispatches still follow the priorities"""
+        scheduler = RequestScheduler(requester, SchedulerConfig(max_concurrency=2), RateLimiter(50.0))
+        requester.gate.set()
+        futures = [scheduler.submit(f"crawl-{i}", str, Priority.BACKGROUND) for i in range(3)]
+        futures.append(scheduler.submit("user", str, Priority.INTERACTIVE))
+        
+        for future in futures:
+            future.result(5)
+        
+        assert requester.executed.index("user") < 3
+        scheduler.shutdown()
+    
+    def test_load_shedding(self, requester):
+        """Test that a full queue sheds the newest request of the lowest priority"""
+        scheduler = blocked_scheduler(requester, max_queue_depth=2)
+        oldest = scheduler.submit("crawl-1", str, Priority.BACKGROUND)
+        newest = scheduler.submit("crawl-2", str, Priority.BACKGROUND)
+        
+        user = scheduler.submit("user", str, Priority.INTERACTIVE)
+        with pytest.raises(RequestRejectedException):
+            newest.result(5)
+        with pytest.raises(RequestRejectedException):
+            scheduler.submit("crawl-3", str, Priority.BACKGROUND)
+        
+        requester.gate.set()
+        assert user.result(5) == "user"
+        assert oldest.result(5) == "crawl-1"
+        assert scheduler.get_stats()[Priority.BACKGROUND].shed == 2
+        scheduler.shutdown()
+    
+    def test_timeout_while_queued(self, requester):
+        """Test that a caller waiting longer than its timeout gives up and leaves the queue"""
+        scheduler = blocked_scheduler(requester)
+        
+        with pytest.raises(RequestTimeoutException):
+            scheduler.execute("late", str, timeout=0.05)
+        assert scheduler.get_stats()[Priority.DEFAULT].queued == 0
+        
+        requester.gate.set()
+        scheduler.shutdown()
+        assert "late" not in requester.executed
+    
+    def test_default_timeout_of_requester_while_queued(self, requester):
+        """Test that executions without a timeout are bounded by the default timeout of the requester"""
+        requester.default_timeout = 0.05
+        scheduler = blocked_scheduler(requester)
+        
+        with pytest.raises(RequestTimeoutException):
+            scheduler.execute("late", str)
+        with pytest.raises(RequestTimeoutException):
+            asyncio.run(scheduler.execute_async("late", str))
+        assert scheduler.get_stats()[Priority.DEFAULT].queued == 0
+        
+        requester.gate.set()
+        scheduler.shutdown()
+        assert "late" not in requester.executed
+    
+    def test_wait_time_stats(self, requester):
+        """Test that queue wait times are reported per priority"""
+        scheduler = blocked_scheduler(requester)
+        future = scheduler.submit("crawl", str, Priority.BACKGROUND)
+        threading.Timer(0.05, requester.gate.set).start()
+        future.result(5)
+        
+        stats = scheduler.get_stats()
+        assert stats[Priority.BACKGROUND].dispatched == 1
+        assert stats[Priority.BACKGROUND].max_wait >= 0.04
+        assert stats[Priority.BACKGROUND].p95_wait == stats[Priority.BACKGROUND].max_wait
+        assert stats[Priority.INTERACTIVE].mean_wait is None
+        scheduler.shutdown()
+    
+    def test_shutdown_rejects_queued_requests(self, requester):
+        """Test that queued requests fail when the scheduler shuts down"""
+        scheduler = blocked_scheduler(requester)
+        queued = scheduler.submit("queued", str)
+        
+        scheduler.shutdown(wait=False)
+        requester.gate.set()
+        
+        with pytest.raises(RequestRejectedException):
+            queued.result(5)
+        with pytest.raises(RequestRejectedException):
+            scheduler.submit("after", str)
+        assert "queued" not in requester.executed
+
+
+class StubClientExecutor(ClientExecutor):
+    def get(self, url, query_parameters, timeout=None):
+        return json.dumps({"ok": True, "prices": {query_parameters["ids"]: {"status": "open", "e5": 1.789}}})
+    
+    def post(self, url, form_params, timeout=None):
+        return json.dumps({"ok": True})
+
+
+class TestSchedulerApi:
+    """Tests for the scheduler set up by the ApiBuilder"""
+    
+    def test_scheduling_context(self):
+        """Test that requests are scheduled with the priority of the context"""
+        api = Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(StubClientExecutor()) \
+            .with_scheduler(SchedulerConfig(max_concurrency=2)).build()
+        
+        with scheduling(Priority.INTERACTIVE, tenant="user-1"):
+            assert api.prices().add_id("station-a").execute().is_ok()
+        assert api.prices().add_id("station-b").execute(timeout=5).is_ok()
+        
+        stats = api.get_scheduler().get_stats()
+        assert stats[Priority.INTERACTIVE].dispatched == 1
+        assert stats[Priority.DEFAULT].dispatched == 1
+        api.get_scheduler().shutdown()
+    
+    def test_scheduling_context_of_batches(self):
+        """Test that requests of execute_many() keep the priority of the context"""
+        api = Tankerkoenig.ApiBuilder().with_api_key("api-key").with_client_executor(StubClientExecutor()) \
+            .with_scheduler().build()
+        
+        with scheduling(Priority.BACKGROUND, tenant="crawl"):
+            outcomes = list(api.execute_many([api.prices().add_id(str(i)) for i in range(3)], max_workers=2))
+        
+        assert all(outcome.is_success() for outcome in outcomes)
+        assert api.get_scheduler().get_stats()[Priority.BACKGROUND].dispatched == 3
+        api.get_scheduler().shutdown()
@@ -0,0 +1,222 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import functools
+import pickle
+import threading
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.sharding import (HashRing, ShardedCrawler, SqliteCoordinator, SqliteResultSink,
+                                   crawl_in_processes)
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+
+KEYS = [f"station-{index}" for index in range(5000)]
+
+
+class Clock:
+    def __init__(self, now: float = 1_700_000_000.0):
+        self.now = now
+    
+    def __call__(self) -> float:
+        return self.now
+
+
+def build_api(base_url: str):
+    return Tankerkoenig.ApiBuilder(base_url=base_url).with_api_key("api-key").build()
+
+
+@pytest.fixture(scope="module")
+def universe():
+    return StationUniverse(size=300, seed=2)
+
+
+@pytest.fixture
+def server(universe):
+    with FakeTankerkoenigServer(universe, clock=lambda: 1_700_000_000.0) as server:
+        yield server
+
+
+@pytest.fixture
+def coordinator(tmp_path):
+    coordinator = SqliteCoordinator(str(tmp_path / "coordinator.sqlite"), ttl=30, clock=Clock())
+    yield coordinator
+    coordinator.close()
+
+
+@pytest.fixture
+def sink(tmp_path):
+    sink = SqliteResultSink(str(tmp_path / "prices.sqlite"))
+    yield sink
+    sink.close()
+
+
+class TestHashRing:
+    """Tests for the consistent hash ring"""
+    
+    def test_balanced(self):
+        """Test that keys are spread evenly over the workers"""
+        assignment = HashRing([f"worker-{index}" for index in range(4)], virtual_nodes=128).assign(KEYS)
+        assert sum(len(keys) for keys in assignment.values()) == len(KEYS)
+        assert all(0.7 < len(keys) / (len(KEYS) / 4) < 1.3 for keys in assignment.values())
+    
+    def test_stable(self):
+        """Test that the assignment does not depend on the insertion order"""
+        assert HashRing(["a", "b", "c"]).assign(KEYS) == HashRing(["c", "a", "b"]).assign(KEYS)
+    
+    def test_join_moves_only_new_share(self):
+        """Test that a joining worker only takes keys, nothing moves between the others"""
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.get_node(key) for key in KEYS}
+        ring.add_node("d")
+        moved = [key for key in KEYS if ring.get_node(key) != before[key]]
+        assert all(ring.get_node(key) == "d" for key in moved)
+        assert 0.15 < len(moved) / len(KEYS) < 0.35
+    
+    def test_leave(self):
+        """Test that only the keys of a leaving worker move"""
+        ring = HashRing(["a", "b", "c"])
+        before = {key: ring.get_node(key) for key in KEYS}
+        ring.remove_node("b")
+        assert "b" not in ring and len(ring) == 2
+        assert all(ring.get_node(key) == node for key, node in before.items() if node != "b")
+    
+    def test_empty(self):
+        assert HashRing().get_node("station") is None
+        with pytest.raises(ValueError):
+            HashRing(virtual_nodes=0)
+
+
+class TestSqliteCoordinator:
+    """Tests for the SQLite membership"""
+    
+    def test_membership(self, coordinator):
+        coordinator.join("b")
+        coordinator.join("a")
+        assert coordinator.get_workers() == ["a", "b"]
+        coordinator.leave("a")
+        assert coordinator.get_workers() == ["b"]
+    
+    def test_expiry(self, tmp_path):
+        """Test that workers without heartbeats are considered gone"""
+        clock = Clock()
+        coordinator = SqliteCoordinator(str(tmp_path / "coordinator.sqlite"), ttl=30, clock=clock)
+        coordinator.join("a")
+        coordinator.join("b")
+        clock.now += 20
+        coordinator.heartbeat("b")
+        clock.now += 20
+        assert coordinator.get_workers() == ["b"]
+        coordinator.close()
+    
+    def test_pickle(self, coordinator):
+        """Test that a pickled coordinator shares the database"""
+        coordinator.join("a")
+        copy = pickle.loads(pickle.dumps(coordinator))
+        assert copy.get_workers() == ["a"]
+        copy.close()
+
+
+class TestSqliteResultSink:
+    """Tests for the shared result sink"""
+    
+    def test_write(self, sink):
+        prices = GasPrices({GasType.E5: 1.799, GasType.DIESEL: 1.659}, Status.OPEN)
+        sink.write({"a": prices, "b": GasPrices({}, Status.CLOSED)}, 100)
+        assert sink.get("a") == prices
+        assert sink.get("b") == GasPrices({}, Status.CLOSED)
+        assert sink.get("c") is None
+        assert len(sink) == 2
+    
+    def test_older_write_ignored(self, sink):
+        """Test that a late write of an overlapping worker does not replace newer prices"""
+        sink.write({"a": GasPrices({GasType.E5: 1.8}, Status.OPEN)}, 200)
+        sink.write({"a": GasPrices({GasType.E5: 1.7}, Status.OPEN)}, 100)
+        assert sink.get("a").get_price(GasType.E5) == 1.8
+        assert sink.get_timestamp("a") == 200
+
+
+class TestShardedCrawler:
+    """Tests for crawling the shards of the stations"""
+    
+    def test_shards_cover_all_stations(self, coordinator, sink):
+        crawlers = [ShardedCrawler(f"worker-{index}", KEYS, coordinator, sink) for index in range(3)]
+        for crawler in crawlers:
+            crawler.join()
+        shards = [set(crawler.get_assigned_ids()) for crawler in crawlers]
+        assert set().union(*shards) == set(KEYS)
+        assert sum(len(shard) for shard in shards) == len(KEYS)
+    
+    def test_rebalance(self, coordinator, sink):
+        """Test that the stations of a leaving worker are taken over by the others"""
+        first = ShardedCrawler("worker-0", KEYS, coordinator, sink)
+        second = ShardedCrawler("worker-1", KEYS, coordinator, sink)
+        first.join()
+        second.join()
+        assert len(first.get_assigned_ids()) < len(KEYS)
+        second.leave()
+        assert first.get_assigned_ids() == KEYS
+        assert first.get_rebalance_count() == 1
+    
+    def test_crawl(self, universe, server, coordinator, sink):
+        station_ids = universe.get_station_ids()[:95]
+        crawlers = [ShardedCrawler(f"worker-{index}", station_ids, coordinator, sink) for index in range(2)]
+        for crawler in crawlers:
+            crawler.join()
+        stats = [crawler.crawl(build_api(server.get_base_url())) for crawler in crawlers]
+        
+        assert sum(stat.assigned for stat in stats) == 95
+        assert all(stat.workers == 2 and stat.failed_requests == 0 for stat in stats)
+        assert len(sink) == 95
+        assert sink.get(station_ids[0]).get_status() in (Status.OPEN, Status.CLOSED)
+    
+    def test_run(self, universe, server, coordinator, sink):
+        """Test that the loop crawls, stops and leaves"""
+        crawler = ShardedCrawler("worker-0", universe.get_station_ids()[:20], coordinator, sink)
+        stop = threading.Event()
+        passes = []
+        
+        def on_stats(stats):
+            passes.append(stats)
+            stop.set()
+        
+        crawler.run(build_api(server.get_base_url()), stop, interval=60, on_stats=on_stats)
+        assert len(passes) == 1 and passes[0].stations == 20
+        assert coordinator.get_workers() == []
+    
+    def test_crawl_in_processes(self, universe, server, tmp_path):
+        station_ids = universe.get_station_ids()[:200]
+        coordinator = SqliteCoordinator(str(tmp_path / "coordinator.sqlite"))
+        sink = SqliteResultSink(str(tmp_path / "prices.sqlite"))
+        
+        stats = crawl_in_processes(functools.partial(build_api, server.get_base_url()), station_ids,
+                                   coordinator, sink, processes=3)
+        
+        assert [stat.worker_id for stat in stats] == ["process-0", "process-1", "process-2"]
+        assert sum(stat.assigned for stat in stats) == 200
+        assert len(sink.get_all()) == 200
+        assert coordinator.get_workers() == []
+        coordinator.close()
+        sink.close()
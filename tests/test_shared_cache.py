@@ -0,0 +1,151 @@
+"""
+MIT License
+
+Copyright (c) 2017 Stefan Hueg (Codengine)
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING WITHOUT LIMITATION THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+SOFTWARE.
+"""
+
+import mmap
+import multiprocessing
+import struct
+
+import pytest
+from tankerkoenig import Tankerkoenig
+from tankerkoenig.models.gas_prices import GasPrices, GasType, Status
+from tankerkoenig.models.results import PricesResult
+from tankerkoenig.shared_cache import SharedPriceReader, SharedPriceWriter
+from tankerkoenig.testing import FakeTankerkoenigServer, StationUniverse
+
+STATION_ID = "51d4b660-a095-1aa0-e100-80009459e03a"
+
+
+def write_consistent_prices(path, rounds):
+    """Writes slots whose three prices are always equal, in a separate process"""
+    with SharedPriceWriter(path, capacity=10) as writer:
+        for index in range(rounds):
+            price = 1.0 + (index % 900) / 1000
+            writer.put(f"station-{index % 10}", GasPrices(dict.fromkeys(GasType, price), Status.OPEN), index)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "prices.bin")
+
+
+class TestSharedPriceCache:
+    """Tests for the shared memory price table"""
+    
+    def test_put_get(self, path):
+        prices = GasPrices({GasType.E5: 1.799, GasType.DIESEL: 1.659}, Status.OPEN)
+        with SharedPriceWriter(path, capacity=5) as writer, SharedPriceReader(path) as reader:
+            writer.put(STATION_ID, prices, 1_700_000_000)
+            writer.put("closed", GasPrices({}, Status.CLOSED), 1_700_000_001)
+            
+            assert reader.get(STATION_ID) == prices
+            assert reader.get_timestamp(STATION_ID) == 1_700_000_000
+            assert reader.get("closed") == GasPrices({}, Status.CLOSED)
+            assert reader.get("unknown") is None
+            assert len(reader) == 2
+            assert reader.get_station_ids() == [STATION_ID, "closed"]
+    
+    def test_update_visible(self, path):
+        """Test that readers see updates without reopening"""
+        with SharedPriceWriter(path, capacity=5) as writer, SharedPriceReader(path) as reader:
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.799}, Status.OPEN), 1)
+            assert reader.get(STATION_ID).get_price(GasType.E5) == 1.799
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.759}, Status.OPEN), 2)
+            assert reader.get_entry(STATION_ID) == (GasPrices({GasType.E5: 1.759}, Status.OPEN), 2)
+            assert len(writer) == 1
+    
+    def test_reopen(self, path):
+        """Test that a restarted writer keeps the slots"""
+        with SharedPriceWriter(path, capacity=5) as writer:
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.799}, Status.OPEN), 1)
+        with SharedPriceWriter(path, capacity=5) as writer:
+            assert len(writer) == 1
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.759}, Status.OPEN), 2)
+            writer.put("other", GasPrices({}, Status.CLOSED), 2)
+        with SharedPriceReader(path) as reader:
+            assert reader.get(STATION_ID).get_price(GasType.E5) == 1.759
+            assert len(reader) == 2
+        with pytest.raises(ValueError):
+            SharedPriceWriter(path, capacity=6)
+    
+    def test_reopen_after_interrupted_write(self, path):
+        """Test that a slot left odd by a writer which died while writing is usable again"""
+        with SharedPriceWriter(path, capacity=5) as writer:
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.799}, Status.OPEN), 1)
+        with open(path, "r+b") as file, mmap.mmap(file.fileno(), 0) as buffer:
+            struct.pack_into("<I", buffer, 64, 3)
+        
+        with SharedPriceWriter(path, capacity=5) as writer, SharedPriceReader(path) as reader:
+            writer.put(STATION_ID, GasPrices({GasType.E5: 1.759}, Status.OPEN), 2)
+            assert reader.get(STATION_ID).get_price(GasType.E5) == 1.759
+            with open(path, "rb") as file:
+                file.seek(64)
+                assert struct.unpack("<I", file.read(4))[0] == 4
+    
+    def test_error_result(self, path):
+        """Test that error responses of the API store nothing"""
+        with SharedPriceWriter(path, capacity=5) as writer:
+            assert writer.put_prices_result(PricesResult(ok=False, message="error", prices=None)) == 0
+            assert len(writer) == 0
+    
+    def test_limits(self, path):
+        with SharedPriceWriter(path, capacity=1) as writer:
+            writer.put("a", GasPrices({}, Status.CLOSED))
+            with pytest.raises(ValueError):
+                writer.put("b", GasPrices({}, Status.CLOSED))
+            with pytest.raises(ValueError):
+                writer.put("x" * 37, GasPrices({}, Status.CLOSED))
+    
+    def test_invalid_file(self, path):
+        with open(path, "wb") as file:
+            file.write(b"\0" * 128)
+        with pytest.raises(ValueError):
+            SharedPriceReader(path)
+    
+    def test_prices_result(self, path):
+        """Test that the prices of a result are stored, stations not found are skipped"""
+        universe = StationUniverse(size=20, seed=5)
+        station_ids = universe.get_station_ids()[:5]
+        with FakeTankerkoenigServer(universe, clock=lambda: 1_700_000_000.0) as server:
+            api = Tankerkoenig.ApiBuilder(base_url=server.get_base_url()).with_api_key("api-key").build()
+            result = api.prices().add_ids_collection(station_ids + [STATION_ID]).execute()
+        
+        with SharedPriceWriter(path, capacity=10) as writer, SharedPriceReader(path) as reader:
+            assert writer.put_prices_result(result, 1_700_000_000) == 5
+            assert reader.get_all() == {station_id: result.get_gas_price(station_id) for station_id in station_ids}
+    
+    def test_concurrent_writer_process(self, path):
+        """Test that a reader never sees a partially written slot of another process"""
+        SharedPriceWriter(path, capacity=10).close()
+        process = multiprocessing.get_context().Process(target=write_consistent_prices, args=(path, 100_000))
+        process.start()
+        with SharedPriceReader(path) as reader:
+            reads = 0
+            while process.is_alive() or reads == 0:
+                for station_id in reader.get_station_ids():
+                    prices = reader.get(station_id)
+                    assert len(set(prices.prices.values())) == 1
+                    reads += 1
+        process.join()
+        assert process.exitcode == 0
+        assert reads > 0